@@ -69,7 +69,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'gestao.middleware.WhiteNoiseAssincrono',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -160,4 +160,81 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cache de PDFs gerados (media/cache_documentos), despejo LRU acima deste tamanho
+DOCUMENTOS_CACHE_MAX_BYTES = int(os.environ.get('DOCUMENTOS_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# PDFs entregues sem arquivar (ex.: ofício de remessa) ficam em memória até este
+# tamanho e passam para um arquivo temporário anônimo acima dele
+PDF_SPOOL_MAX_BYTES = 5 * 1024 * 1024
+
+# Processos simultâneos do worker de documentos (manage.py processar_documentos)
+DOCUMENTOS_WORKERS = int(os.environ.get('DOCUMENTOS_WORKERS', 2))
+
+# Sem sinal de vida (reserva ou avanço do progresso) por este prazo, uma tarefa
+# PROCESSANDO é tida como de um worker que caiu e volta para a fila
+DOCUMENTOS_RESERVA_SEGUNDOS = 1800
+
+# Prazo da reserva de um evento pelo worker do outbox (manage.py processar_outbox);
+# vencido, outro worker pode pegar o evento (o primeiro caiu ou travou)
+OUTBOX_RESERVA_SEGUNDOS = 300
+
+# Extração do texto do PDF no api/ler_tc/ com TC_ASSINCRONO_WORKERS = 0 (tc_parser.MODOS_PDF): 'serial',
+# 'paralelo' (páginas divididas entre processos, para TCs longos com laudos) ou
+# 'cabecalho' (para de ler quando os campos do cabeçalho e os itens aparecem)
+TC_EXTRACAO_PDF = os.environ.get('TC_EXTRACAO_PDF', 'paralelo')
+
+# Ordem em que os backends de extração (tc_parser.BACKENDS_PDF) são tentados;
+# os não instalados são pulados e o próximo entra quando o texto não tem BOU
+# nem processo. None usa a ordem padrão, do mais rápido para o mais fiel
+TC_BACKENDS_PDF = [b for b in os.environ.get('TC_BACKENDS_PDF', '').split(',') if b] or None
+
+# Tamanho máximo do TC enviado ao api/ler_tc/ (o upload vai para um arquivo
+# temporário anônimo e é lido por mmap; acima disso a resposta é 413)
+TC_UPLOAD_MAX_BYTES = int(os.environ.get('TC_UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+
+# TCs já lidos, em memória (nunca em disco), pelo SHA-256 do arquivo: quantos
+# guardar por processo do servidor e por quanto tempo (0 itens desliga o cache)
+TC_CACHE_MAX_ITENS = int(os.environ.get('TC_CACHE_MAX_ITENS', 256))
+TC_CACHE_TTL_SEGUNDOS = 3600
+
+# Instrumentação do tc_parser: tempo e alternativa que casou por campo, nas
+# últimas TC_INSTRUMENTACAO_CAPACIDADE leituras de cada processo do servidor
+# (api/ler_tc/instrumentacao/, só para staff). Desligada não custa nada.
+TC_INSTRUMENTACAO = os.environ.get('TC_INSTRUMENTACAO', '') == '1'
+TC_INSTRUMENTACAO_CAPACIDADE = 1000
+
+# Leitura de TCs em lote (api/ler_tc/lote/): processos, tempo limite por arquivo,
+# quantidade de arquivos por envio, tamanho máximo de cada arquivo e do envio
+# inteiro (somando o conteúdo descomprimido dos ZIPs)
+TC_LOTE_WORKERS = int(os.environ.get('TC_LOTE_WORKERS', 2))
+TC_LOTE_TIMEOUT_SEGUNDOS = 60
+TC_LOTE_MAX_ARQUIVOS = 100
+TC_LOTE_MAX_BYTES_ARQUIVO = 20 * 1024 * 1024
+TC_LOTE_MAX_BYTES_ENVIO = 200 * 1024 * 1024
+
+# Leitura de um TC pelo api/ler_tc/, que é assíncrono (tc_assincrono): processos
+# que extraem e parseiam (0 lê numa thread deste processo, com TC_EXTRACAO_PDF e
+# sem tempo limite), leituras aceitas ao mesmo tempo antes de responder 503,
+# tempo limite por TC (contado depois que um worker o pega) e o nice dos
+# processos, que cedem a CPU às páginas (manage.py benchmark_asgi_tc mede a
+# latência delas durante os envios)
+TC_ASSINCRONO_WORKERS = int(os.environ.get('TC_ASSINCRONO_WORKERS', 2))
+TC_ASSINCRONO_MAX_PENDENTES = 8
+TC_ASSINCRONO_TIMEOUT_SEGUNDOS = 60
+TC_ASSINCRONO_NICE = 10
+
+# Retenção dos PDFs arquivados em MEDIA_ROOT (manage.py limpar_arquivos_gerados):
+# dias de validade por categoria (pasta) e teto total do que pode ser apagado.
+# Certidões de incineração efetivada e documentos de lotes incinerados são protegidos.
+ARQUIVOS_GERADOS_TTL_DIAS = {
+    'recibos/entrada': 30,
+    'recibos/entrega_unica': 30,
+    'oficios': 90,
+    'lotes/capas': 90,
+    'incineracao': 365,
+    'relatorios': 7,
+    'tarefas': 7,
+}
+ARQUIVOS_GERADOS_MAX_BYTES = int(os.environ.get('ARQUIVOS_GERADOS_MAX_BYTES', 1024 * 1024 * 1024))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
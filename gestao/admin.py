@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import LoteIncineracao, Material, RegistroHistorico, Ocorrencia, Noticiado, CaixaIncineracao
+from .models import LoteIncineracao, Material, RegistroHistorico, Ocorrencia, Noticiado, CaixaIncineracao, TarefaDocumento, ArquivoGerado
 
 @admin.register(Ocorrencia)
 class OcorrenciaAdmin(admin.ModelAdmin):
@@ -78,6 +78,7 @@ class RegistroHistoricoAdmin(admin.ModelAdmin):
     list_display = ('data_criacao', 'material', 'status_na_epoca', 'criado_por') 
     list_filter = ('status_na_epoca', 'criado_por', 'data_criacao')
     readonly_fields = ('data_criacao', 'criado_por', 'status_na_epoca', 'material')
+    ordering = ('-data_criacao',)
     
     # Histórico nunca deve ser apagado ou editado manualmente
     def has_add_permission(self, request): return False
@@ -112,4 +113,17 @@ class CaixaIncineracaoAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         if obj and obj.status == 'INCINERADO':
             return False
-        return True
\ No newline at end of file
+        return True
+@admin.register(TarefaDocumento)
+class TarefaDocumentoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'progresso', 'criado_por', 'data_criacao', 'concluido_em')
+    list_filter = ('tipo', 'status')
+    readonly_fields = ('data_criacao', 'iniciado_em', 'concluido_em', 'arquivo', 'erro')
+
+
+@admin.register(ArquivoGerado)
+class ArquivoGeradoAdmin(admin.ModelAdmin):
+    list_display = ('caminho', 'categoria', 'tamanho', 'gerado_em', 'origem_tipo', 'protegido')
+    list_filter = ('categoria', 'protegido')
+    search_fields = ('caminho',)
+    readonly_fields = ('caminho', 'categoria', 'tamanho', 'gerado_em', 'origem_tipo', 'origem_ids')
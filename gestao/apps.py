@@ -3,4 +3,10 @@ from django.apps import AppConfig
 class GestaoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestao'
-    verbose_name = 'Gestão de Custódia'
\ No newline at end of file
+    verbose_name = 'Gestão de Custódia'
+
+    def ready(self):
+        from django.conf import settings
+        if getattr(settings, 'TC_INSTRUMENTACAO', False):
+            from . import tc_parser
+            tc_parser.ativar_instrumentacao(getattr(settings, 'TC_INSTRUMENTACAO_CAPACIDADE', 1000))
@@ -0,0 +1,241 @@
+"""
+arquivos_gerados.py — Retenção dos PDFs arquivados em MEDIA_ROOT.
+
+Cada impressão arquivada (recibos, ofícios, capas, certidões, relatórios,
+documentos da fila) é registrada em ArquivoGerado com a entidade de origem.
+A limpeza trabalha sobre o catálogo, não sobre o disco:
+
+  1. varredura incremental — só relista as pastas cujo mtime mudou desde a
+     última execução, para catalogar arquivos antigos/soltos e esquecer os
+     que sumiram;
+  2. validade por categoria (settings.ARQUIVOS_GERADOS_TTL_DIAS);
+  3. teto de tamanho (settings.ARQUIVOS_GERADOS_MAX_BYTES), apagando os
+     mais antigos primeiro.
+
+Nunca são apagados: arquivos marcados como protegidos (certidão de
+incineração efetivada) e certidões/capas de lotes já incinerados, que são
+registro legal da destruição — inclusive as achadas no disco sem registro
+(ver _origem_legal). Uploads (recibos/forum, recibos/deposito) e o
+cache de documentos (que tem despejo próprio) ficam fora do catálogo.
+"""
+import os
+import re
+import json
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ArquivoGerado, LoteIncineracao
+
+logger = logging.getLogger(__name__)
+
+CATEGORIAS = [c for c, _ in ArquivoGerado.CATEGORIA_CHOICES]
+
+# Categorias cujo arquivo vira registro legal quando os lotes de origem são incinerados
+_CATEGORIAS_LEGAIS = ('incineracao', 'lotes/capas')
+
+_ARQUIVO_ESTADO = '.arquivos_gerados.json'
+
+# capa_lote_<identificador>_<AAAAMMDD>_<HHMMSS>.pdf (documentos_services.gerar_capa_lote_pdf)
+_CAPA_LOTE = re.compile(r'^capa_lote_(?P<identificador>.+)_\d{8}_\d{6}\.pdf$')
+
+
+def _ttl_dias():
+    return getattr(settings, 'ARQUIVOS_GERADOS_TTL_DIAS', {})
+
+
+def _limite_bytes():
+    return getattr(settings, 'ARQUIVOS_GERADOS_MAX_BYTES', 1024 * 1024 * 1024)
+
+
+def categoria_de(relativo):
+    """ Categoria (pasta) de um caminho relativo ao MEDIA_ROOT, ou None se não for gerenciado """
+    pasta = os.path.dirname(relativo.replace(os.sep, '/'))
+    return pasta if pasta in CATEGORIAS else None
+
+
+# ── REGISTRO ──────────────────────────────────────────────────────────────────
+
+def registrar(relativo, origem_tipo=None, origem_ids=(), protegido=False):
+    """
+    Cataloga um arquivo recém-gerado. Falhas aqui só são logadas: o documento
+    já foi entregue e a varredura incremental cataloga o que escapar.
+    """
+    categoria = categoria_de(relativo)
+    if categoria is None:
+        return None
+    try:
+        tamanho = os.path.getsize(os.path.join(settings.MEDIA_ROOT, relativo))
+        arquivo, _ = ArquivoGerado.objects.update_or_create(caminho=relativo, defaults={
+            'categoria': categoria, 'tamanho': tamanho, 'gerado_em': timezone.now(),
+            'origem_tipo': origem_tipo, 'origem_ids': list(origem_ids), 'protegido': protegido,
+        })
+        return arquivo
+    except Exception:
+        logger.exception(f"[RETENCAO] Falha ao catalogar {relativo}")
+        return None
+
+
+# ── VARREDURA INCREMENTAL ─────────────────────────────────────────────────────
+
+def _caminho_estado():
+    return os.path.join(settings.MEDIA_ROOT, _ARQUIVO_ESTADO)
+
+
+def _ler_estado():
+    try:
+        with open(_caminho_estado(), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _gravar_estado(estado):
+    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    temporario = f"{_caminho_estado()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+    os.replace(temporario, _caminho_estado())
+
+
+def varrer(completo=False):
+    """
+    Sincroniza o catálogo com o disco nas pastas que mudaram (mtime diferente
+    do registrado na última varredura). Devolve (pastas relistadas, novos, removidos).
+    """
+    estado = {} if completo else _ler_estado()
+    relistadas = novos = removidos = 0
+
+    for categoria in CATEGORIAS:
+        pasta = os.path.join(settings.MEDIA_ROOT, *categoria.split('/'))
+        try:
+            mtime = os.stat(pasta).st_mtime_ns
+        except FileNotFoundError:
+            removidos += ArquivoGerado.objects.filter(categoria=categoria).delete()[0]
+            estado.pop(categoria, None)
+            continue
+        if estado.get(categoria) == mtime:
+            continue
+
+        relistadas += 1
+        no_disco = {}
+        with os.scandir(pasta) as entradas:
+            for e in entradas:
+                if e.is_file() and not e.name.endswith('.tmp'):
+                    no_disco[f"{categoria}/{e.name}"] = e.stat()
+
+        catalogados = set(ArquivoGerado.objects.filter(categoria=categoria).values_list('caminho', flat=True))
+        sumidos = catalogados - no_disco.keys()
+        if sumidos:
+            removidos += ArquivoGerado.objects.filter(caminho__in=sumidos).delete()[0]
+
+        faltantes = [
+            ArquivoGerado(
+                caminho=relativo, categoria=categoria, tamanho=st.st_size,
+                gerado_em=datetime.fromtimestamp(st.st_mtime, tz=timezone.get_current_timezone()),
+            )
+            for relativo, st in no_disco.items() if relativo not in catalogados
+        ]
+        if categoria in _CATEGORIAS_LEGAIS:
+            _origem_legal(faltantes)
+        ArquivoGerado.objects.bulk_create(faltantes, batch_size=500, ignore_conflicts=True)
+        novos += len(faltantes)
+        estado[categoria] = mtime
+
+    _gravar_estado(estado)
+    return relistadas, novos, removidos
+
+
+def _origem_legal(arquivos):
+    """
+    Arquivos de categoria legal achados no disco sem registro (gerados antes
+    do catálogo): a capa tem o lote no nome e passa pela regra de
+    _proteger_legais; o que não dá para ligar a um lote (as certidões) fica
+    protegido, porque pode ser o registro de uma incineração.
+    """
+    identificadores = {}
+    for arquivo in arquivos:
+        casamento = _CAPA_LOTE.match(os.path.basename(arquivo.caminho))
+        if casamento:
+            identificadores[arquivo.caminho] = casamento['identificador']
+    lotes = dict(LoteIncineracao.objects.filter(identificador__in=set(identificadores.values()))
+                 .values_list('identificador', 'id')) if identificadores else {}
+    for arquivo in arquivos:
+        lote_id = lotes.get(identificadores.get(arquivo.caminho))
+        if lote_id is None:
+            arquivo.protegido = True
+        else:
+            arquivo.origem_tipo, arquivo.origem_ids = 'LOTE', [lote_id]
+
+
+# ── LIMPEZA ───────────────────────────────────────────────────────────────────
+
+def _proteger_legais(candidatos):
+    """
+    Marca como protegidos (de vez) os candidatos de categorias legais cujos
+    lotes de origem já foram incinerados. Devolve os ids protegidos agora.
+    """
+    legais = [a for a in candidatos if a.categoria in _CATEGORIAS_LEGAIS and a.origem_tipo == 'LOTE']
+    lote_ids = {i for a in legais for i in a.origem_ids}
+    if not lote_ids:
+        return set()
+    incinerados = set(LoteIncineracao.objects.filter(id__in=lote_ids, status='INCINERADO').values_list('id', flat=True))
+    ids = {a.id for a in legais if incinerados.intersection(a.origem_ids)}
+    if ids:
+        ArquivoGerado.objects.filter(id__in=ids).update(protegido=True)
+    return ids
+
+
+def _apagar(arquivos, simular):
+    apagados, liberados = 0, 0
+    for arquivo in arquivos:
+        if not simular:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, arquivo.caminho))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception(f"[RETENCAO] Falha ao apagar {arquivo.caminho}")
+                continue
+            ArquivoGerado.objects.filter(id=arquivo.id).delete()
+        apagados += 1
+        liberados += arquivo.tamanho
+    return apagados, liberados
+
+
+def limpar(agora=None, simular=False):
+    """
+    Apaga os arquivos vencidos e, se o total ainda passar do teto, os mais
+    antigos não protegidos. Devolve (vencidos, por_tamanho, bytes_liberados).
+    """
+    agora = agora or timezone.now()
+    livres = ArquivoGerado.objects.filter(protegido=False)
+
+    vencidos = []
+    for categoria, dias in _ttl_dias().items():
+        vencidos.extend(livres.filter(categoria=categoria, gerado_em__lt=agora - timedelta(days=dias)))
+    protegidos = _proteger_legais(vencidos)
+    n_vencidos, liberados = _apagar([a for a in vencidos if a.id not in protegidos], simular)
+
+    total = (ArquivoGerado.objects.aggregate(t=Sum('tamanho'))['t'] or 0) - (liberados if simular else 0)
+    excesso = total - _limite_bytes()
+    n_tamanho = 0
+    if excesso > 0:
+        candidatos = list(livres.exclude(id__in=[a.id for a in vencidos]).order_by('gerado_em', 'id'))
+        protegidos = _proteger_legais(candidatos)
+        escolhidos = []
+        for arquivo in candidatos:
+            if excesso <= 0:
+                break
+            if arquivo.id not in protegidos:
+                escolhidos.append(arquivo)
+                excesso -= arquivo.tamanho
+        n_tamanho, bytes_tamanho = _apagar(escolhidos, simular)
+        liberados += bytes_tamanho
+
+    if (n_vencidos or n_tamanho) and not simular:
+        logger.info(f"[RETENCAO] {n_vencidos} vencido(s) e {n_tamanho} acima do teto apagados, {liberados} bytes liberados")
+    return n_vencidos, n_tamanho, liberados
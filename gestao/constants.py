@@ -59,6 +59,7 @@ STATUS_CUSTODIA_CHOICES = [
     ('RETIRADO_PERICIA', 'Saída Temporária (Enviado para Perícia Externa)'),
     ('RETORNO_PERICIA', 'Retorno de Perícia (Re-armazenado)'),
     ('AUTORIZADO', 'Aguardando Incineração (Ordem Judicial)'),
+    ('AGUARDANDO_INCINERACAO', 'Em Lote de Incineração (Aguardando Queima)'),
     ('TRANSPORTE', 'Em Transporte (Para Destruição)'),
     ('INCINERADO', 'Fim de Custódia (Incinerado)'),
     ('AGUARDANDO_OFICIO', 'Aguardando Geração de Ofício (Materiais Gerais)'),
@@ -69,3 +70,23 @@ STATUS_CUSTODIA_CHOICES = [
     ('GUIA_GERADA', 'Guia Gerada (Aguardando Depósito)'),
     ('DEPOSITADO_JUDICIALMENTE', 'Depositado (Comprovante Anexado)'),
 ]
+
+# Status de custódia -> status para os quais o material pode passar (custodia.transicionar)
+TRANSICOES_CUSTODIA = {
+    'RECEBIDO': ['CONSTATAÇÃO', 'ARMAZENADO', 'RETIRADO_PERICIA', 'AUTORIZADO', 'AGUARDANDO_OFICIO', 'AGUARDANDO_GUIA'],
+    'CONSTATAÇÃO': ['ARMAZENADO', 'RETIRADO_PERICIA', 'AUTORIZADO'],
+    'ARMAZENADO': ['RETIRADO_PERICIA', 'AUTORIZADO'],
+    'RETIRADO_PERICIA': ['RETORNO_PERICIA'],
+    'RETORNO_PERICIA': ['ARMAZENADO', 'AUTORIZADO'],
+    'AUTORIZADO': ['AGUARDANDO_INCINERACAO', 'TRANSPORTE', 'INCINERADO'],
+    'AGUARDANDO_INCINERACAO': ['TRANSPORTE', 'INCINERADO'],
+    'TRANSPORTE': ['INCINERADO'],
+    'INCINERADO': [],
+    'AGUARDANDO_OFICIO': ['OFICIO_GERADO'],
+    'OFICIO_GERADO': ['EM_TRANSPORTE_FORUM'],
+    'EM_TRANSPORTE_FORUM': ['ENTREGUE_AO_JUDICIARIO'],
+    'ENTREGUE_AO_JUDICIARIO': [],
+    'AGUARDANDO_GUIA': ['GUIA_GERADA'],
+    'GUIA_GERADA': ['DEPOSITADO_JUDICIALMENTE'],
+    'DEPOSITADO_JUDICIALMENTE': [],
+}
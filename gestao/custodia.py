@@ -0,0 +1,105 @@
+"""
+custodia.py — Mudança de status de custódia de vários materiais de uma vez.
+
+transicionar() confere as transições (constants.TRANSICOES_CUSTODIA), grava os
+materiais num bulk_update e o histórico num bulk_create, ajusta os
+ProcessoPendente num UPDATE e envia um único materiais_transicionados. Como o
+bulk_update não passa por Material.save(), nada disso dispara post_save.
+"""
+from collections import Counter
+
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .constants import STATUS_CUSTODIA_CHOICES, TRANSICOES_CUSTODIA
+from .models import Material, Noticiado, ProcessoPendente, RegistroHistorico
+
+# Enviado depois da gravação, com sender=Material, materiais, status e usuario
+materiais_transicionados = Signal()
+
+STATUS_VALIDOS = {codigo for codigo, _ in STATUS_CUSTODIA_CHOICES}
+
+
+class TransicaoInvalida(ValueError):
+    """ Algum material não pode passar do status atual para o pedido """
+
+
+def _conferir(materiais, status):
+    if status not in STATUS_VALIDOS:
+        raise TransicaoInvalida(f"Status de custódia desconhecido: {status}")
+    invalidos = [mat for mat in materiais if status not in TRANSICOES_CUSTODIA.get(mat.status, ())]
+    if invalidos:
+        exemplos = ', '.join(f"{mat.numero_lacre or mat.id} ({mat.status})" for mat in invalidos[:5])
+        raise TransicaoInvalida(
+            f"{len(invalidos)} material(is) não pode(m) passar para {status}: {exemplos}")
+
+
+def _ajustar_pendencias(materiais, gravados):
+    """ O que Material.save() faria com ProcessoPendente, somado por ocorrência """
+    por_noticiado = Counter()
+    ocorrencias = {}
+    for mat in materiais:
+        carregado = getattr(mat, '_carregado', {})
+        antes = Material._noticiado_aguardando_lote(carregado)
+        depois = Material._noticiado_aguardando_lote(
+            {**carregado, **{campo: mat.__dict__.get(campo) for campo in gravados if campo in Material.CAMPOS_RASTREADOS}})
+        if antes == depois:
+            continue
+        for noticiado_id, delta in ((antes, -1), (depois, 1)):
+            if noticiado_id:
+                por_noticiado[noticiado_id] += delta
+                if noticiado_id == mat.noticiado_id and Material.noticiado.is_cached(mat):
+                    ocorrencias[noticiado_id] = mat.noticiado.ocorrencia_id
+
+    faltando = [noticiado_id for noticiado_id in por_noticiado if noticiado_id not in ocorrencias]
+    if faltando:
+        ocorrencias.update(Noticiado.objects.filter(pk__in=faltando).values_list('id', 'ocorrencia_id'))
+    deltas = Counter()
+    for noticiado_id, delta in por_noticiado.items():
+        deltas[ocorrencias.get(noticiado_id)] += delta
+    ProcessoPendente.ajustar_varios(deltas)
+
+
+def transicionar(materiais, status, observacao, usuario=None, campos=(), contexto=None):
+    """
+    Passa `materiais` (instâncias de Material) para `status` e registra o
+    histórico. `campos` são outros campos já alterados pelo chamador que
+    devem ser gravados junto (ex.: 'lote'). `observacao` é formatada por
+    material com `material` e as chaves de `contexto`, como em
+    "Material adicionado ao Lote {material.lote.identificador}". Sem
+    `usuario`, o histórico fica com o criado_por de cada material.
+    Levanta TransicaoInvalida (ou ValueError, se um material vier repetido)
+    antes de gravar qualquer coisa. Devolve a lista de materiais.
+    """
+    materiais = list(materiais)
+    if len({mat.pk for mat in materiais}) != len(materiais):
+        raise ValueError("O mesmo material foi passado mais de uma vez")
+    _conferir(materiais, status)
+    if not materiais:
+        return materiais
+
+    agora = timezone.now()
+    contexto = contexto or {}
+    for mat in materiais:
+        mat.status = status
+        mat.ultima_alteracao = agora
+
+    # O histórico é montado antes de gravar: um erro na observação não deixa gravação pela metade
+    historico = [
+        RegistroHistorico(
+            material=mat,
+            criado_por_id=usuario.pk if usuario is not None else mat.criado_por_id,
+            status_na_epoca=status,
+            observacao=observacao.format(material=mat, **contexto),
+        )
+        for mat in materiais
+    ]
+    gravados = ['status', *(Material._meta.get_field(nome).attname for nome in campos)]
+    _ajustar_pendencias(materiais, gravados)
+    Material.objects.bulk_update(materiais, ['status', 'ultima_alteracao', *campos])
+    RegistroHistorico.objects.bulk_create(historico)
+    for mat in materiais:
+        mat._fotografar(gravados)
+
+    materiais_transicionados.send(sender=Material, materiais=materiais, status=status, usuario=usuario)
+    return materiais
@@ -0,0 +1,200 @@
+"""
+documentos_cache.py — Cache de PDFs gerados, endereçado pelo conteúdo de origem.
+
+A chave de um documento é o hash de (tipo, ids das entidades, impressão digital
+das linhas usadas na geração). A impressão digital vem de uma única query de
+agregação (Max de ultima_alteracao, contagens), então reimprimir um documento
+que não mudou custa essa query e nada de ReportLab.
+"""
+import os
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+
+
+def _pasta_cache():
+    return os.path.join(settings.MEDIA_ROOT, 'cache_documentos')
+
+
+def _limite_bytes():
+    return getattr(settings, 'DOCUMENTOS_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+# ── IMPRESSÕES DIGITAIS ───────────────────────────────────────────────────────
+
+def _valores(agregado):
+    return tuple(
+        v.isoformat() if hasattr(v, 'isoformat') else v
+        for _, v in sorted(agregado.items())
+    )
+
+
+def digital_lotes(lote_ids):
+    """Impressão digital de um conjunto de lotes. None se nenhum lote existir."""
+    from .models import LoteIncineracao
+    agregado = LoteIncineracao.objects.filter(id__in=lote_ids).aggregate(
+        lotes=Count('id', distinct=True),
+        lote_alt=Max('ultima_alteracao'),
+        mats=Count('materiais', distinct=True),
+        mats_ids=Sum('materiais__id'),
+        mat_alt=Max('materiais__ultima_alteracao'),
+        not_alt=Max('materiais__noticiado__ultima_alteracao'),
+        oc_alt=Max('materiais__noticiado__ocorrencia__ultima_alteracao'),
+    )
+    if not agregado['lotes']:
+        return None
+    return _valores(agregado)
+
+
+def digital_ocorrencia(ocorrencia_id):
+    """Impressão digital de uma ocorrência com seus noticiados e materiais."""
+    from .models import Ocorrencia
+    agregado = Ocorrencia.objects.filter(id=ocorrencia_id).aggregate(
+        existe=Count('id', distinct=True),
+        oc_alt=Max('ultima_alteracao'),
+        not_alt=Max('noticiados__ultima_alteracao'),
+        nots=Count('noticiados', distinct=True),
+        mat_alt=Max('noticiados__materiais__ultima_alteracao'),
+        mats=Count('noticiados__materiais', distinct=True),
+    )
+    if not agregado['existe']:
+        return None
+    return _valores(agregado)
+
+
+def digital_materiais(materiais_qs):
+    """Impressão digital de um queryset filtrado de materiais."""
+    agregado = materiais_qs.order_by().aggregate(
+        mats=Count('id'),
+        mats_ids=Sum('id'),
+        mat_alt=Max('ultima_alteracao'),
+        oc_alt=Max('noticiado__ocorrencia__ultima_alteracao'),
+    )
+    return _valores(agregado)
+
+
+def chave_documento(tipo, ids, digital, por_dia=False):
+    """
+    Hash do documento. `por_dia` entra para documentos que imprimem a data de
+    emissão, que assim são regerados uma vez por dia.
+    """
+    partes = [tipo, repr(sorted(ids, key=str)), repr(digital)]
+    if por_dia:
+        partes.append(timezone.localdate().isoformat())
+    return hashlib.sha256("|".join(partes).encode('utf-8')).hexdigest()
+
+
+# ── ARMAZENAMENTO ─────────────────────────────────────────────────────────────
+
+def _caminho(chave):
+    return os.path.join(_pasta_cache(), f"{chave}.pdf")
+
+
+def obter_documento(chave, gerar):
+    """
+    Devolve o PDF da chave aberto para leitura (binário); quem chama fecha.
+    Em caso de falta, `gerar(destino)` escreve o PDF num temporário que é
+    renomeado para o arquivo do cache. O arquivo é aberto antes de qualquer
+    despejo: se ele for apagado depois (pelo limite de tamanho, aqui ou em
+    outro processo), o handle continua lendo o conteúdo.
+    """
+    caminho = _caminho(chave)
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        try:
+            os.utime(caminho)  # mtime = último acesso (LRU)
+        except OSError:
+            pass
+        return arquivo
+
+    os.makedirs(_pasta_cache(), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    arquivo = open(temporario, 'w+b')
+    try:
+        gerar(arquivo)
+        arquivo.flush()
+        os.replace(temporario, caminho)
+    except BaseException:
+        arquivo.close()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    arquivo.seek(0)
+    _despejar(manter=caminho)
+    return arquivo
+
+
+def _despejar(manter=None):
+    """
+    Remove os arquivos menos usados recentemente até caber no limite. `manter`
+    (o que acabou de ser gerado) fica, mesmo que sozinho passe do limite.
+    """
+    limite = _limite_bytes()
+    with _LOCK:
+        try:
+            entradas = [e for e in os.scandir(_pasta_cache()) if e.is_file() and e.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return
+        infos = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entradas]
+        total = sum(tam for _, tam, _ in infos)
+        for _, tam, caminho in sorted(infos):
+            if total <= limite:
+                break
+            if caminho == manter:
+                continue
+            try:
+                os.remove(caminho)
+                total -= tam
+                logger.debug(f"[CACHE DOC] Despejado {os.path.basename(caminho)}")
+            except OSError:
+                pass
+
+
+def limpar():
+    with _LOCK:
+        try:
+            for e in os.scandir(_pasta_cache()):
+                if e.is_file():
+                    os.remove(e.path)
+        except FileNotFoundError:
+            pass
+
+
+# ── RESPOSTA HTTP ─────────────────────────────────────────────────────────────
+
+def nao_modificado(request, chave):
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or quote_etag(chave) in etags
+
+
+def _com_cabecalhos(response, chave):
+    response['ETag'] = quote_etag(chave)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def resposta_pdf(request, tipo, ids, digital, gerar, nome_arquivo, por_dia=False):
+    """
+    Responde com o PDF do cache (ou 304 se o cliente já tem a mesma versão).
+    `gerar(destino)` só é chamado quando o documento ainda não existe no cache.
+    """
+    chave = chave_documento(tipo, ids, digital, por_dia=por_dia)
+    if nao_modificado(request, chave):
+        return _com_cabecalhos(HttpResponseNotModified(), chave)
+
+    response = FileResponse(obter_documento(chave, gerar), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{nome_arquivo}"'
+    return _com_cabecalhos(response, chave)
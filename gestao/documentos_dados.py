@@ -0,0 +1,233 @@
+"""
+documentos_dados.py — Carga dos dados usados pelos documentos PDF.
+
+Os construtores de documentos_services não navegam mais pelo ORM
+(m.noticiado.ocorrencia, lote.processos_count, get_*_display...): recebem
+linhas compactas (LinhaMaterial / DadosLote) montadas aqui com um número
+fixo de queries, qualquer que seja a quantidade de lotes ou materiais.
+
+Orçamento de queries de cada documento (coberto em tests.py):
+
+    gerar_recibo_entrada_pdf ............ 1  (ocorrência com criado_por já carregado)
+    gerar_recibo_entrega_unico .......... 1
+    gerar_oficio_materiais_gerais ....... 1
+    gerar_capa_lote_pdf ................. 1
+    gerar_capas_lote_coletivas .......... 2
+    gerar_certidao_incineracao_antecipada 2
+    gerar_certidao_incineracao_coletiva . 2
+    gerar_relatorio_filtrado_pdf ........ 2  (resumo agregado + linhas; +1 com a contagem
+                                              por vara no modo paginado de remessa/incineração)
+"""
+from collections import namedtuple
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .constants import CATEGORIA_CHOICES, DROGAS_CHOICES, VARA_CHOICES
+from .models import LoteIncineracao, Material, formatar_peso_material
+
+_VARAS = dict(VARA_CHOICES)
+_CATEGORIAS = dict(CATEGORIA_CHOICES)
+_SUBSTANCIAS = dict(DROGAS_CHOICES)
+
+# Ordem das colunas do values_list() — a mesma dos campos de LinhaMaterial
+# até 'lote_id'; os nomes de exibição são calculados na montagem da linha.
+_COLUNAS_MATERIAL = (
+    'id', 'noticiado__ocorrencia__bou', 'noticiado__ocorrencia__processo',
+    'noticiado__ocorrencia__vara', 'noticiado__nome', 'categoria', 'substancia',
+    'descricao_geral', 'valor_monetario', 'peso_real', 'peso_estimado', 'unidade',
+    'observacao_material', 'numero_lacre', 'lote_id',
+)
+
+
+class LinhaMaterial(namedtuple('LinhaMaterial', [
+        'id', 'bou', 'processo', 'vara', 'noticiado', 'categoria', 'substancia',
+        'descricao_geral', 'valor_monetario', 'peso_real', 'peso_estimado', 'unidade',
+        'observacao', 'lacre', 'lote_id', 'vara_nome', 'categoria_nome', 'substancia_nome'])):
+    """ Um material pronto para os documentos, sem acesso ao banco """
+    __slots__ = ()
+
+    @property
+    def peso(self):
+        return self.peso_real or self.peso_estimado
+
+    @property
+    def peso_formatado(self):
+        return formatar_peso_material(self.categoria, self.peso_real, self.peso_estimado, self.unidade)
+
+    @property
+    def descricao(self):
+        if self.categoria == 'ENTORPECENTE':
+            return self.substancia_nome or 'Entorpecente'
+        if self.categoria == 'DINHEIRO':
+            return f"R$ {self.valor_monetario}" if self.valor_monetario else 'Dinheiro'
+        return self.descricao_geral or self.categoria_nome
+
+
+class DadosLote(namedtuple('DadosLote', ['id', 'identificador', 'status', 'data_criacao', 'materiais'])):
+    """ Cabeçalho de um lote com todos os seus materiais já carregados """
+    __slots__ = ()
+
+    @property
+    def processos(self):
+        """ BOUs distintos, na ordem em que aparecem (equivale a lote.processos_list) """
+        return list(dict.fromkeys(m.bou for m in self.materiais))
+
+    @property
+    def peso_total(self):
+        """ Mesma conta de LoteIncineracao.peso_total (soma real + soma estimado) """
+        return float(sum(m.peso_real or 0 for m in self.materiais) + sum(m.peso_estimado or 0 for m in self.materiais))
+
+
+def _linha(valores):
+    vara, categoria, substancia = valores[3], valores[5], valores[6]
+    return LinhaMaterial(
+        *valores,
+        vara_nome=_VARAS.get(vara, vara),
+        categoria_nome=_CATEGORIAS.get(categoria, categoria),
+        substancia_nome=_SUBSTANCIAS.get(substancia, substancia) if substancia else None,
+    )
+
+
+def _queryset_materiais(materiais):
+    if isinstance(materiais, QuerySet):
+        return materiais
+    ids = [m.id if isinstance(m, Material) else m for m in materiais]
+    return Material.objects.filter(id__in=ids).order_by('id')
+
+
+def carregar_materiais(materiais):
+    """ Materiais (QuerySet, instâncias ou ids) como LinhaMaterial. 1 query. """
+    return [_linha(v) for v in _queryset_materiais(materiais).values_list(*_COLUNAS_MATERIAL)]
+
+
+def iterar_materiais(materiais_qs, chunk_size=2000):
+    """ Como carregar_materiais, mas lendo o queryset em blocos. 1 query. """
+    for valores in materiais_qs.values_list(*_COLUNAS_MATERIAL).iterator(chunk_size=chunk_size):
+        yield _linha(valores)
+
+
+def materiais_do_lote(lote_id):
+    return carregar_materiais(Material.objects.filter(lote_id=lote_id).order_by('id'))
+
+
+def materiais_da_ocorrencia(ocorrencia_id):
+    return carregar_materiais(
+        Material.objects.filter(noticiado__ocorrencia_id=ocorrencia_id).order_by('noticiado_id', 'id'))
+
+
+def carregar_lotes(lotes):
+    """
+    Lotes (QuerySet ou lista de ids) com seus materiais, na ordem do QuerySet.
+    2 queries: cabeçalhos dos lotes + todos os materiais de uma vez.
+    """
+    if not isinstance(lotes, QuerySet):
+        lotes = LoteIncineracao.objects.filter(id__in=list(lotes))
+    cabecalhos = list(lotes.values_list('id', 'identificador', 'status', 'data_criacao'))
+
+    por_lote = {c[0]: [] for c in cabecalhos}
+    if por_lote:
+        qs = Material.objects.filter(lote_id__in=list(por_lote)).order_by('lote_id', 'id')
+        for linha in carregar_materiais(qs):
+            por_lote[linha.lote_id].append(linha)
+    return [DadosLote(*c, materiais=por_lote[c[0]]) for c in cabecalhos]
+
+
+def carregar_material(material_id):
+    """ Material avulso (recibo único) com ocorrência, noticiado e lote. 1 query. """
+    return Material.objects.select_related('noticiado__ocorrencia', 'lote').get(id=material_id)
+
+
+def aplicar_filtros_material(qs, filtros):
+    """ Filtros da tela de relatórios (categoria, status, vara, período...) aplicados a um QuerySet de Material """
+    if filtros.get('categoria'):
+        qs = qs.filter(categoria=filtros['categoria'])
+    if filtros.get('substancia'):
+        qs = qs.filter(substancia=filtros['substancia'])
+    if filtros.get('status'):
+        qs = qs.filter(status=filtros['status'])
+    if filtros.get('vara'):
+        qs = qs.filter(noticiado__ocorrencia__vara=filtros['vara'])
+    if filtros.get('natureza_penal'):
+        qs = qs.filter(noticiado__ocorrencia__natureza_penal__icontains=filtros['natureza_penal'])
+    if filtros.get('unidade_origem'):
+        qs = qs.filter(noticiado__ocorrencia__unidade_origem=filtros['unidade_origem'])
+    if filtros.get('ano'):
+        qs = qs.filter(noticiado__ocorrencia__data_registro_bou__year=filtros['ano'])
+    if filtros.get('semestre'):
+        sem = int(filtros['semestre'])
+        if sem == 1:
+            qs = qs.filter(noticiado__ocorrencia__data_registro_bou__month__range=(1, 6))
+        else:
+            qs = qs.filter(noticiado__ocorrencia__data_registro_bou__month__range=(7, 12))
+    if filtros.get('data_inicio'):
+        qs = qs.filter(data_criacao__date__gte=filtros['data_inicio'])
+    if filtros.get('data_fim'):
+        qs = qs.filter(data_criacao__date__lte=filtros['data_fim'])
+    return qs
+
+
+def contexto_certidao_caixa(caixa):
+    """ Contexto de certidao_caixa.html, usado pela view e pela exportação de auditoria """
+    return {
+        'caixa': caixa,
+        'lotes': caixa.lotes.all().prefetch_related('materiais__noticiado__ocorrencia'),
+        'data_impressao': timezone.now(),
+    }
+
+
+def contexto_espelho_caixa(caixa):
+    """ Contexto de espelho_caixa.html, usado pela view e pela exportação de auditoria """
+    lotes_list = []
+    all_materiais = []
+
+    for lote in caixa.lotes.all():
+        mats = list(lote.materiais.select_related('noticiado__ocorrencia'))
+        peso_lote = sum(float(m.peso_real or m.peso_estimado or 0) for m in mats)
+
+        lotes_list.append({
+            'lote': lote,
+            'materiais_count': len(mats),
+            'peso': peso_lote,
+        })
+
+        for mat in mats:
+            all_materiais.append({
+                'material': mat,
+                'lote_identificador': lote.identificador,
+                'noticiado_nome': mat.noticiado.nome if mat.noticiado else '',
+                'processo': mat.noticiado.ocorrencia.processo if mat.noticiado and mat.noticiado.ocorrencia else '',
+                'bou': mat.noticiado.ocorrencia.bou if mat.noticiado and mat.noticiado.ocorrencia else '',
+            })
+
+    all_materiais.sort(key=lambda x: (
+        x['noticiado_nome'].upper(),
+        x['processo'] or x['bou'],
+        x['lote_identificador']
+    ))
+
+    por_vara = {}
+    for item in all_materiais:
+        mat = item['material']
+        if mat.noticiado and mat.noticiado.ocorrencia:
+            vn = mat.noticiado.ocorrencia.get_vara_display()
+            por_vara.setdefault(vn, []).append(item)
+
+    processos_unicos = set()
+    for item in all_materiais:
+        proc = item['processo'] or item['bou']
+        if proc:
+            processos_unicos.add(proc)
+
+    total_peso = sum(float(item['material'].peso_real or item['material'].peso_estimado or 0) for item in all_materiais)
+
+    return {
+        'caixa': caixa,
+        'lotes_list': lotes_list,
+        'materiais': all_materiais,
+        'por_vara': por_vara,
+        'processos_unicos_count': len(processos_unicos),
+        'total_peso': total_peso,
+        'total_itens': len(all_materiais),
+        'data_impressao': timezone.now(),
+    }
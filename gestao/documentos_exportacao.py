@@ -0,0 +1,173 @@
+"""
+documentos_exportacao.py — Documentos servidos pelo cache e exportação em ZIP.
+
+Cada documento PDF com cache (recibo de entrada, capa do lote, certidões) é
+descrito por um `Documento`: tipo, ids, impressão digital e a função que o
+gera. As views de PDF e a exportação de auditoria usam as mesmas descrições,
+então um documento já impresso por uma é reaproveitado pela outra.
+
+A exportação de auditoria monta um ZIP com tudo de uma caixa ou semestre e o
+entrega em fluxo: cada arquivo é comprimido e enviado assim que fica pronto,
+sem guardar o ZIP inteiro em memória nem em disco.
+"""
+import os
+import zipfile
+from collections import namedtuple
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from . import documentos_cache, documentos_dados, documentos_services
+from .models import CaixaIncineracao, LoteIncineracao, Material, Ocorrencia
+
+Documento = namedtuple('Documento', ['tipo', 'ids', 'digital', 'gerar', 'por_dia'])
+
+BLOCO_ZIP = 64 * 1024
+
+
+# ── DOCUMENTOS COM CACHE ──────────────────────────────────────────────────────
+
+def recibo_entrada(ocorrencia_id):
+    digital = documentos_cache.digital_ocorrencia(ocorrencia_id)
+    if digital is None:
+        return None
+
+    def gerar(destino):
+        ocorrencia = Ocorrencia.objects.select_related('criado_por').get(id=ocorrencia_id)
+        documentos_services.gerar_recibo_entrada_pdf(ocorrencia, destino=destino)
+
+    return Documento('recibo_entrada', [ocorrencia_id], digital, gerar, True)
+
+
+def capa_lote(lote_id, usuario=None):
+    digital = documentos_cache.digital_lotes([lote_id])
+    if digital is None:
+        return None
+
+    def gerar(destino):
+        lote = LoteIncineracao.objects.get(id=lote_id)
+        documentos_services.gerar_capa_lote_pdf(lote, usuario, destino=destino)
+
+    return Documento('capa_lote', [lote_id], digital, gerar, False)
+
+
+def certidao_lotes(tipo, lote_ids, usuario=None):
+    """ tipo: 'antecipada' ou 'coletiva' (pós-incineração) """
+    lote_ids = sorted(lote_ids)
+    digital = documentos_cache.digital_lotes(lote_ids) if lote_ids else None
+    if digital is None:
+        return None
+
+    def gerar(destino):
+        lotes = LoteIncineracao.objects.filter(id__in=lote_ids).order_by('identificador')
+        if tipo == 'antecipada':
+            documentos_services.gerar_certidao_incineracao_antecipada(lotes, usuario, destino=destino)
+        else:
+            documentos_services.gerar_certidao_incineracao_coletiva(lotes, usuario, destino=destino)
+
+    return Documento(f'certidao_{tipo}', lote_ids, digital, gerar, True)
+
+
+def abrir_em_cache(documento):
+    """ PDF do cache aberto para leitura, gerando-o só se ainda não existir """
+    chave = documentos_cache.chave_documento(
+        documento.tipo, documento.ids, documento.digital, por_dia=documento.por_dia)
+    return documentos_cache.obter_documento(chave, documento.gerar)
+
+
+# ── ZIP EM FLUXO ──────────────────────────────────────────────────────────────
+
+class _SaidaZip:
+    """
+    Destino sem seek() para o ZipFile: guarda o que foi escrito até ser
+    retirado pelo gerador. Sem seek, o zipfile grava os tamanhos em
+    descritores após cada arquivo, o que permite enviar o ZIP aos pedaços.
+    """
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def zip_em_fluxo(arquivos):
+    """
+    Gera os bytes de um ZIP a partir de (nome, abrir), onde abrir() devolve um
+    arquivo binário. Os arquivos só são abertos (e gerados) quando chega a vez deles.
+    """
+    saida = _SaidaZip()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nome, abrir in arquivos:
+            with abrir() as origem, zf.open(nome, 'w') as destino:
+                for bloco in iter(lambda: origem.read(BLOCO_ZIP), b''):
+                    destino.write(bloco)
+                    dados = saida.retirar()
+                    if dados:
+                        yield dados
+            yield saida.retirar()
+    yield saida.retirar()
+
+
+def _abrir_pdf(documento):
+    return lambda: abrir_em_cache(documento)
+
+
+def _pdf(nome, documento):
+    """ (nome, abrir) do documento, ou nada se ele não existe mais (recibo_entrada etc. devolveram None) """
+    if documento is not None:
+        yield nome, _abrir_pdf(documento)
+
+
+def _abrir_html(template, contexto):
+    return lambda: BytesIO(render_to_string(template, contexto()).encode('utf-8'))
+
+
+def _abrir_media(relativo):
+    return lambda: open(os.path.join(settings.MEDIA_ROOT, relativo), 'rb')
+
+
+def arquivos_auditoria(lote_ids, usuario=None):
+    """
+    (nome no ZIP, abrir) de tudo que a auditoria pede para os lotes: espelho e
+    certidão de cada caixa, certidões dos lotes, capa de cada lote, recibo de
+    entrada de cada ocorrência e os recibos/comprovantes anexados aos materiais.
+    Documentos cuja entidade sumiu no meio da exportação ficam de fora.
+    """
+    lotes = list(LoteIncineracao.objects.filter(id__in=lote_ids).order_by('identificador'))
+
+    for caixa in CaixaIncineracao.objects.filter(lotes__in=lote_ids).distinct().order_by('identificador'):
+        pasta = f"caixas/{caixa.identificador}"
+        yield f"{pasta}/espelho.html", _abrir_html('gestao/espelho_caixa.html', lambda c=caixa: documentos_dados.contexto_espelho_caixa(c))
+        yield f"{pasta}/certidao.html", _abrir_html('gestao/certidao_caixa.html', lambda c=caixa: documentos_dados.contexto_certidao_caixa(c))
+
+    ids = [l.id for l in lotes]
+    yield from _pdf("certidao_antecipada.pdf", certidao_lotes('antecipada', ids, usuario))
+    incinerados = [l.id for l in lotes if l.status == 'INCINERADO']
+    if incinerados:
+        yield from _pdf("certidao_incineracao.pdf", certidao_lotes('coletiva', incinerados, usuario))
+
+    for lote in lotes:
+        yield from _pdf(f"lotes/{lote.identificador}/capa.pdf", capa_lote(lote.id, usuario))
+
+    ocorrencias = (Ocorrencia.objects.filter(noticiados__materiais__lote_id__in=ids)
+                   .distinct().order_by('bou').values_list('id', 'bou'))
+    for ocorrencia_id, bou in ocorrencias:
+        yield from _pdf(f"recibos/entrada/{bou.replace('/', '_')}.pdf", recibo_entrada(ocorrencia_id))
+
+    anexos = (Material.objects.filter(lote_id__in=ids)
+              .values_list('noticiado__ocorrencia__bou', 'recibo_forum', 'comprovante_deposito'))
+    for bou, recibo, comprovante in anexos:
+        for pasta, relativo in (('forum', recibo), ('deposito', comprovante)):
+            if relativo and os.path.exists(os.path.join(settings.MEDIA_ROOT, relativo)):
+                nome = f"{bou.replace('/', '_')}_{os.path.basename(relativo)}"
+                yield f"recibos/{pasta}/{nome}", _abrir_media(relativo)
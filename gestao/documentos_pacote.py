@@ -0,0 +1,139 @@
+"""
+documentos_pacote.py — Pacote de documentos de vários lotes num único download.
+
+Seleciona os lotes (de uma caixa, de um semestre ou por ids), quebra o
+trabalho em peças independentes (uma capa por lote, uma capa de caixa por
+lote, uma certidão para o conjunto), renderiza cada peça num processo do
+pool e no fim junta tudo num PDF só ou num ZIP com um arquivo por peça.
+"""
+import os
+import zipfile
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from . import documentos_services, processos
+from .models import LoteIncineracao
+
+# Ordem em que os documentos entram no pacote
+DOCUMENTOS_PACOTE = ('capas', 'caixas', 'certidao')
+
+
+def selecionar_lotes(caixa_id=None, ano=None, semestre=None, lote_ids=None):
+    """
+    Ids dos lotes do pacote, ordenados pelo identificador. No semestre entram os
+    lotes incinerados no período e os ainda não incinerados criados nele.
+    """
+    qs = LoteIncineracao.objects.all()
+    if caixa_id:
+        qs = qs.filter(caixa_id=caixa_id)
+    if ano and semestre:
+        meses = (1, 6) if int(semestre) == 1 else (7, 12)
+        qs = qs.filter(
+            Q(data_incineracao__year=ano, data_incineracao__month__range=meses) |
+            Q(data_incineracao__isnull=True, data_criacao__year=ano, data_criacao__month__range=meses)
+        )
+    if lote_ids:
+        qs = qs.filter(id__in=lote_ids)
+    return list(qs.order_by('identificador').values_list('id', flat=True))
+
+
+def montar_pecas(lote_ids, documentos=DOCUMENTOS_PACOTE):
+    """ [(nome do arquivo, tipo, ids)] na ordem final do pacote """
+    identificadores = dict(LoteIncineracao.objects.filter(id__in=lote_ids).values_list('id', 'identificador'))
+    pecas = []
+    for documento in DOCUMENTOS_PACOTE:
+        if documento not in documentos:
+            continue
+        if documento == 'certidao':
+            pecas.append(("certidao_antecipada.pdf", documento, list(lote_ids)))
+            continue
+        for lote_id in lote_ids:
+            pecas.append((f"{documento}/{identificadores[lote_id]}.pdf", documento, [lote_id]))
+    return pecas
+
+
+def renderizar_peca(tipo, ids, usuario_id, caminho):
+    """ Gera uma peça em `caminho`. Roda dentro do processo do pool. """
+    usuario = User.objects.filter(id=usuario_id).first() if usuario_id else None
+    with open(caminho, 'wb') as destino, documentos_services.acompanhar_progresso(None):
+        if tipo == 'capas':
+            lote = LoteIncineracao.objects.get(id=ids[0])
+            documentos_services.gerar_capa_lote_pdf(lote, usuario, destino=destino)
+        elif tipo == 'caixas':
+            documentos_services.gerar_capas_lote_coletivas(ids, destino=destino)
+        elif tipo == 'certidao':
+            lotes = LoteIncineracao.objects.filter(id__in=ids).order_by('identificador')
+            documentos_services.gerar_certidao_incineracao_antecipada(lotes, usuario, destino=destino)
+        else:
+            raise ValueError(f"Documento desconhecido no pacote: {tipo}")
+    return caminho
+
+
+def _renderizar(pecas, usuario_id, pasta, max_workers):
+    caminhos = [os.path.join(pasta, f"{i:04d}.pdf") for i in range(len(pecas))]
+
+    if max_workers <= 1 or len(pecas) == 1:
+        for i, ((_, tipo, ids), caminho) in enumerate(zip(pecas, caminhos), start=1):
+            renderizar_peca(tipo, ids, usuario_id, caminho)
+            documentos_services.informar_progresso(min(99, i * 90 // len(pecas)))
+        return caminhos
+
+    with processos.novo_pool(min(max_workers, len(pecas))) as pool:
+        pendentes = {
+            pool.submit(processos.chamar, 'gestao.documentos_pacote.renderizar_peca', tipo, ids, usuario_id, caminho)
+            for (_, tipo, ids), caminho in zip(pecas, caminhos)
+        }
+        while pendentes:
+            feitas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in feitas:
+                if futuro.exception() is not None:
+                    # Uma peça falhou: o pacote inteiro falha, sem esperar as demais
+                    for outro in pendentes:
+                        outro.cancel()
+                    raise futuro.exception()
+            documentos_services.informar_progresso(min(99, (len(pecas) - len(pendentes)) * 90 // len(pecas)))
+    return caminhos
+
+
+def _juntar_pdf(caminhos, destino):
+    import pypdfium2
+    saida = pypdfium2.PdfDocument.new()
+    try:
+        for caminho in caminhos:
+            peca = pypdfium2.PdfDocument(caminho)
+            try:
+                saida.import_pages(peca)
+            finally:
+                peca.close()
+        saida.save(destino)
+    finally:
+        saida.close()
+
+
+def _zipar(pecas, caminhos, destino):
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for (nome, _, _), caminho in zip(pecas, caminhos):
+            zf.write(caminho, nome)
+
+
+def gerar_pacote(lote_ids, destino, documentos=DOCUMENTOS_PACOTE, formato='pdf', usuario=None, max_workers=None):
+    """
+    Renderiza as peças dos lotes em paralelo e escreve em `destino` um PDF único
+    (formato='pdf') ou um ZIP com um PDF por peça (formato='zip').
+    """
+    if not lote_ids:
+        raise ValueError("Nenhum lote selecionado para o pacote.")
+    max_workers = max_workers or getattr(settings, 'DOCUMENTOS_WORKERS', 2)
+    pecas = montar_pecas(lote_ids, documentos)
+
+    with tempfile.TemporaryDirectory(prefix='pacote_') as pasta:
+        caminhos = _renderizar(pecas, usuario.id if usuario else None, pasta, max_workers)
+        if formato == 'zip':
+            _zipar(pecas, caminhos, destino)
+        else:
+            _juntar_pdf(caminhos, destino)
+    return len(pecas)
@@ -1,8 +1,15 @@
 import os
+import zlib
 import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from itertools import chain, groupby
+from operator import attrgetter
 from io import BytesIO
 from datetime import datetime
 from django.conf import settings
+from django.db.models import Count, Q
 from django.utils import timezone
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.platypus import (
@@ -15,6 +22,11 @@ from reportlab.lib.units import mm, cm
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY, TA_RIGHT
 from svglib.svglib import svg2rlg
 from reportlab.graphics import renderPDF
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream
+
+from . import arquivos_gerados, documentos_dados
+from .constants import VARA_CHOICES
 
 logging.getLogger("svglib").setLevel(logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -28,23 +40,138 @@ LOGO_PARANA = os.path.join(settings.BASE_DIR, 'static_files', 'img', 'brasao_par
 LOGO_PMPR = os.path.join(settings.BASE_DIR, 'static_files', 'img', 'brasao_pmpr.svg')
 
 
-def draw_svg(canvas_obj, path, x, y, width, height):
+# Cache de Drawings por processo: (caminho, largura, altura, mtime) -> Drawing escalado.
+# O mtime na chave faz com que a troca do arquivo SVG invalide a entrada antiga.
+_CACHE_SVG = {}
+_CACHE_SVG_LOCK = threading.Lock()
+
+
+def _carregar_svg(path, width, height):
+    """Devolve o Drawing do SVG já escalado para width x height, lendo o arquivo uma única vez."""
     try:
-        drawing = svg2rlg(path)
-        if not drawing:
-            return False
-        sx = width / drawing.width
-        sy = height / drawing.height
-        scale = min(sx, sy)
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    chave = (path, width, height, mtime)
+    if chave in _CACHE_SVG:
+        return _CACHE_SVG[chave]
+
+    drawing = svg2rlg(path)
+    if drawing:
+        scale = min(width / drawing.width, height / drawing.height)
         drawing.width = drawing.width * scale
         drawing.height = drawing.height * scale
         drawing.scale(scale, scale)
+
+    with _CACHE_SVG_LOCK:
+        for antiga in [k for k in _CACHE_SVG if k[:3] == chave[:3]]:
+            del _CACHE_SVG[antiga]
+        _CACHE_SVG[chave] = drawing
+    return drawing
+
+
+def limpar_cache_svg():
+    with _CACHE_SVG_LOCK:
+        _CACHE_SVG.clear()
+
+
+def draw_svg(canvas_obj, path, x, y, width, height):
+    try:
+        drawing = _carregar_svg(path, width, height)
+        if not drawing:
+            return False
         renderPDF.draw(drawing, canvas_obj, x, y)
         return True
     except Exception:
         return False
 
 
+def _destino_pdf(destino, *partes):
+    """
+    Define onde o PDF é escrito. Com `destino` (qualquer objeto binário com
+    write(): SpooledTemporaryFile, BytesIO, arquivo aberto) o documento vai
+    direto para ele e nada é arquivado. Sem `destino` o PDF é arquivado em
+    MEDIA_ROOT/<partes>. Devolve (alvo do SimpleDocTemplate, caminho relativo ou None).
+    """
+    if destino is not None:
+        return destino, None
+    pasta = os.path.join(settings.MEDIA_ROOT, *partes[:-1])
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, partes[-1]), "/".join(partes)
+
+
+def _catalogar(relativo, origem_tipo=None, origem_ids=(), protegido=False):
+    """ Registra no catálogo de retenção o PDF arquivado em MEDIA_ROOT (nada a fazer com `destino`) """
+    if relativo:
+        arquivos_gerados.registrar(relativo, origem_tipo, origem_ids, protegido)
+    return relativo
+
+
+# Callback opcional de progresso (0-100) do documento em construção, usado pela
+# fila de documentos em segundo plano. ContextVar para não vazar entre threads.
+_progresso = contextvars.ContextVar('documentos_progresso', default=None)
+
+
+@contextmanager
+def acompanhar_progresso(callback):
+    """Durante o bloco, `callback(pct)` recebe o andamento do doc.build()."""
+    token = _progresso.set(callback)
+    try:
+        yield
+    finally:
+        _progresso.reset(token)
+
+
+def informar_progresso(pct):
+    """Repassa `pct` ao callback ativo, se houver (para quem monta vários documentos)."""
+    callback = _progresso.get()
+    if callback:
+        callback(pct)
+
+
+class _CanvasCompacto(canvas.Canvas):
+    """
+    Canvas que comprime o conteúdo de cada página assim que ela é fechada.
+    O Canvas padrão guarda o texto de todas as páginas até o save(), o que
+    faz a memória crescer com o tamanho do documento (pageCompression só
+    comprime no save()).
+
+    Usa internos do ReportLab 4.4.10 (requirements.txt): _doc.Pages.pages,
+    PDFPage.stream e PDFPage.Contents. Coberto por ReportLabInternosTests;
+    ao atualizar o ReportLab, rode esses testes primeiro.
+    """
+    def showPage(self):
+        super().showPage()
+        pagina = self._doc.Pages.pages[-1]
+        if pagina.stream:
+            conteudo = pagina.stream.encode('latin-1') if isinstance(pagina.stream, str) else pagina.stream
+            pagina.Contents = PDFStream(
+                PDFDictionary({'Filter': PDFArray([PDFName('FlateDecode')])}),
+                zlib.compress(conteudo),
+            )
+            pagina.stream = None
+
+
+def _construir(doc, st, cabecalho, progresso_build=True, canvasmaker=canvas.Canvas):
+    """
+    `progresso_build=False` para stories preguiçosas: o tamanho delas não é
+    conhecido de antemão e quem as gera informa o progresso por conta própria.
+    """
+    callback = _progresso.get()
+    if callback and progresso_build:
+        total = {'n': 1}
+
+        def on_progress(tipo, valor):
+            if tipo == 'SIZE_EST':
+                total['n'] = max(valor, 1)
+            elif tipo == 'PROGRESS':
+                callback(min(99, int(valor * 100 / total['n'])))
+
+        doc.setProgressCallBack(on_progress)
+    doc.build(st, onFirstPage=cabecalho, onLaterPages=cabecalho, canvasmaker=canvasmaker)
+
+
 def _estilos():
     s = getSampleStyleSheet()
     
@@ -67,58 +194,52 @@ def _estilos():
     return s
 
 
-def _cabecalho_oficio(c, doc, cidade="CASCAVEL"):
-    c.save()
-    w, h = A4
-    m = doc.leftMargin
-    
+def _desenhar_cabecalho(c, w, h, m, unidade, tam_rodape, y_rodape):
     draw_svg(c, LOGO_PARANA, m, h - 65, 45, 45)
     draw_svg(c, LOGO_PMPR, w - m - 45, h - 65, 45, 45)
-    
+
     c.setStrokeColor(PRETO)
     c.setLineWidth(1)
     c.line(m, h - 70, w - m, h - 70)
-    
+
     cx = w / 2
     c.setFont("Helvetica-Bold", 12)
     c.drawCentredString(cx, h - 30, "ESTADO DO PARANÁ")
     c.setFont("Helvetica-Bold", 10)
     c.drawCentredString(cx, h - 45, "POLÍCIA MILITAR DO PARANÁ")
     c.setFont("Helvetica-Bold", 9)
-    c.drawCentredString(cx, h - 60, "6º BATALHÃO DE POLÍCIA MILITAR")
-    
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(cx, 18, "6º BPM - Rua Pernambuco, 1711, Centro - Fone: (45) 3321-6200")
-    
-    c.restore()
+    c.drawCentredString(cx, h - 60, unidade)
 
+    c.setFont("Helvetica", tam_rodape)
+    c.drawCentredString(cx, y_rodape, "6º BPM - Rua Pernambuco, 1711, Centro - Fone: (45) 3321-6200")
 
-def _cabecalho_landscape(c, doc):
+
+def _cabecalho_form(c, nome, pagesize, m, unidade, tam_rodape, y_rodape):
+    """
+    Desenha o cabeçalho uma única vez por documento como Form XObject;
+    as páginas seguintes apenas referenciam o form já gravado no PDF.
+    """
+    w, h = pagesize
+    nome = f"{nome}_{int(m)}"
     c.saveState()
-    w, h = landscape(A4)
-    m = doc.leftMargin
-    
-    draw_svg(c, LOGO_PARANA, m, h - 65, 45, 45)
-    draw_svg(c, LOGO_PMPR, w - m - 45, h - 65, 45, 45)
-    
-    c.setStrokeColor(PRETO)
-    c.setLineWidth(1)
-    c.line(m, h - 70, w - m, h - 70)
-    
-    cx = w / 2
-    c.setFont("Helvetica-Bold", 12)
-    c.drawCentredString(cx, h - 30, "ESTADO DO PARANÁ")
-    c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(cx, h - 45, "POLÍCIA MILITAR DO PARANÁ")
-    c.setFont("Helvetica-Bold", 9)
-    c.drawCentredString(cx, h - 60, "6º BATALHÃO DE POLÍCIA MILITAR - CASCAVEL/PR")
-    
-    c.setFont("Helvetica", 7)
-    c.drawCentredString(cx, 15, "6º BPM - Rua Pernambuco, 1711, Centro - Fone: (45) 3321-6200")
-    
+    if not c.hasForm(nome):
+        c.beginForm(nome, 0, 0, w, h)
+        _desenhar_cabecalho(c, w, h, m, unidade, tam_rodape, y_rodape)
+        c.endForm()
+    c.doForm(nome)
     c.restoreState()
 
 
+def _cabecalho_oficio(c, doc, cidade="CASCAVEL"):
+    _cabecalho_form(c, "cabecalho_oficio", A4, doc.leftMargin,
+                    "6º BATALHÃO DE POLÍCIA MILITAR", 8, 18)
+
+
+def _cabecalho_landscape(c, doc):
+    _cabecalho_form(c, "cabecalho_landscape", landscape(A4), doc.leftMargin,
+                    "6º BATALHÃO DE POLÍCIA MILITAR - CASCAVEL/PR", 7, 15)
+
+
 def _tabela_info(dados, estilos, cols=None):
     if cols is None:
         cols = [4*cm, 5*cm, 4*cm, 5*cm]
@@ -155,30 +276,18 @@ def _tabela_items(materiais, estilos, cols=None, col_headers=None):
     
     dados = [col_headers]
     for i, m in enumerate(materiais):
-        oc = m.noticiado.ocorrencia if m.noticiado else None
-        bou = oc.bou if oc else '-'
-        proc = oc.processo[:15] if oc and oc.processo else '-'
-        noti = (m.noticiado.nome or '-')[:25] if m.noticiado else '-'
-        cat = m.get_categoria_display()[:15]
-        
-        if m.categoria == 'ENTORPECENTE':
-            desc = m.get_substancia_display() if m.substancia else 'Entorpecente'
-        elif m.categoria == 'DINHEIRO':
-            desc = f"R$ {m.valor_monetario}" if m.valor_monetario else 'Dinheiro'
-        else:
-            desc = (m.descricao_geral or m.get_categoria_display())[:30]
-        
-        peso = m.peso_formatado() if hasattr(m, 'peso_formatado') and m.categoria == 'ENTORPECENTE' else str(m.peso_real or m.peso_estimado or '-')
-        if peso == 'None': peso = '-'
-        lacre = m.numero_lacre or '-'
-        subst = m.get_substancia_display() if m.categoria == 'ENTORPECENTE' and m.substancia else '-'
-        
+        proc = m.processo[:15] if m.processo else '-'
+        desc = m.descricao[:30]
+        peso = m.peso_formatado if m.categoria == 'ENTORPECENTE' else str(m.peso or '-')
+        lacre = m.lacre or '-'
+        subst = m.substancia_nome if m.categoria == 'ENTORPECENTE' and m.substancia else '-'
+
         mapa = {
             'N': str(i+1),
-            'BOU': bou[:15],
-            'PROC': proc[:15],
-            'NOTICIADO': noti,
-            'CATEGORIA': cat,
+            'BOU': m.bou[:15],
+            'PROC': proc,
+            'NOTICIADO': (m.noticiado or '-')[:25],
+            'CATEGORIA': m.categoria_nome[:15],
             'DESCRICAO': desc,
             'DESCRICAO DO OBJETO': desc,
             'PESO': peso,
@@ -205,48 +314,90 @@ def _tabela_items(materiais, estilos, cols=None, col_headers=None):
     return t
 
 
-def _tabela_items_landscape(materiais, estilos, cols=None, col_headers=None):
+ESTILO_TABELA_LANDSCAPE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), CINZA_CLARO),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,-1), 7),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('ALIGN', (0,0), (0,-1), 'CENTER'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('GRID', (0,0), (-1,-1), 0.5, PRETO),
+    ('TOPPADDING', (0,0), (-1,-1), 3),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 3),
+])
+
+
+def _linha_landscape(n, m):
+    proc = m.processo[:12] if m.processo else '-'
+    noti = (m.noticiado or '-')[:20]
+    peso = str(m.peso or '-')
+    un = m.unidade or '-'
+    obs = (m.observacao or '-')[:25]
+    lacre = m.lacre or '-'
+
+    return [str(n), m.bou[:12], proc, noti, m.descricao[:20], peso[:8], un[:3], obs[:20], lacre[:12]]
+
+
+def _tabela_items_landscape(materiais, estilos, cols=None, col_headers=None, inicio=1):
     if cols is None:
         cols = [0.8*cm, 3*cm, 3*cm, 5*cm, 4*cm, 2.5*cm, 1.5*cm, 4.5*cm, 2.5*cm]
     if col_headers is None:
         col_headers = ['N', 'BOU', 'PROC', 'NOTICIADO', 'SUBST/DESC', 'PESO', 'UN', 'OBS', 'LACRE']
-    
+
     dados = [col_headers]
-    for i, m in enumerate(materiais):
-        oc = m.noticiado.ocorrencia if m.noticiado else None
-        bou = oc.bou if oc else '-'
-        proc = oc.processo[:12] if oc and oc.processo else '-'
-        noti = (m.noticiado.nome or '-')[:20]
-        
-        if m.categoria == 'ENTORPECENTE':
-            desc = m.get_substancia_display() if m.substancia else 'Entorpecente'
-        elif m.categoria == 'DINHEIRO':
-            desc = f"R$ {m.valor_monetario}" if m.valor_monetario else 'Dinheiro'
-        else:
-            desc = (m.descricao_geral or m.get_categoria_display())[:25]
-        
-        peso = str(m.peso_real or m.peso_estimado or '-')
-        un = m.unidade or '-'
-        obs = (m.observacao_material or '-')[:25]
-        lacre = m.numero_lacre or '-'
-        
-        dados.append([str(i+1), bou[:12], proc, noti, desc[:20], peso[:8], un[:3], obs[:20], lacre[:12]])
-    
+    for i, m in enumerate(materiais, start=inicio):
+        dados.append(_linha_landscape(i, m))
+
     t = Table(dados, colWidths=cols, repeatRows=1)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), CINZA_CLARO),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,-1), 7),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('ALIGN', (0,0), (0,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('GRID', (0,0), (-1,-1), 0.5, PRETO),
-        ('TOPPADDING', (0,0), (-1,-1), 3),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 3),
-    ]))
+    t.setStyle(ESTILO_TABELA_LANDSCAPE)
     return t
 
 
+class _StoryPreguicosa(list):
+    """
+    Lista de flowables alimentada sob demanda por um gerador. O doc.build()
+    consome a story pela frente (flowables[0] / del flowables[0]), então só
+    uma janela pequena existe em memória de cada vez.
+
+    Depende de como o BaseDocTemplate.build() do ReportLab 4.4.10 percorre a
+    story (não há API pública para story em gerador). Coberto por
+    ReportLabInternosTests.
+    """
+    def __init__(self, gerador, janela=4):
+        super().__init__()
+        self._gerador = gerador
+        self._janela = janela
+
+    def _encher(self, n):
+        while self._gerador is not None and super().__len__() < n:
+            try:
+                super().append(next(self._gerador))
+            except StopIteration:
+                self._gerador = None
+
+    def __len__(self):
+        self._encher(self._janela)
+        return super().__len__()
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            self._encher(i.stop if i.stop is not None and i.stop >= 0 else self._janela)
+        elif i >= 0:
+            self._encher(i + 1)
+        return super().__getitem__(i)
+
+
+def _agrupar_por_vara(materiais):
+    """ [(nome da vara, [linhas])] em ordem alfabética, como nos documentos antigos """
+    por_vara = {}
+    for m in materiais:
+        por_vara.setdefault(m.vara_nome if m.vara else "VARA NAO INFORMADA", []).append(m)
+    return sorted(por_vara.items())
+
+
 def _bloco_assinaturas(linhas, estilos, largura=17*cm):
     cells = []
     for nome, cargo in linhas:
@@ -268,15 +419,13 @@ def _bloco_assinaturas(linhas, estilos, largura=17*cm):
 
 
 # ====================== RECIBO DE ENTRADA ======================
-def gerar_recibo_entrada_pdf(ocorrencia):
+def gerar_recibo_entrada_pdf(ocorrencia, destino=None):
     ts = timezone.now().strftime('%Y%m%d_%H%M%S')
     fname = f"recibo_entrada_{ocorrencia.bou.replace('/','_')}_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'recibos', 'entrada')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'recibos', 'entrada', fname)
 
     est = _estilos()
-    doc = SimpleDocTemplate(caminho, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
@@ -310,10 +459,7 @@ def gerar_recibo_entrada_pdf(ocorrencia):
     st.append(Paragraph("MATERIAIS RECEBIDOS", est['Centro']))
     st.append(Spacer(1, 6))
 
-    mats = []
-    for n in ocorrencia.noticiados.all():
-        mats.extend(list(n.materiais.all()))
-    
+    mats = documentos_dados.materiais_da_ocorrencia(ocorrencia.id)
     if mats:
         st.append(_tabela_items(mats, est, 
             cols=[0.7*cm, 3*cm, 2.5*cm, 5*cm, 2*cm, 3.5*cm],
@@ -334,24 +480,23 @@ def gerar_recibo_entrada_pdf(ocorrencia):
     data_ext = timezone.now().strftime('%d de %B de %Y')
     st.append(Paragraph(f"Cascavel/PR, {data_ext}.", est['Direita']))
 
-    doc.build(st, onFirstPage=_cabecalho_oficio, onLaterPages=_cabecalho_oficio)
-    return os.path.join('recibos', 'entrada', fname).replace("\\", "/")
+    _construir(doc, st, _cabecalho_oficio)
+    return _catalogar(relativo, 'OCORRENCIA', [ocorrencia.id])
 
 
 # ====================== RECIBO UNICO ======================
-def gerar_recibo_entrega_unico(material, usuario=None, tipo='ENTREGA'):
+def gerar_recibo_entrega_unico(material, usuario=None, tipo='ENTREGA', destino=None):
     ts = timezone.now().strftime('%Y%m%d%H%M%S')
     fname = f"recibo_{tipo.lower()}_{material.id}_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'recibos', 'entrega_unica')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'recibos', 'entrega_unica', fname)
 
     est = _estilos()
-    doc = SimpleDocTemplate(caminho, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
-    oc = material.noticiado.ocorrencia if material.noticiado else None
+    material = documentos_dados.carregar_material(material.id)
+    oc = material.noticiado.ocorrencia
 
     st.append(Paragraph(f"RECIBO DE {tipo}", est['Titulo']))
     st.append(Paragraph(f"No. {material.id}/{datetime.now().year}", est['Subtitulo']))
@@ -412,28 +557,24 @@ def gerar_recibo_entrega_unico(material, usuario=None, tipo='ENTREGA'):
     st.append(Spacer(1, 10))
     st.append(Paragraph("Documento gerado pelo Sistema do 6o BPM Cascavel.", est['Rodape']))
 
-    doc.build(st, onFirstPage=_cabecalho_oficio, onLaterPages=_cabecalho_oficio)
-    return os.path.join('recibos', 'entrega_unica', fname).replace("\\", "/")
+    _construir(doc, st, _cabecalho_oficio)
+    return _catalogar(relativo, 'MATERIAL', [material.id])
 
 
 # ====================== OFICIO DE REMESSA ======================
-def gerar_oficio_materiais_gerais(materiais, usuario):
+def gerar_oficio_materiais_gerais(materiais, usuario, destino=None):
     ts = timezone.now().strftime('%Y%m%d_%H%M%S')
     fname = f"oficio_remessa_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'oficios')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'oficios', fname)
 
-    varas = set()
-    for m in materiais:
-        if m.noticiado and m.noticiado.ocorrencia:
-            varas.add(m.noticiado.ocorrencia.get_vara_display())
+    materiais = documentos_dados.carregar_materiais(materiais)
+    varas = {m.vara_nome for m in materiais if m.vara}
     vara_str = ", ".join(varas) or "Vara Criminal Competente"
 
     ofc_id = f"{timezone.now().year}/{ts[-4:]}"
 
     est = _estilos()
-    doc = SimpleDocTemplate(caminho, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
@@ -463,13 +604,7 @@ def gerar_oficio_materiais_gerais(materiais, usuario):
     st.append(Paragraph("RELACAO DE MATERIAIS ENCAMINHADOS", est['Centro']))
     st.append(Spacer(1, 6))
     
-    por_vara = {}
-    for m in materiais:
-        oc = m.noticiado.ocorrencia if m.noticiado else None
-        vara = oc.get_vara_display() if oc and hasattr(oc, 'get_vara_display') and oc.vara else "VARA NAO INFORMADA"
-        por_vara.setdefault(vara, []).append(m)
-        
-    for vara, mats_vara in sorted(por_vara.items()):
+    for vara, mats_vara in _agrupar_por_vara(materiais):
         st.append(Paragraph(f"<b>- {vara.upper()}</b>", est['CorpoLeft']))
         st.append(Spacer(1, 4))
         st.append(_tabela_items(mats_vara, est,
@@ -494,23 +629,21 @@ def gerar_oficio_materiais_gerais(materiais, usuario):
         ("", "Recebido pelo Forum (assinatura e carimbo)"),
     ], est))
 
-    doc.build(st, onFirstPage=_cabecalho_oficio, onLaterPages=_cabecalho_oficio)
-    return os.path.join('oficios', fname).replace("\\", "/")
+    _construir(doc, st, _cabecalho_oficio)
+    return _catalogar(relativo, 'MATERIAL', [m.id for m in materiais])
 
 
 # ====================== CAPA DO LOTE ======================
-def gerar_capa_lote_pdf(lote, usuario=None):
+def gerar_capa_lote_pdf(lote, usuario=None, destino=None):
     ts = timezone.now().strftime('%Y%m%d_%H%M%S')
     fname = f"capa_lote_{lote.identificador}_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'lotes', 'capas')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'lotes', 'capas', fname)
 
-    mats = list(lote.materiais.all().select_related('noticiado__ocorrencia'))
-    total_peso = sum(float(m.peso_real or m.peso_estimado or 0) for m in mats)
+    mats = documentos_dados.materiais_do_lote(lote.id)
+    total_peso = sum(float(m.peso or 0) for m in mats)
 
     est = _estilos()
-    doc = SimpleDocTemplate(caminho, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
@@ -523,7 +656,7 @@ def gerar_capa_lote_pdf(lote, usuario=None):
         ('STATUS', lote.get_status_display()),
         ('DATA FORMACAO', lote.data_criacao.strftime('%d/%m/%Y %H:%M')),
         ('TOTAL ITENS', str(len(mats))),
-        ('PROCESSOS', str(lote.processos_count)),
+        ('PROCESSOS', str(len({m.bou for m in mats}))),
         ('PESO TOTAL', f"{total_peso/1000:.3f} kg" if total_peso >= 1000 else f"{total_peso:.1f} g"),
     ]
     st.append(_tabela_info(dados, est))
@@ -545,21 +678,19 @@ def gerar_capa_lote_pdf(lote, usuario=None):
         ("", "Testemunha - Nome e CPF"),
     ], est))
 
-    doc.build(st, onFirstPage=_cabecalho_oficio, onLaterPages=_cabecalho_oficio)
-    return os.path.join('lotes', 'capas', fname).replace("\\", "/")
+    _construir(doc, st, _cabecalho_oficio)
+    return _catalogar(relativo, 'LOTE', [lote.id])
 
 
 # ====================== CERTIDAO DE INCINERACAO ANTECIPADA ======================
-def gerar_certidao_incineracao_antecipada(lotes, usuario):
+def gerar_certidao_incineracao_antecipada(lotes, usuario, destino=None):
     """Gera certidão ANTES da incineração para ser levada ao fórum/MP para assinatura"""
     ts = datetime.now().strftime('%Y%m%d_%H%M%S')
     fname = f"certidao_antecipada_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'incineracao')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'incineracao', fname)
 
     est = _estilos()
-    doc = SimpleDocTemplate(caminho, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
@@ -567,28 +698,15 @@ def gerar_certidao_incineracao_antecipada(lotes, usuario):
     st.append(Paragraph("DOCUMENTO PARA ASSINATURA ANTECIPADA", est['Subtitulo']))
     st.append(Spacer(1, 8))
 
-    lotes_list = list(lotes)
-    
-    all_mats = []
-    for lote in lotes_list:
-        mats = list(lote.materiais.filter(categoria='ENTORPECENTE').select_related('noticiado__ocorrencia'))
-        all_mats.extend(mats)
-    
+    lotes_list = documentos_dados.carregar_lotes(lotes)
+    all_mats = [m for l in lotes_list for m in l.materiais if m.categoria == 'ENTORPECENTE']
     lotes_str = ", ".join([l.identificador for l in lotes_list])
-    
-    processos_unicos = set()
-    for m in all_mats:
-        if m.noticiado and m.noticiado.ocorrencia:
-            proc = m.noticiado.ocorrencia.processo or m.noticiado.ocorrencia.bou
-            processos_unicos.add(proc)
-    
-    total_peso = sum(float(m.peso_real or m.peso_estimado or 0) for m in all_mats)
+    processos_unicos = {m.processo or m.bou for m in all_mats}
+    total_peso = sum(float(m.peso or 0) for m in all_mats)
 
     por_vara = {}
     for m in all_mats:
-        if m.noticiado and m.noticiado.ocorrencia:
-            vn = m.noticiado.ocorrencia.get_vara_display()
-            por_vara.setdefault(vn, []).append(m)
+        por_vara.setdefault(m.vara_nome, []).append(m)
 
     st.append(Paragraph(
         f"O 6o Batalhao de Policia Militar de Cascavel/PR vem respeitosamente requerer a "
@@ -615,11 +733,10 @@ def gerar_certidao_incineracao_antecipada(lotes, usuario):
         st.append(Spacer(1, 4))
         
         for m in mats_vara[:10]:
-            oc = m.noticiado.ocorrencia if m.noticiado else None
-            proc = oc.processo or oc.bou if oc else '-'
-            subst = m.get_substancia_display() if m.substancia else m.get_categoria_display()
-            peso = str(m.peso_real or m.peso_estimado or '-')
-            lacre = m.numero_lacre or '-'
+            proc = m.processo or m.bou
+            subst = m.substancia_nome if m.substancia else m.categoria_nome
+            peso = str(m.peso or '-')
+            lacre = m.lacre or '-'
             st.append(Paragraph(
                 f"  {proc[:25]} | {subst[:15]} | {peso} | Lacres: {lacre[:15]}",
                 ParagraphStyle('Lista', fontSize=8, fontName='Helvetica', leading=10)
@@ -655,29 +772,28 @@ def gerar_certidao_incineracao_antecipada(lotes, usuario):
         est['Rodape']
     ))
 
-    doc.build(st, onFirstPage=_cabecalho_oficio, onLaterPages=_cabecalho_oficio)
+    _construir(doc, st, _cabecalho_oficio)
+    _catalogar(relativo, 'LOTE', [l.id for l in lotes_list])
     
     lote_info = [{
         'identificador': l.identificador,
-        'processos': l.processos_count,
-        'materiais': l.materiais.count(),
+        'processos': len(l.processos),
+        'materiais': len(l.materiais),
         'peso': l.peso_total
     } for l in lotes_list]
     
-    return fname, lote_info
+    return (fname if relativo else None), lote_info
 
 
 # ====================== CERTIDAO DE INCINERACAO (POS) ======================
-def gerar_certidao_incineracao_coletiva(lotes, usuario):
+def gerar_certidao_incineracao_coletiva(lotes, usuario, destino=None):
     """Gera certidão DEPOIS da incineração (apos assinatura do termo)"""
     ts = datetime.now().strftime('%Y%m%d_%H%M%S')
     fname = f"certidao_coletiva_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'incineracao')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'incineracao', fname)
 
     est = _estilos()
-    doc = SimpleDocTemplate(caminho, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
@@ -685,9 +801,9 @@ def gerar_certidao_incineracao_coletiva(lotes, usuario):
     st.append(Paragraph("DESTRUICAO DE SUBSTANCIAS ENTORPECENTES", est['Subtitulo']))
     st.append(Spacer(1, 10))
 
-    lotes_list = list(lotes)
+    lotes_list = documentos_dados.carregar_lotes(lotes)
     lotes_str = ", ".join([l.identificador for l in lotes_list])
-    
+
     st.append(Paragraph(
         f"Certifico e dou fe que, em data de hoje, foi realizada a destruicao termica (incineracao) "
         f"das substancias entorpecentes relacionadas nos lotes: <b>{lotes_str}</b>, "
@@ -696,15 +812,10 @@ def gerar_certidao_incineracao_coletiva(lotes, usuario):
     ))
     st.append(Spacer(1, 10))
 
-    all_mats = []
-    for lote in lotes_list:
-        all_mats.extend(list(lote.materiais.all().select_related('noticiado__ocorrencia')))
-
     por_vara = {}
-    for m in all_mats:
-        oc = m.noticiado.ocorrencia if m.noticiado else None
-        vn = oc.get_vara_display() if oc else "SEM VARA"
-        por_vara.setdefault(vn, []).append(m)
+    for lote in lotes_list:
+        for m in lote.materiais:
+            por_vara.setdefault(m.vara_nome if m.vara else "SEM VARA", []).append(m)
 
     for vara, ms in por_vara.items():
         st.append(Paragraph(f"- {vara.upper()}", est['Centro']))
@@ -726,14 +837,16 @@ def gerar_certidao_incineracao_coletiva(lotes, usuario):
         ("", "Testemunha Judiciaria"),
     ], est))
 
-    doc.build(st, onFirstPage=_cabecalho_oficio, onLaterPages=_cabecalho_oficio)
-    return fname
+    _construir(doc, st, _cabecalho_oficio)
+    # Certidão da incineração efetivada: registro legal, nunca expira
+    _catalogar(relativo, 'LOTE', [l.id for l in lotes_list], protegido=True)
+    return fname if relativo else None
 
 
 # ====================== CAPAS EM MASSA (LANDSCAPE) ======================
-def gerar_capas_lote_coletivas(lote_ids):
-    from .models import LoteIncineracao
-    buf = BytesIO()
+def gerar_capas_lote_coletivas(lote_ids, destino=None):
+    """Sem `destino` devolve os bytes do PDF; com `destino` escreve nele e devolve None."""
+    buf = destino if destino is not None else BytesIO()
 
     est = _estilos()
     est.add(ParagraphStyle('CapaTitulo', fontSize=20, alignment=TA_CENTER,
@@ -745,7 +858,7 @@ def gerar_capas_lote_coletivas(lote_ids):
     doc = SimpleDocTemplate(buf, pagesize=landscape(A4), leftMargin=2*cm, rightMargin=2*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
-    lotes = list(LoteIncineracao.objects.filter(id__in=lote_ids))
+    lotes = documentos_dados.carregar_lotes(lote_ids)
 
     for i, lote in enumerate(lotes):
         if i > 0:
@@ -758,7 +871,7 @@ def gerar_capas_lote_coletivas(lote_ids):
         dados = [
             [Paragraph("<b>DATA:</b>", est['CorpoLeft']), Paragraph(lote.data_criacao.strftime('%d/%m/%Y'), est['CorpoLeft'])],
             [Paragraph("<b>ESTADO:</b>", est['CorpoLeft']), Paragraph("AGUARDANDO TRANSPORTE", est['CorpoLeft'])],
-            [Paragraph("<b>PROCESSOS:</b>", est['CorpoLeft']), Paragraph(str(lote.processos_count), est['CorpoLeft'])],
+            [Paragraph("<b>PROCESSOS:</b>", est['CorpoLeft']), Paragraph(str(len(lote.processos)), est['CorpoLeft'])],
             [Paragraph("<b>PESO APROX.:</b>", est['CorpoLeft']), Paragraph(f"{(lote.peso_total/1000):.2f} kg", est['CorpoLeft'])],
         ]
         t = Table(dados, colWidths=[4*cm, 14*cm])
@@ -772,7 +885,7 @@ def gerar_capas_lote_coletivas(lote_ids):
         st.append(t)
         st.append(Spacer(1, 15))
 
-        procs = lote.processos_list
+        procs = lote.processos
         st.append(Paragraph("<b>PROCESSOS:</b>", est['CorpoLeft']))
         st.append(Spacer(1, 4))
         st.append(Paragraph(", ".join(procs[:30]) + ("..." if len(procs) > 30 else ""), est['CorpoLeft']))
@@ -781,19 +894,85 @@ def gerar_capas_lote_coletivas(lote_ids):
         st.append(Paragraph("6o BATALHAO DE POLICIA MILITAR - CASCAVEL/PR", est['Centro']))
         st.append(Paragraph("CARTORIO DE TERMOS CIRCUNSTANCIADOS", est['Centro']))
 
-    doc.build(st, onFirstPage=_cabecalho_landscape, onLaterPages=_cabecalho_landscape)
+    _construir(doc, st, _cabecalho_landscape)
+    if destino is not None:
+        return None
     pdf = buf.getvalue()
     buf.close()
     return pdf
 
 
 # ====================== RELATORIO FILTRADO (LANDSCAPE) ======================
-def gerar_relatorio_filtrado_pdf(materiais_qs, filtros_desc, tipo='inventario'):
+# Acima deste número de registros o relatório é montado em modo paginado:
+# o queryset é lido em blocos com .iterator() e cada página recebe uma tabela
+# própria de tamanho fixo, em vez de uma única Table gigante repartida pelo ReportLab.
+RELATORIO_LIMITE_TABELA_UNICA = 1500
+RELATORIO_LINHAS_POR_TABELA = 25
+
+
+def _resumo_relatorio(materiais_qs):
+    return materiais_qs.order_by().aggregate(
+        total=Count('id'),
+        ent=Count('id', filter=Q(categoria='ENTORPECENTE')),
+        ger=Count('id', filter=Q(categoria__in=['SOM', 'FACA', 'SIMULACRO', 'OUTROS'])),
+        bous=Count('noticiado__ocorrencia__bou', distinct=True),
+    )
+
+
+def _tabelas_paginadas(materiais, est, linhas_por_tabela):
+    """Gera tabelas de tamanho fixo (cabeçalho repetido em cada uma) a partir de um iterável."""
+    bloco, n = [], 1
+    for m in materiais:
+        bloco.append(m)
+        if len(bloco) == linhas_por_tabela:
+            yield _tabela_items_landscape(bloco, est, inicio=n)
+            n += len(bloco)
+            bloco = []
+    if bloco:
+        yield _tabela_items_landscape(bloco, est, inicio=n)
+
+
+def _story_paginada(materiais_qs, tipo, est, total, chunk_size, linhas_por_tabela):
+    """Gera a relação detalhada lendo o queryset em blocos, sem materializá-lo."""
+    callback = _progresso.get()
+
+    def iterar(qs):
+        for lidos, m in enumerate(documentos_dados.iterar_materiais(qs, chunk_size), start=1):
+            if callback and lidos % linhas_por_tabela == 0:
+                callback(min(99, int(lidos * 100 / max(total, 1))))
+            yield m
+
+    if tipo in ['remessa', 'incineracao']:
+        vara_map = dict(VARA_CHOICES)
+        contagem = dict(
+            materiais_qs.order_by().values_list('noticiado__ocorrencia__vara').annotate(n=Count('id'))
+        )
+        ordem = [
+            campo for campo in (materiais_qs.query.order_by or materiais_qs.model._meta.ordering)
+            if not (isinstance(campo, str) and 'vara' in campo)
+        ]
+        qs = materiais_qs.order_by('noticiado__ocorrencia__vara', *ordem)
+
+        for vara, mats_vara in groupby(iterar(qs), key=attrgetter('vara')):
+            nome = vara_map.get(vara, "VARA NAO INFORMADA") if vara else "VARA NAO INFORMADA"
+            yield Paragraph(f"<b>DESTINO / JURISDICAO: {nome.upper()}</b> - ({contagem.get(vara, 0)} itens)", est['CorpoLeft'])
+            yield Spacer(1, 4)
+            yield from _tabelas_paginadas(mats_vara, est, linhas_por_tabela)
+            yield Spacer(1, 10)
+    else:
+        yield from _tabelas_paginadas(iterar(materiais_qs), est, linhas_por_tabela)
+
+
+def gerar_relatorio_filtrado_pdf(materiais_qs, filtros_desc, tipo='inventario', destino=None,
+                                 paginado=None, chunk_size=2000):
+    """
+    `paginado` força o modo (None = automático acima de RELATORIO_LIMITE_TABELA_UNICA
+    registros). No modo paginado a memória fica limitada a `chunk_size` materiais
+    mais algumas tabelas de uma página, independentemente do tamanho do filtro.
+    """
     ts = timezone.now().strftime('%Y%m%d_%H%M%S')
     fname = f"relatorio_{tipo}_{ts}.pdf"
-    pasta = os.path.join(settings.MEDIA_ROOT, 'relatorios')
-    os.makedirs(pasta, exist_ok=True)
-    caminho = os.path.join(pasta, fname)
+    alvo, relativo = _destino_pdf(destino, 'relatorios', fname)
 
     titulos = {
         'inventario': 'RELATORIO DE INVENTARIO GERAL',
@@ -802,14 +981,20 @@ def gerar_relatorio_filtrado_pdf(materiais_qs, filtros_desc, tipo='inventario'):
         'custodia': 'RELATORIO DE CUSTODIA EM COFRE',
     }
 
+    resumo_qs = _resumo_relatorio(materiais_qs)
+    total = resumo_qs['total']
+    if paginado is None:
+        paginado = total > RELATORIO_LIMITE_TABELA_UNICA
+
     est = _estilos()
     W, H = landscape(A4)
-    doc = SimpleDocTemplate(caminho, pagesize=landscape(A4), leftMargin=1.5*cm, rightMargin=1.5*cm,
+    doc = SimpleDocTemplate(alvo, pagesize=landscape(A4), leftMargin=1.5*cm, rightMargin=1.5*cm,
                            topMargin=3.5*cm, bottomMargin=2*cm)
     st = []
 
     st.append(Paragraph(titulos.get(tipo, 'RELATORIO'), est['Titulo']))
-    st.append(Paragraph(f"Gerado em {timezone.now().strftime('%d/%m/%Y as %H:%M')} - {materiais_qs.count()} registro(s)", est['Subtitulo']))
+    # Só a data: o PDF fica em cache o dia todo (por_dia), uma hora ficaria velha na reimpressão
+    st.append(Paragraph(f"Gerado em {timezone.localdate().strftime('%d/%m/%Y')} - {total} registro(s)", est['Subtitulo']))
     st.append(Spacer(1, 8))
 
     if filtros_desc:
@@ -818,14 +1003,9 @@ def gerar_relatorio_filtrado_pdf(materiais_qs, filtros_desc, tipo='inventario'):
             st.append(_tabela_info(pares, est, cols=[3*cm, 5*cm, 3*cm, 5*cm, 3*cm, 4.5*cm]))
             st.append(Spacer(1, 8))
 
-    mats = list(materiais_qs)
-    ent = sum(1 for m in mats if m.categoria == 'ENTORPECENTE')
-    ger = sum(1 for m in mats if m.categoria in ['SOM', 'FACA', 'SIMULACRO', 'OUTROS'])
-    Bous = len(set(m.noticiado.ocorrencia.bou for m in mats if m.noticiado and m.noticiado.ocorrencia))
-
     resumo = [
-        ('TOTAL', str(len(mats)), 'BOU UNICOS', str(Bous)),
-        ('ENTORPECENTES', str(ent), 'MATERIAIS GERAIS', str(ger)),
+        ('TOTAL', str(total), 'BOU UNICOS', str(resumo_qs['bous'])),
+        ('ENTORPECENTES', str(resumo_qs['ent']), 'MATERIAIS GERAIS', str(resumo_qs['ger'])),
     ]
     t_res = Table(resumo, colWidths=[4*cm, 3.5*cm, 4*cm, 3.5*cm])
     t_res.setStyle(TableStyle([
@@ -840,29 +1020,31 @@ def gerar_relatorio_filtrado_pdf(materiais_qs, filtros_desc, tipo='inventario'):
     st.append(t_res)
     st.append(Spacer(1, 8))
 
-    st.append(Paragraph(f"RELACAO DETALHADA ({len(mats)} registros)", est['Centro']))
+    st.append(Paragraph(f"RELACAO DETALHADA ({total} registros)", est['Centro']))
     st.append(Spacer(1, 6))
-    
+
+    rodape = [
+        Spacer(1, 15),
+        Paragraph(f"Cascavel/PR, {timezone.now().strftime('%d de %B de %Y')}.", est['Direita']),
+        Spacer(1, 6),
+        _bloco_assinaturas([("", "Encarregado do Cartorio - 6o Batalhao de Policia Militar")], est, largura=W-3*cm),
+    ]
+
+    if paginado:
+        corpo = _story_paginada(materiais_qs, tipo, est, total, chunk_size, RELATORIO_LINHAS_POR_TABELA)
+        _construir(doc, _StoryPreguicosa(chain(st, corpo, rodape)), _cabecalho_landscape,
+                   progresso_build=False, canvasmaker=_CanvasCompacto)
+        return _catalogar(relativo)
+
+    mats = documentos_dados.carregar_materiais(materiais_qs)
     if tipo in ['remessa', 'incineracao']:
-        por_vara = {}
-        for m in mats:
-            oc = m.noticiado.ocorrencia if m.noticiado else None
-            vara = oc.get_vara_display() if oc and hasattr(oc, 'get_vara_display') and oc.vara else "VARA NAO INFORMADA"
-            por_vara.setdefault(vara, []).append(m)
-            
-        for vara, mats_vara in sorted(por_vara.items()):
+        for vara, mats_vara in _agrupar_por_vara(mats):
             st.append(Paragraph(f"<b>DESTINO / JURISDICAO: {vara.upper()}</b> - ({len(mats_vara)} itens)", est['CorpoLeft']))
             st.append(Spacer(1, 4))
             st.append(_tabela_items_landscape(mats_vara, est))
             st.append(Spacer(1, 10))
     else:
         st.append(_tabela_items_landscape(mats, est))
-        
-    st.append(Spacer(1, 15))
-
-    st.append(Paragraph(f"Cascavel/PR, {timezone.now().strftime('%d de %B de %Y')}.", est['Direita']))
-    st.append(Spacer(1, 6))
-    st.append(_bloco_assinaturas([("", "Encarregado do Cartorio - 6o Batalhao de Policia Militar")], est, largura=W-3*cm))
 
-    doc.build(st, onFirstPage=_cabecalho_landscape, onLaterPages=_cabecalho_landscape)
-    return os.path.join('relatorios', fname).replace("\\", "/")
+    _construir(doc, st + rodape, _cabecalho_landscape)
+    return _catalogar(relativo)
@@ -0,0 +1,70 @@
+"""
+historico.py — Rotação do histórico de custódia para as tabelas de arquivo anuais.
+
+RegistroHistorico é a tabela quente: as telas e os painéis só leem dela. Um
+ano encerrado vai inteiro para gestao_registrohistorico_<ano>
+(modelo_arquivo_historico) com um INSERT ... SELECT e sai da tabela quente
+com um DELETE, na mesma transação, e fica anotado em HistoricoArquivado para
+RegistroHistorico.objects.entre() saber onde procurar.
+"""
+import logging
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import HistoricoArquivado, RegistroHistorico, modelo_arquivo_historico
+
+logger = logging.getLogger(__name__)
+
+
+def inicio_do_ano(ano):
+    """ 1º de janeiro de `ano` à meia-noite no fuso local (TIME_ZONE), não em UTC """
+    return timezone.make_aware(datetime(ano, 1, 1), timezone.get_current_timezone())
+
+
+def anos_encerrados(manter_anos=0):
+    """
+    Anos com registro na tabela quente anteriores ao atual, menos os
+    `manter_anos` mais recentes. O ano é o do fuso local, o mesmo dos
+    limites de arquivar_ano().
+    """
+    limite = inicio_do_ano(timezone.localdate().year - manter_anos)
+    return [data.year for data in RegistroHistorico.objects.filter(data_criacao__lt=limite)
+            .datetimes('data_criacao', 'year', tzinfo=timezone.get_current_timezone())]
+
+
+def criar_tabela_arquivo(ano):
+    """
+    Cria a tabela de arquivo de `ano` se ainda não existe. No SQLite o
+    schema_editor não roda dentro de transaction.atomic().
+    """
+    modelo = modelo_arquivo_historico(ano)
+    if modelo._meta.db_table in connection.introspection.table_names():
+        return modelo
+    with connection.schema_editor() as editor:
+        editor.create_model(modelo)
+    return modelo
+
+
+def arquivar_ano(ano):
+    """ Move os registros de `ano` da tabela quente para a de arquivo; devolve quantos """
+    modelo = criar_tabela_arquivo(ano)
+    do_ano = RegistroHistorico.objects.filter(
+        data_criacao__gte=inicio_do_ano(ano), data_criacao__lt=inicio_do_ano(ano + 1))
+    campos = RegistroHistorico._meta.concrete_fields
+    select, params = do_ano.values_list(*(campo.attname for campo in campos)).query.sql_with_params()
+    colunas = ', '.join(connection.ops.quote_name(campo.column) for campo in campos)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {connection.ops.quote_name(modelo._meta.db_table)} ({colunas}) {select}", params)
+            movidos = cursor.rowcount
+        do_ano.delete()
+        HistoricoArquivado.objects.get_or_create(ano=ano)
+        HistoricoArquivado.objects.filter(ano=ano).update(
+            registros=F('registros') + movidos, arquivado_em=timezone.now())
+
+    logger.info(f"[HISTORICO] {movidos} registro(s) de {ano} arquivado(s) em {modelo._meta.db_table}")
+    return movidos
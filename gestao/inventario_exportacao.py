@@ -0,0 +1,237 @@
+"""
+inventario_exportacao.py — Exportação do inventário geral em CSV e XLSX.
+
+Os materiais são lidos do banco em blocos (iterator) já com ocorrência,
+noticiado, lote e o resumo do histórico resolvidos em SQL (joins e
+subqueries), então cada linha sai pronta sem queries extras nem prefetch.
+Os dois formatos são geradores de bytes para StreamingHttpResponse: o
+download começa na primeira linha e nada além de um bloco fica em memória.
+
+O XLSX é escrito à mão (SpreadsheetML mínimo, strings inline) sobre o mesmo
+ZIP em fluxo da exportação de auditoria, sem dependência extra.
+"""
+import csv
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+
+from .constants import CATEGORIA_CHOICES, DROGAS_CHOICES, STATUS_CUSTODIA_CHOICES, VARA_CHOICES
+from .documentos_exportacao import zip_em_fluxo
+from .models import RegistroHistorico, formatar_peso_material
+
+_VARAS = dict(VARA_CHOICES)
+_CATEGORIAS = dict(CATEGORIA_CHOICES)
+_SUBSTANCIAS = dict(DROGAS_CHOICES)
+_STATUS = dict(STATUS_CUSTODIA_CHOICES)
+
+CABECALHO = [
+    'BOU', 'PROJUDI', 'Data do Fato', 'Vara', 'Unidade de Origem', 'Noticiado',
+    'Categoria', 'Substância', 'Descrição', 'Peso', 'Unidade', 'Peso (texto)', 'Lacre',
+    'Local', 'Status', 'Lote', 'Movimentações', 'Última Movimentação', 'Responsável', 'Observação',
+]
+
+_COLUNAS = (
+    'noticiado__ocorrencia__bou', 'noticiado__ocorrencia__processo',
+    'noticiado__ocorrencia__data_registro_bou', 'noticiado__ocorrencia__vara',
+    'noticiado__ocorrencia__unidade_origem', 'noticiado__nome',
+    'categoria', 'substancia', 'descricao_geral', 'valor_monetario',
+    'peso_real', 'peso_estimado', 'unidade', 'numero_lacre', 'localizacao_no_cofre',
+    'status', 'lote__identificador',
+    'movimentacoes', 'ultima_mov_em', 'ultima_mov_por', 'ultima_mov_obs',
+)
+
+
+def _com_historico(qs):
+    """ Anota o resumo do histórico (quantidade + último registro) via subqueries correlacionadas """
+    historico = RegistroHistorico.objects.filter(material=OuterRef('pk')).order_by('-data_criacao', '-id')
+    contagem = (RegistroHistorico.objects.filter(material=OuterRef('pk')).order_by()
+                .values('material').annotate(n=Count('id')).values('n'))
+    return qs.annotate(
+        movimentacoes=Subquery(contagem),
+        ultima_mov_em=Subquery(historico.values('data_criacao')[:1]),
+        ultima_mov_por=Subquery(historico.values('criado_por__username')[:1]),
+        ultima_mov_obs=Subquery(historico.values('observacao')[:1]),
+    )
+
+
+def _descricao(categoria, substancia, descricao_geral, valor, peso_txt):
+    """ Mesmo texto de Material.descricao_amigavel """
+    if categoria == 'ENTORPECENTE':
+        return f"{_SUBSTANCIAS.get(substancia, substancia)} | {peso_txt}"
+    if categoria == 'DINHEIRO':
+        return f"Dinheiro R$ {valor}"
+    return f"{_CATEGORIAS.get(categoria, categoria)} - {(descricao_geral or '')[:30]}"
+
+
+def linhas_inventario(materiais_qs, chunk_size=2000):
+    """ Linhas (listas na ordem de CABECALHO) dos materiais filtrados, lidas em blocos """
+    qs = _com_historico(materiais_qs).values_list(*_COLUNAS)
+    for (bou, processo, data_fato, vara, unidade_origem, noticiado, categoria, substancia,
+         descricao_geral, valor, peso_real, peso_estimado, unidade, lacre, local, status, lote,
+         movimentacoes, ultima_em, ultima_por, ultima_obs) in qs.iterator(chunk_size=chunk_size):
+        peso_txt = formatar_peso_material(categoria, peso_real, peso_estimado, unidade)
+        yield [
+            bou, processo or '', data_fato, _VARAS.get(vara, vara), unidade_origem or '', noticiado,
+            _CATEGORIAS.get(categoria, categoria), _SUBSTANCIAS.get(substancia, substancia) if substancia else '',
+            _descricao(categoria, substancia, descricao_geral, valor, peso_txt),
+            peso_real if peso_real is not None else peso_estimado, unidade or '', peso_txt, lacre or '',
+            local or '', _STATUS.get(status, status), lote or '', movimentacoes or 0,
+            timezone.localtime(ultima_em) if ultima_em else None, ultima_por or '', ultima_obs or '',
+        ]
+
+
+# ── CSV ───────────────────────────────────────────────────────────────────────
+
+class _Eco:
+    """ "Arquivo" do csv.writer que só devolve a linha formatada """
+    def write(self, valor):
+        return valor
+
+
+def _texto_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    if not isinstance(valor, str):
+        return str(valor).replace('.', ',')  # números no padrão do Excel pt-BR
+    return valor
+
+
+def csv_em_fluxo(linhas, linhas_por_bloco=500):
+    """ CSV em UTF-8 com BOM e ';' (abre direto no Excel pt-BR), em blocos de linhas """
+    escritor = csv.writer(_Eco(), delimiter=';')
+    bloco = ['\ufeff', escritor.writerow(CABECALHO)]
+    for linha in linhas:
+        bloco.append(escritor.writerow([_texto_csv(v) for v in linha]))
+        if len(bloco) >= linhas_por_bloco:
+            yield ''.join(bloco).encode('utf-8')
+            bloco = []
+    yield ''.join(bloco).encode('utf-8')
+
+
+# ── XLSX ──────────────────────────────────────────────────────────────────────
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CONTENT_TYPES = _XML + (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS = _XML + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = _XML + (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Inventario" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+
+_WORKBOOK_RELS = _XML + (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilos: 0 = padrão, 1 = cabeçalho em negrito, 2 = data, 3 = data e hora
+_STYLES = _XML + (
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '</styleSheet>'
+)
+
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+# Caracteres de controle não são permitidos em XML (aparecem em textos colados do BOU)
+_CONTROLE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _celula(valor, estilo=0):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, datetime):
+        serial = (valor.replace(tzinfo=None) - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="3"><v>{serial:.6f}</v></c>'
+    if isinstance(valor, date):
+        return f'<c s="2"><v>{(valor - _EPOCA_EXCEL.date()).days}</v></c>'
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    atributo = f' s="{estilo}"' if estilo else ''
+    texto = escape(_CONTROLE.sub('', str(valor)))
+    return f'<c t="inlineStr"{atributo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _planilha(linhas):
+    yield (_XML + '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+           '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/></sheetView></sheetViews>'
+           '<sheetData>')
+    yield '<row>' + ''.join(_celula(t, estilo=1) for t in CABECALHO) + '</row>'
+    for linha in linhas:
+        yield '<row>' + ''.join(_celula(v) for v in linha) + '</row>'
+    yield '</sheetData></worksheet>'
+
+
+class _LeitorGerador:
+    """ Arquivo somente leitura sobre um gerador de str (entrada do zip_em_fluxo) """
+    def __init__(self, partes):
+        self._partes = iter(partes)
+        self._resto = bytearray()
+
+    def read(self, n=-1):
+        while n < 0 or len(self._resto) < n:
+            parte = next(self._partes, None)
+            if parte is None:
+                break
+            self._resto += parte.encode('utf-8')
+        if n < 0:
+            n = len(self._resto)
+        dados = bytes(self._resto[:n])
+        del self._resto[:n]
+        return dados
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _fixo(conteudo):
+    return lambda: _LeitorGerador([conteudo])
+
+
+def xlsx_em_fluxo(linhas):
+    """ Bytes de um XLSX com uma planilha, escrito em fluxo (memória constante) """
+    return zip_em_fluxo([
+        ('[Content_Types].xml', _fixo(_CONTENT_TYPES)),
+        ('_rels/.rels', _fixo(_RELS)),
+        ('xl/workbook.xml', _fixo(_WORKBOOK)),
+        ('xl/_rels/workbook.xml.rels', _fixo(_WORKBOOK_RELS)),
+        ('xl/styles.xml', _fixo(_STYLES)),
+        ('xl/worksheets/sheet1.xml', lambda: _LeitorGerador(_planilha(linhas))),
+    ])
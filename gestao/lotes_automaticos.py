@@ -0,0 +1,93 @@
+"""
+lotes_automaticos.py — Lote de incineração automático.
+
+Quando um entorpecente passa a AUTORIZADO e já há PROCESSOS_POR_LOTE_AUTO
+processos aguardando lote (ProcessoPendente), o signal só grava um evento
+LOTE_AUTOMATICO no outbox, na transação da própria autorização. O lote é
+montado depois pelo worker (manage.py processar_outbox), em tratar_evento.
+"""
+import logging
+from datetime import datetime
+
+from . import custodia, outbox
+from .models import LoteIncineracao, Material, ProcessoPendente
+
+logger = logging.getLogger(__name__)
+
+PROCESSOS_POR_LOTE_AUTO = 20
+
+
+def verificar_criacao_lote_automatico(material):
+    if material.categoria != 'ENTORPECENTE' or material.status != 'AUTORIZADO':
+        return
+    
+    # ProcessoPendente é mantido pelo Material.save(): contar as linhas basta.
+    # O lote é montado pelo worker do outbox, fora desta requisição
+    if ProcessoPendente.quantidade() >= PROCESSOS_POR_LOTE_AUTO:
+        outbox.registrar('LOTE_AUTOMATICO')
+
+
+def criar_lote_automatico():
+    """ Monta um lote com os processos pendentes mais antigos; devolve o lote (ou None) """
+    # Os PROCESSOS_POR_LOTE_AUTO processos pendentes há mais tempo, numa consulta só
+    primeiros = (ProcessoPendente.objects.filter(materiais__gt=0)
+                 .order_by('desde', 'ocorrencia_id').values('ocorrencia_id')[:PROCESSOS_POR_LOTE_AUTO])
+    materiais_sem_lote = Material.objects.filter(
+        status='AUTORIZADO',
+        categoria='ENTORPECENTE',
+        lote__isnull=True,
+        noticiado__ocorrencia__in=primeiros,
+    ).select_related('noticiado__ocorrencia').order_by('noticiado__ocorrencia__pendencia__desde', 'noticiado__ocorrencia_id', 'id')
+    
+    processos = {}
+    for mat in materiais_sem_lote:
+        proc = mat.noticiado.ocorrencia.processo or f"BOU-{mat.noticiado.ocorrencia.bou}"
+        if proc not in processos:
+            processos[proc] = []
+        processos[proc].append(mat)
+    
+    if not processos:
+        return None
+    
+    processos_list = list(processos.keys())
+    
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    identificador = f"AUTO-{timestamp}"
+    sufixo = 1
+    while LoteIncineracao.objects.filter(identificador=identificador).exists():
+        sufixo += 1
+        identificador = f"AUTO-{timestamp}-{sufixo}"
+    
+    lote = LoteIncineracao.objects.create(
+        identificador=identificador,
+        status='ABERTO'
+    )
+    
+    materiais = [mat for proc in processos_list for mat in processos[proc]]
+    for mat in materiais:
+        mat.lote = lote
+    custodia.transicionar(
+        materiais, 'AGUARDANDO_INCINERACAO',
+        "LOTE AUTOMÁTICO gerado com {processos} processos. Lote: {lote}",
+        campos=['lote'], contexto={'processos': len(processos_list), 'lote': lote.identificador})
+    
+    ProcessoPendente.objects.filter(materiais__lte=0).delete()
+    
+    logger.info(f"[LOTE AUTO] Lote {lote.identificador} criado com {len(materiais)} materiais de {len(processos_list)} processos.")
+    return lote
+
+
+def tratar_evento(evento):
+    """
+    Tratador do evento LOTE_AUTOMATICO do outbox (roda numa transação).
+    Idempotente: confere a contagem de novo e monta lotes enquanto houver
+    processos suficientes; um evento repetido, ou já atendido por outro,
+    não monta nada.
+    """
+    lotes = []
+    while ProcessoPendente.quantidade() >= PROCESSOS_POR_LOTE_AUTO:
+        lote = criar_lote_automatico()
+        if lote is None:
+            break
+        lotes.append(lote.identificador)
+    return f"Lote(s) {', '.join(lotes)}" if lotes else "Nenhum lote: processos pendentes insuficientes."
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestao import historico
+
+
+class Command(BaseCommand):
+    help = ("Tira os anos encerrados do histórico de custódia da tabela quente para as tabelas "
+            "de arquivo anuais (gestao_registrohistorico_<ano>).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int, help="Arquiva só este ano (precisa estar encerrado)")
+        parser.add_argument('--manter-anos', type=int, default=0,
+                            help="Anos encerrados mais recentes que continuam na tabela quente")
+        parser.add_argument('--simular', action='store_true', help="Só mostra os anos que seriam arquivados")
+
+    def handle(self, *args, **opts):
+        if opts['ano'] is not None:
+            if opts['ano'] >= timezone.localdate().year:
+                raise CommandError(f"{opts['ano']} ainda não está encerrado.")
+            anos = [opts['ano']]
+        else:
+            anos = historico.anos_encerrados(opts['manter_anos'])
+
+        if not anos:
+            self.stdout.write("Nenhum ano encerrado na tabela quente.")
+            return
+        if opts['simular']:
+            self.stdout.write(f"Seriam arquivados: {', '.join(map(str, anos))}.")
+            return
+        for ano in anos:
+            movidos = historico.arquivar_ano(ano)
+            self.stdout.write(self.style.SUCCESS(f"{ano}: {movidos} registro(s) arquivado(s)."))
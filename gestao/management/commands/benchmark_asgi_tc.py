@@ -0,0 +1,120 @@
+"""
+Teste de carga do api/ler_tc/ sob ASGI: latência das páginas (painel e
+custódia) sozinhas e durante envios simultâneos de TCs, pelo handler ASGI do
+Django (AsyncClient, no mesmo processo, com a pilha de middlewares real).
+Roda num banco de teste descartável, nunca no real.
+
+    manage.py benchmark_asgi_tc              # envios lidos no pool do tc_assincrono
+    manage.py benchmark_asgi_tc --workers 0  # envios lidos numa thread, para comparar
+"""
+import asyncio
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+
+from gestao import tc_assincrono, tc_corpus
+
+from .benchmark_relatorio import _popular
+
+PAGINAS = ('home', 'custodia_lista')
+
+
+def _ms(tempos, p):
+    ordenados = sorted(tempos)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))] * 1000
+
+
+class Command(BaseCommand):
+    help = "Teste de carga: latência das páginas durante envios simultâneos ao api/ler_tc/ (ASGI)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simultaneos', type=int, default=4, help="Envios de TC ao mesmo tempo")
+        parser.add_argument('--rodadas', type=int, default=20, help="Vezes que cada página é pedida por fase")
+        parser.add_argument('--workers', type=int, default=None, help="TC_ASSINCRONO_WORKERS (padrão: o do settings)")
+        parser.add_argument('--backend', default='pdfplumber',
+                            help="Backend de PDF dos envios (o padrão, pdfplumber, é o que mais ocupa a CPU)")
+        parser.add_argument('--materiais', type=int, default=2000, help="Materiais na base de teste")
+
+    async def _paginas(self, cliente, rodadas):
+        tempos = []
+        for _ in range(rodadas):
+            for pagina in PAGINAS:
+                inicio = time.perf_counter()
+                resposta = await cliente.get(reverse(pagina))
+                tempos.append(time.perf_counter() - inicio)
+                if resposta.status_code != 200:
+                    raise CommandError(f"{pagina} respondeu {resposta.status_code}")
+        return tempos
+
+    async def _enviar(self, cliente, caso):
+        arquivo = SimpleUploadedFile(caso['nome'], caso['conteudo'])
+        return (await cliente.post(reverse('api_ler_tc'), {'arquivo': arquivo})).status_code
+
+    async def _enviar_sem_parar(self, cliente, casos, parar, respostas):
+        indice = 0
+        while not parar.is_set():
+            status = await self._enviar(cliente, casos[indice % len(casos)])
+            respostas[status] = respostas.get(status, 0) + 1
+            indice += 1
+
+    async def _rodar(self, usuario, casos, rodadas, simultaneos):
+        cliente = AsyncClient()
+        await cliente.aforce_login(usuario)
+        await self._paginas(cliente, 1)
+        await self._enviar(cliente, casos[0])  # aquece o pool de leitura
+        sozinhas = await self._paginas(cliente, rodadas)
+
+        parar, respostas = asyncio.Event(), {}
+        envios = [asyncio.create_task(self._enviar_sem_parar(cliente, casos[i::simultaneos], parar, respostas))
+                  for i in range(simultaneos)]
+        await asyncio.sleep(0.5)
+        inicio = time.perf_counter()
+        durante = await self._paginas(cliente, rodadas)
+        duracao = time.perf_counter() - inicio
+        parar.set()
+        await asyncio.gather(*envios)
+        return sozinhas, durante, respostas, duracao
+
+    def _linha(self, rotulo, tempos):
+        self.stdout.write(f"  {rotulo:<16} p50 {_ms(tempos, 0.5):8.1f} ms  p95 {_ms(tempos, 0.95):8.1f} ms"
+                          f"  máx {max(tempos) * 1000:8.1f} ms")
+
+    def handle(self, *args, **opts):
+        simultaneos = opts['simultaneos']
+        ajustes = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'TC_BACKENDS_PDF': [opts['backend']],
+            'TC_EXTRACAO_PDF': 'serial',
+            'TC_CACHE_MAX_ITENS': 0,
+            'TC_ASSINCRONO_MAX_PENDENTES': simultaneos,
+        }
+        if opts['workers'] is not None:
+            ajustes['TC_ASSINCRONO_WORKERS'] = opts['workers']
+
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            _popular(opts['materiais'], 0)
+            usuario = User.objects.create_user('benchmark')
+            casos = tc_corpus.gerar_corpus(max(simultaneos * 4, 8), formatos=('pdf',))
+            with override_settings(**ajustes):
+                workers = tc_assincrono._workers()
+                sozinhas, durante, respostas, duracao = asyncio.run(
+                    self._rodar(usuario, casos, opts['rodadas'], simultaneos))
+        finally:
+            tc_assincrono.descartar_pool()
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+        lidos = respostas.get(200, 0)
+        leitura = f"{workers} processo(s) de leitura" if workers else "leitura numa thread"
+        self.stdout.write(f"Páginas {', '.join(PAGINAS)} x{opts['rodadas']}; {simultaneos} envios simultâneos "
+                          f"({opts['backend']}, {leitura}):")
+        self._linha('sozinhas', sozinhas)
+        self._linha('durante envios', durante)
+        self.stdout.write(f"  {lidos} TCs lidos durante a fase ({lidos / duracao:.1f}/s); respostas {respostas}")
+        self.stdout.write(f"  p95 durante/sozinhas: {_ms(durante, 0.95) / _ms(sozinhas, 0.95):.2f}x")
@@ -0,0 +1,98 @@
+"""
+Mede o custo do cabeçalho por página: desenho direto (svg2rlg a cada chamada)
+contra o cache de Drawings + Form XObject de documentos_services.
+"""
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, PageBreak
+from reportlab.graphics import renderPDF
+from svglib.svglib import svg2rlg
+
+from gestao import documentos_services as ds
+
+
+def _draw_svg_sem_cache(c, path, x, y, width, height):
+    drawing = svg2rlg(path)
+    if not drawing:
+        return
+    scale = min(width / drawing.width, height / drawing.height)
+    drawing.width = drawing.width * scale
+    drawing.height = drawing.height * scale
+    drawing.scale(scale, scale)
+    renderPDF.draw(drawing, c, x, y)
+
+
+def _cabecalho_sem_cache(c, doc):
+    """Cabeçalho como era antes: SVG reprocessado e redesenhado em toda página."""
+    c.saveState()
+    w, h = A4
+    m = doc.leftMargin
+    _draw_svg_sem_cache(c, ds.LOGO_PARANA, m, h - 65, 45, 45)
+    _draw_svg_sem_cache(c, ds.LOGO_PMPR, w - m - 45, h - 65, 45, 45)
+    c.setStrokeColor(ds.PRETO)
+    c.setLineWidth(1)
+    c.line(m, h - 70, w - m, h - 70)
+    cx = w / 2
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(cx, h - 30, "ESTADO DO PARANÁ")
+    c.setFont("Helvetica-Bold", 10)
+    c.drawCentredString(cx, h - 45, "POLÍCIA MILITAR DO PARANÁ")
+    c.setFont("Helvetica-Bold", 9)
+    c.drawCentredString(cx, h - 60, "6º BATALHÃO DE POLÍCIA MILITAR")
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(cx, 18, "6º BPM - Rua Pernambuco, 1711, Centro - Fone: (45) 3321-6200")
+    c.restoreState()
+
+
+def _sem_cabecalho(c, doc):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark do cabeçalho dos PDFs (antes/depois do cache de SVG e Form XObject)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', type=int, default=40)
+        parser.add_argument('--repeticoes', type=int, default=1)
+
+    def _gerar(self, cabecalho, paginas):
+        est = ds._estilos()
+        buf = BytesIO()
+        doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+                               topMargin=3.5*cm, bottomMargin=2*cm)
+        st = []
+        for i in range(paginas):
+            if i:
+                st.append(PageBreak())
+            st.append(Paragraph(f"Página {i + 1}", est['Corpo']))
+        inicio = time.perf_counter()
+        doc.build(st, onFirstPage=cabecalho, onLaterPages=cabecalho)
+        return time.perf_counter() - inicio, len(buf.getvalue())
+
+    def _medir(self, cabecalho, paginas, repeticoes):
+        tempos, tamanho = [], 0
+        for _ in range(repeticoes):
+            t, tamanho = self._gerar(cabecalho, paginas)
+            tempos.append(t)
+        return min(tempos), tamanho
+
+    def handle(self, *args, **opts):
+        paginas, rep = opts['paginas'], opts['repeticoes']
+
+        base, _ = self._medir(_sem_cabecalho, paginas, rep)
+        antes, tam_antes = self._medir(_cabecalho_sem_cache, paginas, rep)
+        ds.limpar_cache_svg()
+        depois, tam_depois = self._medir(ds._cabecalho_oficio, paginas, rep)
+
+        def por_pagina(t):
+            return (t - base) / paginas * 1000
+
+        self.stdout.write(f"{paginas} páginas, melhor de {rep} execuções")
+        self.stdout.write(f"  sem cache:  {por_pagina(antes):8.3f} ms/página  PDF {tam_antes / 1024:8.1f} KB")
+        self.stdout.write(f"  com cache:  {por_pagina(depois):8.3f} ms/página  PDF {tam_depois / 1024:8.1f} KB")
+        if depois > base:
+            self.stdout.write(f"  ganho:      {(antes - base) / (depois - base):8.1f}x")
@@ -0,0 +1,101 @@
+"""
+Mede a extração de texto de TCs longos (TC de uma página + laudos anexos)
+nos modos de tc_parser.MODOS_PDF: serial, paralelo (páginas divididas entre
+processos) e cabecalho (para quando os campos do cabeçalho aparecem), e
+compara os backends de tc_parser.BACKENDS_PDF instalados no modo serial.
+Os PDFs são sintéticos, gerados em memória com o ReportLab.
+"""
+import os
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from gestao import tc_parser
+
+TC_PRIMEIRA_PAGINA = """POLÍCIA MILITAR DO PARANÁ
+6º BPM - CASCAVEL
+TERMO CIRCUNSTANCIADO DE INFRAÇÃO PENAL
+BOU: 2025/1234567
+Data do Registro: 12/03/2025
+Natureza: Art. 28 - Lei 11.343/06 - Posse de droga para consumo pessoal
+Autos: 0001234-56.2025.8.16.0021
+O noticiado assume o compromisso de comparecer ao 1º Juizado Especial Criminal de Cascavel.
+NOTICIADO
+JOAO PEDRO DOS SANTOS
+RG: 12.345.678-9
+OBJETOS APREENDIDOS:
+01 porção de maconha pesando aproximadamente 5,3 g
+01 aparelho celular marca Samsung cor preta"""
+
+LINHA_LAUDO = "Material examinado: fragmentos vegetais secos, de coloração pardo-esverdeada, acondicionados em"
+
+
+def pdf_sintetico(paginas):
+    """ TC na primeira página e `paginas - 1` páginas de laudo com texto corrido """
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for numero in range(paginas):
+        linhas = TC_PRIMEIRA_PAGINA.split('\n') if numero == 0 else (
+            [f"LAUDO DE CONSTATAÇÃO - folha {numero + 1}"] + [f"{LINHA_LAUDO} {i}" for i in range(50)])
+        pdf.setFont("Helvetica", 9)
+        y = 810
+        for linha in linhas:
+            pdf.drawString(30, y, linha)
+            y -= 15
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark da extração de texto do TC em PDF: serial x paralelo x parada no cabeçalho."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', default='5,15,30,60',
+                            help="Tamanhos dos PDFs (páginas) separados por vírgula")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processos do modo paralelo (padrão: núcleos da máquina)")
+        parser.add_argument('--backend', default='auto',
+                            help="Backend dos modos (padrão: auto, o mais rápido disponível)")
+        parser.add_argument('--repeticoes', type=int, default=3)
+
+    def _medir(self, conteudo, modo, workers, repeticoes, backend='auto'):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            texto = tc_parser.extrair_texto_pdf(conteudo, modo, max_workers=workers, backend=backend)
+            tempos.append(time.perf_counter() - inicio)
+        return min(tempos), texto
+
+    def handle(self, *args, **opts):
+        workers = opts['workers'] or os.cpu_count()
+        backend = opts['backend']
+        backends = [nome for nome in tc_parser.BACKENDS_PDF if tc_parser.backend_disponivel(nome)]
+        self.stdout.write(f"{os.cpu_count()} núcleo(s), paralelo com {workers} processo(s), backend {backend}, "
+                          f"melhor de {opts['repeticoes']} execuções")
+        for paginas in sorted(int(p) for p in opts['paginas'].split(',')):
+            conteudo = pdf_sintetico(paginas)
+            serial, texto_serial = self._medir(conteudo, 'serial', workers, opts['repeticoes'], backend)
+            paralelo, texto_paralelo = self._medir(conteudo, 'paralelo', workers, opts['repeticoes'], backend)
+            cabecalho, texto_cabecalho = self._medir(conteudo, 'cabecalho', workers, opts['repeticoes'], backend)
+
+            if texto_paralelo != texto_serial:
+                self.stderr.write(f"  {paginas} páginas: texto do modo paralelo difere do serial!")
+            dados_serial, dados_cabecalho = tc_parser.parsear_tc(texto_serial), tc_parser.parsear_tc(texto_cabecalho)
+            iguais = all(dados_serial[c] == dados_cabecalho[c] for c in ('bou', 'processo', 'vara', 'natureza_penal'))
+
+            self.stdout.write(f"{paginas:4d} páginas ({len(conteudo) / 1024:.0f} KB):")
+            self.stdout.write(f"  serial     {serial * 1000:8.0f} ms")
+            self.stdout.write(f"  paralelo   {paralelo * 1000:8.0f} ms  {serial / paralelo:5.1f}x")
+            self.stdout.write(f"  cabecalho  {cabecalho * 1000:8.0f} ms  {serial / cabecalho:5.1f}x"
+                              f"  ({texto_cabecalho.count(chr(10)) + 1} de {texto_serial.count(chr(10)) + 1} linhas,"
+                              f" cabeçalho {'igual' if iguais else 'DIFERENTE'})")
+
+            for nome in backends:
+                tempo, texto = self._medir(conteudo, 'serial', workers, opts['repeticoes'], nome)
+                self.stdout.write(f"  {nome:10s} {tempo * 1000:8.0f} ms  "
+                                  f"{tempo * 1000 / paginas:7.1f} ms/página"
+                                  f"  {'aceito' if tc_parser.texto_aceitavel(texto) else 'REJEITADO'}")
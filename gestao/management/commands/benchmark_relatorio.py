@@ -0,0 +1,106 @@
+"""
+Mede o relatório filtrado (landscape) em 10k/50k/100k materiais: tempo,
+linhas/s e pico de memória Python (tracemalloc) do modo paginado contra o
+modo de tabela única. Roda num banco de teste descartável, nunca no real.
+"""
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from gestao import documentos_services as ds
+from gestao.models import Ocorrencia, Noticiado, Material
+
+
+class _Descarte:
+    """Destino binário que só conta bytes (o benchmark não mede disco)."""
+    def __init__(self):
+        self.tamanho = 0
+
+    def write(self, dados):
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+
+def _popular(ate, ja_existentes):
+    """Completa a base até `ate` materiais (um noticiado e uma ocorrência por material)."""
+    varas = ['VARA_01', 'VARA_02', 'VARA_03']
+    for inicio in range(ja_existentes, ate, 5000):
+        fim = min(inicio + 5000, ate)
+        ocs = Ocorrencia.objects.bulk_create([
+            Ocorrencia(bou=f"2025/{i:07d}", vara=varas[i % 3], processo=f"000{i:07d}",
+                       processo_normalizado=f"000{i:07d}", policial_nome='Soldado Benchmark', rg_policial='0')
+            for i in range(inicio, fim)
+        ])
+        nots = Noticiado.objects.bulk_create([
+            Noticiado(ocorrencia=oc, nome=f"NOTICIADO {i}") for i, oc in zip(range(inicio, fim), ocs)
+        ])
+        Material.objects.bulk_create([
+            Material(noticiado=n, categoria='ENTORPECENTE', substancia='MACONHA',
+                     peso_estimado=10, unidade='G', numero_lacre=f"L{i:07d}")
+            for i, n in zip(range(inicio, fim), nots)
+        ])
+
+
+class Command(BaseCommand):
+    help = "Benchmark do relatório filtrado em PDF: modo paginado x tabela única."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', default='10000,50000,100000',
+                            help="Quantidades de materiais separadas por vírgula")
+        parser.add_argument('--limite-tabela-unica', type=int, default=10000,
+                            help="Maior tamanho em que o modo de tabela única também é medido")
+        parser.add_argument('--tipo', default='inventario', choices=['inventario', 'remessa'])
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--sem-memoria', action='store_true',
+                            help="Não faz a segunda execução com tracemalloc")
+
+    def _medir(self, qs, tipo, paginado, chunk_size, memoria):
+        """Tempo e pico de memória em execuções separadas: o tracemalloc deixa o código 3-4x mais lento."""
+        def gerar():
+            destino = _Descarte()
+            ds.gerar_relatorio_filtrado_pdf(qs, {}, tipo, destino=destino, paginado=paginado, chunk_size=chunk_size)
+            return destino.tamanho
+
+        inicio = time.perf_counter()
+        tamanho = gerar()
+        tempo = time.perf_counter() - inicio
+
+        pico = None
+        if memoria:
+            tracemalloc.start()
+            try:
+                gerar()
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        return tempo, pico, tamanho
+
+    def _linha(self, rotulo, n, tempo, pico, tamanho):
+        self.stdout.write(
+            f"  {rotulo:<13} {tempo:8.1f} s  {n / tempo:8.0f} linhas/s  "
+            + (f"pico {pico / 2**20:8.1f} MB  " if pico is not None else "")
+            + f"PDF {tamanho / 2**20:6.1f} MB"
+        )
+
+    def handle(self, *args, **opts):
+        tamanhos = sorted(int(t) for t in opts['tamanhos'].split(','))
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            existentes = 0
+            for n in tamanhos:
+                _popular(n, existentes)
+                existentes = n
+                qs = Material.objects.select_related('noticiado__ocorrencia').order_by('id')
+
+                self.stdout.write(f"{n} materiais ({opts['tipo']}):")
+                self._linha('paginado', n, *self._medir(qs, opts['tipo'], True, opts['chunk_size'], not opts['sem_memoria']))
+                if n <= opts['limite_tabela_unica']:
+                    self._linha('tabela única', n, *self._medir(qs, opts['tipo'], False, opts['chunk_size'], not opts['sem_memoria']))
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
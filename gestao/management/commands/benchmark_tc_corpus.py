@@ -0,0 +1,134 @@
+"""
+Mede o tc_parser num corpus sintético (tc_corpus): acerto por campo,
+documentos por segundo e latência p95 de extrair_texto_pdf,
+extrair_texto_docx e parsear_tc. Compara com o baseline gravado e termina
+com erro se o acerto cair ou o desempenho piorar além da tolerância.
+
+    manage.py benchmark_tc_corpus                    # mede e compara
+    manage.py benchmark_tc_corpus --salvar-baseline  # grava o novo baseline
+"""
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import tc_corpus, tc_parser
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(tc_corpus.__file__), 'benchmarks', 'tc_corpus_baseline.json')
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def _resumo(tempos):
+    return {
+        'documentos': len(tempos),
+        'docs_por_segundo': round(len(tempos) / sum(tempos), 1),
+        'p50_ms': round(_percentil(tempos, 0.5) * 1000, 3),
+        'p95_ms': round(_percentil(tempos, 0.95) * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark do tc_parser num corpus sintético de TCs, com acerto por campo e baseline de regressão."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quantidade', type=int, default=100, help="TCs no corpus (cada um em cada formato)")
+        parser.add_argument('--semente', type=int, default=2025)
+        parser.add_argument('--formatos', default=','.join(tc_corpus.FORMATOS))
+        parser.add_argument('--baseline', default=BASELINE_PADRAO)
+        parser.add_argument('--salvar-baseline', action='store_true', help="Grava o resultado como novo baseline")
+        parser.add_argument('--tolerancia', type=float, default=0.3,
+                            help="Piora aceita em docs/s e p95 antes de acusar regressão (0.3 = 30%%)")
+        parser.add_argument('--exportar', default=None, help="Pasta onde gravar os PDFs/DOCX do corpus")
+
+    def _medir(self, casos):
+        etapas = {'extracao_pdf': [], 'extracao_docx': [], 'parsear_tc': []}
+        acertos = {campo: 0 for campo in tc_corpus.CAMPOS}
+        perfeitos = 0
+        tc_parser.parsear_tc(casos[0]['texto'])  # aquece as regex
+        for caso in casos:
+            inicio = time.perf_counter()
+            if caso['formato'] == 'pdf':
+                texto = tc_parser.extrair_texto_pdf(caso['conteudo'])
+            else:
+                texto = tc_parser.extrair_texto_docx(caso['conteudo'])
+            meio = time.perf_counter()
+            dados = tc_parser.parsear_tc(texto)
+            fim = time.perf_counter()
+            etapas[f"extracao_{caso['formato']}"].append(meio - inicio)
+            etapas['parsear_tc'].append(fim - meio)
+
+            conferidos = tc_corpus.conferir(caso['esperado'], dados)
+            perfeitos += all(conferidos.values())
+            for campo, acertou in conferidos.items():
+                acertos[campo] += acertou
+        return {
+            'acerto': {campo: round(n / len(casos), 4) for campo, n in acertos.items()},
+            'documentos_perfeitos': round(perfeitos / len(casos), 4),
+            'etapas': {nome: _resumo(tempos) for nome, tempos in etapas.items() if tempos},
+        }
+
+    def _regressoes(self, atual, baseline, tolerancia):
+        regressoes = []
+        if atual['corpus'] == baseline.get('corpus'):
+            for campo, acerto in baseline['acerto'].items():
+                if atual['acerto'].get(campo, 0) < acerto:
+                    regressoes.append(f"acerto de {campo}: {acerto:.2%} -> {atual['acerto'].get(campo, 0):.2%}")
+        else:
+            self.stdout.write(self.style.WARNING("Corpus diferente do baseline: acerto não comparado."))
+
+        for nome, base in baseline['etapas'].items():
+            medido = atual['etapas'].get(nome)
+            if medido is None or (nome == 'extracao_pdf' and atual['backend_pdf'] != baseline.get('backend_pdf')):
+                continue
+            if medido['docs_por_segundo'] < base['docs_por_segundo'] * (1 - tolerancia):
+                regressoes.append(f"{nome}: {base['docs_por_segundo']} -> {medido['docs_por_segundo']} docs/s")
+            if medido['p95_ms'] > base['p95_ms'] * (1 + tolerancia):
+                regressoes.append(f"{nome}: p95 {base['p95_ms']} -> {medido['p95_ms']} ms")
+        return regressoes
+
+    def handle(self, *args, **opts):
+        formatos = tuple(f for f in opts['formatos'].split(',') if f)
+        casos = tc_corpus.gerar_corpus(opts['quantidade'], opts['semente'], formatos)
+        if opts['exportar']:
+            os.makedirs(opts['exportar'], exist_ok=True)
+            for caso in casos:
+                with open(os.path.join(opts['exportar'], caso['nome']), 'wb') as f:
+                    f.write(caso['conteudo'])
+
+        backends = [nome for nome in tc_parser.BACKENDS_PDF if tc_parser.backend_disponivel(nome)]
+        atual = {
+            'corpus': {'quantidade': opts['quantidade'], 'semente': opts['semente'], 'formatos': list(formatos),
+                       'versao_parser': tc_parser.VERSAO_PARSER},
+            'backend_pdf': backends[0] if backends else None,
+            **self._medir(casos),
+        }
+
+        self.stdout.write(f"{len(casos)} documentos, backend de PDF {atual['backend_pdf']}")
+        for campo, acerto in atual['acerto'].items():
+            self.stdout.write(f"  {campo:20s} {acerto:8.2%}")
+        self.stdout.write(f"  {'documentos perfeitos':20s} {atual['documentos_perfeitos']:8.2%}")
+        for nome, etapa in atual['etapas'].items():
+            self.stdout.write(f"  {nome:14s} {etapa['docs_por_segundo']:9.1f} docs/s"
+                              f"  p50 {etapa['p50_ms']:8.3f} ms  p95 {etapa['p95_ms']:8.3f} ms")
+
+        if opts['salvar_baseline']:
+            os.makedirs(os.path.dirname(opts['baseline']), exist_ok=True)
+            with open(opts['baseline'], 'w', encoding='utf-8') as f:
+                json.dump(atual, f, ensure_ascii=False, indent=2)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline gravado em {opts['baseline']}"))
+            return
+
+        if not os.path.exists(opts['baseline']):
+            raise CommandError(f"Sem baseline em {opts['baseline']}; rode com --salvar-baseline.")
+        with open(opts['baseline'], encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressoes = self._regressoes(atual, baseline, opts['tolerancia'])
+        if regressoes:
+            raise CommandError("Regressão em relação ao baseline:\n  " + "\n  ".join(regressoes))
+        self.stdout.write(self.style.SUCCESS("Sem regressão em relação ao baseline."))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import documentos_pacote
+
+
+class Command(BaseCommand):
+    help = "Gera num único arquivo (PDF ou ZIP) as capas e a certidão dos lotes de uma caixa ou semestre."
+
+    def add_arguments(self, parser):
+        parser.add_argument('saida', help="Arquivo de saída (.pdf ou .zip)")
+        parser.add_argument('--caixa', type=int, help="Id da caixa de incineração")
+        parser.add_argument('--ano', type=int)
+        parser.add_argument('--semestre', type=int, choices=[1, 2])
+        parser.add_argument('--lote', type=int, action='append', dest='lotes', help="Id de lote (repetível)")
+        parser.add_argument('--documento', action='append', dest='documentos',
+                            choices=documentos_pacote.DOCUMENTOS_PACOTE,
+                            help="Documentos do pacote (padrão: todos)")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processos simultâneos (padrão: settings.DOCUMENTOS_WORKERS)")
+
+    def handle(self, *args, **opts):
+        if not (opts['caixa'] or opts['lotes'] or (opts['ano'] and opts['semestre'])):
+            raise CommandError("Informe --caixa, --ano e --semestre, ou --lote.")
+        lote_ids = documentos_pacote.selecionar_lotes(
+            caixa_id=opts['caixa'], ano=opts['ano'], semestre=opts['semestre'], lote_ids=opts['lotes'])
+        if not lote_ids:
+            raise CommandError("Nenhum lote encontrado.")
+
+        formato = 'zip' if opts['saida'].lower().endswith('.zip') else 'pdf'
+        inicio = time.perf_counter()
+        with open(opts['saida'], 'wb') as destino:
+            pecas = documentos_pacote.gerar_pacote(
+                lote_ids, destino, documentos=opts['documentos'] or documentos_pacote.DOCUMENTOS_PACOTE,
+                formato=formato, max_workers=opts['workers'])
+        self.stdout.write(
+            f"{len(lote_ids)} lote(s), {pecas} documento(s) em {time.perf_counter() - inicio:.1f} s -> {opts['saida']}")
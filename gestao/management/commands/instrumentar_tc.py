@@ -0,0 +1,62 @@
+"""
+Lê TCs com a instrumentação do tc_parser ligada e mostra, por campo, a taxa
+de acerto, qual alternativa casou e o tempo médio/p95. Os TCs vêm dos
+arquivos indicados (PDF/DOCX) ou do corpus sintético (tc_corpus).
+
+A instrumentação do servidor fica no processo dele (TC_INSTRUMENTACAO=1,
+api/ler_tc/instrumentacao/); este comando mede num processo próprio.
+"""
+import json
+import os
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestao import tc_corpus, tc_parser
+
+
+class Command(BaseCommand):
+    help = "Instrumentação do tc_parser por campo (tempo e alternativa que casou) em TCs reais ou sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivos', nargs='*', help="PDFs/DOCX de TCs (sem arquivos, usa o corpus sintético)")
+        parser.add_argument('--corpus', type=int, default=100, help="TCs do corpus sintético")
+        parser.add_argument('--json', action='store_true', help="Imprime o resumo em JSON")
+
+    def _textos(self, opts):
+        if not opts['arquivos']:
+            rng = random.Random(2025)
+            return [tc_corpus.gerar_tc(rng)[0] for _ in range(opts['corpus'])]
+        textos = []
+        for caminho in opts['arquivos']:
+            if not os.path.isfile(caminho):
+                raise CommandError(f"Arquivo não encontrado: {caminho}")
+            with open(caminho, 'rb') as f:
+                conteudo = f.read()
+            nome = caminho.lower()
+            if nome.endswith('.pdf'):
+                textos.append(tc_parser.extrair_texto_pdf(conteudo))
+            elif nome.endswith('.docx'):
+                textos.append(tc_parser.extrair_texto_docx(conteudo))
+            else:
+                raise CommandError(f"Formato não suportado: {caminho}")
+        return textos
+
+    def handle(self, *args, **opts):
+        textos = self._textos(opts)
+        tc_parser.ativar_instrumentacao(len(textos))
+        try:
+            for texto in textos:
+                tc_parser.parsear_tc(texto)
+            resumo = tc_parser.resumo_instrumentacao()
+        finally:
+            tc_parser.desativar_instrumentacao()
+
+        if opts['json']:
+            self.stdout.write(json.dumps(resumo, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(f"{resumo['documentos']} TCs, {resumo['ms_medio']} ms em média, p95 {resumo['ms_p95']} ms")
+        for campo, dados in resumo['campos'].items():
+            alternativas = ', '.join(f"{nome} {n}" for nome, n in dados['alternativas'].items()) or '-'
+            self.stdout.write(f"  {campo:20s} {dados['taxa_acerto']:7.1%}  {dados['ms_medio']:7.3f} ms"
+                              f"  p95 {dados['ms_p95']:7.3f} ms  {alternativas}")
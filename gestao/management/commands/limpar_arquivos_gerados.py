@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from gestao import arquivos_gerados
+
+
+class Command(BaseCommand):
+    help = ("Aplica a retenção dos PDFs arquivados em MEDIA_ROOT: cataloga o que mudou no disco, "
+            "apaga os vencidos por categoria e os mais antigos acima do teto de tamanho.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help="Só mostra o que seria apagado")
+        parser.add_argument('--completo', action='store_true',
+                            help="Relista todas as pastas, mesmo as que não mudaram desde a última execução")
+
+    def handle(self, *args, **opts):
+        relistadas, novos, removidos = arquivos_gerados.varrer(completo=opts['completo'])
+        self.stdout.write(f"Varredura: {relistadas} pasta(s) relistada(s), {novos} arquivo(s) catalogado(s), "
+                          f"{removidos} registro(s) sem arquivo removido(s).")
+
+        vencidos, por_tamanho, liberados = arquivos_gerados.limpar(simular=opts['simular'])
+        verbo = "seriam apagados" if opts['simular'] else "apagados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{vencidos} vencido(s) e {por_tamanho} acima do teto {verbo} ({liberados / 2**20:.1f} MB)."))
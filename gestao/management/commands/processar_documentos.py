@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from gestao import tarefas_documentos
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de documentos (TarefaDocumento). Rode uma instância por servidor."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Processos simultâneos (padrão: settings.DOCUMENTOS_WORKERS)")
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos entre consultas à fila quando ociosa")
+        parser.add_argument('--uma-vez', action='store_true',
+                            help="Processa o que estiver na fila e termina (para cron/agendador)")
+
+    def handle(self, *args, **opts):
+        self.stdout.write("Worker de documentos iniciado.")
+        try:
+            tarefas_documentos.processar_fila(
+                max_workers=opts['workers'], intervalo=opts['intervalo'], uma_vez=opts['uma_vez'])
+        except KeyboardInterrupt:
+            self.stdout.write("Worker encerrado.")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from gestao import outbox
+
+
+class Command(BaseCommand):
+    help = "Worker do outbox (EventoOutbox): lotes automáticos e outros trabalhos pedidos pelas requisições."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help="Segundos entre consultas ao outbox quando ocioso")
+        parser.add_argument('--uma-vez', action='store_true',
+                            help="Processa o que estiver no outbox e termina (para cron/agendador)")
+
+    def handle(self, *args, **opts):
+        self.stdout.write("Worker do outbox iniciado.")
+        try:
+            n = outbox.processar_outbox(intervalo=opts['intervalo'], uma_vez=opts['uma_vez'])
+            self.stdout.write(f"{n} evento(s) processado(s).")
+        except KeyboardInterrupt:
+            self.stdout.write("Worker encerrado.")
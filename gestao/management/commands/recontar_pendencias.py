@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from gestao.models import ProcessoPendente
+
+
+class Command(BaseCommand):
+    help = ("Reconta ProcessoPendente a partir dos materiais (entorpecente AUTORIZADO sem lote). "
+            "Use depois de alterar materiais por QuerySet.update(), bulk_update() ou QuerySet.delete().")
+
+    def handle(self, *args, **opts):
+        corrigidas = ProcessoPendente.recontar()
+        self.stdout.write(self.style.SUCCESS(f"{corrigidas} ocorrência(s) com a contagem corrigida."))
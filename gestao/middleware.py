@@ -0,0 +1,37 @@
+"""
+middleware.py — Middlewares próprios do projeto.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class WhiteNoiseAssincrono(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware que também roda em modo assíncrono. O original é só
+    síncrono e, no meio da pilha, faz o Django atender sob ASGI toda requisição
+    (até as das views assíncronas, como api_ler_tc) na thread única das views
+    síncronas: um upload demorado segurava as páginas de todo mundo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.5 on 2026-10-17 17:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0011_alter_material_substancia_alter_ocorrencia_vara'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('ultima_alteracao', models.DateTimeField(auto_now=True)),
+                ('tipo', models.CharField(choices=[('CAPA_LOTE', 'Capa do Lote'), ('CAPAS_COLETIVAS', 'Capas de Lotes (Landscape)'), ('CERTIDAO_ANTECIPADA', 'Certidão de Incineração Antecipada'), ('CERTIDAO_COLETIVA', 'Certidão de Incineração Coletiva'), ('RELATORIO', 'Relatório Filtrado')], max_length=30)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na Fila'), ('PROCESSANDO', 'Em Processamento'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=20)),
+                ('progresso', models.PositiveSmallIntegerField(default=0)),
+                ('arquivo', models.CharField(blank=True, help_text='Caminho relativo ao MEDIA_ROOT', max_length=255, null=True)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('criado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_criado', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Documento',
+                'verbose_name_plural': 'Tarefas de Documentos',
+                'ordering': ['data_criacao'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.5 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0012_tarefadocumento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefadocumento',
+            name='tipo',
+            field=models.CharField(choices=[('CAPA_LOTE', 'Capa do Lote'), ('CAPAS_COLETIVAS', 'Capas de Lotes (Landscape)'), ('CERTIDAO_ANTECIPADA', 'Certidão de Incineração Antecipada'), ('CERTIDAO_COLETIVA', 'Certidão de Incineração Coletiva'), ('RELATORIO', 'Relatório Filtrado'), ('PACOTE', 'Pacote de Documentos de Lotes')], max_length=30),
+        ),
+    ]
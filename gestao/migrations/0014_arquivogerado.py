@@ -0,0 +1,32 @@
+# Generated by Django 5.0.5 on 2026-10-17 19:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0013_tarefadocumento_pacote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoGerado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caminho', models.CharField(help_text='Caminho relativo ao MEDIA_ROOT', max_length=255, unique=True)),
+                ('categoria', models.CharField(choices=[('recibos/entrada', 'Recibo de Entrada'), ('recibos/entrega_unica', 'Recibo de Entrega/Devolução'), ('oficios', 'Ofício de Remessa'), ('lotes/capas', 'Capa de Lote'), ('incineracao', 'Certidão de Incineração'), ('relatorios', 'Relatório'), ('tarefas', 'Documento da Fila')], db_index=True, max_length=30)),
+                ('tamanho', models.PositiveBigIntegerField(default=0)),
+                ('gerado_em', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('origem_tipo', models.CharField(blank=True, choices=[('OCORRENCIA', 'Ocorrência'), ('MATERIAL', 'Material'), ('LOTE', 'Lote de Incineração'), ('TAREFA', 'Tarefa de Documento')], max_length=20, null=True)),
+                ('origem_ids', models.JSONField(blank=True, default=list)),
+                ('protegido', models.BooleanField(default=False, help_text='Registro legal: nunca é apagado pela retenção')),
+            ],
+            options={
+                'verbose_name': 'Arquivo Gerado',
+                'verbose_name_plural': 'Arquivos Gerados',
+                'ordering': ['gerado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.5 on 2026-10-17 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0014_arquivogerado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocorrencia',
+            name='processo_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=30, null=True),
+        ),
+    ]
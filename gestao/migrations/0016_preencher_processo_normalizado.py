@@ -0,0 +1,47 @@
+"""
+Preenche Ocorrencia.processo_normalizado (só os dígitos do processo) antes
+do índice único. Quando o mesmo processo foi cadastrado mais de uma vez
+(com e sem pontuação), só a ocorrência mais antiga recebe a chave; as
+outras ficam sem ela e continuam acessíveis pelo BOU e pelo processo
+digitado. Ocorrencia.save() só recalcula a chave quando o processo muda,
+então essas repetidas continuam podendo ser editadas.
+"""
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+
+def normalizar(processo):
+    digitos = ''.join(c for c in (processo or '') if c.isdigit())
+    return digitos or None
+
+
+def preencher(apps, schema_editor):
+    Ocorrencia = apps.get_model('gestao', 'Ocorrencia')
+    vistos, alterar, repetidos = set(), [], []
+    for id_, bou, processo in Ocorrencia.objects.order_by('id').values_list('id', 'bou', 'processo').iterator():
+        chave = normalizar(processo)
+        if chave is None:
+            continue
+        if chave in vistos:
+            repetidos.append(bou)
+            continue
+        vistos.add(chave)
+        alterar.append(Ocorrencia(id=id_, processo_normalizado=chave))
+    Ocorrencia.objects.bulk_update(alterar, ['processo_normalizado'], batch_size=500)
+    if repetidos:
+        logger.warning(f"{len(repetidos)} ocorrência(s) com processo repetido ficaram sem chave normalizada: "
+                       f"{', '.join(repetidos[:20])}{' ...' if len(repetidos) > 20 else ''}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0015_ocorrencia_processo_normalizado'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher, migrations.RunPython.noop),
+    ]
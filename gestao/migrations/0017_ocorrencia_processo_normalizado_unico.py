@@ -0,0 +1,17 @@
+# Generated by Django 5.0.5 on 2026-10-17 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0016_preencher_processo_normalizado'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ocorrencia',
+            constraint=models.UniqueConstraint(condition=models.Q(('processo_normalizado__isnull', False)), fields=('processo_normalizado',), name='ocorrencia_processo_normalizado_unico'),
+        ),
+    ]
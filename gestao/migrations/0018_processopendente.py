@@ -0,0 +1,26 @@
+# Generated by Django 5.0.5 on 2026-10-17 20:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0017_ocorrencia_processo_normalizado_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessoPendente',
+            fields=[
+                ('ocorrencia', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pendencia', serialize=False, to='gestao.ocorrencia')),
+                ('materiais', models.IntegerField(default=0)),
+                ('desde', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Processo Pendente de Lote',
+                'verbose_name_plural': 'Processos Pendentes de Lote',
+            },
+        ),
+    ]
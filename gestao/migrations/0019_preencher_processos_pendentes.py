@@ -0,0 +1,28 @@
+"""
+Preenche ProcessoPendente com as ocorrências que já têm entorpecente
+AUTORIZADO sem lote. "desde" fica com o material pendente mais antigo.
+"""
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def preencher(apps, schema_editor):
+    Material = apps.get_model('gestao', 'Material')
+    ProcessoPendente = apps.get_model('gestao', 'ProcessoPendente')
+    pendentes = (Material.objects.filter(status='AUTORIZADO', categoria='ENTORPECENTE', lote__isnull=True)
+                 .values('noticiado__ocorrencia').annotate(n=Count('id'), desde=Min('data_criacao')))
+    ProcessoPendente.objects.bulk_create([
+        ProcessoPendente(ocorrencia_id=p['noticiado__ocorrencia'], materiais=p['n'], desde=p['desde'])
+        for p in pendentes
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0018_processopendente'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.5 on 2026-10-17 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0019_preencher_processos_pendentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('LOTE_AUTOMATICO', 'Lote Automático de Incineração')], max_length=30)),
+                ('chave', models.CharField(max_length=100)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Em Processamento'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=20)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('reservado_ate', models.DateTimeField(blank=True, null=True)),
+                ('resultado', models.TextField(blank=True, null=True)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento do Outbox',
+                'verbose_name_plural': 'Eventos do Outbox',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventooutbox',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDENTE')), fields=('chave',), name='outbox_um_pendente_por_chave'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.5 on 2026-10-17 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0020_eventooutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='material',
+            name='status',
+            field=models.CharField(choices=[('RECEBIDO', 'Entrada no Cartório (Lacre Conferido)'), ('CONSTATAÇÃO', 'Processamento (Auto de Constatação Realizado)'), ('ARMAZENADO', 'Armazenamento (No Cofre)'), ('RETIRADO_PERICIA', 'Saída Temporária (Enviado para Perícia Externa)'), ('RETORNO_PERICIA', 'Retorno de Perícia (Re-armazenado)'), ('AUTORIZADO', 'Aguardando Incineração (Ordem Judicial)'), ('AGUARDANDO_INCINERACAO', 'Em Lote de Incineração (Aguardando Queima)'), ('TRANSPORTE', 'Em Transporte (Para Destruição)'), ('INCINERADO', 'Fim de Custódia (Incinerado)'), ('AGUARDANDO_OFICIO', 'Aguardando Geração de Ofício (Materiais Gerais)'), ('OFICIO_GERADO', 'Ofício Gerado (Aguardando Transporte)'), ('EM_TRANSPORTE_FORUM', 'Em Transporte (Para o Fórum)'), ('ENTREGUE_AO_JUDICIARIO', 'Entregue ao Judiciário (Fórum / Recibo Anexado)'), ('AGUARDANDO_GUIA', 'Aguardando Guia de Depósito (Dinheiro)'), ('GUIA_GERADA', 'Guia Gerada (Aguardando Depósito)'), ('DEPOSITADO_JUDICIALMENTE', 'Depositado (Comprovante Anexado)')], db_index=True, default='RECEBIDO', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='registrohistorico',
+            name='status_na_epoca',
+            field=models.CharField(choices=[('RECEBIDO', 'Entrada no Cartório (Lacre Conferido)'), ('CONSTATAÇÃO', 'Processamento (Auto de Constatação Realizado)'), ('ARMAZENADO', 'Armazenamento (No Cofre)'), ('RETIRADO_PERICIA', 'Saída Temporária (Enviado para Perícia Externa)'), ('RETORNO_PERICIA', 'Retorno de Perícia (Re-armazenado)'), ('AUTORIZADO', 'Aguardando Incineração (Ordem Judicial)'), ('AGUARDANDO_INCINERACAO', 'Em Lote de Incineração (Aguardando Queima)'), ('TRANSPORTE', 'Em Transporte (Para Destruição)'), ('INCINERADO', 'Fim de Custódia (Incinerado)'), ('AGUARDANDO_OFICIO', 'Aguardando Geração de Ofício (Materiais Gerais)'), ('OFICIO_GERADO', 'Ofício Gerado (Aguardando Transporte)'), ('EM_TRANSPORTE_FORUM', 'Em Transporte (Para o Fórum)'), ('ENTREGUE_AO_JUDICIARIO', 'Entregue ao Judiciário (Fórum / Recibo Anexado)'), ('AGUARDANDO_GUIA', 'Aguardando Guia de Depósito (Dinheiro)'), ('GUIA_GERADA', 'Guia Gerada (Aguardando Depósito)'), ('DEPOSITADO_JUDICIALMENTE', 'Depositado (Comprovante Anexado)')], max_length=50),
+        ),
+    ]
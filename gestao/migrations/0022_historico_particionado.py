@@ -0,0 +1,41 @@
+# Generated by Django 5.0.5 on 2026-10-17 20:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestao', '0021_status_aguardando_incineracao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoArquivado',
+            fields=[
+                ('ano', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('registros', models.PositiveIntegerField(default=0)),
+                ('arquivado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ano de Histórico Arquivado',
+                'verbose_name_plural': 'Anos de Histórico Arquivados',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='registrohistorico',
+            options={'verbose_name': 'Registro de Movimentação'},
+        ),
+        migrations.AlterField(
+            model_name='registrohistorico',
+            name='material',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='historico', to='gestao.material'),
+        ),
+        migrations.AddIndex(
+            model_name='registrohistorico',
+            index=models.Index(fields=['material', 'data_criacao'], name='historico_material_data'),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth.models import User
 from .constants import (
     DROGAS_CHOICES, UNIDADES_MEDIDA_CHOICES, VARA_CHOICES,
@@ -6,6 +9,25 @@ from .constants import (
     STATUS_CUSTODIA_CHOICES
 )
 
+def formatar_peso_material(categoria, peso_real, peso_estimado, unidade):
+    """ Peso de exibição de um material; usado pelo modelo e pelas linhas dos documentos PDF """
+    if categoria != 'ENTORPECENTE':
+        return "-"
+    valor = peso_real if peso_real is not None else peso_estimado
+    if not valor: return "0,000"
+    if unidade == 'UN': return f"{int(valor)} un"
+    def fmt(v): return f"{v:,.3f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    if unidade == 'KG': return f"{fmt(valor)} kg"
+    if valor >= 1000: return f"{fmt(valor / 1000)} kg"
+    return f"{fmt(valor)} g"
+
+
+def normalizar_processo(processo):
+    """ Só os dígitos do número do processo (CNJ com ou sem pontuação); None se não houver nenhum """
+    digitos = ''.join(c for c in (processo or '') if c.isdigit())
+    return digitos or None
+
+
 # --- MODELOS ---
 
 class DrogaConfig(models.Model):
@@ -115,6 +137,8 @@ class Ocorrencia(AuditoriaModel):
     bou = models.CharField(max_length=20, unique=True, verbose_name="BOU")
     vara = models.CharField(max_length=20, choices=VARA_CHOICES, db_index=True)
     processo = models.CharField(max_length=30, null=True, blank=True, verbose_name="PROJUDI")
+    # Chave das buscas por processo: só dígitos, preenchida no save() (ver normalizar_processo)
+    processo_normalizado = models.CharField(max_length=30, null=True, blank=True, editable=False)
     
     policial_nome = models.CharField(max_length=100, blank=True, null=True)
     policial_graduacao = models.CharField(max_length=50, blank=True, null=True)
@@ -129,10 +153,45 @@ class Ocorrencia(AuditoriaModel):
     data_registro_bou = models.DateField(null=True, blank=True, verbose_name="Data do Fato (BOU)", db_index=True)
     observacao = models.TextField(blank=True, null=True, verbose_name="Observações de Conferência / Erros BOU")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['processo_normalizado'], condition=models.Q(processo_normalizado__isnull=False),
+                                    name='ocorrencia_processo_normalizado_unico'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._fotografar_processo()
+        return instance
+
+    def _fotografar_processo(self):
+        if 'processo' in self.__dict__:
+            self._processo_carregado = self.processo
+
+    def _processo_mudou(self):
+        if 'processo' not in self.__dict__:
+            return False
+        return not hasattr(self, '_processo_carregado') or self.processo != self._processo_carregado
+
     def save(self, *args, **kwargs):
         if self.policial_nome: 
             self.policial_nome = self.policial_nome.upper()
+        # A chave só é recalculada quando o processo muda: as ocorrências com processo
+        # repetido que a migração 0016 deixou sem chave continuam editáveis
+        if self._processo_mudou():
+            self.processo_normalizado = normalizar_processo(self.processo)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'processo' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'processo_normalizado'}
         super().save(*args, **kwargs)
+        self._fotografar_processo()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        fields = kwargs.get('fields')
+        if fields is None or 'processo' in fields:
+            self._fotografar_processo()
         
     def get_unidade_origem_display(self):
         return self.unidade_origem or "Indefinida"
@@ -188,10 +247,39 @@ class Material(AuditoriaModel):
     eprotocolo_geral = models.CharField(max_length=50, blank=True, null=True, verbose_name="Nº Ofício/EProtocolo")
     observacao_material = models.TextField(blank=True, null=True, verbose_name="Observação do Item")
     
+    # Campos cujo valor lido do banco fica guardado (from_db) para campos_alterados()
+    CAMPOS_RASTREADOS = ('status', 'categoria', 'lote_id', 'noticiado_id')
+
     class Meta:
         verbose_name = "Material"
         verbose_name_plural = "Materiais"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._fotografar(cls.CAMPOS_RASTREADOS)
+        return instance
+
+    def _fotografar(self, campos):
+        # Só o que já está carregado: ler um campo adiado faria uma consulta
+        carregado = getattr(self, '_carregado', {})
+        carregado.update({campo: self.__dict__[campo] for campo in campos if campo in self.__dict__})
+        self._carregado = carregado
+
+    def valor_carregado(self, campo):
+        """ Valor do campo rastreado na última leitura ou gravação (None se o material é novo) """
+        return getattr(self, '_carregado', {}).get(campo)
+
+    def campos_alterados(self):
+        """
+        Campos de CAMPOS_RASTREADOS que mudaram desde a última leitura ou
+        gravação, sem consultar o banco. Num material ainda não salvo, todos.
+        """
+        carregado = getattr(self, '_carregado', None)
+        if carregado is None:
+            return set(self.CAMPOS_RASTREADOS)
+        return {campo for campo, valor in carregado.items() if self.__dict__.get(campo) != valor}
+
     @property
     def vara(self):
         return self.noticiado.ocorrencia.vara
@@ -207,21 +295,60 @@ class Material(AuditoriaModel):
     def get_unidade_display(self):
         return self.unidade or ""
 
+    @staticmethod
+    def _noticiado_aguardando_lote(valores):
+        if (valores.get('status') == 'AUTORIZADO' and valores.get('categoria') == 'ENTORPECENTE'
+                and 'lote_id' in valores and valores['lote_id'] is None):
+            return valores.get('noticiado_id')
+        return None
+
+    def _ajustar_pendencia(self, noticiado_id, delta):
+        if noticiado_id == self.noticiado_id and Material.noticiado.is_cached(self):
+            ProcessoPendente.ajustar(self.noticiado.ocorrencia_id, delta)
+        elif delta < 0:
+            # A baixa não precisa do id da ocorrência: um UPDATE só, pelo noticiado
+            ProcessoPendente.objects.filter(ocorrencia__noticiados=noticiado_id).update(
+                materiais=models.F('materiais') + delta)
+        else:
+            ProcessoPendente.ajustar(
+                Noticiado.objects.filter(pk=noticiado_id).values_list('ocorrencia_id', flat=True).first(), delta)
+
     def save(self, *args, **kwargs):
         if self.substancia == 'COLHEITA':
             self.unidade = 'UN'
+        update_fields = kwargs.get('update_fields')
+        gravados = (self.CAMPOS_RASTREADOS if update_fields is None
+                    else [self._meta.get_field(nome).attname for nome in update_fields])
+
+        # ProcessoPendente é ajustado antes do post_save, que já confere a contagem
+        carregado = getattr(self, '_carregado', {})
+        antes = self._noticiado_aguardando_lote(carregado)
+        depois = self._noticiado_aguardando_lote(
+            {**carregado, **{campo: self.__dict__.get(campo) for campo in gravados if campo in self.CAMPOS_RASTREADOS}})
+        if antes != depois:
+            if antes:
+                self._ajustar_pendencia(antes, -1)
+            if depois:
+                self._ajustar_pendencia(depois, 1)
+
         super().save(*args, **kwargs)
+        self._fotografar(gravados)
+
+    def delete(self, *args, **kwargs):
+        noticiado_id = self._noticiado_aguardando_lote(getattr(self, '_carregado', {}))
+        resultado = super().delete(*args, **kwargs)
+        if noticiado_id:
+            self._ajustar_pendencia(noticiado_id, -1)
+        return resultado
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        fields = kwargs.get('fields')
+        self._fotografar(self.CAMPOS_RASTREADOS if fields is None
+                         else [self._meta.get_field(nome).attname for nome in fields])
 
     def peso_formatado(self):
-        if self.categoria != 'ENTORPECENTE':
-            return "-"
-        valor = self.peso_real if self.peso_real is not None else self.peso_estimado
-        if not valor: return "0,000"
-        if self.unidade == 'UN': return f"{int(valor)} un"
-        def fmt(v): return f"{v:,.3f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-        if self.unidade == 'KG': return f"{fmt(valor)} kg"
-        if valor >= 1000: return f"{fmt(valor / 1000)} kg"
-        return f"{fmt(valor)} g"
+        return formatar_peso_material(self.categoria, self.peso_real, self.peso_estimado, self.unidade)
 
     def descricao_amigavel(self):
         if self.categoria == 'ENTORPECENTE':
@@ -235,20 +362,196 @@ class Material(AuditoriaModel):
         return f"{self.descricao_amigavel()} | Lacre: {self.numero_lacre}"
 
 
-class RegistroHistorico(AuditoriaModel):
-    """ Este é o coração da auditoria. Imutável. """
-    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='historico')
+class ProcessoPendente(models.Model):
+    """
+    Ocorrências com entorpecente AUTORIZADO ainda sem lote e quantos materiais
+    estão nessa situação. O gatilho do lote automático (lotes_automaticos)
+    conta estas linhas em vez de varrer os materiais. Linhas zeradas ficam até
+    o próximo lote automático.
+
+    A contagem acompanha Material.save(), Material.delete(),
+    custodia.transicionar() e a exclusão de Noticiado, Ocorrencia ou
+    LoteIncineracao (cascata e SET_NULL, pelos pre_delete abaixo).
+    QuerySet.update(), bulk_update() e QuerySet.delete() de Material fora
+    desses caminhos não passam por ela: depois deles, manage.py
+    recontar_pendencias (recontar()) corrige as linhas.
+    """
+    ocorrencia = models.OneToOneField(Ocorrencia, on_delete=models.CASCADE, primary_key=True, related_name='pendencia')
+    materiais = models.IntegerField(default=0)
+    desde = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Processo Pendente de Lote"
+        verbose_name_plural = "Processos Pendentes de Lote"
+
+    @classmethod
+    def quantidade(cls):
+        """ Processos distintos com material aguardando lote """
+        return cls.objects.filter(materiais__gt=0).count()
+
+    @classmethod
+    def ajustar(cls, ocorrencia_id, delta):
+        if ocorrencia_id is None:
+            return
+        if delta > 0:
+            cls.objects.bulk_create([cls(ocorrencia_id=ocorrencia_id)], ignore_conflicts=True)
+        cls.objects.filter(ocorrencia_id=ocorrencia_id).update(materiais=models.F('materiais') + delta)
+
+    @classmethod
+    def ajustar_varios(cls, deltas):
+        """ ajustar() de várias ocorrências ({ocorrencia_id: delta}) num UPDATE só """
+        deltas = {ocorrencia_id: delta for ocorrencia_id, delta in deltas.items() if ocorrencia_id is not None and delta}
+        if not deltas:
+            return
+        novos = [cls(ocorrencia_id=ocorrencia_id) for ocorrencia_id, delta in deltas.items() if delta > 0]
+        if novos:
+            cls.objects.bulk_create(novos, ignore_conflicts=True)
+        cls.objects.filter(ocorrencia_id__in=deltas).update(materiais=models.Case(
+            *[models.When(ocorrencia_id=ocorrencia_id, then=models.F('materiais') + delta)
+              for ocorrencia_id, delta in deltas.items()],
+            default=models.F('materiais')))
+
+    @staticmethod
+    def materiais_pendentes():
+        return Material.objects.filter(status='AUTORIZADO', categoria='ENTORPECENTE', lote__isnull=True)
+
+    @classmethod
+    def recontar(cls):
+        """ Acerta as linhas pela contagem real dos materiais; devolve quantas ocorrências mudaram """
+        reais = dict(cls.materiais_pendentes().order_by().values_list('noticiado__ocorrencia')
+                     .annotate(n=models.Count('id')))
+        atuais = dict(cls.objects.values_list('ocorrencia_id', 'materiais'))
+        deltas = {ocorrencia_id: reais.get(ocorrencia_id, 0) - atuais.get(ocorrencia_id, 0)
+                  for ocorrencia_id in {*reais, *atuais}}
+        cls.ajustar_varios(deltas)
+        return sum(1 for delta in deltas.values() if delta)
+
+    def __str__(self):
+        return f"{self.ocorrencia_id}: {self.materiais} material(is) aguardando lote"
+
+
+# A cascata e o SET_NULL apagam/alteram os materiais sem passar por Material.delete()/save()
+
+@receiver(pre_delete, sender=Noticiado)
+def _baixar_pendencias_do_noticiado(sender, instance, **kwargs):
+    pendentes = ProcessoPendente.materiais_pendentes().filter(noticiado=instance).count()
+    if pendentes:
+        ProcessoPendente.ajustar(instance.ocorrencia_id, -pendentes)
+
+
+@receiver(pre_delete, sender=LoteIncineracao)
+def _devolver_pendencias_do_lote(sender, instance, **kwargs):
+    # Os materiais AUTORIZADO do lote voltam a ficar sem lote
+    ProcessoPendente.ajustar_varios(dict(
+        Material.objects.filter(lote=instance, status='AUTORIZADO', categoria='ENTORPECENTE')
+        .order_by().values_list('noticiado__ocorrencia').annotate(n=models.Count('id'))))
+
+
+class HistoricoArquivado(models.Model):
+    """
+    Ano do histórico já tirado da tabela quente para a tabela de arquivo
+    daquele ano (manage.py arquivar_historico). É o que HistoricoManager.entre()
+    consulta para saber quais tabelas de arquivo um período alcança.
+    """
+    ano = models.PositiveIntegerField(primary_key=True)
+    registros = models.PositiveIntegerField(default=0)
+    arquivado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Ano de Histórico Arquivado"
+        verbose_name_plural = "Anos de Histórico Arquivados"
+
+    def __str__(self):
+        return f"{self.ano}: {self.registros} registro(s)"
+
+
+class RegistroHistoricoBase(AuditoriaModel):
+    """ Campos comuns à tabela quente do histórico e às tabelas de arquivo anuais """
     status_na_epoca = models.CharField(max_length=50, choices=STATUS_CUSTODIA_CHOICES)
     observacao = models.TextField(blank=True, null=True, help_text="Descreva: 'Droga guardada no cofre', 'Retirada para pesagem real', etc.")
 
     class Meta:
-        verbose_name = "Registro de Movimentação"
-        ordering = ['-data_criacao']
+        abstract = True
 
     def __str__(self):
         return f"{self.material.numero_lacre} - {self.status_na_epoca}"
 
 
+def _ano_local(momento):
+    return timezone.localtime(momento).year if timezone.is_aware(momento) else momento.year
+
+
+class HistoricoManager(models.Manager):
+    def entre(self, inicio=None, fim=None, **filtros):
+        """
+        Registros de [inicio, fim) (None: sem limite) que satisfazem `filtros`,
+        da tabela quente e das tabelas de arquivo dos anos que o período
+        alcança, do mais recente ao mais antigo. Devolve uma lista: as partes
+        vêm de tabelas diferentes e não se juntam num QuerySet.
+        """
+        periodo = {}
+        anos = HistoricoArquivado.objects.all()
+        if inicio is not None:
+            periodo['data_criacao__gte'] = inicio
+            anos = anos.filter(ano__gte=_ano_local(inicio))
+        if fim is not None:
+            periodo['data_criacao__lt'] = fim
+            anos = anos.filter(ano__lte=_ano_local(fim))
+
+        partes = [self.filter(**periodo, **filtros)]
+        partes += [modelo_arquivo_historico(ano).objects.filter(**periodo, **filtros)
+                   for ano in anos.values_list('ano', flat=True)]
+        registros = [registro for parte in partes for registro in parte.select_related('criado_por')]
+        registros.sort(key=lambda registro: (registro.data_criacao, registro.id), reverse=True)
+        return registros
+
+
+class RegistroHistorico(RegistroHistoricoBase):
+    """
+    Este é o coração da auditoria. Imutável. Esta é a tabela quente: os anos
+    encerrados vão para as tabelas de arquivo (modelo_arquivo_historico) e as
+    telas só leem daqui, a não ser que peçam o arquivo (objects.entre()).
+    """
+    # O índice composto abaixo começa pelo material e já serve aos filtros só por ele
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, related_name='historico', db_index=False)
+
+    objects = HistoricoManager()
+
+    class Meta:
+        verbose_name = "Registro de Movimentação"
+        # Sem ordering padrão: quem precisa de ordem (linha do tempo, últimos registros) pede
+        indexes = [models.Index(fields=['material', 'data_criacao'], name='historico_material_data')]
+
+
+# ano -> modelo da tabela de arquivo, criado uma vez por processo
+_MODELOS_ARQUIVO = {}
+
+
+def modelo_arquivo_historico(ano):
+    """
+    Modelo da tabela de arquivo do histórico de `ano` (gestao_registrohistorico_<ano>).
+    Não é gerenciado pelas migrations: a tabela é criada por arquivar_historico.
+    As chaves não têm constraint no banco nem CASCADE, para o arquivo
+    continuar intacto mesmo se o material ou o usuário sumirem.
+    """
+    modelo = _MODELOS_ARQUIVO.get(ano)
+    if modelo is None:
+        meta = type('Meta', (), {
+            'managed': False,
+            'db_table': f'gestao_registrohistorico_{ano}',
+            'verbose_name': f"Registro de Movimentação ({ano})",
+            'indexes': [models.Index(fields=['material', 'data_criacao'], name=f'historico_{ano}_material_data')],
+        })
+        modelo = type(f'RegistroHistorico{ano}', (RegistroHistoricoBase,), {
+            '__module__': __name__,
+            'Meta': meta,
+            'criado_por': models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+'),
+            'material': models.ForeignKey(Material, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'),
+        })
+        _MODELOS_ARQUIVO[ano] = modelo
+    return modelo
+
+
 class NaturezaPenal(models.Model):
     nome = models.CharField(max_length=255, unique=True)
     tipo = models.CharField(max_length=20, choices=[('TC', 'Termo Circunstanciado'), ('IP', 'Inquérito Policial')])
@@ -279,4 +582,117 @@ class EquipePM(models.Model):
     def save(self, *args, **kwargs):
         self.nome = self.nome.upper()
         self.rg = self.rg.upper()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class TarefaDocumento(AuditoriaModel):
+    """ Documento pesado gerado fora da requisição pela fila local (tarefas_documentos). """
+    TIPO_CHOICES = [
+        ('CAPA_LOTE', 'Capa do Lote'),
+        ('CAPAS_COLETIVAS', 'Capas de Lotes (Landscape)'),
+        ('CERTIDAO_ANTECIPADA', 'Certidão de Incineração Antecipada'),
+        ('CERTIDAO_COLETIVA', 'Certidão de Incineração Coletiva'),
+        ('RELATORIO', 'Relatório Filtrado'),
+        ('PACOTE', 'Pacote de Documentos de Lotes'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Na Fila'),
+        ('PROCESSANDO', 'Em Processamento'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE', db_index=True)
+    progresso = models.PositiveSmallIntegerField(default=0)
+    arquivo = models.CharField(max_length=255, blank=True, null=True, help_text="Caminho relativo ao MEDIA_ROOT")
+    erro = models.TextField(blank=True, null=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tarefa de Documento"
+        verbose_name_plural = "Tarefas de Documentos"
+        ordering = ['data_criacao']
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} - {self.status}"
+
+
+class EventoOutbox(models.Model):
+    """
+    Trabalho pedido por uma mudança no banco, gravado na mesma transação dela
+    e feito depois pelo worker (outbox.py / manage.py processar_outbox).
+    Só pode haver um evento PENDENTE por chave, e o worker não pega um evento
+    enquanto outro da mesma chave está reservado.
+    """
+    TIPO_CHOICES = [
+        ('LOTE_AUTOMATICO', 'Lote Automático de Incineração'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Em Processamento'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES)
+    chave = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE', db_index=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    reservado_ate = models.DateTimeField(null=True, blank=True)
+    resultado = models.TextField(blank=True, null=True)
+    erro = models.TextField(blank=True, null=True)
+    data_criacao = models.DateTimeField(auto_now_add=True, db_index=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Evento do Outbox"
+        verbose_name_plural = "Eventos do Outbox"
+        constraints = [
+            models.UniqueConstraint(fields=['chave'], condition=models.Q(status='PENDENTE'),
+                                    name='outbox_um_pendente_por_chave'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.id} - {self.status}"
+
+
+class ArquivoGerado(models.Model):
+    """
+    Catálogo dos PDFs arquivados em MEDIA_ROOT pelos geradores de documentos,
+    usado pela retenção (arquivos_gerados / manage.py limpar_arquivos_gerados).
+    Uploads (recibos do fórum, comprovantes) não entram aqui e nunca são apagados.
+    """
+    CATEGORIA_CHOICES = [
+        ('recibos/entrada', 'Recibo de Entrada'),
+        ('recibos/entrega_unica', 'Recibo de Entrega/Devolução'),
+        ('oficios', 'Ofício de Remessa'),
+        ('lotes/capas', 'Capa de Lote'),
+        ('incineracao', 'Certidão de Incineração'),
+        ('relatorios', 'Relatório'),
+        ('tarefas', 'Documento da Fila'),
+    ]
+    ORIGEM_CHOICES = [
+        ('OCORRENCIA', 'Ocorrência'),
+        ('MATERIAL', 'Material'),
+        ('LOTE', 'Lote de Incineração'),
+        ('TAREFA', 'Tarefa de Documento'),
+    ]
+
+    caminho = models.CharField(max_length=255, unique=True, help_text="Caminho relativo ao MEDIA_ROOT")
+    categoria = models.CharField(max_length=30, choices=CATEGORIA_CHOICES, db_index=True)
+    tamanho = models.PositiveBigIntegerField(default=0)
+    gerado_em = models.DateTimeField(default=timezone.now, db_index=True)
+    origem_tipo = models.CharField(max_length=20, choices=ORIGEM_CHOICES, blank=True, null=True)
+    origem_ids = models.JSONField(default=list, blank=True)
+    protegido = models.BooleanField(default=False, help_text="Registro legal: nunca é apagado pela retenção")
+
+    class Meta:
+        verbose_name = "Arquivo Gerado"
+        verbose_name_plural = "Arquivos Gerados"
+        ordering = ['gerado_em']
+
+    def __str__(self):
+        return self.caminho
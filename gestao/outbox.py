@@ -0,0 +1,102 @@
+"""
+outbox.py — Outbox transacional: trabalho pedido dentro de uma requisição e
+feito depois, fora dela.
+
+registrar() grava um EventoOutbox na transação de quem pede, então o evento
+só existe se a mudança que o motivou foi gravada. `manage.py processar_outbox`
+reserva os eventos com um UPDATE condicional e um prazo (OUTBOX_RESERVA_SEGUNDOS):
+dois workers nunca pegam o mesmo evento nem dois eventos da mesma chave ao
+mesmo tempo, e um evento de um worker que caiu volta a ser pego quando o
+prazo vence. Os tratadores devem ser idempotentes (o evento pode rodar de novo).
+"""
+import importlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import EventoOutbox
+
+logger = logging.getLogger(__name__)
+
+# tipo -> 'modulo.funcao' que recebe o evento e devolve o texto do resultado
+TRATADORES = {
+    'LOTE_AUTOMATICO': 'gestao.lotes_automaticos.tratar_evento',
+}
+
+
+def _reserva():
+    return timedelta(seconds=getattr(settings, 'OUTBOX_RESERVA_SEGUNDOS', 300))
+
+
+def registrar(tipo, chave=None, parametros=None):
+    """
+    Pede o trabalho `tipo`. Se já houver um evento pendente com a mesma chave
+    (padrão: o próprio tipo), não cria outro. Chame dentro da transação da
+    mudança que motivou o pedido.
+    """
+    if tipo not in TRATADORES:
+        raise ValueError(f"Tipo de evento desconhecido: {tipo}")
+    EventoOutbox.objects.bulk_create(
+        [EventoOutbox(tipo=tipo, chave=chave or tipo, parametros=parametros or {})], ignore_conflicts=True)
+
+
+def _disponiveis(agora):
+    return Q(status='PENDENTE') | Q(status='PROCESSANDO', reservado_ate__lte=agora)
+
+
+def reservar_proximo():
+    """
+    Reserva o evento disponível mais antigo (pendente, ou reservado com o
+    prazo vencido) cuja chave não está reservada por outro worker.
+    """
+    agora = timezone.now()
+    ocupada = EventoOutbox.objects.filter(
+        chave=OuterRef('chave'), status='PROCESSANDO', reservado_ate__gt=agora).exclude(id=OuterRef('id'))
+    candidatos = (EventoOutbox.objects.filter(_disponiveis(agora)).order_by('data_criacao', 'id')
+                  .values_list('id', flat=True)[:10])
+    for evento_id in candidatos:
+        if EventoOutbox.objects.filter(_disponiveis(agora), ~Exists(ocupada), id=evento_id).update(
+                status='PROCESSANDO', reservado_ate=agora + _reserva(), tentativas=F('tentativas') + 1):
+            return evento_id
+    return None
+
+
+def processar_evento(evento_id):
+    """ Executa um evento já reservado. Devolve True se deu certo. """
+    evento = EventoOutbox.objects.get(id=evento_id)
+    modulo, funcao = TRATADORES[evento.tipo].rsplit('.', 1)
+    try:
+        with transaction.atomic():
+            resultado = getattr(importlib.import_module(modulo), funcao)(evento)
+    except Exception as e:
+        logger.exception(f"[OUTBOX] Evento {evento_id} ({evento.tipo}) falhou")
+        EventoOutbox.objects.filter(id=evento_id).update(
+            status='ERRO', erro=str(e)[:2000], reservado_ate=None, concluido_em=timezone.now())
+        return False
+
+    EventoOutbox.objects.filter(id=evento_id).update(
+        status='CONCLUIDO', resultado=resultado, reservado_ate=None, concluido_em=timezone.now())
+    logger.info(f"[OUTBOX] Evento {evento_id} ({evento.tipo}) concluído: {resultado}")
+    return True
+
+
+def processar_outbox(intervalo=2.0, uma_vez=False):
+    """
+    Laço do worker: processa um evento por vez. Com `uma_vez`, sai quando
+    não há mais evento disponível. Devolve quantos eventos processou.
+    """
+    processados = 0
+    while True:
+        evento_id = reservar_proximo()
+        if evento_id is None:
+            if uma_vez:
+                return processados
+            time.sleep(intervalo)
+            continue
+        processar_evento(evento_id)
+        processados += 1
@@ -0,0 +1,64 @@
+"""
+processos.py — Pool de processos para trabalho pesado fora da requisição.
+
+Os filhos são criados com 'spawn' (igual no Windows e no Linux) e não herdam
+conexões de banco do pai. Este módulo não importa nada do Django no topo,
+porque é ele que os filhos importam antes de o Django estar configurado;
+as funções executadas são referenciadas por caminho ('modulo.funcao') e só
+importadas depois do django.setup().
+"""
+import os
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def inicializar_django():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+
+def chamar(caminho, *args, **kwargs):
+    """Importa 'pacote.modulo.funcao' no processo filho e a executa."""
+    modulo, funcao = caminho.rsplit('.', 1)
+    return getattr(importlib.import_module(modulo), funcao)(*args, **kwargs)
+
+
+def inicializar(com_django, nice):
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+    if com_django:
+        inicializar_django()
+
+
+def novo_pool(max_workers, com_django=True, nice=0):
+    """
+    ProcessPoolExecutor com spawn. Com `com_django`, cada filho roda
+    django.setup() e pode usar o ORM (com conexão própria). `nice` baixa a
+    prioridade dos filhos no agendador (Unix), para o trabalho pesado ceder
+    a CPU ao servidor web quando os dois disputam os mesmos núcleos.
+    """
+    if com_django:
+        from django.db import connections
+        connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=inicializar,
+        initargs=(com_django, nice),
+    )
+
+
+def encerrar(pool):
+    """
+    Derruba o pool sem esperar: cancela o que está na fila e mata os filhos
+    que ainda estão rodando (ex.: travados numa tarefa que estourou o tempo).
+    """
+    filhos = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for processo in filhos:
+        if processo.is_alive():
+            processo.terminate()
+    for processo in filhos:
+        processo.join(5)
@@ -0,0 +1,198 @@
+"""
+tarefas_documentos.py — Fila local de geração de documentos pesados.
+
+As tarefas ficam na tabela TarefaDocumento (não há broker externo) e são
+executadas por `manage.py processar_documentos`, que mantém um pool de
+processos com concorrência limitada por settings.DOCUMENTOS_WORKERS.
+Uma tarefa em processamento sem sinal de vida há mais de
+DOCUMENTOS_RESERVA_SEGUNDOS (o worker dela caiu) volta para a fila.
+"""
+import os
+import time
+import logging
+from datetime import timedelta
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import arquivos_gerados, documentos_dados, documentos_services, documentos_pacote, processos
+from .models import TarefaDocumento, LoteIncineracao, Material
+
+logger = logging.getLogger(__name__)
+
+
+# ── CONSTRUTORES ──────────────────────────────────────────────────────────────
+# Cada construtor recebe (parametros, usuario, destino) e escreve o arquivo em destino
+# (PDF, ou ZIP quando parametros['formato'] == 'zip').
+
+def _lotes(parametros):
+    return LoteIncineracao.objects.filter(id__in=parametros['lote_ids']).order_by('identificador')
+
+
+def _capa_lote(parametros, usuario, destino):
+    lote = LoteIncineracao.objects.get(id=parametros['lote_id'])
+    documentos_services.gerar_capa_lote_pdf(lote, usuario, destino=destino)
+
+
+def _capas_coletivas(parametros, usuario, destino):
+    documentos_services.gerar_capas_lote_coletivas(parametros['lote_ids'], destino=destino)
+
+
+def _certidao_antecipada(parametros, usuario, destino):
+    documentos_services.gerar_certidao_incineracao_antecipada(_lotes(parametros), usuario, destino=destino)
+
+
+def _certidao_coletiva(parametros, usuario, destino):
+    documentos_services.gerar_certidao_incineracao_coletiva(_lotes(parametros), usuario, destino=destino)
+
+
+def _relatorio(parametros, usuario, destino):
+    filtros = parametros.get('filtros', {})
+    qs = documentos_dados.aplicar_filtros_material(
+        Material.objects.select_related('noticiado__ocorrencia'), filtros
+    ).order_by('noticiado__ocorrencia__data_registro_bou', 'id')
+    documentos_services.gerar_relatorio_filtrado_pdf(qs, filtros, parametros.get('tipo', 'inventario'), destino=destino)
+
+
+def _pacote(parametros, usuario, destino):
+    documentos_pacote.gerar_pacote(
+        parametros['lote_ids'], destino,
+        documentos=parametros.get('documentos') or documentos_pacote.DOCUMENTOS_PACOTE,
+        formato=parametros.get('formato', 'pdf'), usuario=usuario,
+    )
+
+
+CONSTRUTORES = {
+    'CAPA_LOTE': _capa_lote,
+    'CAPAS_COLETIVAS': _capas_coletivas,
+    'CERTIDAO_ANTECIPADA': _certidao_antecipada,
+    'CERTIDAO_COLETIVA': _certidao_coletiva,
+    'RELATORIO': _relatorio,
+    'PACOTE': _pacote,
+}
+
+
+# ── FILA ──────────────────────────────────────────────────────────────────────
+
+def enfileirar(tipo, parametros, usuario=None):
+    if tipo not in CONSTRUTORES:
+        raise ValueError(f"Tipo de documento desconhecido: {tipo}")
+    return TarefaDocumento.objects.create(tipo=tipo, parametros=parametros, criado_por=usuario)
+
+
+def _reserva():
+    return timedelta(seconds=getattr(settings, 'DOCUMENTOS_RESERVA_SEGUNDOS', 1800))
+
+
+def recuperar_interrompidas():
+    """
+    Devolve à fila as tarefas PROCESSANDO cuja reserva venceu (worker que caiu).
+    As de um worker vivo renovam a reserva (ultima_alteracao) ao avançar o
+    progresso e ficam onde estão.
+    """
+    n = TarefaDocumento.objects.filter(status='PROCESSANDO', ultima_alteracao__lt=timezone.now() - _reserva()).update(
+        status='PENDENTE', progresso=0, iniciado_em=None, ultima_alteracao=timezone.now())
+    if n:
+        logger.warning(f"[FILA DOC] {n} tarefa(s) interrompida(s) devolvida(s) à fila.")
+    return n
+
+
+def reservar_proxima():
+    """
+    Reserva a tarefa pendente mais antiga. O UPDATE condicional (status ainda
+    PENDENTE) garante que dois workers nunca peguem a mesma tarefa.
+    """
+    candidatas = TarefaDocumento.objects.filter(status='PENDENTE').order_by('data_criacao', 'id').values_list('id', flat=True)[:10]
+    for tarefa_id in candidatas:
+        agora = timezone.now()
+        if TarefaDocumento.objects.filter(id=tarefa_id, status='PENDENTE').update(
+                status='PROCESSANDO', progresso=0, iniciado_em=agora, ultima_alteracao=agora):
+            return tarefa_id
+    return None
+
+
+def executar_tarefa(tarefa_id):
+    """Executa uma tarefa já reservada. Roda dentro do processo do pool."""
+    tarefa = TarefaDocumento.objects.select_related('criado_por').get(id=tarefa_id)
+    extensao = 'zip' if tarefa.parametros.get('formato') == 'zip' else 'pdf'
+    relativo = f"tarefas/{tarefa.tipo.lower()}_{tarefa.id}.{extensao}"
+    caminho = os.path.join(settings.MEDIA_ROOT, relativo)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+    ultimo = {'pct': 0}
+
+    def progresso(pct):
+        # Limita as escritas no banco a saltos de 5%
+        if pct >= ultimo['pct'] + 5:
+            ultimo['pct'] = pct
+            TarefaDocumento.objects.filter(id=tarefa_id).update(progresso=pct, ultima_alteracao=timezone.now())
+
+    try:
+        with open(caminho, 'wb') as destino, documentos_services.acompanhar_progresso(progresso):
+            CONSTRUTORES[tarefa.tipo](tarefa.parametros, tarefa.criado_por, destino)
+    except Exception as e:
+        logger.exception(f"[FILA DOC] Tarefa {tarefa_id} falhou")
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        TarefaDocumento.objects.filter(id=tarefa_id).update(
+            status='ERRO', erro=str(e)[:2000], concluido_em=timezone.now())
+        return False
+
+    TarefaDocumento.objects.filter(id=tarefa_id).update(
+        status='CONCLUIDO', progresso=100, arquivo=relativo, concluido_em=timezone.now())
+    arquivos_gerados.registrar(relativo, 'TAREFA', [tarefa.id], protegido=tarefa.tipo == 'CERTIDAO_COLETIVA')
+    logger.info(f"[FILA DOC] Tarefa {tarefa_id} ({tarefa.tipo}) concluída: {relativo}")
+    return True
+
+
+def processar_fila(max_workers=None, intervalo=2.0, uma_vez=False):
+    """
+    Laço do worker: reserva tarefas enquanto houver vaga no pool e espera
+    terminarem. Com `uma_vez`, sai quando a fila esvazia. Se um processo filho
+    morrer, as tarefas dele são marcadas com erro e o pool é recriado.
+    """
+    max_workers = max_workers or getattr(settings, 'DOCUMENTOS_WORKERS', 2)
+    recuperar_interrompidas()
+
+    while True:
+        with processos.novo_pool(max_workers) as pool:
+            if _executar_no_pool(pool, max_workers, intervalo, uma_vez):
+                return
+
+
+def _executar_no_pool(pool, max_workers, intervalo, uma_vez):
+    """Devolve True quando a fila esvaziou (modo uma_vez), False se o pool quebrou."""
+    em_execucao = {}
+    while True:
+        while len(em_execucao) < max_workers:
+            tarefa_id = reservar_proxima()
+            if tarefa_id is None:
+                break
+            em_execucao[pool.submit(processos.chamar, 'gestao.tarefas_documentos.executar_tarefa', tarefa_id)] = tarefa_id
+
+        if not em_execucao:
+            if uma_vez:
+                return True
+            # Ocioso: aproveita para devolver as tarefas de workers que caíram
+            recuperar_interrompidas()
+            time.sleep(intervalo)
+            continue
+
+        feitos, _ = wait(list(em_execucao), timeout=intervalo, return_when=FIRST_COMPLETED)
+        quebrado = False
+        for futuro in feitos:
+            tarefa_id = em_execucao.pop(futuro)
+            erro = futuro.exception()
+            if erro is not None:
+                # Falha fora do construtor (ex.: processo filho morto)
+                logger.error(f"[FILA DOC] Tarefa {tarefa_id} abortada: {erro}")
+                TarefaDocumento.objects.filter(id=tarefa_id, status='PROCESSANDO').update(
+                    status='ERRO', erro=str(erro)[:2000], concluido_em=timezone.now())
+                quebrado = quebrado or isinstance(erro, BrokenProcessPool)
+        if quebrado:
+            # As demais tarefas do pool perdido voltam para a fila
+            TarefaDocumento.objects.filter(id__in=list(em_execucao.values()), status='PROCESSANDO').update(
+                status='PENDENTE', progresso=0, iniciado_em=None)
+            return False
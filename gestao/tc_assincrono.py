@@ -0,0 +1,162 @@
+"""
+tc_assincrono.py — Leitura de TC para as views assíncronas (ASGI).
+
+A extração e o parse não rodam no laço de eventos: vão para um pool de
+TC_ASSINCRONO_WORKERS processos, criado no primeiro uso e compartilhado pelas
+requisições deste processo do servidor, e o laço só espera o resultado enquanto
+continua atendendo as páginas. Com TC_ASSINCRONO_MAX_PENDENTES leituras já em
+andamento ou na fila, a próxima é recusada (Ocupado) em vez de alongar a fila.
+Com 0 workers, lê numa thread deste processo (desenvolvimento e testes).
+
+A fila fica deste lado: uma leitura só vai para o pool quando há um worker
+livre, e o tempo limite conta a partir daí. Assim, quem espera atrás de um
+TC lento não estoura o tempo, e o pool só é derrubado por uma leitura que
+de fato travou um worker.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import processos, tc_cache, tc_parser
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pendentes = 0
+_trava = threading.Lock()
+# Vagas no pool por laço de eventos (um só sob ASGI): (workers, asyncio.Semaphore)
+_vagas = weakref.WeakKeyDictionary()
+
+
+class Ocupado(Exception):
+    """ Leituras demais em andamento neste processo do servidor """
+
+
+def _workers():
+    return getattr(settings, 'TC_ASSINCRONO_WORKERS', 2)
+
+
+def _max_pendentes():
+    return getattr(settings, 'TC_ASSINCRONO_MAX_PENDENTES', 8)
+
+
+def _timeout():
+    return getattr(settings, 'TC_ASSINCRONO_TIMEOUT_SEGUNDOS', 60)
+
+
+def _nice():
+    return getattr(settings, 'TC_ASSINCRONO_NICE', 10)
+
+
+def _backends():
+    return getattr(settings, 'TC_BACKENDS_PDF', None)
+
+
+def _obter_pool():
+    global _pool
+    with _trava:
+        if _pool is None:
+            _pool = processos.novo_pool(_workers(), com_django=False, nice=_nice())
+        return _pool
+
+
+def descartar_pool(pool=None):
+    """
+    Derruba o pool (ou só `pool`, se ainda for o atual); o próximo uso cria
+    outro. As leituras que estavam nele terminam com BrokenProcessPool.
+    """
+    global _pool
+    with _trava:
+        if _pool is None or (pool is not None and pool is not _pool):
+            return
+        pool, _pool = _pool, None
+    processos.encerrar(pool)
+
+
+def _reservar():
+    global _pendentes
+    with _trava:
+        if _pendentes >= _max_pendentes():
+            raise Ocupado()
+        _pendentes += 1
+
+
+def _liberar():
+    global _pendentes
+    with _trava:
+        _pendentes -= 1
+
+
+def _vagas_do_laco():
+    laco = asyncio.get_running_loop()
+    with _trava:
+        workers, vagas = _vagas.get(laco, (None, None))
+        if workers != _workers():
+            vagas = asyncio.Semaphore(_workers())
+            _vagas[laco] = (_workers(), vagas)
+        return vagas
+
+
+async def _no_pool(rotulo, caminho_funcao, *args):
+    """
+    processos.chamar(caminho_funcao, *args) no pool, esperando um worker
+    livre antes de enviar; o tempo limite conta só a execução. `rotulo`
+    identifica a leitura no log.
+    """
+    async with _vagas_do_laco():
+        pool = _obter_pool()
+        futuro = asyncio.get_running_loop().run_in_executor(pool, processos.chamar, caminho_funcao, *args)
+        try:
+            return await asyncio.wait_for(futuro, _timeout())
+        except TimeoutError:
+            # A leitura estava num worker (havia vaga): só derrubando o pool ele é liberado
+            logger.warning(f"[TC ASGI] {rotulo} passou de {_timeout()}s")
+            descartar_pool(pool)
+            raise
+        except BrokenProcessPool:
+            descartar_pool(pool)
+            raise
+
+
+async def _ler_no_pool(nome, conteudo, caminho=None):
+    # Com o caminho do arquivo temporário o worker o lê por mmap; sem ele (upload
+    # em memória, sistema sem /proc) vai uma cópia em bytes, porque o mmap do
+    # upload não passa para outro processo e é fechado quando a view responde
+    dados, tentativas, medicoes = await _no_pool(
+        nome, 'gestao.tc_parser.ler_tc_no_pool', nome, None if caminho else bytes(conteudo), _backends(),
+        tc_parser.instrumentacao_ativa(), caminho)
+    for tentativa in tentativas:
+        tc_parser.registrar_tentativa(tentativa)
+    for medicao in medicoes:
+        tc_parser.registrar_medicao(medicao)
+    return dados
+
+
+async def ler_tc(nome, conteudo, caminho=None):
+    """
+    tc_parser.ler_tc sem prender o laço de eventos, passando pelo tc_cache.
+    `caminho` (uploads.caminho_do_processo) deixa o worker abrir o próprio
+    arquivo em vez de receber uma cópia de `conteudo`. Levanta ValueError
+    (arquivo inválido), Ocupado ou TimeoutError.
+    """
+    chave_tc = await sync_to_async(tc_cache.chave, thread_sensitive=False)(nome, conteudo)
+    dados = tc_cache.obter(chave_tc)
+    if dados is not None:
+        return dados
+
+    _reservar()
+    try:
+        if _workers() > 0:
+            dados = await _ler_no_pool(nome, conteudo, caminho)
+        else:
+            dados = await sync_to_async(tc_parser.ler_tc, thread_sensitive=False)(
+                nome, conteudo, getattr(settings, 'TC_EXTRACAO_PDF', 'serial'), backends=_backends())
+    finally:
+        _liberar()
+    tc_cache.guardar(chave_tc, dados)
+    return dados
@@ -0,0 +1,73 @@
+"""
+tc_cache.py — Cache em memória dos TCs já lidos, endereçado pelo conteúdo.
+
+A chave é o SHA-256 dos bytes enviados, o formato (extensão) e a
+tc_parser.VERSAO_PARSER; o valor é o dicionário devolvido por ler_tc. Nada
+vai para o disco: o cache vive no processo do servidor, com prazo de
+validade (TTL) e despejo do menos usado (LRU) acima de TC_CACHE_MAX_ITENS.
+Reenviar o mesmo TC (correção do BOU, outro escrivão) custa só o hash.
+"""
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import tc_parser
+
+_LOCK = threading.Lock()
+_ITENS = OrderedDict()  # chave -> (expira_em, dados)
+
+
+def _max_itens():
+    return getattr(settings, 'TC_CACHE_MAX_ITENS', 256)
+
+
+def _ttl():
+    return getattr(settings, 'TC_CACHE_TTL_SEGUNDOS', 3600)
+
+
+def chave(nome, file_bytes):
+    extensao = os.path.splitext(nome.lower())[1]
+    return f"{hashlib.sha256(file_bytes).hexdigest()}:{extensao}:{tc_parser.VERSAO_PARSER}"
+
+
+def obter(chave_tc):
+    """ Cópia dos dados em cache, ou None se ausentes ou vencidos """
+    with _LOCK:
+        item = _ITENS.get(chave_tc)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del _ITENS[chave_tc]
+            return None
+        _ITENS.move_to_end(chave_tc)
+        return copy.deepcopy(item[1])
+
+
+def guardar(chave_tc, dados):
+    if _max_itens() <= 0:
+        return
+    with _LOCK:
+        _ITENS[chave_tc] = (time.monotonic() + _ttl(), copy.deepcopy(dados))
+        _ITENS.move_to_end(chave_tc)
+        while len(_ITENS) > _max_itens():
+            _ITENS.popitem(last=False)
+
+
+def limpar():
+    with _LOCK:
+        _ITENS.clear()
+
+
+def ler_tc(nome, file_bytes, *args, **kwargs):
+    """ tc_parser.ler_tc passando pelo cache; erros (ValueError) não ficam guardados """
+    chave_tc = chave(nome, file_bytes)
+    dados = obter(chave_tc)
+    if dados is None:
+        dados = tc_parser.ler_tc(nome, file_bytes, *args, **kwargs)
+        guardar(chave_tc, dados)
+    return dados
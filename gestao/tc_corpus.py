@@ -0,0 +1,210 @@
+"""
+tc_corpus.py — Corpus sintético de TCs para medir o tc_parser.
+
+Gera TCs anonimizados (nomes, RGs, BOUs e processos inventados) a partir de
+uma semente, cada um com os valores que parsear_tc deve devolver, cobrindo os
+layouts que o parser trata: BOU nas duas ordens, data do registro numérica ou
+por extenso, processo CNJ com e sem pontuação, natureza por "Natureza:" ou
+"fatos notificados como", vara como Juizado ou Vara, um ou vários noticiados
+(bloco NOTICIADO/AUTUADO, "eu NOME, RG/PR" ou assinatura do compromissado) e
+itens apreendidos. Cada TC sai como PDF (ReportLab) e/ou DOCX (python-docx).
+Usado pelo manage.py benchmark_tc_corpus e pelos testes.
+"""
+import random
+from io import BytesIO
+
+# Campos de parsear_tc conferidos contra o esperado
+CAMPOS = (
+    'bou', 'data_registro', 'processo', 'vara', 'data_audiencia', 'natureza_penal',
+    'unidade_origem', 'policial_nome', 'policial_graduacao', 'policial_rg',
+    'noticiados', 'itens_apreendidos',
+)
+
+FORMATOS = ('pdf', 'docx')
+
+_PRENOMES = ['ANA', 'BRUNO', 'CARLA', 'DIEGO', 'ELISA', 'FABIO', 'GISELE', 'HUGO', 'IARA', 'JONAS',
+             'KATIA', 'LUCAS', 'MARTA', 'NELSON', 'OTAVIO', 'PAULA', 'RENATO', 'SILVIA', 'TIAGO', 'VERA']
+_SOBRENOMES = ['ALMEIDA', 'BARROS', 'CARDOSO', 'DUARTE', 'ESTEVES', 'FONSECA', 'GUIMARÃES', 'HOLANDA',
+               'MACHADO', 'NOGUEIRA', 'PEIXOTO', 'QUEIROZ', 'RIBEIRO', 'TEIXEIRA', 'VIEIRA']
+_CIDADES = ['CASCAVEL', 'TOLEDO', 'FOZ DO IGUAÇU', 'MARECHAL CÂNDIDO RONDON', 'MEDIANEIRA']
+_GRADUACOES = ['Soldado', 'Cabo', 'Sargento', 'Subtenente', 'Tenente']
+_MESES = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho', 'agosto',
+          'setembro', 'outubro', 'novembro', 'dezembro']
+# Só dias de uma palavra: o parser não lê "vinte e um dias do mês..."
+_DIAS = {2: 'dois', 3: 'três', 4: 'quatro', 5: 'cinco', 6: 'seis', 7: 'sete', 8: 'oito', 9: 'nove',
+         10: 'dez', 11: 'onze', 12: 'doze', 13: 'treze', 14: 'quatorze', 15: 'quinze', 16: 'dezesseis',
+         17: 'dezessete', 18: 'dezoito', 19: 'dezenove', 20: 'vinte', 30: 'trinta'}
+_NATUREZAS = [
+    'Art. 28 - Lei 11.343/06 - Posse de droga para consumo pessoal',
+    'Art. 147 - Código Penal - Ameaça',
+    'Art. 129 - Código Penal - Lesão corporal',
+    'Art. 42 - Lei das Contravenções Penais - Perturbação do sossego',
+]
+_FATOS = ['ameaça', 'perturbação do trabalho ou sossego alheios', 'vias de fato', 'dano simples']
+# (linha do TC, substância, unidade)
+_DROGAS = [
+    ('{n:02d} porção de maconha pesando aproximadamente {q} g', 'MACONHA', 'G'),
+    ('{n:02d} invólucro de cocaína pesando {q} g', 'COCAINA', 'G'),
+    ('{n:02d} pedras de crack com {q} g', 'CRACK', 'G'),
+    ('tablete de haxixe com {q} g', 'HAXIXE', 'G'),
+]
+
+
+def _nome(rng):
+    return f"{rng.choice(_PRENOMES)} {rng.choice(_SOBRENOMES)} {rng.choice(_SOBRENOMES)}"
+
+
+def _rg(rng):
+    return f"{rng.randint(1, 19)}.{rng.randint(0, 999):03d}.{rng.randint(0, 999):03d}-{rng.randint(0, 9)}"
+
+
+def _decimal(rng, maximo):
+    return f"{rng.randint(1, maximo)},{rng.randint(0, 9)}"
+
+
+def gerar_tc(rng):
+    """ (texto, esperado) de um TC sorteado com `rng` """
+    ano = rng.choice([2023, 2024, 2025])
+    numero = rng.randint(1000000, 9999999)
+    cidade = rng.choice(_CIDADES)
+    batalhao = rng.randint(1, 30)
+    mes, dia = rng.randint(1, 12), rng.choice(list(_DIAS))
+    dia_audiencia, mes_audiencia = rng.randint(10, 28), rng.randint(1, 12)
+    cnj = (f"{rng.randint(0, 9999999):07d}", f"{rng.randint(0, 99):02d}", str(ano),
+           '8', '16', f"{rng.randint(1, 9999):04d}")
+    policial, graduacao, rg_policial = _nome(rng), rng.choice(_GRADUACOES), _rg(rng)
+
+    linhas = ["POLÍCIA MILITAR DO PARANÁ", f"{batalhao}º BPM - {cidade}", "TERMO CIRCUNSTANCIADO DE INFRAÇÃO PENAL"]
+    esperado = {
+        'bou': f"{ano}/{numero}",
+        'unidade_origem': f"{batalhao}º BPM - {cidade}",
+        'data_registro': f"{dia:02d}/{mes:02d}/{ano}",
+        'data_audiencia': f"{dia_audiencia:02d}/{mes_audiencia:02d}/{ano + 1}",
+        'policial_nome': policial,
+        'policial_graduacao': graduacao,
+        'policial_rg': rg_policial,
+    }
+
+    linhas.append(f"BOU: {ano}/{numero}" if rng.random() < 0.5 else f"B.O.U. {numero}/{ano}")
+    if rng.random() < 0.5:
+        linhas.append(f"Data do Registro: {esperado['data_registro']}")
+    else:
+        linhas.append(f"Aos {_DIAS[dia]} dias do mês de {_MESES[mes - 1]} do ano de {ano}, nesta cidade.")
+
+    if rng.random() < 0.6:
+        esperado['natureza_penal'] = rng.choice(_NATUREZAS)
+        linhas.append(f"Natureza: {esperado['natureza_penal']}")
+    else:
+        esperado['natureza_penal'] = rng.choice(_FATOS)
+        linhas.append(f"fatos notificados como {esperado['natureza_penal']}")
+
+    if rng.random() < 0.5:
+        esperado['processo'] = f"{cnj[0]}-{cnj[1]}.{cnj[2]}.{cnj[3]}.{cnj[4]}.{cnj[5]}"
+        linhas.append(f"Autos: {esperado['processo']}")
+    else:
+        esperado['processo'] = ''.join(cnj)
+        linhas.append(f"Processo nº {esperado['processo']}")
+
+    if rng.random() < 0.5:
+        esperado['vara'] = f"{rng.randint(1, 3)}º Juizado Especial Criminal de {cidade.title()}"
+    else:
+        esperado['vara'] = f"{rng.randint(1, 3)}ª Vara Criminal de {cidade.title()}"
+    linhas.append(f"Juízo: {esperado['vara']}")
+
+    # Noticiados: vários em blocos, ou um só em bloco, "eu NOME, RG/PR" ou assinatura do compromissado
+    noticiados = [(_nome(rng), _rg(rng)) for _ in range(rng.choice([1, 1, 2, 3]))]
+    esperado['noticiados'] = [{'nome': nome.title(), 'rg': rg} for nome, rg in noticiados]
+    forma = 'blocos' if len(noticiados) > 1 else rng.choice(['blocos', 'eu', 'compromissado'])
+    if forma == 'blocos':
+        for i, (nome, rg) in enumerate(noticiados):
+            linhas += ['NOTICIADO' if i % 2 == 0 else 'AUTUADO', nome, f"RG: {rg}"]
+    elif forma == 'eu':
+        linhas.append(f"Pelo presente, eu {noticiados[0][0]}, RG/PR {noticiados[0][1]}, assumo o compromisso.")
+
+    itens, esperados = [], []
+    for molde, substancia, unidade in rng.sample(_DROGAS, rng.choice([0, 1, 1])):
+        quantidade = _decimal(rng, 50)
+        itens.append(molde.format(n=rng.randint(1, 9), q=quantidade))
+        esperados.append(('ENTORPECENTE', substancia, quantidade.replace(',', '.')))
+    if rng.random() < 0.6:
+        itens.append(f"01 aparelho celular marca {rng.choice(['Samsung', 'Motorola', 'Xiaomi'])} cor preta")
+        esperados.append(('OUTROS', None, '1'))
+    if rng.random() < 0.4:
+        itens.append("01 faca de cozinha")
+        esperados.append(('FACA', None, '1'))
+    if rng.random() < 0.5:
+        reais, centavos = rng.randint(1, 2500), rng.randint(0, 99)
+        itens.append(f"R$ {reais:,}".replace(',', '.') + f",{centavos:02d} em espécie")
+        esperados.append(('DINHEIRO', None, f"{reais}.{centavos:02d}"))
+    if itens:
+        linhas += ["OBJETOS APREENDIDOS:"] + itens
+    esperado['itens_apreendidos'] = sorted(esperados, key=str)
+
+    # A narrativa às vezes cita "o noticiado" em minúsculas, como nos TCs reais
+    envolvido = rng.choice(['o noticiado', 'os envolvidos'])
+    linhas.append(f"Histórico: Durante patrulhamento a equipe abordou {envolvido}.")
+    linhas.append(f"Fica {rng.choice(['o noticiado', 'o compromissado'])} ciente de comparecer à audiência "
+                  f"em data de {esperado['data_audiencia']}, às 14h.")
+    if forma == 'compromissado':
+        linhas += ["ASSINATURA DO COMPROMISSADO", noticiados[0][0], f"RG: {noticiados[0][1]}"]
+    linhas += ["ASSINATURA POLICIAL MILITAR:", f"{policial} - {graduacao}", f"RG: {rg_policial}"]
+    return "\n".join(linhas), esperado
+
+
+def pdf_de_linhas(linhas):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setFont("Helvetica", 9)
+    y = 810
+    for linha in linhas:
+        if y < 40:
+            pdf.showPage()
+            pdf.setFont("Helvetica", 9)
+            y = 810
+        pdf.drawString(30, y, linha)
+        y -= 15
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def docx_de_linhas(linhas):
+    from docx import Document
+    documento = Document()
+    for linha in linhas:
+        documento.add_paragraph(linha)
+    buffer = BytesIO()
+    documento.save(buffer)
+    return buffer.getvalue()
+
+
+def gerar_corpus(quantidade, semente=2025, formatos=FORMATOS):
+    """
+    Lista de {'nome', 'formato', 'texto', 'conteudo', 'esperado'}: `quantidade`
+    TCs, cada um em cada formato. A mesma semente gera sempre o mesmo corpus.
+    """
+    rng = random.Random(semente)
+    casos = []
+    for numero in range(quantidade):
+        texto, esperado = gerar_tc(rng)
+        linhas = texto.split("\n")
+        for formato in formatos:
+            conteudo = pdf_de_linhas(linhas) if formato == 'pdf' else docx_de_linhas(linhas)
+            casos.append({'nome': f"tc_{numero:04d}.{formato}", 'formato': formato, 'texto': texto,
+                          'conteudo': conteudo, 'esperado': esperado})
+    return casos
+
+
+def _normalizado(campo, valor):
+    if campo == 'noticiados':
+        return [{'nome': n['nome'], 'rg': n['rg']} for n in valor]
+    if campo == 'itens_apreendidos':
+        return sorted(((i['categoria'], i['substancia'], i['quantidade']) for i in valor), key=str)
+    return valor.strip() if isinstance(valor, str) else valor
+
+
+def conferir(esperado, dados):
+    """ {campo: acertou} de um resultado de parsear_tc contra o esperado do corpus """
+    return {campo: _normalizado(campo, dados[campo]) == esperado[campo] for campo in CAMPOS}
@@ -0,0 +1,246 @@
+"""
+tc_lote.py — Leitura de vários TCs de uma vez (upload múltiplo ou ZIP).
+
+Cada arquivo é extraído e parseado (tc_parser.ler_tc) num processo do pool,
+com tempo limite por arquivo (os que já estão em tc_cache saem na hora), e os resultados saem na ordem em que ficam
+prontos, como NDJSON: uma linha por arquivo e uma linha final com as
+duplicatas, conferidas contra Ocorrencia numa única consulta para o lote.
+"""
+import json
+import logging
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import processos, tc_cache, tc_parser
+from .models import Ocorrencia, normalizar_processo
+
+logger = logging.getLogger(__name__)
+
+EXTENSOES = ('.pdf', '.docx')
+
+# De quanto em quanto tempo (s) o lote confere se algum arquivo estourou o tempo
+_INTERVALO = 0.5
+
+
+def _max_arquivos():
+    return getattr(settings, 'TC_LOTE_MAX_ARQUIVOS', 100)
+
+
+def _max_bytes():
+    return getattr(settings, 'TC_LOTE_MAX_BYTES_ARQUIVO', 20 * 1024 * 1024)
+
+
+def _max_bytes_envio():
+    return getattr(settings, 'TC_LOTE_MAX_BYTES_ENVIO', 200 * 1024 * 1024)
+
+
+# ── ARQUIVOS ENVIADOS ─────────────────────────────────────────────────────────
+
+def arquivos_do_envio(enviados):
+    """
+    [(nome, bytes)] dos TCs enviados. ZIPs são abertos e deles só entram os
+    PDF/DOCX; arquivos soltos entram todos (o formato é validado na leitura).
+    Levanta ValueError se o envio for inválido ou grande demais. Os limites
+    são conferidos antes de ler cada arquivo, pelo tamanho declarado, então
+    um ZIP com arquivos demais não chega a ser descomprimido.
+    """
+    arquivos = []
+    total = 0
+
+    def conferir(nome, tamanho):
+        nonlocal total
+        if len(arquivos) >= _max_arquivos():
+            raise ValueError(f"Envie no máximo {_max_arquivos()} TCs por vez.")
+        if tamanho > _max_bytes():
+            raise ValueError(f"{nome}: arquivo maior que o permitido.")
+        total += tamanho
+        if total > _max_bytes_envio():
+            raise ValueError(f"Envio maior que o permitido ({_max_bytes_envio() // 2**20} MB no total).")
+
+    for enviado in enviados:
+        if enviado.name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(enviado) as zf:
+                    for info in zf.infolist():
+                        nome = info.filename
+                        if info.is_dir() or nome.startswith('__MACOSX/') or not nome.lower().endswith(EXTENSOES):
+                            continue
+                        conferir(nome, info.file_size)
+                        arquivos.append((nome, zf.read(info)))
+            except zipfile.BadZipFile:
+                raise ValueError(f"{enviado.name}: ZIP inválido.")
+        else:
+            conferir(enviado.name, enviado.size)
+            arquivos.append((enviado.name, enviado.read()))
+    return arquivos
+
+
+# ── LEITURA NO POOL ───────────────────────────────────────────────────────────
+
+def _resultado(indice, nome, dados=None, erro=None):
+    if erro is not None:
+        return {'indice': indice, 'arquivo': nome, 'sucesso': False, 'erro': erro}
+    return {'indice': indice, 'arquivo': nome, 'sucesso': True, 'dados': dados}
+
+
+def _de_excecao(indice, nome, e):
+    if isinstance(e, ValueError):
+        return _resultado(indice, nome, erro=str(e))
+    logger.error(f"[TC LOTE] Falha ao ler {nome}: {e!r}")
+    return _resultado(indice, nome, erro=f'Erro ao processar arquivo: {e}')
+
+
+def _backends():
+    return getattr(settings, 'TC_BACKENDS_PDF', None)
+
+
+def _ler_aqui(arquivos):
+    for indice, (nome, conteudo) in enumerate(arquivos):
+        try:
+            yield _resultado(indice, nome, dados=tc_cache.ler_tc(nome, conteudo, backends=_backends()))
+        except Exception as e:
+            yield _de_excecao(indice, nome, e)
+
+
+def ler_em_lote(arquivos, max_workers=None, timeout=None):
+    """
+    Gera o resultado de cada (nome, bytes) assim que ele fica pronto.
+
+    O tempo limite conta a partir de quando o arquivo é entregue a um
+    processo. Só vão para o pool tantos arquivos quantos são os workers (o
+    ProcessPoolExecutor marcaria como "running" também o que ainda espera na
+    fila interna dele), então a entrega é o início da leitura. Um processo
+    que estoura o tempo não pode ser interrompido sozinho: o pool é derrubado
+    e os arquivos que faltavam voltam para um pool novo. Com um worker só,
+    lê tudo neste processo (sem tempo limite).
+    """
+    max_workers = max_workers or getattr(settings, 'TC_LOTE_WORKERS', 2)
+    timeout = timeout or getattr(settings, 'TC_LOTE_TIMEOUT_SEGUNDOS', 60)
+
+    if max_workers <= 1 or len(arquivos) <= 1:
+        yield from _ler_aqui(arquivos)
+        return
+
+    fila = []
+    for indice, (nome, conteudo) in enumerate(arquivos):
+        dados = tc_cache.obter(tc_cache.chave(nome, conteudo))
+        if dados is None:
+            fila.append((indice, (nome, conteudo)))
+        else:
+            yield _resultado(indice, nome, dados=dados)
+
+    while fila:
+        vagas = min(max_workers, len(fila))
+        pool = processos.novo_pool(vagas, com_django=False)
+        pendentes, entregues, travou = {}, {}, False
+
+        def entregar():
+            while fila and len(pendentes) < vagas:
+                indice, (nome, conteudo) = fila.pop(0)
+                futuro = pool.submit(processos.chamar, 'gestao.tc_parser.ler_tc_no_pool', nome, conteudo,
+                                     _backends(), tc_parser.instrumentacao_ativa())
+                pendentes[futuro] = (indice, nome, conteudo)
+                entregues[futuro] = time.monotonic()
+
+        try:
+            entregar()
+            while pendentes:
+                feitos, _ = wait(pendentes, timeout=_INTERVALO, return_when=FIRST_COMPLETED)
+                prontos = []
+                for futuro in feitos:
+                    indice, nome, conteudo = pendentes.pop(futuro)
+                    if futuro.exception() is None:
+                        dados, tentativas, medicoes = futuro.result()
+                        for tentativa in tentativas:
+                            tc_parser.registrar_tentativa(tentativa)
+                        for medicao in medicoes:
+                            tc_parser.registrar_medicao(medicao)
+                        tc_cache.guardar(tc_cache.chave(nome, conteudo), dados)
+                        prontos.append(_resultado(indice, nome, dados=dados))
+                    else:
+                        prontos.append(_de_excecao(indice, nome, futuro.exception()))
+                # Os workers livres recebem o próximo arquivo antes de o resultado sair daqui
+                entregar()
+                yield from prontos
+
+                agora = time.monotonic()
+                vencidos = [f for f in pendentes if agora - entregues[f] > timeout]
+                if vencidos:
+                    travou = True
+                    for futuro in vencidos:
+                        indice, nome, _ = pendentes.pop(futuro)
+                        logger.warning(f"[TC LOTE] {nome} passou de {timeout}s")
+                        yield _resultado(indice, nome, erro=f'Tempo esgotado ({timeout}s) ao processar o arquivo.')
+                    fila = [(indice, (nome, conteudo)) for indice, nome, conteudo in pendentes.values()] + fila
+                    break
+        finally:
+            if travou or pendentes:
+                processos.encerrar(pool)
+            else:
+                pool.shutdown()
+
+
+# ── DUPLICATAS ────────────────────────────────────────────────────────────────
+
+def _consulta_duplicatas(lista_dados):
+    bous = {d['bou'] for d in lista_dados if d.get('bou')}
+    numeros = {normalizar_processo(d.get('processo')) for d in lista_dados} - {None}
+    if not (bous or numeros):
+        return Ocorrencia.objects.none()
+    return (Ocorrencia.objects.filter(Q(bou__in=bous) | Q(processo_normalizado__in=numeros))
+            .order_by('id').values_list('id', 'bou', 'processo_normalizado'))
+
+
+def _casar_duplicatas(lista_dados, existentes):
+    por_bou, por_processo = {}, {}
+    for id_, bou, processo in existentes:
+        por_bou.setdefault(bou, {'id': id_, 'bou': bou})
+        if processo:
+            por_processo.setdefault(processo, {'id': id_, 'bou': bou})
+    return [
+        (d.get('bou') and por_bou.get(d['bou'])) or por_processo.get(normalizar_processo(d.get('processo'))) or None
+        for d in lista_dados
+    ]
+
+
+def buscar_duplicatas(lista_dados):
+    """
+    Para cada dicionário do parser, a ocorrência já cadastrada com o mesmo BOU
+    (ou, sem BOU correspondente, o mesmo processo, com ou sem pontuação), ou
+    None. Uma consulta só, pelos índices de bou e processo_normalizado.
+    """
+    return _casar_duplicatas(lista_dados, _consulta_duplicatas(lista_dados))
+
+
+async def abuscar_duplicatas(lista_dados):
+    """ buscar_duplicatas para as views assíncronas (mesma consulta, pelo ORM assíncrono) """
+    return _casar_duplicatas(lista_dados, [linha async for linha in _consulta_duplicatas(lista_dados)])
+
+
+# ── NDJSON ────────────────────────────────────────────────────────────────────
+
+def _linha(objeto):
+    return (json.dumps(objeto, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def ndjson_em_fluxo(arquivos, max_workers=None, timeout=None):
+    """
+    Uma linha JSON por arquivo, na ordem em que terminam, e por fim
+    {"fim": true, "total", "lidos", "duplicatas": [{"indice", "arquivo", "id", "bou"}]}.
+    """
+    lidos = []
+    for resultado in ler_em_lote(arquivos, max_workers, timeout):
+        if resultado['sucesso']:
+            lidos.append(resultado)
+        yield _linha(resultado)
+
+    duplicatas = [
+        {'indice': r['indice'], 'arquivo': r['arquivo'], **duplicata}
+        for r, duplicata in zip(lidos, buscar_duplicatas([r['dados'] for r in lidos])) if duplicata
+    ]
+    yield _linha({'fim': True, 'total': len(arquivos), 'lidos': len(lidos),
+                  'duplicatas': sorted(duplicatas, key=lambda d: d['indice'])})
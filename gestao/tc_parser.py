@@ -1,127 +1,858 @@
 """
 tc_parser.py \u2014 Parser de Termos Circunstanciados (TC)
 Suporta PDF digital (sistema SESP/intranet) e arquivo Word (.docx).
-O arquivo nunca \u00e9 gravado em disco \u2014 processa em mem\u00f3ria e descarta.
+O arquivo nunca \u00e9 gravado em disco \u2014 processa em mem\u00f3ria e descarta. O
+conte\u00fado pode vir como bytes ou como buffer (o mmap do upload em
+uploads.py), lido sem c\u00f3pia.
+
+O texto vai para min\u00fasculas uma vez e cada campo s\u00f3 tenta casar sua regex
+(compilada na importa\u00e7\u00e3o) nas posi\u00e7\u00f5es das suas palavras-chave, as \u00e2ncoras,
+em vez de percorrer o TC inteiro uma vez por padr\u00e3o. As \u00e2ncoras ficam num
+\u00edndice compartilhado pelos campos: cada palavra \u00e9 procurada uma \u00fanica vez e
+s\u00f3 at\u00e9 onde foi preciso. O resultado \u00e9 id\u00eantico ao de re.search sobre o texto
+todo, pois toda ocorr\u00eancia de um padr\u00e3o come\u00e7a numa das suas \u00e2ncoras e elas
+s\u00e3o tentadas da esquerda para a direita.
 """
 
 import re
 import io
+import mmap
+import os
+import time
+import logging
+import threading
+import importlib.util
+from bisect import bisect_left
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+# Suba a cada mudan\u00e7a no que parsear_tc devolve: invalida os resultados em tc_cache
+VERSAO_PARSER = 1
 
 
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 # EXTRA\u00c7\u00c3O DE TEXTO
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 
-def extrair_texto_pdf(file_bytes: bytes) -> str:
-    """Extrai todo o texto de um PDF (suporte a m\u00faltiplas p\u00e1ginas)."""
+# Modos de extra\u00e7\u00e3o do PDF:
+#   'serial'    \u2014 todas as p\u00e1ginas, uma a uma, neste processo;
+#   'paralelo'  \u2014 todas as p\u00e1ginas, em faixas cont\u00edguas divididas entre processos
+#                 (PDFs curtos ou m\u00e1quina de um n\u00facleo caem no serial);
+#   'cabecalho' \u2014 p\u00e1gina a p\u00e1gina, parando assim que BOU, processo, vara,
+#                 natureza e o bloco de itens aparecem (laudos anexos n\u00e3o s\u00e3o lidos).
+MODOS_PDF = ('serial', 'paralelo', 'cabecalho')
+
+# Abaixo disso o custo de subir os processos n\u00e3o compensa
+PAGINAS_MIN_PARALELO = 8
+
+_LINHAS_VAZIAS = re.compile(r'\n[ \t]*(?:\n[ \t]*)+')
+
+
+class _LeitorBuffer(io.RawIOBase):
+    """ Arquivo s\u00f3 de leitura sobre um buffer (mmap), com posi\u00e7\u00e3o pr\u00f3pria e sem copi\u00e1-lo """
+
+    def __init__(self, buffer):
+        self._dados = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        n = max(0, min(len(destino), len(self._dados) - self._pos))
+        destino[:n] = self._dados[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, deslocamento, de_onde=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._dados)}[de_onde]
+        self._pos = max(0, base + deslocamento)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._dados.release()
+        super().close()
+
+
+def _fluxo(file_bytes):
+    """ Arquivo em mem\u00f3ria para as bibliotecas de PDF/DOCX; buffers n\u00e3o s\u00e3o copiados """
+    if isinstance(file_bytes, bytes):
+        return io.BytesIO(file_bytes)
+    return _LeitorBuffer(file_bytes)
+
+
+def _paginas_pdfplumber(file_bytes, inicio=0, fim=None):
+    import pdfplumber
+    with _fluxo(file_bytes) as fluxo, pdfplumber.open(fluxo) as pdf:
+        for page in pdf.pages[inicio:fim]:
+            yield page.extract_text() or ''
+            page.close()
+
+
+def _paginas_pdfminer(file_bytes, inicio=0, fim=None):
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    recursos = PDFResourceManager()
+    with _fluxo(file_bytes) as fluxo:
+        for numero, page in enumerate(PDFPage.get_pages(fluxo)):
+            if numero < inicio:
+                continue
+            if fim is not None and numero >= fim:
+                return
+            saida = io.StringIO()
+            with TextConverter(recursos, saida, laparams=LAParams()) as conversor:
+                PDFPageInterpreter(recursos, conversor).process_page(page)
+            # O pdfminer separa as caixas de texto com linha em branco e fecha a p\u00e1gina com \f
+            yield _LINHAS_VAZIAS.sub('\n', saida.getvalue().replace('\x0c', '')).strip()
+
+
+def _abrir_pypdfium2(file_bytes):
+    import pypdfium2
+    # bytes s\u00e3o lidos direto da mem\u00f3ria; outros buffers pelo leitor, que o PdfDocument fecha
+    if isinstance(file_bytes, bytes):
+        return pypdfium2.PdfDocument(file_bytes)
+    return pypdfium2.PdfDocument(_fluxo(file_bytes), autoclose=True)
+
+
+def _paginas_pypdfium2(file_bytes, inicio=0, fim=None):
+    pdf = _abrir_pypdfium2(file_bytes)
+    try:
+        for numero in range(inicio, len(pdf) if fim is None else min(fim, len(pdf))):
+            page = pdf[numero]
+            texto = page.get_textpage()
+            try:
+                yield texto.get_text_range().replace('\r\n', '\n').strip()
+            finally:
+                texto.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+# Backends de extra\u00e7\u00e3o, do mais r\u00e1pido para o mais fiel ao layout. No modo
+# autom\u00e1tico o primeiro dispon\u00edvel cujo texto passa em texto_aceitavel() vence.
+BACKENDS_PDF = {
+    'pypdfium2': _paginas_pypdfium2,
+    'pdfminer': _paginas_pdfminer,
+    'pdfplumber': _paginas_pdfplumber,
+}
+
+_disponiveis = {}
+
+
+def backend_disponivel(nome):
+    if nome not in _disponiveis:
+        _disponiveis[nome] = importlib.util.find_spec(nome) is not None
+    return _disponiveis[nome]
+
+
+def _contar_paginas(file_bytes):
+    if backend_disponivel('pypdfium2'):
+        pdf = _abrir_pypdfium2(file_bytes)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
     import pdfplumber
-    texto_total = []
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                texto_total.append(t)
-    return "\n".join(texto_total)
+    with _fluxo(file_bytes) as fluxo, pdfplumber.open(fluxo) as pdf:
+        return len(pdf.pages)
+
+
+def extrair_paginas(file_bytes: bytes, inicio: int = 0, fim: int = None, backend: str = 'pdfplumber') -> list:
+    """Texto de cada p\u00e1gina em [inicio, fim) ('' para p\u00e1gina sem texto). Roda tamb\u00e9m nos processos do pool."""
+    return list(BACKENDS_PDF[backend](file_bytes, inicio, fim))
+
+
+def _paginas_em_paralelo(file_bytes, backend, max_workers):
+    from . import processos
+    total = _contar_paginas(file_bytes)
+    max_workers = min(max_workers or os.cpu_count() or 1, total // 2 or 1)
+    if total < PAGINAS_MIN_PARALELO or max_workers <= 1:
+        return extrair_paginas(file_bytes, backend=backend)
+
+    tamanho = -(-total // max_workers)
+    if not isinstance(file_bytes, bytes):
+        file_bytes = bytes(file_bytes)  # o buffer n\u00e3o atravessa para os processos
+    faixas = [(inicio, min(inicio + tamanho, total)) for inicio in range(0, total, tamanho)]
+    with processos.novo_pool(len(faixas), com_django=False) as pool:
+        futuros = [pool.submit(processos.chamar, 'gestao.tc_parser.extrair_paginas', file_bytes, inicio, fim, backend)
+                   for inicio, fim in faixas]
+        return [texto for futuro in futuros for texto in futuro.result()]
+
+
+def _paginas_ate_cabecalho(file_bytes, backend):
+    textos, faltando = [], None
+    paginas = BACKENDS_PDF[backend](file_bytes)
+    try:
+        for texto in paginas:
+            textos.append(texto)
+            faltando = campos_cabecalho("\n".join(t for t in textos if t), faltando)
+            if not faltando:
+                break
+    finally:
+        paginas.close()
+    return textos
+
+
+# \u2500\u2500 CONTADORES POR BACKEND \u2500\u2500
+# Por processo: tentativas, aceitos (passaram em texto_aceitavel), falhas
+# (exce\u00e7\u00e3o), p\u00e1ginas lidas e tempo total. Os lidos nos processos do pool
+# voltam como `tentativas` e s\u00e3o somados aqui por registrar_tentativa().
+
+_ESTATISTICAS = {}
+_TRAVA_ESTATISTICAS = threading.Lock()
+
+
+def registrar_tentativa(tentativa):
+    with _TRAVA_ESTATISTICAS:
+        total = _ESTATISTICAS.setdefault(tentativa['backend'], {
+            'tentativas': 0, 'aceitos': 0, 'falhas': 0, 'paginas': 0, 'segundos': 0.0,
+        })
+        total['tentativas'] += 1
+        total['aceitos'] += tentativa['aceito']
+        total['falhas'] += tentativa['falhou']
+        total['paginas'] += tentativa['paginas']
+        total['segundos'] += tentativa['segundos']
+
+
+def estatisticas_pdf():
+    """ Contadores de cada backend, com ms por p\u00e1gina e taxa de aceita\u00e7\u00e3o """
+    with _TRAVA_ESTATISTICAS:
+        copia = {nome: dict(total) for nome, total in _ESTATISTICAS.items()}
+    for total in copia.values():
+        total['ms_por_pagina'] = round(total['segundos'] * 1000 / total['paginas'], 2) if total['paginas'] else None
+        total['taxa_aceitos'] = round(total['aceitos'] / total['tentativas'], 3) if total['tentativas'] else None
+    return copia
+
+
+def extrair_texto_pdf(file_bytes: bytes, modo: str = 'serial', max_workers: int = None,
+                      backend: str = 'auto', backends=None, tentativas: list = None) -> str:
+    """
+    Extrai o texto de um PDF (suporte a m\u00faltiplas p\u00e1ginas). `modo` \u00e9 um de
+    MODOS_PDF. Com backend='auto', tenta os backends dispon\u00edveis (na ordem de
+    `backends` ou de BACKENDS_PDF) at\u00e9 um texto passar em texto_aceitavel();
+    se nenhum passar, fica o do \u00faltimo que extraiu algum texto.
+    """
+    if modo not in MODOS_PDF:
+        raise ValueError(f"Modo de extra\u00e7\u00e3o desconhecido: {modo}")
+    if backend == 'auto':
+        candidatos = [nome for nome in (backends or BACKENDS_PDF) if backend_disponivel(nome)]
+    elif backend in BACKENDS_PDF:
+        candidatos = [backend]
+    else:
+        raise ValueError(f"Backend de extra\u00e7\u00e3o desconhecido: {backend}")
+
+    melhor, erro = '', None
+    for numero, nome in enumerate(candidatos, start=1):
+        inicio = time.perf_counter()
+        tentativa = {'backend': nome, 'aceito': False, 'falhou': False, 'paginas': 0}
+        try:
+            if modo == 'paralelo':
+                textos = _paginas_em_paralelo(file_bytes, nome, max_workers)
+            elif modo == 'cabecalho':
+                textos = _paginas_ate_cabecalho(file_bytes, nome)
+            else:
+                textos = extrair_paginas(file_bytes, backend=nome)
+            texto = "\n".join(t for t in textos if t)
+            tentativa.update(paginas=len(textos), aceito=texto_aceitavel(texto))
+        except Exception as e:
+            logger.warning(f"[TC PDF] {nome} falhou: {e!r}")
+            tentativa['falhou'], erro, texto = True, e, ''
+        tentativa['segundos'] = time.perf_counter() - inicio
+        registrar_tentativa(tentativa)
+        if tentativas is not None:
+            tentativas.append(tentativa)
+
+        if tentativa['aceito']:
+            return texto
+        melhor = texto or melhor
+        if numero < len(candidatos):
+            logger.info(f"[TC PDF] {nome} n\u00e3o achou BOU nem processo, tentando {candidatos[numero]}")
+
+    if not melhor and erro is not None:
+        raise erro
+    return melhor
 
 
 def extrair_texto_docx(file_bytes: bytes) -> str:
     """Extrai todo o texto de um arquivo Word (.docx)."""
     from docx import Document
-    doc = Document(io.BytesIO(file_bytes))
+    with _fluxo(file_bytes) as fluxo:
+        doc = Document(fluxo)
     return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
 
 
+def ler_tc(nome: str, file_bytes: bytes, modo_pdf: str = 'serial', backends=None, tentativas: list = None) -> dict:
+    """
+    Extrai e parseia um TC (PDF ou DOCX) pelo nome do arquivo. Levanta
+    ValueError com a mensagem para o usu\u00e1rio quando o arquivo n\u00e3o serve.
+    """
+    nome = nome.lower()
+    if nome.endswith('.pdf'):
+        texto = extrair_texto_pdf(file_bytes, modo_pdf, backends=backends, tentativas=tentativas)
+    elif nome.endswith('.docx'):
+        texto = extrair_texto_docx(file_bytes)
+    else:
+        raise ValueError('Formato n\u00e3o suportado. Envie PDF ou DOCX.')
+    if not texto.strip():
+        raise ValueError('N\u00e3o foi poss\u00edvel extrair texto do arquivo. Verifique se o PDF n\u00e3o \u00e9 uma imagem escaneada.')
+    return parsear_tc(texto)
+
+
+def ler_tc_no_pool(nome: str, file_bytes: bytes, backends=None, instrumentar: bool = False,
+                   caminho: str = None) -> tuple:
+    """
+    ler_tc para os processos do pool: devolve (dados, tentativas, medi\u00e7\u00f5es)
+    para o pai somar os contadores dos backends e, se `instrumentar`, a medi\u00e7\u00e3o.
+    Com `caminho` (e file_bytes None), o arquivo \u00e9 aberto e lido por mmap aqui
+    mesmo, sem o pai copiar o conte\u00fado para o processo.
+    """
+    if caminho is not None:
+        with open(caminho, 'rb') as arquivo, mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            return ler_tc_no_pool(nome, mapa, backends, instrumentar)
+    tentativas = []
+    if instrumentar:
+        ativar_instrumentacao(1)
+    try:
+        return ler_tc(nome, file_bytes, backends=backends, tentativas=tentativas), tentativas, medicoes()
+    finally:
+        desativar_instrumentacao()
+
+
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
-# HELPERS DE REGEX
+# \u00cdNDICE DE PALAVRAS-CHAVE
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 
-def _primeiro(pattern, texto, flags=re.IGNORECASE):
-    try:
-        m = re.search(pattern, texto, flags)
-        if not m: return ""
-        return m.group(1).strip() if m.groups() else m.group(0).strip()
-    except IndexError:
-        return m.group(0).strip() if m else ""
+# Caracteres que o re.IGNORECASE iguala a 'i'/'s' mas que str.lower() n\u00e3o
+# converte (e '\u0130', cujo lower() tem 2 caracteres e deslocaria as posi\u00e7\u00f5es).
+_DOBRAS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+
+
+def _dobrar(texto):
+    """
+    Vers\u00e3o em min\u00fasculas com o mesmo comprimento do original: se uma regex
+    IGNORECASE casa uma palavra min\u00fascula na posi\u00e7\u00e3o p do texto, a palavra
+    aparece literalmente na posi\u00e7\u00e3o p desta vers\u00e3o.
+    """
+    if any(c in texto for c in '\u0130\u0131\u017f'):
+        texto = texto.translate(_DOBRAS)
+    return texto.lower()
 
 
-def _todos(pattern, texto, flags=re.IGNORECASE):
-    return [m.strip() for m in re.findall(pattern, texto, flags)]
+# Tamanho inicial (em caracteres) da janela de busca das \u00e2ncoras
+_JANELA = 2048
+
+
+class _Leitura:
+    """
+    O texto do TC e o \u00edndice das \u00e2ncoras na vers\u00e3o min\u00fascula. Cada palavra
+    \u00e9 procurada uma \u00fanica vez, da esquerda para a direita e s\u00f3 at\u00e9 onde algum
+    campo precisou olhar; as posi\u00e7\u00f5es achadas ficam para os campos seguintes.
+    """
+    def __init__(self, texto):
+        self.texto = texto
+        self.dobrado = _dobrar(texto)
+        self._indice = {}
+        self.numeros_soltos = None  # _numeros_soltos()
+
+    def _ocorrencias(self, palavra, inicio, fim, limite):
+        """ Posi\u00e7\u00f5es em [inicio, fim) onde a palavra cabe inteira antes de limite """
+        # [posi\u00e7\u00f5es achadas, at\u00e9 onde a lista est\u00e1 completa]
+        achadas = self._indice.get(palavra)
+        if achadas is None:
+            achadas = self._indice[palavra] = [[], 0]
+        posicoes = achadas[0]
+        i = bisect_left(posicoes, inicio)
+        while True:
+            if i == len(posicoes):
+                if achadas[1] >= fim:
+                    return
+                ate = min(fim + len(palavra) - 1, limite)
+                pos = self.dobrado.find(palavra, achadas[1], ate)
+                if pos < 0:
+                    achadas[1] = max(achadas[1], ate - len(palavra) + 1)
+                    return
+                achadas[1] = pos + 1
+                posicoes.append(pos)
+            pos = posicoes[i]
+            i += 1
+            if pos >= fim:
+                return
+            if pos >= inicio and pos + len(palavra) <= limite:
+                yield pos
+
+    def posicoes(self, ancoras, inicio=0, fim=None):
+        """
+        Posi\u00e7\u00f5es crescentes das \u00e2ncoras em [inicio, fim). O texto \u00e9 percorrido
+        em janelas que dobram de tamanho, para que uma \u00e2ncora ausente n\u00e3o
+        obrigue a varrer o TC inteiro quando outra aparece logo.
+        """
+        fim = len(self.texto) if fim is None else fim
+        janela = _JANELA
+        while inicio < fim:
+            ate = min(fim, inicio + janela)
+            yield from sorted({p for a in ancoras for p in self._ocorrencias(a, inicio, ate, fim)})
+            inicio, janela = ate, janela * 2
 
 
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
-# PARSER PRINCIPAL
+# EXTRATORES DE CAMPO
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 
-def _converter_data_extenso(texto):
-    meses = {
-        'janeiro': '01', 'fevereiro': '02', 'mar\u00e7o': '03', 'abril': '04',
-        'maio': '05', 'junho': '06', 'julho': '07', 'agosto': '08',
-        'setembro': '09', 'outubro': '10', 'novembro': '11', 'dezembro': '12'
-    }
-    m = re.search(r'([a-z\u00e1\u00e9\u00ed\u00f3\u00fa\u00e7]+)\s+dias\s+do\s+m\u00eas\s+de\s+([a-z\u00e1\u00ea\u00ed\u00f3\u00fa\u00e7]+)\s+do\s+ano\s+de\s+(\d{4})', texto, re.IGNORECASE)
-    if m:
-        dia_str = m.group(1).lower()
-        dias_map = {'primeiro': '01', 'dois': '02', 'tr\u00eas': '03', 'quatro': '04', 'cinco': '05', 'seis': '06', 'sete': '07', 'oito': '08', 'nove': '09', 'dez': '10', 'onze': '11', 'doze': '12', 'treze': '13', 'quatorze': '14', 'catorze': '14', 'quinze': '15', 'dezesseis': '16', 'dezessete': '17', 'dezoito': '18', 'dezenove': '19', 'vinte': '20', 'vinte e um': '21', 'vinte e dois': '22', 'vinte e tr\u00eas': '23', 'vinte e quatro': '24', 'vinte e cinco': '25', 'vinte e seis': '26', 'vinte e sete': '27', 'vinte e oito': '28', 'vinte e nove': '29', 'trinta': '30', 'trinta e um': '31'}
-        dia = dias_map.get(dia_str, dia_str.zfill(2) if dia_str.isdigit() else "01")
-        mes = meses.get(m.group(2).lower(), "01")
-        return f"{dia}/{mes}/{m.group(3)}"
+def _variantes_pontuadas(letras):
+    """ 'bou' -> bou, b.ou, bo.u, b.o.u (siglas com pontos opcionais) """
+    variantes = ['']
+    for i, letra in enumerate(letras):
+        variantes = [v + letra + ponto for v in variantes for ponto in (('', '.') if i < len(letras) - 1 else ('',))]
+    return variantes
+
+
+class _Campo:
+    """
+    Regex de um campo + \u00e2ncoras (palavras min\u00fasculas) com que toda ocorr\u00eancia
+    dela come\u00e7a. Tentar casar nas \u00e2ncoras em ordem equivale a re.search.
+    """
+    def __init__(self, padrao, ancoras, flags=re.IGNORECASE):
+        self.regex = re.compile(padrao, flags)
+        self.ancoras = frozenset(ancoras)
+
+    def buscar(self, leitura, inicio=0, fim=None):
+        texto = leitura.texto
+        fim_texto = len(texto) if fim is None else fim
+        for pos in leitura.posicoes(self.ancoras, inicio, fim):
+            m = self.regex.match(texto, pos, fim_texto)
+            if m:
+                return m
+        return None
+
+    def primeiro(self, leitura, inicio=0):
+        return _grupo(self.buscar(leitura, inicio))
+
+
+def _grupo(m):
+    if not m:
+        return ""
+    return m.group(1).strip() if m.groups() else m.group(0).strip()
+
+
+_LETRAS_NOME = 'A-Z\u00c1\u00c9\u00cd\u00d3\u00da\u00c3\u00d5\u00c2\u00ca\u00ce\u00d4\u00db\u00c0\u00c7'
+_ORDINAIS_VARA = '\u00aa\u00ba'
+_ORDINAIS_BPM = '\u00b0\u00ba'
+
+_BOU = _Campo(r'B\.?O\.?U\.?\s*[:\-]?\s*(\d+/\d+)', _variantes_pontuadas('bou'))
+_DATA_REGISTRO = _Campo(r'Data\s+(?:do\s+)?(?:Registro|fato|ocorr\u00eancia)\s*[:\-]?\s*(\d{2}/\d{2}/\d{4})', ['data'])
+_DATA_QUALQUER = re.compile(r'(\d{2}/\d{2}/\d{4})')
+_PROCESSO_CNJ = re.compile(r'(\d{7}-?\d{2}\.?\d{4}\.?\d\.?\d{2}\.?\d{4})')
+# As duas buscas sem palavra-\u00e2ncora numa passada s\u00f3: o lookahead testa as
+# duas em cada posi\u00e7\u00e3o sem consumir texto (nunca casam na mesma posi\u00e7\u00e3o:
+# a data tem '/' onde o CNJ tem d\u00edgito)
+_NUMEROS_SOLTOS = re.compile(r'(?=' + _DATA_QUALQUER.pattern + '|' + _PROCESSO_CNJ.pattern + ')')
+_AUTOS = _Campo(r'Autos\s*[:\-]?\s*([\d\.\-/]+)', ['autos'])
+_VARA = re.compile(r'(\d+[\u00aa\u00ba]?\s*(?:Juizado|Vara)[^\n,]+)', re.IGNORECASE)
+_VARA_ANCORAS = frozenset({'juizado', 'vara'})
+_JECRIM = _Campo(r'(JECRIM)', ['jecrim'])
+_AUDIENCIA = re.compile(r'em\s+data\s+de\s+(\d{2}/\d{2}/\d{2,4})', re.IGNORECASE)
+_ANCORA_DATA = frozenset({'data'})
+_NATUREZA = _Campo(r'Natureza\s*[:\-]?\s*([^\n]+)', ['natureza'])
+_FATOS = _Campo(r'fatos\s+notificados\s+como\s+([^\n]+)', ['fatos'])
+_ARTIGO = _Campo(r'(?:Art(?:igo)?\.?\s*\d+[^\n]{0,80})', ['art'])
+_BPM = re.compile(r'(\d+[\u00b0\u00ba]?\s*BPM[^\n]*)', re.IGNORECASE)
+_BPM_ANCORAS = frozenset({'bpm'})
+_PMPR = _Campo(r'P\.?M\.?P\.?R\.?\s*\n\s*([^\n]+)', _variantes_pontuadas('pmpr'))
+_UNIDADE = _Campo(r'Unidade\s*[:\-]?\s*([^\n]+)', ['unidade'])
+_ASSINATURA_PM = _Campo(r'ASSINATURA\s+POLICIAL\s+MILITAR\s*[:\-]?\s*\n\s*([' + _LETRAS_NOME + r'\s]{5,})', ['assinatura'])
+_AGENTE = _Campo(r'Agente\s*[:\-]?\s*([^\n]+)', ['agente'])
+_RG_POLICIAL = _Campo(r'RG\s*(?:do\s+Policial)?\s*[:\-]?\s*([\d\.\-]+)', ['rg'])
+_GRADUACAO = _Campo(r'(Soldado|Cabo|Sargento|Subtenente|Tenente|Capit\u00e3o|Major|Coronel)',
+                    ['soldado', 'cabo', 'sargento', 'subtenente', 'tenente', 'capit', 'major', 'coronel'])
+_OBSERVACAO = _Campo(r'Observa[\u00e7\u00e7][\u00e3\u00e3]o\s*[:\-]?\s*([^\n]+(?:\n\s+[^\n]+)*)', ['observa'])
+_HISTORICO = _Campo(r'Hist[\u00f3\u00f3]rico\s*[:\-]?\s*([^\n]+(?:\n\s+[^\n]+)*)', ['hist'])
+_DECLARACAO = _Campo(r'DECLARA[\u00c7\u00c7][\u00c3\u00c3]O\s+DO\s+NOTICIADO\s*[:\-]?\s*\n\s*([^\n]+(?:\n\s+[^\n]+)*)', ['declara'])
+
+# Noticiados (estas regex n\u00e3o usam IGNORECASE; as \u00e2ncoras min\u00fasculas cobrem qualquer caixa)
+_EU = _Campo(r'eu\s+([' + _LETRAS_NOME + r'\s]{10,}),\s*RG[/]PR\s*([\d\.\-]+)', ['eu'], flags=0)
+_COMPROMISSADO = _Campo(r'ASSINATURA\s+DO\s+COMPROMISSADO\s*\n\s*([' + _LETRAS_NOME + r'\s]{10,})\s*\n\s*RG\s*[:\-]?\s*([\d\.\-]+)',
+                        ['assinatura'], flags=0)
+_MARCADOR_NOTICIADO = _Campo(r'(?:NOTICIADO|AUTUADO|CONDUTOR|INDICIADO|R\u00c9U|NOME DO NOTICIADO)',
+                             ['noticiado', 'autuado', 'condutor', 'indiciado', 'r\u00e9u', 'nome do noticiado'])
+_NOME_LINHA = re.compile(r'^[' + _LETRAS_NOME + r'\s]{5,}$')
+_RG_LINHA = re.compile(r'RG\s*[:\-]?\s*([\d\.\-]+)', re.IGNORECASE)
+
+# Itens apreendidos
+_BLOCO_ITENS = _Campo(r'(?:OBJETO|ITEM|BEM|MATERIAL|ENTORPECENTE|APREENDIDO)[S]?[:\s]*\n(.*?)(?:\n\n|\Z)',
+                      ['objeto', 'item', 'bem', 'material', 'entorpecente', 'apreendido'],
+                      flags=re.IGNORECASE | re.DOTALL)
+
+# Padr\u00f5es de drogas conhecidas
+_DROGAS = {
+    'MACONHA': ['maconha', 'cannabis', 'marijuana', 'erva', 'baseado'],
+    'COCAINA': ['coca\u00edna', 'cocaina', 'p\u00f3', 'pasta base'],
+    'CRACK': ['crack', 'pedra'],
+    'ANFETAMINA': ['anfetamina', 'rebite', 'lan\u00e7a'],
+    'ECSTASY': ['ecstasy', 'mdma'],
+    'HAXIXE': ['haxixe', 'hash'],
+}
+# Todos os sin\u00f4nimos numa regex s\u00f3 (lookahead: acha os que se sobrep\u00f5em),
+# procurada uma vez no bloco de itens em vez de um `in` por sin\u00f4nimo
+# (os sin\u00f4nimos j\u00e1 est\u00e3o em min\u00fasculas, como o texto de _Leitura.dobrado)
+_SINONIMOS = sorted({sino for sinonimos in _DROGAS.values() for sino in sinonimos}, key=len, reverse=True)
+_SINONIMO_DROGA = re.compile('(?=(' + '|'.join(re.escape(sino) for sino in _SINONIMOS) + '))')
+# Na mesma posi\u00e7\u00e3o a alternativa mais longa vence: os sin\u00f4nimos que s\u00e3o prefixo
+# dela tamb\u00e9m est\u00e3o no texto
+_PREFIXOS_SINONIMO = {sino: {outro for outro in _SINONIMOS if sino.startswith(outro)} for sino in _SINONIMOS}
+_QUANTIDADE_DROGA = {
+    sino: _Campo(rf'{re.escape(sino)}[^\d]{{0,50}}([\d,\.]+)\s*(g|kg|gramas?|quilos?|unidades?|p\u00e9s?)?', [sino])
+    for sinonimos in _DROGAS.values() for sino in sinonimos
+}
+
+# Outros itens comuns pela nomenclatura do TC
+_OUTROS_ITENS = [
+    (_Campo(r'(aparelho\s+de\s+som[^\n]*)', ['aparelho']), 'SOM'),
+    (_Campo(r'(faca[^\n]*|canivete[^\n]*)', ['faca', 'canivete']), 'FACA'),
+    (_Campo(r'(simulacro[^\n]*|r\u00e9plica[^\n]*)', ['simulacro', 'r\u00e9plica']), 'SIMULACRO'),
+    (_Campo(r'(dinheiro[^\n]*|esp\u00e9cie[^\n]*|R\$\s*[\d\.,]+)', ['dinheiro', 'esp\u00e9cie', 'r$']), 'DINHEIRO'),
+    (_Campo(r'(celular[^\n]*|smartphone[^\n]*)', ['celular', 'smartphone']), 'OUTROS'),
+    (_Campo(r'(arma\s+de\s+fogo[^\n]*|pistola[^\n]*|rev\u00f3lver[^\n]*)', ['arma', 'pistola', 'rev\u00f3lver']), 'OUTROS'),
+]
+_VALOR_REAIS = re.compile(r'R\$\s*([\d\.,]+)')
+
+# Data por extenso ("aos vinte dias do m\u00eas de mar\u00e7o do ano de 2025")
+_MESES = {
+    'janeiro': '01', 'fevereiro': '02', 'mar\u00e7o': '03', 'abril': '04',
+    'maio': '05', 'junho': '06', 'julho': '07', 'agosto': '08',
+    'setembro': '09', 'outubro': '10', 'novembro': '11', 'dezembro': '12'
+}
+_DIAS = {'primeiro': '01', 'dois': '02', 'tr\u00eas': '03', 'quatro': '04', 'cinco': '05', 'seis': '06', 'sete': '07', 'oito': '08', 'nove': '09', 'dez': '10', 'onze': '11', 'doze': '12', 'treze': '13', 'quatorze': '14', 'catorze': '14', 'quinze': '15', 'dezesseis': '16', 'dezessete': '17', 'dezoito': '18', 'dezenove': '19', 'vinte': '20', 'vinte e um': '21', 'vinte e dois': '22', 'vinte e tr\u00eas': '23', 'vinte e quatro': '24', 'vinte e cinco': '25', 'vinte e seis': '26', 'vinte e sete': '27', 'vinte e oito': '28', 'vinte e nove': '29', 'trinta': '30', 'trinta e um': '31'}
+_EXTENSO = re.compile(r'([a-z\u00e1\u00e9\u00ed\u00f3\u00fa\u00e7]+)\s+dias\s+do\s+m\u00eas\s+de\s+([a-z\u00e1\u00ea\u00ed\u00f3\u00fa\u00e7]+)\s+do\s+ano\s+de\s+(\d{4})', re.IGNORECASE)
+_LETRA_EXTENSO = re.compile(r'[a-z\u00e1\u00e9\u00ed\u00f3\u00fa\u00e7]', re.IGNORECASE)
+_ANCORA_DIAS = frozenset({'dias'})
+
+# \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+# CAMPOS ANCORADOS NO MEIO DA REGEX
+# \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+# Nestes padr\u00f5es a palavra-chave n\u00e3o est\u00e1 no come\u00e7o; o in\u00edcio da ocorr\u00eancia
+# \u00e9 achado andando para tr\u00e1s a partir dela, o que mant\u00e9m o casamento mais
+# \u00e0 esquerda de re.search.
+
+def _recuar(texto, pos, aceita):
+    while pos > 0 and aceita(texto[pos - 1]):
+        pos -= 1
+    return pos
+
+
+def _numero_antes(leitura, ancoras, ordinais, regex):
+    """ \\d+[ordinal]?\\s*<\u00e2ncora>...: recua espa\u00e7os, ordinal e d\u00edgitos a partir da \u00e2ncora """
+    texto = leitura.texto
+    for pos in leitura.posicoes(ancoras):
+        inicio = _recuar(texto, pos, str.isspace)
+        if inicio > 0 and texto[inicio - 1] in ordinais:
+            inicio -= 1
+        digitos = _recuar(texto, inicio, str.isdecimal)
+        if digitos == inicio:
+            continue
+        m = regex.match(texto, digitos)
+        if m:
+            return _grupo(m)
     return ""
 
+
+def _data_audiencia(leitura):
+    """ em\\s+data\\s+de ...: a \u00e2ncora \u00e9 'data'; o 'em' vem antes dos espa\u00e7os """
+    texto = leitura.texto
+    for pos in leitura.posicoes(_ANCORA_DATA):
+        espacos = _recuar(texto, pos, str.isspace)
+        if espacos == pos or espacos < 2:
+            continue
+        if leitura.dobrado[espacos - 2:espacos] != 'em':
+            continue
+        m = _AUDIENCIA.match(texto, espacos - 2)
+        if m:
+            return _grupo(m)
+    return ""
+
+
+def _numeros_soltos(leitura):
+    """
+    (primeira data dd/mm/aaaa, primeiro n\u00famero CNJ) do texto, os mesmos de
+    _DATA_QUALQUER.search e _PROCESSO_CNJ.search, achados numa passada s\u00f3 que
+    para quando os dois aparecem. Fica guardado na leitura.
+    """
+    if leitura.numeros_soltos is None:
+        data = cnj = None
+        for m in _NUMEROS_SOLTOS.finditer(leitura.texto):
+            if data is None and m.group(1) is not None:
+                data = m.group(1)
+            elif cnj is None and m.group(2) is not None:
+                cnj = m.group(2)
+            if data is not None and cnj is not None:
+                break
+        leitura.numeros_soltos = ((data or "").strip(), (cnj or "").strip())
+    return leitura.numeros_soltos
+
+
+def _converter_data_extenso(leitura):
+    texto = leitura.texto
+    for pos in leitura.posicoes(_ANCORA_DIAS):
+        espacos = _recuar(texto, pos, str.isspace)
+        if espacos == pos:
+            continue
+        inicio = _recuar(texto, espacos, lambda c: _LETRA_EXTENSO.match(c) is not None)
+        if inicio == espacos:
+            continue
+        m = _EXTENSO.match(texto, inicio)
+        if m:
+            dia_str = m.group(1).lower()
+            dia = _DIAS.get(dia_str, dia_str.zfill(2) if dia_str.isdigit() else "01")
+            mes = _MESES.get(m.group(2).lower(), "01")
+            return f"{dia}/{mes}/{m.group(3)}"
+    return ""
+
+
+# \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+# INSTRUMENTA\u00c7\u00c3O
+# \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+# Desligada, parsear_tc s\u00f3 testa `_telemetria is None` uma vez por documento.
+# Ligada, cada documento vira uma medi\u00e7\u00e3o {'segundos', 'campos': {campo:
+# [alternativa que casou ou None, segundos]}} num anel com as \u00faltimas N.
+
+_telemetria = None
+_TRAVA_TELEMETRIA = threading.Lock()
+
+
+def ativar_instrumentacao(capacidade=1000):
+    global _telemetria
+    with _TRAVA_TELEMETRIA:
+        _telemetria = deque(maxlen=capacidade)
+
+
+def desativar_instrumentacao():
+    global _telemetria
+    with _TRAVA_TELEMETRIA:
+        _telemetria = None
+
+
+def instrumentacao_ativa():
+    return _telemetria is not None
+
+
+def registrar_medicao(medicao):
+    """ Guarda a medi\u00e7\u00e3o de um documento (as dos processos do pool chegam por aqui) """
+    with _TRAVA_TELEMETRIA:
+        if _telemetria is not None:
+            _telemetria.append(medicao)
+
+
+def medicoes():
+    with _TRAVA_TELEMETRIA:
+        return list(_telemetria or ())
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 3)
+
+
+def _p95(valores):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(0.95 * len(ordenados)))]
+
+
+def resumo_instrumentacao():
+    """
+    Agregado das medi\u00e7\u00f5es no anel: por campo, taxa de acerto, quantas vezes
+    cada alternativa casou e tempo m\u00e9dio/p95 (ms); e o tempo do documento todo.
+    """
+    lista = medicoes()
+    resumo = {'ativa': instrumentacao_ativa(), 'documentos': len(lista), 'campos': {}}
+    if not lista:
+        return resumo
+    totais = [m['segundos'] for m in lista]
+    resumo.update(ms_medio=_ms(sum(totais) / len(totais)), ms_p95=_ms(_p95(totais)))
+    por_campo = {}
+    for medicao in lista:
+        for campo, (casou, segundos) in medicao['campos'].items():
+            por_campo.setdefault(campo, []).append((casou, segundos))
+    for campo, valores in por_campo.items():
+        casaram = Counter(casou for casou, _ in valores if casou)
+        tempos = [segundos for _, segundos in valores]
+        resumo['campos'][campo] = {
+            'documentos': len(valores),
+            'taxa_acerto': round(sum(casaram.values()) / len(valores), 3),
+            'alternativas': dict(casaram.most_common()),
+            'ms_medio': _ms(sum(tempos) / len(tempos)),
+            'ms_p95': _ms(_p95(tempos)),
+        }
+    return resumo
+
+
+# \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+# PARSER PRINCIPAL
+# \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+
+# Cada campo \u00e9 uma sequ\u00eancia de alternativas (nome, extrator); vale a primeira
+# que acha algo. O nome aparece na instrumenta\u00e7\u00e3o como a alternativa que casou.
+_ALT_BOU = (('bou', _BOU.primeiro),)
+_ALT_DATA_REGISTRO = (
+    ('data_registro', _DATA_REGISTRO.primeiro),
+    ('extenso', _converter_data_extenso),
+    ('qualquer_data', lambda leitura: _numeros_soltos(leitura)[0]),
+)
+_ALT_PROCESSO = (
+    ('cnj', lambda leitura: _numeros_soltos(leitura)[1]),
+    ('autos', _AUTOS.primeiro),
+)
+_ALT_VARA = (
+    ('vara', lambda leitura: _numero_antes(leitura, _VARA_ANCORAS, _ORDINAIS_VARA, _VARA)),
+    ('jecrim', _JECRIM.primeiro),
+)
+_ALT_AUDIENCIA = (('em_data_de', _data_audiencia),)
+_ALT_NATUREZA = (
+    ('natureza', _NATUREZA.primeiro),
+    ('fatos', _FATOS.primeiro),
+    ('artigo', _ARTIGO.primeiro),
+)
+_ALT_UNIDADE = (
+    ('bpm', lambda leitura: _numero_antes(leitura, _BPM_ANCORAS, _ORDINAIS_BPM, _BPM)),
+    ('pmpr', _PMPR.primeiro),
+    ('unidade', _UNIDADE.primeiro),
+)
+_ALT_POLICIAL = (
+    ('assinatura', _ASSINATURA_PM.primeiro),
+    ('agente', _AGENTE.primeiro),
+)
+_ALT_POLICIAL_RG = (
+    ('apos_assinatura', lambda leitura: _RG_POLICIAL.primeiro(
+        leitura, inicio=max(leitura.texto.find('ASSINATURA POLICIAL'), 0))),
+)
+_ALT_GRADUACAO = (('graduacao', _GRADUACAO.primeiro),)
+_ALT_OBSERVACAO = (
+    ('observacao', _OBSERVACAO.primeiro),
+    ('historico', _HISTORICO.primeiro),
+    ('declaracao', _DECLARACAO.primeiro),
+)
+
+
+def _extrair(medicao, campo, leitura, alternativas):
+    """ Valor da primeira alternativa que acha algo ("" se nenhuma); com `medicao`, anota qual foi e o tempo """
+    if medicao is None:
+        for _, extrator in alternativas:
+            valor = extrator(leitura)
+            if valor:
+                return valor
+        return ""
+    inicio, valor, casou = time.perf_counter(), "", None
+    for nome, extrator in alternativas:
+        valor = extrator(leitura)
+        if valor:
+            casou = nome
+            break
+    medicao[campo] = [casou, time.perf_counter() - inicio]
+    return valor
+
+
+def _extrair_lista(medicao, campo, leitura, extrator):
+    """ Noticiados/itens: o extrator anota em `fontes` de onde tirou a lista """
+    if medicao is None:
+        return extrator(leitura)
+    inicio, fontes = time.perf_counter(), []
+    valor = extrator(leitura, fontes)
+    medicao[campo] = ['+'.join(fontes) if valor else None, time.perf_counter() - inicio]
+    return valor
+
+
+def _processo(leitura):
+    return _extrair(None, 'processo', leitura, _ALT_PROCESSO)
+
+
+def _vara(leitura):
+    return _extrair(None, 'vara', leitura, _ALT_VARA)
+
+
+def _natureza(leitura):
+    return _extrair(None, 'natureza_penal', leitura, _ALT_NATUREZA)
+
+
+# Campos que o modo 'cabecalho' da extra\u00e7\u00e3o de PDF espera achar antes de parar
+_CAMPOS_CABECALHO = {
+    'bou': _BOU.primeiro,
+    'processo': _processo,
+    'vara': _vara,
+    'natureza': _natureza,
+    'itens': _BLOCO_ITENS.buscar,
+}
+
+
+def campos_cabecalho(texto, faltando=None):
+    """ Quais dos campos do cabe\u00e7alho (e o bloco de itens) ainda n\u00e3o aparecem no texto """
+    leitura = _Leitura(texto)
+    return {campo for campo in (_CAMPOS_CABECALHO if faltando is None else faltando) if not _CAMPOS_CABECALHO[campo](leitura)}
+
+
+def texto_aceitavel(texto):
+    """ Teste de qualidade da extra\u00e7\u00e3o: o texto tem BOU ou n\u00famero de processo """
+    leitura = _Leitura(texto)
+    return bool(_BOU.primeiro(leitura) or _processo(leitura))
+
+
 def parsear_tc(texto: str) -> dict:
     """
     Recebe o texto bruto do TC e devolve um dicion\u00e1rio estruturado.
     """
+    medicao = {} if _telemetria is not None else None
+    inicio_parser = time.perf_counter() if medicao is not None else 0
+    leitura = _Leitura(texto)
+
     # \u2500\u2500 BOU \u2500\u2500 (Suporta YYYY/NNNN e NNNN/YYYY)
-    bou_match = re.search(r'B\.?O\.?U\.?\s*[:\-]?\s*(\d+/\d+)', texto, re.IGNORECASE)
-    bou = bou_match.group(1) if bou_match else ""
+    bou = _extrair(medicao, 'bou', leitura, _ALT_BOU)
     if bou and '/' in bou:
         parts = bou.split('/')
         if len(parts[0]) == 4 and parts[0].startswith('20'): bou = f"{parts[0]}/{parts[1]}"
         elif len(parts[1]) == 4 and parts[1].startswith('20'): bou = f"{parts[1]}/{parts[0]}"
 
     # \u2500\u2500 DATA DO REGISTRO \u2500\u2500
-    data_registro = (_primeiro(r'Data\s+(?:do\s+)?(?:Registro|fato|ocorr\u00eancia)\s*[:\-]?\s*(\d{2}/\d{2}/\d{4})', texto) or
-                     _converter_data_extenso(texto) or
-                     _primeiro(r'(\d{2}/\d{2}/\d{4})', texto))
+    data_registro = _extrair(medicao, 'data_registro', leitura, _ALT_DATA_REGISTRO)
 
     # \u2500\u2500 PROCESSO / NUMER DOS AUTOS \u2500\u2500 (Suporta CNJ com ou sem pontua\u00e7\u00e3o)
-    processo = (_primeiro(r'(\d{7}-?\d{2}\.?\d{4}\.?\d\.?\d{2}\.?\d{4})', texto) or   
-                _primeiro(r'Autos\s*[:\-]?\s*([\d\.\-/]+)', texto))
+    processo = _extrair(medicao, 'processo', leitura, _ALT_PROCESSO)
 
     # \u2500\u2500 VARA \u2500\u2500
-    vara = (_primeiro(r'(\d+[\u00aa\u00ba]?\s*(?:Juizado|Vara)[^\n,]+)', texto) or
-            _primeiro(r'(JECRIM)', texto))
+    vara = _extrair(medicao, 'vara', leitura, _ALT_VARA)
 
     # \u2500\u2500 DATA DA AUDI\u00caNCIA \u2500\u2500
-    data_audiencia = _primeiro(r'em\s+data\s+de\s+(\d{2}/\d{2}/\d{2,4})', texto)
+    data_audiencia = _extrair(medicao, 'data_audiencia', leitura, _ALT_AUDIENCIA)
 
     # \u2500\u2500 NATUREZA PENAL \u2500\u2500
-    natureza = (_primeiro(r'Natureza\s*[:\-]?\s*([^\n]+)', texto) or
-                _primeiro(r'fatos\s+notificados\s+como\s+([^\n]+)', texto) or
-                _primeiro(r'(?:Art(?:igo)?\.?\s*\d+[^\n]{0,80})', texto))
+    natureza = _extrair(medicao, 'natureza_penal', leitura, _ALT_NATUREZA)
 
     # \u2500\u2500 UNIDADE / BATALH\u00c3O \u2500\u2500
-    unidade = (_primeiro(r'(\d+[\u00b0\u00ba]?\s*BPM[^\n]*)', texto) or
-               _primeiro(r'P\.?M\.?P\.?R\.?\s*\n\s*([^\n]+)', texto) or
-               _primeiro(r'Unidade\s*[:\-]?\s*([^\n]+)', texto))
+    unidade = _extrair(medicao, 'unidade_origem', leitura, _ALT_UNIDADE)
 
     # \u2500\u2500 POLICIAL \u2500\u2500
-    policial_nome = (_primeiro(r'ASSINATURA\s+POLICIAL\s+MILITAR\s*[:\-]?\s*\n\s*([A-Z\u00c1\u00c9\u00cd\u00d3\u00da\u00c3\u00d5\u00c2\u00ca\u00ce\u00d4\u00db\u00c0\u00c7\s]{5,})', texto) or
-                     _primeiro(r'Agente\s*[:\-]?\s*([^\n]+)', texto))
-    policial_rg = _primeiro(r'RG\s*(?:do\s+Policial)?\s*[:\-]?\s*([\d\.\-]+)', texto[texto.find('ASSINATURA POLICIAL'):] if 'ASSINATURA POLICIAL' in texto else texto)
-    policial_graduacao = _primeiro(r'(Soldado|Cabo|Sargento|Subtenente|Tenente|Capit\u00e3o|Major|Coronel)', texto)
+    policial_nome = _extrair(medicao, 'policial_nome', leitura, _ALT_POLICIAL)
+    policial_rg = _extrair(medicao, 'policial_rg', leitura, _ALT_POLICIAL_RG)
+    policial_graduacao = _extrair(medicao, 'policial_graduacao', leitura, _ALT_GRADUACAO)
 
-    # \u2500\u2500 NOTICIADOS \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
+    # \u2500\u2500 NOTICIADOS \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
     # Tenta identificar blocos separados por "NOTICIADO", "AUTUADO", "CONDUTOR", etc.
-    noticiados = _extrair_noticiados(texto)
+    noticiados = _extrair_lista(medicao, 'noticiados', leitura, _extrair_noticiados)
 
     # \u2500\u2500 ITENS APREENDIDOS \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
-    itens = _extrair_itens(texto)
+    itens = _extrair_lista(medicao, 'itens_apreendidos', leitura, _extrair_itens)
 
     # \u2500\u2500 OBSERVA\u00c7\u00c3O \u2500\u2500
-    observacao = (_primeiro(r'Observa[\u00e7\u00e7][\u00e3\u00e3]o\s*[:\-]?\s*([^\n]+(?:\n\s+[^\n]+)*)', texto) or
-                  _primeiro(r'Hist[\u00f3\u00f3]rico\s*[:\-]?\s*([^\n]+(?:\n\s+[^\n]+)*)', texto) or
-                  _primeiro(r'DECLARA[\u00c7\u00c7][\u00c3\u00c3]O\s+DO\s+NOTICIADO\s*[:\-]?\s*\n\s*([^\n]+(?:\n\s+[^\n]+)*)', texto))
+    observacao = _extrair(medicao, 'observacao', leitura, _ALT_OBSERVACAO)
+
+    if medicao is not None:
+        registrar_medicao({'segundos': time.perf_counter() - inicio_parser, 'campos': medicao})
 
     return {
         'bou': bou,
@@ -145,34 +876,36 @@ def parsear_tc(texto: str) -> dict:
 # EXTRA\u00c7\u00c3O DE NOTICIADOS
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 
-def _extrair_noticiados(texto: str) -> list:
+def _extrair_noticiados(leitura, fontes=None) -> list:
+    texto = leitura.texto
     noticiados = []
-    
+    fontes = [] if fontes is None else fontes
+
     # Busca por blocos de assinatura ou "eu [NOME]"
-    m_eu = re.search(r'eu\s+([A-Z\u00c1\u00c9\u00cd\u00d3\u00da\u00c3\u00d5\u00c2\u00ca\u00ce\u00d4\u00db\u00c0\u00c7\s]{10,}),\s*RG[/]PR\s*([\d\.\-]+)', texto)
+    m_eu = _EU.buscar(leitura) if 'RG/PR' in texto else None
     if m_eu:
+        fontes.append('eu')
         noticiados.append({'nome': m_eu.group(1).strip().title(), 'rg': m_eu.group(2).strip(), 'cpf': '', 'data_nascimento': ''})
 
     # Busca em assinatura do compromissado
-    m_ass = re.search(r'ASSINATURA\s+DO\s+COMPROMISSADO\s*\n\s*([A-Z\u00c1\u00c9\u00cd\u00d3\u00da\u00c3\u00d5\u00c2\u00ca\u00ce\u00d4\u00db\u00c0\u00c7\s]{10,})\s*\n\s*RG\s*[:\-]?\s*([\d\.\-]+)', texto)
+    m_ass = _COMPROMISSADO.buscar(leitura)
     if m_ass:
         nome_ass = m_ass.group(1).strip().title()
         if not any(n['nome'] == nome_ass for n in noticiados):
+            fontes.append('compromissado')
             noticiados.append({'nome': nome_ass, 'rg': m_ass.group(2).strip(), 'cpf': '', 'data_nascimento': ''})
 
     if not noticiados:
+        fontes.append('blocos')
         # Palavras-chave que indicam in\u00edcio de bloco de noticiado
-        marcadores = r'(?:NOTICIADO|AUTUADO|CONDUTOR|INDICIADO|R\u00c9U|NOME DO NOTICIADO)'
-        blocos = re.split(marcadores, texto, flags=re.IGNORECASE)
-
-        for bloco in blocos[1:]:  # pula a parte antes do primeiro noticiado
+        for bloco in _blocos_noticiados(leitura):
             linhas = bloco.strip().split('\n')
             nome = ""; rg = ""; cpf = ""; data_nasc = ""
             for linha in linhas[:20]:
                 linha = linha.strip()
-                if not nome and re.match(r'^[A-Z\u00c1\u00c9\u00cd\u00d3\u00da\u00c3\u00d5\u00c2\u00ca\u00ce\u00d4\u00db\u00c0\u00c7\s]{5,}$', linha):
+                if not nome and _NOME_LINHA.match(linha):
                     nome = linha.title()
-                rg_m = re.search(r'RG\s*[:\-]?\s*([\d\.\-]+)', linha, re.IGNORECASE)
+                rg_m = _RG_LINHA.search(linha)
                 if rg_m and not rg: rg = rg_m.group(1)
             if nome or rg:
                 noticiados.append({
@@ -182,42 +915,49 @@ def _extrair_noticiados(texto: str) -> list:
     return noticiados
 
 
+def _blocos_noticiados(leitura):
+    """ Trechos depois de cada marcador (como re.split, sem a parte antes do primeiro) """
+    texto = leitura.texto
+    fim_anterior, blocos_inicio = 0, []
+    for pos in leitura.posicoes(_MARCADOR_NOTICIADO.ancoras):
+        if pos < fim_anterior:
+            continue
+        m = _MARCADOR_NOTICIADO.regex.match(texto, pos)
+        if m:
+            blocos_inicio.append((m.start(), m.end()))
+            fim_anterior = m.end()
+    for i, (_, fim) in enumerate(blocos_inicio):
+        proximo = blocos_inicio[i + 1][0] if i + 1 < len(blocos_inicio) else len(texto)
+        yield texto[fim:proximo]
+
+
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 # EXTRA\u00c7\u00c3O DE ITENS APREENDIDOS
 # \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500
 
-def _extrair_itens(texto: str) -> list:
+def _extrair_itens(leitura, fontes=None) -> list:
     """
     Extrai os bens/entorpecentes apreendidos.
     Procura pelo bloco de apreens\u00e3o e lista os itens.
     """
+    texto = leitura.texto
     itens = []
 
     # Tenta isolar o bloco de itens apreendidos
-    match_bloco = re.search(
-        r'(?:OBJETO|ITEM|BEM|MATERIAL|ENTORPECENTE|APREENDIDO)[S]?[:\s]*\n(.*?)(?:\n\n|\Z)',
-        texto, re.IGNORECASE | re.DOTALL
-    )
-    bloco = match_bloco.group(1) if match_bloco else texto
-
-    # Padr\u00f5es de drogas conhecidas
-    drogas_map = {
-        'MACONHA': ['maconha', 'cannabis', 'marijuana', 'erva', 'baseado'],
-        'COCAINA': ['coca\u00edna', 'cocaina', 'p\u00f3', 'pasta base'],
-        'CRACK': ['crack', 'pedra'],
-        'ANFETAMINA': ['anfetamina', 'rebite', 'lan\u00e7a'],
-        'ECSTASY': ['ecstasy', 'mdma'],
-        'HAXIXE': ['haxixe', 'hash'],
-    }
-
-    # Verificar entorpecentes no texto
-    texto_upper = bloco.upper()
-    for droga_key, sinonimos in drogas_map.items():
+    match_bloco = _BLOCO_ITENS.buscar(leitura)
+    inicio, fim = match_bloco.span(1) if match_bloco else (0, len(texto))
+    if fontes is not None:
+        fontes.append('bloco' if match_bloco else 'texto_todo')
+
+    # Verificar entorpecentes no texto: uma passada acha todos os sin\u00f4nimos presentes
+    presentes = set()
+    for m in _SINONIMO_DROGA.finditer(leitura.dobrado, inicio, fim):
+        presentes |= _PREFIXOS_SINONIMO[m.group(1)]
+    for droga_key, sinonimos in _DROGAS.items():
         for sino in sinonimos:
-            if sino.upper() in texto_upper:
+            if sino in presentes:
                 # Tenta capturar quantidade pr\u00f3xima
-                pattern = rf'{re.escape(sino)}[^\d]{{0,50}}([\d,\.]+)\s*(g|kg|gramas?|quilos?|unidades?|p\u00e9s?)?'
-                m = re.search(pattern, bloco, re.IGNORECASE)
+                m = _QUANTIDADE_DROGA[sino].buscar(leitura, inicio, fim)
                 qtd = m.group(1).replace(',', '.') if m else "0"
                 unid = (m.group(2) or 'G').upper()[:2] if m else 'G'
                 if unid.startswith('K'): unid = 'KG'
@@ -232,21 +972,13 @@ def _extrair_itens(texto: str) -> list:
                 break
 
     # Verificar outros itens comuns pela nomenclatura do TC
-    outros_patterns = [
-        (r'(aparelho\s+de\s+som[^\n]*)', 'SOM'),
-        (r'(faca[^\n]*|canivete[^\n]*)', 'FACA'),
-        (r'(simulacro[^\n]*|r\u00e9plica[^\n]*)', 'SIMULACRO'),
-        (r'(dinheiro[^\n]*|esp\u00e9cie[^\n]*|R\$\s*[\d\.,]+)', 'DINHEIRO'),
-        (r'(celular[^\n]*|smartphone[^\n]*)', 'OUTROS'),
-        (r'(arma\s+de\s+fogo[^\n]*|pistola[^\n]*|rev\u00f3lver[^\n]*)', 'OUTROS'),
-    ]
-    for pattern, cat in outros_patterns:
-        m = re.search(pattern, bloco, re.IGNORECASE)
+    for campo, cat in _OUTROS_ITENS:
+        m = campo.buscar(leitura, inicio, fim)
         if m:
             desc = m.group(1).strip()
             valor = None
             if cat == 'DINHEIRO':
-                vm = re.search(r'R\$\s*([\d\.,]+)', desc)
+                vm = _VALOR_REAIS.search(desc)
                 valor = vm.group(1).replace('.', '').replace(',', '.') if vm else None
             itens.append({
                 'categoria': cat,
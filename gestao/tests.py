@@ -1,3 +1,1499 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+from datetime import date
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save
+from django.test import (
+    AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    arquivos_gerados, custodia, documentos_cache, documentos_exportacao, documentos_pacote, documentos_services,
+    historico, inventario_exportacao, lotes_automaticos, outbox, processos, tarefas_documentos, tc_assincrono,
+    tc_cache, tc_corpus, tc_lote, tc_parser, uploads, views,
+)
+from .models import (
+    Ocorrencia, Noticiado, Material, LoteIncineracao, CaixaIncineracao, ArquivoGerado, EventoOutbox, TarefaDocumento,
+    HistoricoArquivado, ProcessoPendente, RegistroHistorico, modelo_arquivo_historico,
+)
+
+
+class DadosCartorioMixin:
+    """ Cria ocorrências/noticiados/materiais mínimos para os testes """
+
+    def criar_usuario(self):
+        return User.objects.create_user('escrivao', password='senha-teste', first_name='Escrivao', last_name='Teste')
+
+    def criar_ocorrencia(self, n, vara='VARA_01', processo=None, **kwargs):
+        return Ocorrencia.objects.create(
+            bou=f"2025/{n:05d}", vara=vara, processo=processo,
+            policial_nome='Soldado Teste', rg_policial='123', **kwargs
+        )
+
+    def criar_material(self, ocorrencia, nome='FULANO', **kwargs):
+        noticiado = Noticiado.objects.create(ocorrencia=ocorrencia, nome=nome)
+        dados = {'categoria': 'ENTORPECENTE', 'substancia': 'MACONHA', 'peso_estimado': 10, 'unidade': 'G'}
+        dados.update(kwargs)
+        return Material.objects.create(noticiado=noticiado, **dados)
+
+    def criar_lote(self, identificador, n_processos=2, inicio=1):
+        lote = LoteIncineracao.objects.create(identificador=identificador)
+        for i in range(inicio, inicio + n_processos):
+            oc = self.criar_ocorrencia(i)
+            self.criar_material(oc, lote=lote, status='AGUARDANDO_INCINERACAO', numero_lacre=f"L{i}")
+        return lote
+
+
+class DocumentosCacheTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.client.force_login(self.criar_usuario())
+        self.lote = self.criar_lote('LOTE-TESTE-001')
+        self.url = reverse('pdf_capa_lote', args=[self.lote.id])
+
+    def test_reimpressao_reutiliza_pdf_e_responde_304(self):
+        with mock.patch.object(documentos_services, 'gerar_capa_lote_pdf',
+                               wraps=documentos_services.gerar_capa_lote_pdf) as gerar:
+            r1 = self.client.get(self.url)
+            self.assertEqual(r1.status_code, 200)
+            self.assertTrue(b''.join(r1.streaming_content).startswith(b'%PDF'))
+
+            # sessão + usuário + a query de impressão digital
+            with self.assertNumQueries(3):
+                r2 = self.client.get(self.url, HTTP_IF_NONE_MATCH=r1['ETag'])
+            self.assertEqual(r2.status_code, 304)
+
+            r3 = self.client.get(self.url)
+            b''.join(r3.streaming_content)
+            self.assertEqual(r3['ETag'], r1['ETag'])
+            self.assertEqual(gerar.call_count, 1)
+
+    def test_pdf_maior_que_o_limite_do_cache_ainda_e_servido(self):
+        with override_settings(DOCUMENTOS_CACHE_MAX_BYTES=1):
+            primeiro = b''.join(self.client.get(self.url).streaming_content)
+            segundo = b''.join(self.client.get(reverse('pdf_capa_lote', args=[self.criar_lote('LOTE-TESTE-002', inicio=3).id]))
+                               .streaming_content)
+        self.assertTrue(primeiro.startswith(b'%PDF') and primeiro.rstrip().endswith(b'%%EOF'))
+        self.assertTrue(segundo.startswith(b'%PDF') and segundo.rstrip().endswith(b'%%EOF'))
+        # O segundo ficou; o primeiro foi despejado
+        self.assertEqual(len(os.listdir(os.path.join(self.media, 'cache_documentos'))), 1)
+
+    def test_arquivo_despejado_depois_de_aberto_continua_legivel(self):
+        gerar = lambda destino: destino.write(b'%PDF-1.4 teste')
+        with documentos_cache.obter_documento('chave', gerar) as arquivo:
+            pass
+        with documentos_cache.obter_documento('chave', gerar) as arquivo:
+            documentos_cache.limpar()
+            self.assertEqual(arquivo.read(), b'%PDF-1.4 teste')
+
+    def test_chave_por_dia_segue_o_fuso_local(self):
+        with mock.patch.object(documentos_cache.timezone, 'localdate', return_value=date(2025, 1, 1)):
+            primeira = documentos_cache.chave_documento('relatorio', [1], ('x',), por_dia=True)
+        with mock.patch.object(documentos_cache.timezone, 'localdate', return_value=date(2025, 1, 2)):
+            segunda = documentos_cache.chave_documento('relatorio', [1], ('x',), por_dia=True)
+        self.assertNotEqual(primeira, segunda)
+
+    def test_alteracao_no_material_invalida_o_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        material = self.lote.materiais.first()
+        material.numero_lacre = 'NOVO-LACRE'
+        material.save()
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
+
+
+class OficioRemessaTests(DadosCartorioMixin, TestCase):
+    def test_oficio_e_entregue_sem_arquivar_em_media(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.client.force_login(self.criar_usuario())
+        oc = self.criar_ocorrencia(1)
+        som = self.criar_material(oc, categoria='SOM', substancia=None, descricao_geral='Caixa de som',
+                                  status='AGUARDANDO_OFICIO')
+
+        with override_settings(MEDIA_ROOT=media):
+            r = self.client.post(reverse('gerar_oficio_remessa'), {'itens_selecionados': [som.id]})
+
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(b''.join(r.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(os.listdir(media), [])
+
+
+class FilaDocumentosTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.criar_usuario())
+        self.lote = self.criar_lote('LOTE-FILA-001')
+
+    def test_enfileirar_executar_e_baixar(self):
+        r = self.client.post(reverse('api_enfileirar_documento'),
+                             {'tipo': 'certidao_antecipada', 'lote': [self.lote.id]})
+        self.assertEqual(r.status_code, 202)
+        tarefa_id = r.json()['id']
+
+        download = reverse('baixar_documento_tarefa', args=[tarefa_id])
+        self.assertEqual(self.client.get(download).status_code, 409)
+
+        self.assertEqual(tarefas_documentos.reservar_proxima(), tarefa_id)
+        self.assertIsNone(tarefas_documentos.reservar_proxima())
+        self.assertTrue(tarefas_documentos.executar_tarefa(tarefa_id))
+
+        status = self.client.get(reverse('api_status_documento', args=[tarefa_id])).json()
+        self.assertEqual((status['status'], status['progresso']), ('CONCLUIDO', 100))
+        r = self.client.get(download)
+        self.assertTrue(b''.join(r.streaming_content).startswith(b'%PDF'))
+
+    def test_tarefa_interrompida_volta_para_fila(self):
+        tarefa = tarefas_documentos.enfileirar('CAPA_LOTE', {'lote_id': self.lote.id})
+        tarefas_documentos.reservar_proxima()
+        # Reserva em dia: é de um worker vivo e não volta para a fila
+        self.assertEqual(tarefas_documentos.recuperar_interrompidas(), 0)
+
+        TarefaDocumento.objects.filter(id=tarefa.id).update(
+            ultima_alteracao=timezone.now() - timezone.timedelta(seconds=settings.DOCUMENTOS_RESERVA_SEGUNDOS + 1))
+        self.assertEqual(tarefas_documentos.recuperar_interrompidas(), 1)
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'PENDENTE')
+
+    def test_erro_no_construtor_fica_registrado(self):
+        tarefa = tarefas_documentos.enfileirar('CAPA_LOTE', {'lote_id': 999999})
+        tarefas_documentos.reservar_proxima()
+        self.assertFalse(tarefas_documentos.executar_tarefa(tarefa.id))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'ERRO')
+
+
+class RelatorioPaginadoTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        for i in range(1, 61):
+            oc = self.criar_ocorrencia(i, vara='VARA_01' if i % 2 else 'VARA_02')
+            self.criar_material(oc, nome=f"NOTICIADO {i}", numero_lacre=f"L{i:04d}")
+        self.qs = Material.objects.select_related('noticiado__ocorrencia').order_by('id')
+
+    def _texto(self, buffer):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(buffer.getvalue())
+        try:
+            return len(pdf), "\n".join(pdf[i].get_textpage().get_text_range() for i in range(len(pdf)))
+        finally:
+            pdf.close()
+
+    def test_modo_paginado_mantem_linhas_e_numeracao(self):
+        unica, paginada = BytesIO(), BytesIO()
+        documentos_services.gerar_relatorio_filtrado_pdf(self.qs, {}, destino=unica, paginado=False)
+        # resumo agregado + leitura do queryset em blocos
+        with self.assertNumQueries(2):
+            documentos_services.gerar_relatorio_filtrado_pdf(self.qs, {}, destino=paginada, paginado=True, chunk_size=7)
+
+        paginas_unica, texto_unica = self._texto(unica)
+        paginas, texto = self._texto(paginada)
+        self.assertEqual(paginas, paginas_unica)
+        for i in (1, 25, 26, 60):
+            self.assertIn(f"L{i:04d}", texto)
+        self.assertIn("\n60 ", texto)
+        self.assertEqual(len(re.findall(r'NOTICIADO \d+', texto)), len(re.findall(r'NOTICIADO \d+', texto_unica)))
+
+    def test_cabecalho_so_tem_a_data_de_emissao(self):
+        # O relatório fica em cache o dia inteiro; uma hora impressa ficaria velha
+        buffer = BytesIO()
+        documentos_services.gerar_relatorio_filtrado_pdf(self.qs, {}, destino=buffer)
+        _, texto = self._texto(buffer)
+        self.assertIn(f"Gerado em {timezone.localdate().strftime('%d/%m/%Y')} - 60 registro(s)", texto)
+
+    def test_modo_paginado_agrupa_por_vara(self):
+        buffer = BytesIO()
+        documentos_services.gerar_relatorio_filtrado_pdf(self.qs, {}, tipo='remessa', destino=buffer, paginado=True)
+        _, texto = self._texto(buffer)
+        self.assertEqual(texto.count('DESTINO / JURISDICAO'), 2)
+        self.assertIn('(30 itens)', texto)
+
+
+class ReportLabInternosTests(SimpleTestCase):
+    """ Fixa os internos do ReportLab (4.4.10) usados por _CanvasCompacto e _StoryPreguicosa """
+
+    def test_canvas_compacto_libera_cada_pagina_ao_fechar(self):
+        import pypdfium2
+        from reportlab.pdfbase.pdfdoc import PDFStream
+        buffer = BytesIO()
+        c = documentos_services._CanvasCompacto(buffer)
+        for i in range(3):
+            c.drawString(100, 700, f"PAGINA {i}")
+            c.showPage()
+            pagina = c._doc.Pages.pages[-1]
+            self.assertIsNone(pagina.stream)
+            self.assertIsInstance(pagina.Contents, PDFStream)
+        c.save()
+
+        pdf = pypdfium2.PdfDocument(buffer.getvalue())
+        try:
+            self.assertEqual([pdf[i].get_textpage().get_text_range() for i in range(len(pdf))],
+                             ['PAGINA 0', 'PAGINA 1', 'PAGINA 2'])
+        finally:
+            pdf.close()
+
+    def test_story_preguicosa_e_consumida_aos_poucos(self):
+        from reportlab.platypus import Flowable, SimpleDocTemplate
+
+        estado = {'gerados': 0, 'desenhados': 0, 'pendentes': 0}
+
+        class Linha(Flowable):
+            def wrap(self, largura, altura):
+                return largura, 20
+
+            def draw(self):
+                estado['desenhados'] += 1
+
+        def gerador():
+            for _ in range(300):
+                estado['gerados'] += 1
+                estado['pendentes'] = max(estado['pendentes'], estado['gerados'] - estado['desenhados'])
+                yield Linha()
+
+        SimpleDocTemplate(BytesIO()).build(documentos_services._StoryPreguicosa(gerador()))
+        self.assertEqual(estado['desenhados'], 300)
+        self.assertLessEqual(estado['pendentes'], 10)
+
+
+class OrcamentoQueriesDocumentosTests(DadosCartorioMixin, TestCase):
+    """ O número de queries de cada documento não depende de quantos lotes/materiais ele tem """
+
+    def _gerar(self, funcao, *args, **kwargs):
+        funcao(*args, destino=BytesIO(), **kwargs)
+
+    def test_documentos_de_lotes(self):
+        usuario = self.criar_usuario()
+        pequeno = [self.criar_lote('LOTE-A', n_processos=1, inicio=1)]
+        grande = [self.criar_lote(f'LOTE-B{i}', n_processos=4, inicio=10 + i * 4) for i in range(4)]
+
+        for lotes in (pequeno, grande):
+            ids = [l.id for l in lotes]
+            qs = LoteIncineracao.objects.filter(id__in=ids).order_by('identificador')
+            with self.subTest(lotes=len(lotes)):
+                with self.assertNumQueries(1):
+                    self._gerar(documentos_services.gerar_capa_lote_pdf, lotes[-1], usuario)
+                with self.assertNumQueries(2):
+                    self._gerar(documentos_services.gerar_capas_lote_coletivas, ids)
+                with self.assertNumQueries(2):
+                    _, info = documentos_services.gerar_certidao_incineracao_antecipada(qs, usuario, destino=BytesIO())
+                with self.assertNumQueries(2):
+                    self._gerar(documentos_services.gerar_certidao_incineracao_coletiva, qs, usuario)
+            self.assertEqual([i['materiais'] for i in info], [len(l.materiais.all()) for l in qs])
+            self.assertEqual([i['processos'] for i in info], [l.processos_count for l in qs])
+
+    def test_documentos_de_materiais(self):
+        usuario = self.criar_usuario()
+        for n in (1, 12):
+            oc = self.criar_ocorrencia(100 + n, criado_por=usuario)
+            for i in range(n):
+                self.criar_material(oc, nome=f"NOTICIADO {i}", categoria='SOM', substancia=None,
+                                    descricao_geral='Caixa de som')
+            oc = Ocorrencia.objects.select_related('criado_por').get(id=oc.id)
+            materiais = Material.objects.filter(noticiado__ocorrencia=oc)
+            primeiro = materiais.first()
+            with self.subTest(materiais=n):
+                with self.assertNumQueries(1):
+                    self._gerar(documentos_services.gerar_recibo_entrada_pdf, oc)
+                with self.assertNumQueries(1):
+                    self._gerar(documentos_services.gerar_oficio_materiais_gerais, materiais, usuario)
+                with self.assertNumQueries(1):
+                    self._gerar(documentos_services.gerar_recibo_entrega_unico, primeiro)
+                with self.assertNumQueries(2):
+                    self._gerar(documentos_services.gerar_relatorio_filtrado_pdf, materiais, {}, 'remessa')
+
+
+class PacoteDocumentosTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.usuario = self.criar_usuario()
+
+        self.caixa = CaixaIncineracao.objects.create(identificador='CAIXA-01')
+        self.lotes = [self.criar_lote(f'LOTE-P{i}', n_processos=2, inicio=1 + i * 2) for i in range(3)]
+        LoteIncineracao.objects.filter(id__in=[l.id for l in self.lotes[:2]]).update(caixa=self.caixa)
+
+    def _paginas(self, dados):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(dados)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def test_selecao_por_caixa_e_semestre(self):
+        self.assertEqual(documentos_pacote.selecionar_lotes(caixa_id=self.caixa.id),
+                         [l.id for l in self.lotes[:2]])
+        hoje = timezone.now()
+        semestre = 1 if hoje.month <= 6 else 2
+        self.assertEqual(len(documentos_pacote.selecionar_lotes(ano=hoje.year, semestre=semestre)), 3)
+        self.assertEqual(documentos_pacote.selecionar_lotes(ano=hoje.year - 1, semestre=semestre), [])
+
+    def test_pacote_pdf_junta_todas_as_pecas_em_ordem(self):
+        ids = documentos_pacote.selecionar_lotes(caixa_id=self.caixa.id)
+        pecas = documentos_pacote.montar_pecas(ids)
+        self.assertEqual([p[0] for p in pecas], [
+            'capas/LOTE-P0.pdf', 'capas/LOTE-P1.pdf', 'caixas/LOTE-P0.pdf', 'caixas/LOTE-P1.pdf',
+            'certidao_antecipada.pdf'])
+
+        separadas = 0
+        for _, tipo, lote_ids in pecas:
+            caminho = os.path.join(self.media, 'peca.pdf')
+            documentos_pacote.renderizar_peca(tipo, lote_ids, self.usuario.id, caminho)
+            with open(caminho, 'rb') as f:
+                separadas += self._paginas(f.read())
+
+        destino = BytesIO()
+        documentos_pacote.gerar_pacote(ids, destino, usuario=self.usuario, max_workers=1)
+        self.assertEqual(self._paginas(destino.getvalue()), separadas)
+
+    def test_pacote_zip_pela_fila(self):
+        self.client.force_login(self.usuario)
+        r = self.client.post(reverse('api_enfileirar_documento'), {'tipo': 'pacote'})
+        self.assertEqual(r.status_code, 400)
+
+        r = self.client.post(reverse('api_enfileirar_documento'),
+                             {'tipo': 'pacote', 'caixa': self.caixa.id, 'documento': ['capas'], 'formato': 'zip'})
+        self.assertEqual(r.status_code, 202)
+        tarefa_id = r.json()['id']
+
+        tarefas_documentos.reservar_proxima()
+        with self.settings(DOCUMENTOS_WORKERS=1):
+            self.assertTrue(tarefas_documentos.executar_tarefa(tarefa_id))
+
+        r = self.client.get(reverse('baixar_documento_tarefa', args=[tarefa_id]))
+        self.assertEqual(r['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(r.streaming_content))) as zf:
+            self.assertEqual(zf.namelist(), ['capas/LOTE-P0.pdf', 'capas/LOTE-P1.pdf'])
+
+
+class ExportacaoAuditoriaTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.usuario = self.criar_usuario()
+        self.client.force_login(self.usuario)
+
+        self.caixa = CaixaIncineracao.objects.create(identificador='CAIXA-01')
+        self.lotes = [self.criar_lote(f'LOTE-A{i}', n_processos=2, inicio=1 + i * 2) for i in range(2)]
+        LoteIncineracao.objects.filter(id__in=[l.id for l in self.lotes]).update(caixa=self.caixa)
+
+        os.makedirs(os.path.join(self.media, 'recibos_forum'))
+        with open(os.path.join(self.media, 'recibos_forum', 'recibo.pdf'), 'wb') as f:
+            f.write(b'%PDF-1.4 anexo')
+        Material.objects.filter(noticiado__ocorrencia__bou='2025/00001').update(recibo_forum='recibos_forum/recibo.pdf')
+
+    def _baixar(self, **params):
+        r = self.client.get(reverse('exportar_auditoria_zip'), params)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        self.assertEqual(r['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(BytesIO(b''.join(r.streaming_content)))
+
+    def test_zip_da_caixa_tem_todos_os_documentos(self):
+        with self._baixar(caixa=self.caixa.id) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), [
+                'caixas/CAIXA-01/espelho.html', 'caixas/CAIXA-01/certidao.html', 'certidao_antecipada.pdf',
+                'lotes/LOTE-A0/capa.pdf', 'lotes/LOTE-A1/capa.pdf',
+                'recibos/entrada/2025_00001.pdf', 'recibos/entrada/2025_00002.pdf',
+                'recibos/entrada/2025_00003.pdf', 'recibos/entrada/2025_00004.pdf',
+                'recibos/forum/2025_00001_recibo.pdf',
+            ])
+            for nome in zf.namelist():
+                if nome.endswith('.pdf'):
+                    self.assertTrue(zf.read(nome).startswith(b'%PDF'), nome)
+            self.assertIn('CAIXA-01', zf.read('caixas/CAIXA-01/espelho.html').decode('utf-8'))
+
+    def test_reaproveita_pdfs_ja_gerados(self):
+        self.client.get(reverse('pdf_capa_lote', args=[self.lotes[0].id]))
+        with mock.patch.object(documentos_services, 'gerar_capa_lote_pdf',
+                               wraps=documentos_services.gerar_capa_lote_pdf) as gerar:
+            self._baixar(caixa=self.caixa.id).close()
+            self.assertEqual(gerar.call_count, 1)
+            self._baixar(caixa=self.caixa.id).close()
+            self.assertEqual(gerar.call_count, 1)
+
+    def test_documento_que_sumiu_fica_fora_do_zip(self):
+        capa_lote = documentos_exportacao.capa_lote
+        apagado = self.lotes[0].id
+        with mock.patch.object(documentos_exportacao, 'capa_lote',
+                               side_effect=lambda lote_id, usuario=None: None if lote_id == apagado else capa_lote(lote_id, usuario)):
+            with self._baixar(caixa=self.caixa.id) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertNotIn('lotes/LOTE-A0/capa.pdf', zf.namelist())
+                self.assertIn('lotes/LOTE-A1/capa.pdf', zf.namelist())
+                self.assertIn('recibos/forum/2025_00001_recibo.pdf', zf.namelist())
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(reverse('exportar_auditoria_zip')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('exportar_auditoria_zip'), {'caixa': 999}).status_code, 404)
+
+
+class RetencaoArquivosTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.usuario = self.criar_usuario()
+
+    def _existe(self, relativo):
+        return os.path.exists(os.path.join(self.media, relativo))
+
+    def _criar_arquivo(self, relativo, tamanho=100):
+        caminho = os.path.join(self.media, relativo)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'wb') as f:
+            f.write(b'x' * tamanho)
+
+    def test_validade_respeita_registros_legais(self):
+        aberto = self.criar_lote('LOTE-R1', n_processos=1, inicio=1)
+        incinerado = self.criar_lote('LOTE-R2', n_processos=1, inicio=2)
+        capa_aberto = documentos_services.gerar_capa_lote_pdf(aberto, self.usuario)
+        capa_incinerado = documentos_services.gerar_capa_lote_pdf(incinerado, self.usuario)
+        certidao = 'incineracao/' + documentos_services.gerar_certidao_incineracao_coletiva(
+            LoteIncineracao.objects.filter(id=incinerado.id), self.usuario)
+        recibo = documentos_services.gerar_recibo_entrada_pdf(Ocorrencia.objects.get(bou='2025/00001'))
+        LoteIncineracao.objects.filter(id=incinerado.id).update(status='INCINERADO')
+
+        registro = ArquivoGerado.objects.get(caminho=capa_aberto)
+        self.assertEqual((registro.categoria, registro.origem_tipo, registro.origem_ids), ('lotes/capas', 'LOTE', [aberto.id]))
+        self.assertTrue(ArquivoGerado.objects.get(caminho=certidao).protegido)
+
+        ArquivoGerado.objects.update(gerado_em=timezone.now() - timezone.timedelta(days=400))
+        vencidos, por_tamanho, _ = arquivos_gerados.limpar()
+        self.assertEqual((vencidos, por_tamanho), (2, 0))
+        self.assertFalse(self._existe(capa_aberto))
+        self.assertFalse(self._existe(recibo))
+        self.assertTrue(self._existe(capa_incinerado))
+        self.assertTrue(self._existe(certidao))
+        self.assertEqual(set(ArquivoGerado.objects.values_list('caminho', flat=True)), {capa_incinerado, certidao})
+
+    def test_certidao_anterior_ao_catalogo_fica_protegida(self):
+        incinerado = self.criar_lote('LOTE-R3', n_processos=1, inicio=1)
+        aberto = self.criar_lote('LOTE-R4', n_processos=1, inicio=2)
+        LoteIncineracao.objects.filter(id=incinerado.id).update(status='INCINERADO')
+        certidao = 'incineracao/certidao_coletiva_20230105_101500.pdf'
+        capa_incinerado = 'lotes/capas/capa_lote_LOTE-R3_20230105_101500.pdf'
+        capa_aberto = 'lotes/capas/capa_lote_LOTE-R4_20230105_101500.pdf'
+        for relativo in (certidao, capa_incinerado, capa_aberto):
+            self._criar_arquivo(relativo)
+
+        arquivos_gerados.varrer()
+        self.assertTrue(ArquivoGerado.objects.get(caminho=certidao).protegido)
+        self.assertEqual(ArquivoGerado.objects.get(caminho=capa_aberto).origem_ids, [aberto.id])
+        ArquivoGerado.objects.update(gerado_em=timezone.now() - timezone.timedelta(days=400))
+        with self.settings(ARQUIVOS_GERADOS_MAX_BYTES=0):
+            arquivos_gerados.limpar()
+        self.assertTrue(self._existe(certidao))
+        self.assertTrue(self._existe(capa_incinerado))
+        self.assertFalse(self._existe(capa_aberto))
+
+    def test_teto_de_tamanho_apaga_os_mais_antigos(self):
+        for i in range(4):
+            self._criar_arquivo(f'relatorios/relatorio_{i}.pdf', tamanho=1000)
+        arquivos_gerados.varrer()
+        for i in range(4):
+            ArquivoGerado.objects.filter(caminho=f'relatorios/relatorio_{i}.pdf').update(
+                gerado_em=timezone.now() - timezone.timedelta(hours=4 - i))
+
+        with self.settings(ARQUIVOS_GERADOS_MAX_BYTES=2500):
+            self.assertEqual(arquivos_gerados.limpar(simular=True), (0, 2, 2000))
+            self.assertEqual(ArquivoGerado.objects.count(), 4)
+            self.assertEqual(arquivos_gerados.limpar(), (0, 2, 2000))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media, 'relatorios'))), ['relatorio_2.pdf', 'relatorio_3.pdf'])
+
+    def test_varredura_incremental_so_relista_pastas_alteradas(self):
+        self._criar_arquivo('oficios/oficio_antigo.pdf')
+        self._criar_arquivo('recibos/entrada/recibo_antigo.pdf')
+        self._criar_arquivo('recibos/forum/recibo_assinado.pdf')
+
+        self.assertEqual(arquivos_gerados.varrer(), (2, 2, 0))
+        self.assertEqual(arquivos_gerados.varrer(), (0, 0, 0))
+
+        os.remove(os.path.join(self.media, 'oficios/oficio_antigo.pdf'))
+        self._criar_arquivo('oficios/oficio_novo.pdf')
+        self.assertEqual(arquivos_gerados.varrer(), (1, 1, 1))
+        self.assertEqual(sorted(ArquivoGerado.objects.values_list('caminho', flat=True)),
+                         ['oficios/oficio_novo.pdf', 'recibos/entrada/recibo_antigo.pdf'])
+
+
+class ExportacaoInventarioTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.usuario = self.criar_usuario()
+        self.client.force_login(self.usuario)
+        hoje = timezone.localdate()
+        for i in range(1, 6):
+            oc = self.criar_ocorrencia(i, vara='VARA_01' if i <= 3 else 'VARA_02', data_registro_bou=hoje)
+            self.criar_material(oc, nome=f'NOTICIADO {i}', numero_lacre=f'L{i}')
+        self.material = Material.objects.get(numero_lacre='L1')
+        RegistroHistorico.objects.create(material=self.material, status_na_epoca='ARMAZENADO',
+                                         observacao='Guardado no cofre\x0b A', criado_por=self.usuario)
+
+    def test_linhas_em_uma_query_com_historico(self):
+        qs = Material.objects.order_by('id')
+        with self.assertNumQueries(1):
+            linhas = list(inventario_exportacao.linhas_inventario(qs))
+        self.assertEqual(len(linhas), 5)
+        coluna = dict(zip(inventario_exportacao.CABECALHO, linhas[0]))
+        movimentacoes = RegistroHistorico.objects.filter(material=self.material).count()
+        self.assertEqual(coluna['Movimentações'], movimentacoes)
+        self.assertEqual(coluna['Responsável'], 'escrivao')
+        self.assertEqual(coluna['Observação'], 'Guardado no cofre\x0b A')
+        self.assertEqual(coluna['Descrição'], self.material.descricao_amigavel())
+
+    def test_csv_aplica_os_filtros_da_tela(self):
+        r = self.client.get(reverse('exportar_inventario', args=['csv']), {'vara': 'VARA_01'})
+        self.assertTrue(r.streaming)
+        texto = b''.join(r.streaming_content).decode('utf-8-sig')
+        linhas = list(csv.reader(texto.split('\r\n')[:-1], delimiter=';'))
+        self.assertEqual(linhas[0], inventario_exportacao.CABECALHO)
+        self.assertEqual(sorted(l[0] for l in linhas[1:]), ['2025/00001', '2025/00002', '2025/00003'])
+        self.assertEqual(linhas[1][9], '10,000')
+
+    async def test_sob_asgi_envia_cada_pedaco_assim_que_sai(self):
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.usuario)
+        url = reverse('exportar_inventario', args=['csv'])
+        produzidos = []
+
+        def em_pedacos(linhas):
+            for i in range(3):
+                produzidos.append(i)
+                yield f'{i};'.encode()
+
+        with warnings.catch_warnings():
+            # O Django avisa quando junta um iterador síncrono inteiro para enviar por ASGI
+            warnings.simplefilter('error')
+            with mock.patch.object(inventario_exportacao, 'csv_em_fluxo', em_pedacos):
+                r = await cliente.get(url)
+                self.assertTrue(r.is_async)
+                pedacos = aiter(r.streaming_content)
+                self.assertEqual(await anext(pedacos), b'0;')
+                self.assertEqual(produzidos, [0])
+                self.assertEqual([p async for p in pedacos], [b'1;', b'2;'])
+
+            r = await cliente.get(url, {'vara': 'VARA_01'})
+            texto = b''.join([p async for p in r.streaming_content]).decode('utf-8-sig')
+        self.assertEqual(len(texto.split('\r\n')[:-1]), 4)
+
+    def test_xlsx_valido(self):
+        import xml.etree.ElementTree as ET
+        r = self.client.get(reverse('exportar_inventario', args=['xlsx']))
+        self.assertEqual(r['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        with zipfile.ZipFile(BytesIO(b''.join(r.streaming_content))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertIn('[Content_Types].xml', zf.namelist())
+            planilha = ET.fromstring(zf.read('xl/worksheets/sheet1.xml'))
+        ns = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        linhas = planilha.findall('.//s:sheetData/s:row', ns)
+        self.assertEqual(len(linhas), 6)
+        self.assertEqual(len(linhas[0].findall('s:c', ns)), len(inventario_exportacao.CABECALHO))
+        self.assertEqual(self.client.get(reverse('exportar_inventario', args=['pdf'])).status_code, 404)
+
+
+TC_COMPLETO = """POLÍCIA MILITAR DO PARANÁ
+6º BPM - CASCAVEL
+BOU: 2025/1234567
+Data do Registro: 12/03/2025
+Natureza: Art. 28 - Lei 11.343/06 - Posse de droga para consumo pessoal
+NOTICIADO
+JOAO PEDRO DOS SANTOS
+RG: 12.345.678-9
+OBJETOS APREENDIDOS:
+01 porção de maconha pesando aproximadamente 5,3 g
+01 aparelho celular marca Samsung cor preta
+R$ 150,00 em espécie
+Histórico: Durante patrulhamento a equipe abordou o noticiado.
+O noticiado assume o compromisso de comparecer ao 1º Juizado Especial Criminal de Cascavel em data de 10/04/2025 às 14h.
+Autos: 0001234-56.2025.8.16.0021
+ASSINATURA DO COMPROMISSADO
+JOAO PEDRO DOS SANTOS
+RG: 12.345.678-9
+ASSINATURA POLICIAL MILITAR:
+CARLOS ALBERTO PEREIRA
+Soldado QPM 1-0
+RG: 9.876.543-2"""
+
+TC_VARIANTE = """TERMO CIRCUNSTANCIADO
+B.O.U. 1234/2024
+Aos quinze dias do mês de agosto do ano de 2024, nesta cidade.
+2ª Vara Criminal de Toledo
+fatos notificados como ameaça
+PMPR
+19º Batalhão
+AUTUADO
+MARIA DA SILVA
+RG: 1.234.567-8
+CONDUTOR
+Sargento Fulano
+Material:
+cocaína 2,5 kg
+faca de cozinha
+dinheiro R$ 1.200,50
+
+Histórico: sem mais.
+"""
+
+
+class TCParserTests(SimpleTestCase):
+    """ Saída do parser de TC em textos conhecidos (a mesma do parser anterior, de uma regex por busca) """
+
+    def test_tc_completo(self):
+        dados = tc_parser.parsear_tc(TC_COMPLETO)
+        self.assertEqual(dados['bou'], '2025/1234567')
+        self.assertEqual(dados['data_registro'], '12/03/2025')
+        self.assertEqual(dados['processo'], '0001234-56.2025.8.16.0021')
+        self.assertEqual(dados['vara'], '1º Juizado Especial Criminal de Cascavel em data de 10/04/2025 às 14h.')
+        self.assertEqual(dados['data_audiencia'], '10/04/2025')
+        self.assertEqual(dados['natureza_penal'], 'Art. 28 - Lei 11.343/06 - Posse de droga para consumo pessoal')
+        self.assertEqual(dados['unidade_origem'], '6º BPM - CASCAVEL')
+        self.assertEqual(dados['policial_nome'], 'CARLOS ALBERTO PEREIRA\nSoldado QPM')
+        self.assertEqual(dados['policial_graduacao'], 'Soldado')
+        self.assertEqual(dados['policial_rg'], '9.876.543-2')
+        self.assertEqual(dados['noticiados'], [
+            {'nome': 'Joao Pedro Dos Santos', 'rg': '12.345.678-9', 'cpf': '', 'data_nascimento': ''},
+        ])
+        self.assertEqual(dados['itens_apreendidos'], [
+            {'categoria': 'ENTORPECENTE', 'substancia': 'MACONHA', 'quantidade': '5.3', 'unidade': 'G', 'descricao': ''},
+            {'categoria': 'DINHEIRO', 'substancia': None, 'quantidade': '150.00', 'unidade': 'UN', 'descricao': 'R$ 150,00'},
+            {'categoria': 'OUTROS', 'substancia': None, 'quantidade': '1', 'unidade': 'UN',
+             'descricao': 'celular marca Samsung cor preta'},
+        ])
+        self.assertEqual(dados['observacao'], 'Durante patrulhamento a equipe abordou o noticiado.')
+
+    def test_tc_com_data_por_extenso_e_blocos_de_noticiado(self):
+        dados = tc_parser.parsear_tc(TC_VARIANTE)
+        self.assertEqual(dados['bou'], '2024/1234')
+        self.assertEqual(dados['data_registro'], '15/08/2024')
+        self.assertEqual(dados['processo'], '')
+        self.assertEqual(dados['vara'], '2ª Vara Criminal de Toledo')
+        self.assertEqual(dados['natureza_penal'], 'ameaça')
+        self.assertEqual(dados['unidade_origem'], '19º Batalhão')
+        self.assertEqual(dados['policial_graduacao'], 'Sargento')
+        self.assertEqual(dados['noticiados'], [
+            {'nome': 'Maria Da Silva', 'rg': '1.234.567-8', 'cpf': '', 'data_nascimento': ''},
+        ])
+        self.assertEqual([(i['substancia'] or i['categoria'], i['quantidade'], i['unidade'])
+                          for i in dados['itens_apreendidos']],
+                         [('COCAINA', '2.5', 'KG'), ('FACA', '1', 'UN'), ('DINHEIRO', '1200.50', 'UN')])
+        self.assertEqual(dados['observacao'], 'sem mais.')
+
+    def test_campos_depois_de_historico_longo(self):
+        """ Âncoras além da primeira janela de busca e palavras com caixa mista """
+        enchimento = '\n'.join(['a equipe abordou o individuo na via publica'] * 2000)
+        texto = f"{enchimento}\nbOu: 77/2023\nAgente: Fulano de Tal\nCAPITÃO\n{TC_VARIANTE}"
+        dados = tc_parser.parsear_tc(texto)
+        self.assertEqual(dados['bou'], '2023/77')
+        self.assertEqual(dados['policial_nome'], 'Fulano de Tal')
+        self.assertEqual(dados['policial_graduacao'], 'CAPITÃO')
+        self.assertEqual(dados['data_registro'], '15/08/2024')
+
+
+def pdf_de_texto(texto, anexos=0):
+    """ PDF com o texto, linha a linha (como o TC impresso pela intranet), e páginas de laudo anexas """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    paginas = [texto.split('\n')] + [[f'LAUDO ANEXO {n}', 'fragmentos vegetais secos'] for n in range(1, anexos + 1)]
+    for linhas in paginas:
+        y = 800
+        for linha in linhas:
+            pdf.drawString(40, y, linha)
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@override_settings(TC_LOTE_WORKERS=1)
+class RastreioMaterialTests(DadosCartorioMixin, TestCase):
+    """ Material.campos_alterados: o que mudou desde a leitura, sem consulta """
+
+    def setUp(self):
+        from . import signals  # o app não registra os receivers: liga só nestes testes
+        self.signals = signals
+        post_save.connect(signals.registrar_mudanca_custodia, sender=Material)
+        self.addCleanup(post_save.disconnect, signals.registrar_mudanca_custodia, sender=Material)
+
+    def test_mudanca_de_status_em_lote_sem_select_extra(self):
+        for i in range(1, 6):
+            self.criar_material(self.criar_ocorrencia(i), status='AUTORIZADO')
+        lote = LoteIncineracao.objects.create(identificador='LOTE-TESTE')
+        materiais = list(Material.objects.order_by('id'))
+
+        # Por material: o UPDATE dele e a baixa em ProcessoPendente; nenhum SELECT
+        with self.assertNumQueries(2 * len(materiais)) as consultas:
+            for mat in materiais:
+                mat.lote = lote
+                mat.status = 'AGUARDANDO_INCINERACAO'
+                self.assertEqual(mat.campos_alterados(), {'lote_id', 'status'})
+                mat.save(update_fields=['lote', 'status'])
+                self.assertEqual(mat.campos_alterados(), set())
+        self.assertFalse([q for q in consultas.captured_queries if q['sql'].startswith('SELECT')])
+        self.assertEqual(ProcessoPendente.quantidade(), 0)
+
+    def test_autorizacao_dispara_verificacao_uma_vez(self):
+        novo = Material(noticiado=Noticiado.objects.create(ocorrencia=self.criar_ocorrencia(1), nome='FULANO'))
+        self.assertEqual(novo.campos_alterados(), set(Material.CAMPOS_RASTREADOS))
+
+        with mock.patch.object(self.signals, 'verificar_criacao_lote_automatico') as verificar:
+            novo.save()
+            mat = Material.objects.only('id', 'status').get()
+            mat.status = 'AUTORIZADO'
+            mat.save()
+            mat.save()
+        verificar.assert_called_once_with(mat)
+        self.assertEqual(mat.valor_carregado('status'), 'AUTORIZADO')
+
+        Material.objects.filter(id=mat.id).update(status='ARMAZENADO')
+        mat.refresh_from_db(fields=['status'])
+        self.assertEqual(mat.campos_alterados(), set())
+
+
+class ProcessoPendenteTests(DadosCartorioMixin, TestCase):
+    """ ProcessoPendente acompanha os materiais que entram e saem de AUTORIZADO sem lote """
+
+    def setUp(self):
+        from . import signals
+        self.signals = signals
+        post_save.connect(signals.registrar_mudanca_custodia, sender=Material)
+        self.addCleanup(post_save.disconnect, signals.registrar_mudanca_custodia, sender=Material)
+
+    def pendentes(self):
+        return dict(ProcessoPendente.objects.filter(materiais__gt=0).values_list('ocorrencia_id', 'materiais'))
+
+    def test_contagem_acompanha_entrada_e_saida(self):
+        oc = self.criar_ocorrencia(1)
+        primeiro = self.criar_material(oc, status='AUTORIZADO')
+        segundo = self.criar_material(oc, nome='BELTRANO', status='RECEBIDO')
+        self.criar_material(self.criar_ocorrencia(2), categoria='OUTROS', status='AUTORIZADO')
+        self.assertEqual(self.pendentes(), {oc.id: 1})
+
+        segundo = Material.objects.get(id=segundo.id)
+        segundo.status = 'AUTORIZADO'
+        segundo.save()
+        self.assertEqual(self.pendentes(), {oc.id: 2})
+
+        primeiro = Material.objects.get(id=primeiro.id)
+        primeiro.lote = LoteIncineracao.objects.create(identificador='LOTE-TESTE')
+        primeiro.save(update_fields=['lote'])
+        segundo.delete()
+        self.assertEqual(self.pendentes(), {})
+        self.assertEqual(ProcessoPendente.quantidade(), 0)
+
+    def test_vigesimo_processo_cria_lote_com_os_mais_antigos(self):
+        materiais = []
+        for i in range(1, 22):
+            oc = self.criar_ocorrencia(i)
+            materiais.append(self.criar_material(oc, status='ARMAZENADO'))
+            if i == 2:
+                self.criar_material(oc, nome='BELTRANO', status='AUTORIZADO')
+        for mat in materiais[:19]:
+            mat.status = 'AUTORIZADO'
+            # INSERT OR IGNORE e UPDATE da pendência, o UPDATE do material e a contagem do gatilho
+            with self.assertNumQueries(4):
+                mat.save()
+        self.assertFalse(LoteIncineracao.objects.exists())
+
+        materiais[19].status = 'AUTORIZADO'
+        materiais[19].save()
+        self.assertFalse(LoteIncineracao.objects.exists())
+        self.assertEqual(outbox.processar_outbox(uma_vez=True), 1)
+        lote = LoteIncineracao.objects.get(identificador__startswith='AUTO-')
+        self.assertEqual(lote.materiais.count(), 21)
+        self.assertEqual(lote.processos_count, 20)
+        self.assertEqual(ProcessoPendente.objects.count(), 0)
+
+        ultimo = Material.objects.get(noticiado__ocorrencia__bou='2025/00021')
+        ultimo.status = 'AUTORIZADO'
+        ultimo.save()
+        self.assertEqual(self.pendentes(), {ultimo.noticiado.ocorrencia_id: 1})
+
+    def test_exclusao_em_cascata_e_set_null_acompanham_a_contagem(self):
+        oc = self.criar_ocorrencia(1)
+        fulano = self.criar_material(oc, status='AUTORIZADO').noticiado
+        self.criar_material(oc, nome='BELTRANO', status='AUTORIZADO')
+        lote = LoteIncineracao.objects.create(identificador='LOTE-TESTE')
+        outra = self.criar_ocorrencia(2)
+        self.criar_material(outra, status='AUTORIZADO', lote=lote)
+        self.assertEqual(self.pendentes(), {oc.id: 2})
+
+        fulano.delete()
+        self.assertEqual(self.pendentes(), {oc.id: 1})
+        lote.delete()
+        self.assertEqual(self.pendentes(), {oc.id: 1, outra.id: 1})
+        self.assertEqual(ProcessoPendente.recontar(), 0)
+
+    def test_recontar_corrige_escritas_fora_do_modelo(self):
+        oc = self.criar_ocorrencia(1)
+        for nome in ('FULANO', 'BELTRANO'):
+            self.criar_material(oc, nome=nome, status='ARMAZENADO')
+        fora = self.criar_ocorrencia(2)
+        self.criar_material(fora, status='AUTORIZADO')
+        Material.objects.filter(noticiado__ocorrencia=oc).update(status='AUTORIZADO')
+        Material.objects.filter(noticiado__ocorrencia=fora).delete()
+        self.assertEqual(self.pendentes(), {fora.id: 1})
+
+        saida = StringIO()
+        call_command('recontar_pendencias', stdout=saida)
+        self.assertIn('2 ocorrência(s)', saida.getvalue())
+        self.assertEqual(self.pendentes(), {oc.id: 2})
+
+    def test_migracao_conta_pendentes_existentes(self):
+        oc = self.criar_ocorrencia(1)
+        for nome in ('FULANO', 'BELTRANO'):
+            self.criar_material(oc, nome=nome, status='AUTORIZADO')
+        ProcessoPendente.objects.all().delete()
+
+        migracao = importlib.import_module('gestao.migrations.0019_preencher_processos_pendentes')
+        migracao.preencher(apps, None)
+        self.assertEqual(self.pendentes(), {oc.id: 2})
+
+
+class OutboxTests(DadosCartorioMixin, TestCase):
+    """ Lote automático pelo outbox: um evento por vez por chave, tratador idempotente """
+
+    def pendencias(self, n):
+        for i in range(1, n + 1):
+            self.criar_material(self.criar_ocorrencia(i), status='AUTORIZADO')
+
+    def test_reserva_exclusiva_por_chave_e_prazo(self):
+        outbox.registrar('LOTE_AUTOMATICO')
+        outbox.registrar('LOTE_AUTOMATICO')
+        primeiro = outbox.reservar_proximo()
+        self.assertEqual(EventoOutbox.objects.count(), 1)
+
+        outbox.registrar('LOTE_AUTOMATICO')
+        self.assertIsNone(outbox.reservar_proximo())
+
+        EventoOutbox.objects.filter(id=primeiro).update(reservado_ate=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual(outbox.reservar_proximo(), primeiro)
+        self.assertEqual(EventoOutbox.objects.get(id=primeiro).tentativas, 2)
+        with self.assertRaises(ValueError):
+            outbox.registrar('OUTRO')
+
+    def test_eventos_repetidos_montam_um_lote_so(self):
+        self.pendencias(lotes_automaticos.PROCESSOS_POR_LOTE_AUTO)
+        outbox.registrar('LOTE_AUTOMATICO')
+        primeiro = outbox.reservar_proximo()
+        outbox.registrar('LOTE_AUTOMATICO')
+
+        self.assertTrue(outbox.processar_evento(primeiro))
+        self.assertEqual(outbox.processar_outbox(uma_vez=True), 1)
+        lote = LoteIncineracao.objects.get()
+        self.assertEqual(lote.materiais.count(), lotes_automaticos.PROCESSOS_POR_LOTE_AUTO)
+        resultados = list(EventoOutbox.objects.order_by('id').values_list('status', 'resultado'))
+        self.assertEqual(resultados, [('CONCLUIDO', f"Lote(s) {lote.identificador}"),
+                                      ('CONCLUIDO', "Nenhum lote: processos pendentes insuficientes.")])
+
+    def test_falha_desfaz_e_marca_erro(self):
+        self.pendencias(lotes_automaticos.PROCESSOS_POR_LOTE_AUTO)
+        outbox.registrar('LOTE_AUTOMATICO')
+        with mock.patch.object(RegistroHistorico.objects, 'bulk_create', side_effect=RuntimeError('disco cheio')), \
+                mock.patch.object(outbox.logger, 'exception'):
+            self.assertEqual(outbox.processar_outbox(uma_vez=True), 1)
+        evento = EventoOutbox.objects.get()
+        self.assertEqual((evento.status, evento.erro), ('ERRO', 'disco cheio'))
+        self.assertFalse(LoteIncineracao.objects.exists())
+        self.assertEqual(ProcessoPendente.quantidade(), lotes_automaticos.PROCESSOS_POR_LOTE_AUTO)
+
+
+class TransicaoCustodiaTests(DadosCartorioMixin, TestCase):
+    """ custodia.transicionar: consultas fixas por transição, histórico e transições conferidas """
+
+    def setUp(self):
+        self.usuario = self.criar_usuario()
+        self.client.force_login(self.usuario)
+
+    def caixa_com_lotes(self, identificador, n_processos, inicio):
+        caixa = CaixaIncineracao.objects.create(identificador=identificador)
+        for i in range(2):
+            lote = self.criar_lote(f"{identificador}-{i}", n_processos=n_processos, inicio=inicio + i * n_processos)
+            lote.caixa = caixa
+            lote.save(update_fields=['caixa'])
+        return caixa
+
+    def test_concluir_caixa_com_consultas_fixas(self):
+        consultas = []
+        for identificador, n, inicio in (('CX-A', 2, 1), ('CX-B', 15, 100)):
+            caixa = self.caixa_com_lotes(identificador, n, inicio)
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(reverse('concluir_caixa', args=[caixa.id]))
+            consultas.append(len(ctx))
+            materiais = Material.objects.filter(lote__caixa=caixa)
+            self.assertEqual(set(materiais.values_list('status', flat=True)), {'INCINERADO'})
+            self.assertEqual(RegistroHistorico.objects.filter(
+                material__in=materiais, status_na_epoca='INCINERADO', criado_por=self.usuario,
+                observacao=f"Material incinerado via caixa {identificador}").count(), 2 * n)
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_finalizar_lote_registra_historico_e_recusa_transicao_invalida(self):
+        lote = self.criar_lote('LOTE-E', n_processos=2)
+        self.client.post(reverse('finalizar_lote_com_eprotocolo'), {'lote_id': lote.id, 'eprotocolo_geral': '12.345'})
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, 'INCINERADO')
+        self.assertEqual(list(RegistroHistorico.objects.filter(status_na_epoca='INCINERADO')
+                              .values_list('observacao', flat=True)),
+                         ["Material incinerado com o Lote LOTE-E. eProtocolo: 12.345"] * 2)
+
+        invalido = self.criar_lote('LOTE-F', n_processos=1, inicio=5)
+        self.criar_material(self.criar_ocorrencia(6), lote=invalido, status='RECEBIDO')
+        self.client.post(reverse('finalizar_lote_com_eprotocolo'), {'lote_id': invalido.id})
+        invalido.refresh_from_db()
+        self.assertEqual(invalido.status, 'ABERTO')
+        self.assertFalse(invalido.materiais.filter(status='INCINERADO').exists())
+
+    def test_fechar_lote_manual_baixa_pendencias_e_sinaliza_uma_vez(self):
+        for i in range(1, 4):
+            oc = self.criar_ocorrencia(i, processo=f"000000{i}-00.2025.8.16.0021")
+            for nome in ('FULANO', 'BELTRANO'):
+                self.criar_material(oc, nome=nome, status='AUTORIZADO')
+        self.assertEqual(ProcessoPendente.quantidade(), 3)
+
+        envios = []
+        receptor = lambda sender, **kwargs: envios.append((kwargs['status'], len(kwargs['materiais'])))
+        custodia.materiais_transicionados.connect(receptor, weak=False)
+        self.addCleanup(custodia.materiais_transicionados.disconnect, receptor)
+        processos = list(Ocorrencia.objects.values_list('processo', flat=True))
+        self.client.post(reverse('fechar_lote_manual'), {'processos_selecionados': processos, 'limite_lote': 15})
+
+        self.assertEqual(envios, [('AGUARDANDO_INCINERACAO', 6)])
+        self.assertEqual(ProcessoPendente.quantidade(), 0)
+        lote = LoteIncineracao.objects.get()
+        self.assertEqual(lote.materiais.filter(status='AGUARDANDO_INCINERACAO').count(), 6)
+        self.assertEqual(RegistroHistorico.objects.filter(
+            observacao=f"Material adicionado ao Lote {lote.identificador}").count(), 6)
+
+    def test_fechar_lote_manual_processo_maior_que_o_limite(self):
+        oc = self.criar_ocorrencia(1, processo='0000009-00.2025.8.16.0021')
+        for i in range(21):
+            self.criar_material(oc, nome=f"NOTICIADO {i}", status='AUTORIZADO')
+        self.client.post(reverse('fechar_lote_manual'), {'processos_selecionados': [oc.processo], 'limite_lote': 20})
+
+        lote = LoteIncineracao.objects.get()
+        self.assertEqual(lote.materiais.filter(status='AGUARDANDO_INCINERACAO').count(), 21)
+        self.assertFalse(Material.objects.filter(lote__isnull=True).exists())
+        self.assertEqual(RegistroHistorico.objects.filter(
+            observacao=f"Material adicionado ao Lote {lote.identificador}").count(), 21)
+        self.assertEqual(ProcessoPendente.objects.get(ocorrencia=oc).materiais, 0)
+
+    def test_fechar_lote_manual_desfaz_tudo_se_a_transicao_falha(self):
+        oc = self.criar_ocorrencia(1, processo='0000009-00.2025.8.16.0021')
+        for i in range(3):
+            self.criar_material(oc, nome=f"NOTICIADO {i}", status='AUTORIZADO')
+        with mock.patch.object(custodia.RegistroHistorico.objects, 'bulk_create', side_effect=RuntimeError('falhou')):
+            self.client.post(reverse('fechar_lote_manual'), {'processos_selecionados': [oc.processo], 'limite_lote': 20})
+
+        self.assertFalse(LoteIncineracao.objects.exists())
+        self.assertEqual(set(Material.objects.values_list('status', flat=True)), {'AUTORIZADO'})
+        self.assertEqual(ProcessoPendente.objects.get(ocorrencia=oc).materiais, 3)
+
+    def test_fechar_lote_manual_bou_nao_casa_com_processo_de_outra_ocorrencia(self):
+        sem_processo = self.criar_ocorrencia(1)
+        outra = self.criar_ocorrencia(2, processo='2025.00001')
+        self.criar_material(sem_processo, status='AUTORIZADO')
+        self.criar_material(outra, status='AUTORIZADO')
+        self.client.post(reverse('fechar_lote_manual'), {'processos_selecionados': [sem_processo.bou], 'limite_lote': 15})
+
+        lote = LoteIncineracao.objects.get()
+        self.assertEqual(list(lote.materiais.values_list('noticiado__ocorrencia', flat=True)), [sem_processo.id])
+        self.assertTrue(Material.objects.filter(noticiado__ocorrencia=outra, lote__isnull=True).exists())
+
+    def test_fechar_lote_manual_aceita_processo_repetido_sem_chave(self):
+        # Repetida antiga: a migração 0016 a deixou sem processo_normalizado
+        repetida = self.criar_ocorrencia(1)
+        Ocorrencia.objects.filter(id=repetida.id).update(processo='0001234.56-2025.8.16.0021')
+        self.criar_material(repetida, status='AUTORIZADO')
+        self.client.post(reverse('fechar_lote_manual'),
+                         {'processos_selecionados': ['0001234.56-2025.8.16.0021'], 'limite_lote': 15})
+
+        lote = LoteIncineracao.objects.get()
+        self.assertEqual(list(lote.materiais.values_list('noticiado__ocorrencia', flat=True)), [repetida.id])
+
+    def test_conferencia_grava_peso_e_local_do_formulario(self):
+        mat = self.criar_material(self.criar_ocorrencia(1), peso_estimado=12)
+        self.client.post(reverse('confirmar_conferencia', args=[mat.id]), {'localizacao': 'Armário {1}'})
+        mat.refresh_from_db()
+        self.assertEqual((mat.status, mat.peso_real, mat.localizacao_no_cofre), ('ARMAZENADO', 12, 'Armário {1}'))
+        self.assertEqual(mat.historico.get(status_na_epoca='ARMAZENADO').observacao,
+                         "CONFERÊNCIA FÍSICA: Pesagem Real 12,000 g. Local: Armário {1}")
+        with self.assertRaises(custodia.TransicaoInvalida):
+            custodia.transicionar([mat], 'RECEBIDO', "volta")
+
+
+class HistoricoArquivoTests(DadosCartorioMixin, TransactionTestCase):
+    """ Rotação do histórico para as tabelas anuais; leituras roteadas por período """
+
+    def setUp(self):
+        self.material = self.criar_material(self.criar_ocorrencia(1), numero_lacre='L1')
+        self.ano = timezone.localdate().year
+        for ano, status in ((self.ano - 3, 'RECEBIDO'), (self.ano - 2, 'ARMAZENADO'), (self.ano, 'AUTORIZADO')):
+            registro = RegistroHistorico.objects.create(material=self.material, status_na_epoca=status)
+            RegistroHistorico.objects.filter(id=registro.id).update(
+                data_criacao=historico.inicio_do_ano(ano) + timezone.timedelta(days=40))
+        self.addCleanup(self.apagar_tabelas_arquivo)
+
+    def apagar_tabelas_arquivo(self):
+        tabelas = connection.introspection.table_names()
+        with connection.schema_editor() as editor:
+            for ano in (self.ano - 3, self.ano - 2):
+                modelo = modelo_arquivo_historico(ano)
+                if modelo._meta.db_table in tabelas:
+                    editor.delete_model(modelo)
+
+    def test_rotacao_move_anos_encerrados(self):
+        call_command('arquivar_historico', '--manter-anos', '2', stdout=StringIO())
+        self.assertEqual(list(HistoricoArquivado.objects.values_list('ano', 'registros')), [(self.ano - 3, 1)])
+
+        call_command('arquivar_historico', stdout=StringIO())
+        self.assertEqual(list(RegistroHistorico.objects.values_list('status_na_epoca', flat=True)), ['AUTORIZADO'])
+        self.assertEqual(modelo_arquivo_historico(self.ano - 2).objects.get().status_na_epoca, 'ARMAZENADO')
+        self.assertEqual(HistoricoArquivado.objects.count(), 2)
+        with self.assertRaises(CommandError):
+            call_command('arquivar_historico', '--ano', str(self.ano), stdout=StringIO())
+
+    def test_ano_segue_o_fuso_local(self):
+        # 31/12 às 22h em Brasília já é 1º de janeiro em UTC
+        registro = RegistroHistorico.objects.create(material=self.material, status_na_epoca='RECEBIDO')
+        RegistroHistorico.objects.filter(id=registro.id).update(
+            data_criacao=historico.inicio_do_ano(self.ano - 2) - timezone.timedelta(hours=2))
+        self.assertEqual(historico.anos_encerrados(manter_anos=2), [self.ano - 3])
+        self.assertEqual(historico.arquivar_ano(self.ano - 3), 2)
+
+    def test_leitura_roteada_pelo_periodo(self):
+        call_command('arquivar_historico', stdout=StringIO())
+        todos = RegistroHistorico.objects.entre(material_id=self.material.id)
+        self.assertEqual([r.status_na_epoca for r in todos], ['AUTORIZADO', 'ARMAZENADO', 'RECEBIDO'])
+
+        # Só o ano corrente: a lista de anos arquivados e a tabela quente, nenhum arquivo
+        with self.assertNumQueries(2):
+            recentes = RegistroHistorico.objects.entre(inicio=historico.inicio_do_ano(self.ano))
+        self.assertEqual([r.status_na_epoca for r in recentes], ['AUTORIZADO'])
+        antigos = RegistroHistorico.objects.entre(
+            historico.inicio_do_ano(self.ano - 2), historico.inicio_do_ano(self.ano - 1))
+        self.assertEqual([r.status_na_epoca for r in antigos], ['ARMAZENADO'])
+
+    def test_detalhe_auditoria_so_le_o_arquivo_quando_pedido(self):
+        call_command('arquivar_historico', stdout=StringIO())
+        fabrica, usuario = RequestFactory(), self.criar_usuario()
+        for consulta, esperado in (({}, ['AUTORIZADO']), ({'arquivo': '1'}, ['AUTORIZADO', 'ARMAZENADO', 'RECEBIDO'])):
+            request = fabrica.get('/', consulta)
+            request.user = usuario
+            with mock.patch.object(views, 'render') as render:
+                views.detalhe_auditoria(request, self.material.id)
+            contexto = render.call_args.args[2]
+            self.assertEqual([r.status_na_epoca for r in contexto['historico']], esperado)
+            self.assertEqual(contexto['ha_arquivo'], not consulta)
+
+
+class ProcessoNormalizadoTests(DadosCartorioMixin, TestCase):
+    CNJ = '0001234-56.2025.8.16.0021'
+
+    def test_busca_por_processo_ignora_pontuacao_e_unicidade(self):
+        oc = self.criar_ocorrencia(1, processo=self.CNJ)
+        self.assertEqual(oc.processo_normalizado, '00012345620258160021')
+
+        with self.assertNumQueries(1):
+            duplicatas = tc_lote.buscar_duplicatas([{'bou': '2025/99999', 'processo': '00012345620258160021'},
+                                                    {'bou': '', 'processo': ''}])
+        self.assertEqual(duplicatas, [{'id': oc.id, 'bou': oc.bou}, None])
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.criar_ocorrencia(2, processo='0001234.56-2025.8.16.0021')
+        self.criar_ocorrencia(3)
+        self.criar_ocorrencia(4, processo='')
+
+        oc.processo = '0009999-11.2024.8.16.0021'
+        oc.save(update_fields=['processo'])
+        oc.refresh_from_db()
+        self.assertEqual(oc.processo_normalizado, '00099991120248160021')
+
+    def test_migracao_preenche_e_pula_repetidos(self):
+        primeira = self.criar_ocorrencia(1, processo=self.CNJ)
+        repetida = self.criar_ocorrencia(2)
+        Ocorrencia.objects.filter(id=repetida.id).update(processo='00012345620258160021')
+        Ocorrencia.objects.filter(id=primeira.id).update(processo_normalizado=None)
+
+        migracao = importlib.import_module('gestao.migrations.0016_preencher_processo_normalizado')
+        with self.assertLogs(migracao.logger, 'WARNING'):
+            migracao.preencher(apps, None)
+        self.assertEqual(dict(Ocorrencia.objects.values_list('id', 'processo_normalizado')),
+                         {primeira.id: '00012345620258160021', repetida.id: None})
+
+        # A repetida continua editável e sem chave enquanto o processo não muda
+        repetida = Ocorrencia.objects.get(id=repetida.id)
+        repetida.observacao = 'Conferida'
+        repetida.save()
+        repetida.processo = '0005555-11.2024.8.16.0021'
+        repetida.save(update_fields=['processo'])
+        self.assertEqual(Ocorrencia.objects.get(id=repetida.id).processo_normalizado, '00055551120248160021')
+
+
+@override_settings(TC_ASSINCRONO_WORKERS=0)
+class CacheTCTests(DadosCartorioMixin, TestCase):
+    """ tc_cache: o mesmo TC reenviado não é extraído de novo """
+
+    def setUp(self):
+        tc_cache.limpar()
+        self.addCleanup(tc_cache.limpar)
+        self.client.force_login(self.criar_usuario())
+
+    def enviar(self, conteudo, nome='tc.pdf'):
+        return self.client.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile(nome, conteudo)})
+
+    def test_reenvio_vem_do_cache_e_ve_duplicata_nova(self):
+        conteudo = pdf_de_texto(TC_COMPLETO)
+        primeiro = self.enviar(conteudo).json()['dados']
+        self.assertIsNone(primeiro['duplicata'])
+
+        Ocorrencia.objects.create(bou='2025/1234567', vara='VARA_01', policial_nome='Sd Teste', rg_policial='1')
+        with mock.patch.object(tc_parser, 'ler_tc') as ler_tc:
+            segundo = self.enviar(conteudo).json()['dados']
+        ler_tc.assert_not_called()
+        self.assertEqual(segundo['bou'], primeiro['bou'])
+        self.assertEqual(segundo['duplicata']['bou'], '2025/1234567')
+
+        with mock.patch.object(tc_parser, 'VERSAO_PARSER', tc_parser.VERSAO_PARSER + 1), \
+                mock.patch.object(tc_parser, 'ler_tc', wraps=tc_parser.ler_tc) as ler_tc:
+            self.enviar(conteudo)
+        ler_tc.assert_called_once()
+
+    def test_upload_lido_por_mmap_com_csrf_e_limite(self):
+        conteudo = pdf_de_texto(TC_COMPLETO, anexos=2)
+        for nome, backend in tc_parser.BACKENDS_PDF.items():
+            if tc_parser.backend_disponivel(nome):
+                with mock.patch.object(tc_parser, 'BACKENDS_PDF', {nome: backend}), \
+                        mock.patch.object(uploads.mmap, 'mmap', wraps=uploads.mmap.mmap) as mapa:
+                    tc_cache.limpar()
+                    dados = self.enviar(conteudo).json()['dados']
+                self.assertEqual(dados['bou'], '2025/1234567', nome)
+                mapa.assert_called_once()
+
+        cliente = Client(enforce_csrf_checks=True)
+        cliente.force_login(User.objects.get())
+        r = cliente.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile('tc.pdf', conteudo)})
+        self.assertEqual(r.status_code, 403)
+
+        with override_settings(TC_UPLOAD_MAX_BYTES=len(conteudo) - 1):
+            self.assertEqual(self.enviar(conteudo).status_code, 413)
+        with override_settings(TC_UPLOAD_MAX_BYTES=len(conteudo)):
+            self.assertEqual(self.enviar(conteudo).status_code, 200)
+
+    @override_settings(TC_CACHE_MAX_ITENS=2, TC_CACHE_TTL_SEGUNDOS=60)
+    def test_despejo_lru_e_validade(self):
+        for chave in ('a', 'b'):
+            tc_cache.guardar(chave, {'bou': chave})
+        tc_cache.obter('a')
+        tc_cache.guardar('c', {'bou': 'c'})
+        self.assertIsNone(tc_cache.obter('b'))
+        self.assertEqual(tc_cache.obter('a'), {'bou': 'a'})
+
+        with mock.patch.object(tc_cache.time, 'monotonic', return_value=tc_cache.time.monotonic() + 61):
+            self.assertIsNone(tc_cache.obter('a'))
+
+
+@override_settings(TC_ASSINCRONO_WORKERS=0, TC_ASSINCRONO_MAX_PENDENTES=1)
+class LeituraAssincronaTCTests(DadosCartorioMixin, TestCase):
+    """ api_ler_tc e api_receber_projudi como views assíncronas """
+
+    def setUp(self):
+        tc_cache.limpar()
+        self.addCleanup(tc_cache.limpar)
+        self.addCleanup(tc_assincrono.descartar_pool)
+
+    async def test_paginas_respondem_durante_leitura_e_fila_cheia_da_503(self):
+        cliente = AsyncClient()
+        await cliente.aforce_login(await sync_to_async(self.criar_usuario)())
+        liberar = threading.Event()
+
+        def ler_travado(*args, **kwargs):
+            liberar.wait(10)
+            return {'bou': '2025/1234567', 'processo': '0001234-56.2025.8.16.0021'}
+
+        with mock.patch.object(tc_parser, 'ler_tc', side_effect=ler_travado):
+            envio = asyncio.ensure_future(
+                cliente.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile('tc.pdf', b'um')}))
+            while not tc_assincrono._pendentes:
+                await asyncio.sleep(0.01)
+            for pagina in ('home', 'custodia_lista'):
+                self.assertEqual((await cliente.get(reverse(pagina))).status_code, 200)
+            self.assertFalse(envio.done())
+
+            cheio = await cliente.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile('tc.pdf', b'dois')})
+            self.assertEqual(cheio.status_code, 503)
+            liberar.set()
+            self.assertEqual((await envio).json()['dados']['bou'], '2025/1234567')
+
+        self.assertEqual((await AsyncClient().post(reverse('api_ler_tc'))).status_code, 302)
+
+    def test_pool_com_tempo_limite(self):
+        self.client.force_login(self.criar_usuario())
+        self.criar_ocorrencia(1, processo='00012345620258160021')
+        conteudo = pdf_de_texto(TC_COMPLETO)
+        with override_settings(TC_ASSINCRONO_WORKERS=1, TC_ASSINCRONO_TIMEOUT_SEGUNDOS=0.001):
+            r = self.client.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile('tc.pdf', conteudo)})
+            self.assertEqual(r.status_code, 504)
+            self.assertIsNone(tc_assincrono._pool)
+        with override_settings(TC_ASSINCRONO_WORKERS=1):
+            r = self.client.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile('tc.pdf', conteudo)})
+        dados = r.json()['dados']
+        self.assertEqual(dados['bou'], '2025/1234567')
+        self.assertEqual(dados['duplicata']['bou'], '2025/00001')
+        self.assertEqual(tc_assincrono._pendentes, 0)
+
+    async def test_tempo_limite_nao_conta_a_espera_por_um_worker(self):
+        with override_settings(TC_ASSINCRONO_WORKERS=1, TC_ASSINCRONO_TIMEOUT_SEGUNDOS=1.2):
+            await tc_assincrono._no_pool('aquecer', 'time.sleep', 0)
+            pool = tc_assincrono._pool
+            # A segunda espera a primeira (0,8 s) e roda mais 0,8 s: só a execução conta
+            await asyncio.gather(*(tc_assincrono._no_pool(f'tc_{i}', 'time.sleep', 0.8) for i in range(2)))
+            self.assertIs(tc_assincrono._pool, pool)
+
+    def test_worker_abre_o_upload_sem_copia(self):
+        self.client.force_login(self.criar_usuario())
+        with override_settings(TC_ASSINCRONO_WORKERS=1), \
+                mock.patch.object(tc_assincrono, '_no_pool', wraps=tc_assincrono._no_pool) as no_pool:
+            r = self.client.post(reverse('api_ler_tc'), {'arquivo': SimpleUploadedFile('tc.pdf', pdf_de_texto(TC_COMPLETO))})
+        self.assertEqual(r.json()['dados']['bou'], '2025/1234567')
+        args = no_pool.call_args.args
+        self.assertIsNone(args[3])
+        self.assertTrue(args[-1].startswith('/proc/'))
+
+    def test_projudi_confere_processo_normalizado(self):
+        oc = self.criar_ocorrencia(1, processo='00012345620258160021')
+        url = reverse('api_receber_projudi')
+        r = self.client.post(url, json.dumps({'processo': '0001234-56.2025.8.16.0021'}), content_type='application/json')
+        self.assertTrue(r.json()['existe'])
+        self.assertIn(f'/adicionar/{oc.id}/', r.json()['url'])
+        r = self.client.post(url, json.dumps({'processo': '0009999-11.2025.8.16.0021'}), content_type='application/json')
+        self.assertFalse(r.json()['existe'])
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+class LeituraTCLoteTests(DadosCartorioMixin, TestCase):
+
+    def setUp(self):
+        self.client.force_login(self.criar_usuario())
+
+    def enviar(self, *arquivos):
+        enviados = [SimpleUploadedFile(nome, conteudo) for nome, conteudo in arquivos]
+        return self.client.post(reverse('api_ler_tc_lote'), {'arquivos': enviados})
+
+    def test_zip_e_arquivos_soltos_em_ndjson_com_duplicatas(self):
+        Ocorrencia.objects.create(bou='2025/1234567', vara='VARA_01', policial_nome='Sd Teste', rg_policial='1')
+        pacote = BytesIO()
+        with zipfile.ZipFile(pacote, 'w') as zf:
+            zf.writestr('fim_de_semana/tc_1.pdf', pdf_de_texto(TC_COMPLETO))
+            zf.writestr('fim_de_semana/tc_2.pdf', pdf_de_texto(TC_VARIANTE))
+            zf.writestr('fim_de_semana/Thumbs.db', b'lixo')
+
+        resposta = self.enviar(('tcs.zip', pacote.getvalue()), ('anotacao.txt', b'texto'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+        linhas = [json.loads(l) for l in b''.join(resposta.streaming_content).decode('utf-8').splitlines()]
+
+        self.assertEqual(len(linhas), 4)
+        por_arquivo = {l['arquivo']: l for l in linhas[:3]}
+        self.assertEqual(por_arquivo['fim_de_semana/tc_1.pdf']['dados']['bou'], '2025/1234567')
+        self.assertEqual(por_arquivo['fim_de_semana/tc_2.pdf']['dados']['bou'], '2024/1234')
+        self.assertFalse(por_arquivo['anotacao.txt']['sucesso'])
+        self.assertIn('Formato', por_arquivo['anotacao.txt']['erro'])
+
+        fim = linhas[-1]
+        self.assertEqual((fim['fim'], fim['total'], fim['lidos']), (True, 3, 2))
+        self.assertEqual(len(fim['duplicatas']), 1)
+        self.assertEqual(fim['duplicatas'][0]['arquivo'], 'fim_de_semana/tc_1.pdf')
+        self.assertEqual(fim['duplicatas'][0]['bou'], '2025/1234567')
+
+    def test_envio_invalido(self):
+        self.assertEqual(self.client.post(reverse('api_ler_tc_lote')).status_code, 400)
+        self.assertEqual(self.enviar(('tcs.zip', b'nao e zip')).status_code, 400)
+        with override_settings(TC_LOTE_MAX_ARQUIVOS=1):
+            self.assertEqual(self.enviar(('a.pdf', b'1'), ('b.pdf', b'2')).status_code, 400)
+
+    def test_pool_so_recebe_o_que_os_workers_comportam(self):
+        # O tempo limite conta da entrega: nada pode ficar esperando na fila interna do pool
+        from concurrent.futures import ThreadPoolExecutor
+        enviados, maximo = [], [0]
+
+        class Pool(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                futuro = super().submit(*args, **kwargs)
+                enviados.append(futuro)
+                maximo[0] = max(maximo[0], sum(not f.done() for f in enviados))
+                return futuro
+
+        def ler(nome, conteudo, *args):
+            time.sleep(0.05)
+            return {'bou': nome}, [], []
+
+        tc_cache.limpar()
+        self.addCleanup(tc_cache.limpar)
+        with mock.patch.object(processos, 'novo_pool', lambda workers, **kwargs: Pool(workers)), \
+                mock.patch.object(tc_parser, 'ler_tc_no_pool', side_effect=ler):
+            resultados = list(tc_lote.ler_em_lote([(f'tc_{i}.pdf', bytes([i])) for i in range(5)],
+                                                  max_workers=2, timeout=5))
+        self.assertEqual(sorted(r['dados']['bou'] for r in resultados), [f'tc_{i}.pdf' for i in range(5)])
+        self.assertEqual(len(enviados), 5)
+        self.assertLessEqual(maximo[0], 2)
+
+    def test_limites_conferidos_antes_de_descomprimir(self):
+        zipado = BytesIO()
+        with zipfile.ZipFile(zipado, 'w') as zf:
+            for i in range(3):
+                zf.writestr(f"tc_{i}.pdf", b'%PDF' + b'0' * 100)
+        enviado = lambda: [SimpleUploadedFile('tcs.zip', zipado.getvalue())]
+
+        with mock.patch.object(zipfile.ZipFile, 'read', autospec=True, side_effect=zipfile.ZipFile.read) as ler:
+            with override_settings(TC_LOTE_MAX_ARQUIVOS=2), self.assertRaisesMessage(ValueError, 'no máximo 2'):
+                tc_lote.arquivos_do_envio(enviado())
+            self.assertEqual(ler.call_count, 2)
+            ler.reset_mock()
+            with override_settings(TC_LOTE_MAX_BYTES_ENVIO=250), self.assertRaisesMessage(ValueError, 'Envio maior'):
+                tc_lote.arquivos_do_envio(enviado())
+            self.assertEqual(ler.call_count, 2)
+
+
+class InstrumentacaoTCTests(DadosCartorioMixin, TestCase):
+    def setUp(self):
+        self.addCleanup(tc_parser.desativar_instrumentacao)
+
+    def test_registra_alternativa_por_campo_so_quando_ligada(self):
+        esperado = tc_parser.parsear_tc(TC_VARIANTE)
+        self.assertEqual(tc_parser.medicoes(), [])
+
+        tc_parser.ativar_instrumentacao(capacidade=2)
+        for _ in range(3):
+            self.assertEqual(tc_parser.parsear_tc(TC_VARIANTE), esperado)
+        resumo = tc_parser.resumo_instrumentacao()
+        self.assertEqual(resumo['documentos'], 2)
+        self.assertEqual(resumo['campos']['data_registro']['alternativas'], {'extenso': 2})
+        self.assertEqual(resumo['campos']['natureza_penal']['alternativas'], {'fatos': 2})
+        self.assertEqual(resumo['campos']['noticiados']['alternativas'], {'blocos': 2})
+        self.assertEqual(resumo['campos']['data_audiencia']['taxa_acerto'], 0)
+
+    def test_endpoint_so_para_staff(self):
+        usuario = self.criar_usuario()
+        self.client.force_login(usuario)
+        url = reverse('api_instrumentacao_tc')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        usuario.is_staff = True
+        usuario.save()
+        tc_parser.ativar_instrumentacao()
+        tc_parser.parsear_tc(TC_COMPLETO)
+        self.assertEqual(self.client.get(url).json()['campos']['bou']['alternativas'], {'bou': 1})
+
+
+class CorpusTCTests(SimpleTestCase):
+    """ Corpus sintético do benchmark_tc_corpus """
+
+    def test_corpus_deterministico_e_conferido(self):
+        casos = tc_corpus.gerar_corpus(4, semente=3, formatos=('docx',))
+        self.assertEqual([c['texto'] for c in casos], [c['texto'] for c in tc_corpus.gerar_corpus(4, 3, ('docx',))])
+        for caso in casos:
+            conferidos = tc_corpus.conferir(caso['esperado'], tc_parser.parsear_tc(
+                tc_parser.extrair_texto_docx(caso['conteudo'])))
+            for campo in ('bou', 'processo', 'vara', 'natureza_penal', 'itens_apreendidos'):
+                self.assertTrue(conferidos[campo], f"{caso['nome']}: {campo}")
+
+    def test_benchmark_acusa_regressao_no_acerto(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        baseline = os.path.join(pasta, 'baseline.json')
+        opcoes = {'quantidade': 3, 'formatos': 'docx', 'baseline': baseline, 'tolerancia': 100, 'stdout': StringIO()}
+        call_command('benchmark_tc_corpus', salvar_baseline=True, **opcoes)
+        call_command('benchmark_tc_corpus', **opcoes)
+
+        with open(baseline) as f:
+            gravado = json.load(f)
+        gravado['acerto']['bou'] = 1.01
+        with open(baseline, 'w') as f:
+            json.dump(gravado, f)
+        with self.assertRaisesMessage(CommandError, 'acerto de bou'):
+            call_command('benchmark_tc_corpus', **opcoes)
+
+
+class ExtracaoPDFTests(SimpleTestCase):
+    """ Os modos de extração do PDF do TC (tc_parser.MODOS_PDF) """
+
+    def test_paralelo_igual_ao_serial_e_cabecalho_para_cedo(self):
+        conteudo = pdf_de_texto(TC_COMPLETO, anexos=5)
+        serial = tc_parser.extrair_texto_pdf(conteudo)
+        self.assertIn('LAUDO ANEXO 5', serial)
+
+        with mock.patch.object(tc_parser, 'PAGINAS_MIN_PARALELO', 2):
+            self.assertEqual(tc_parser.extrair_texto_pdf(conteudo, 'paralelo', max_workers=2), serial)
+
+        cabecalho = tc_parser.extrair_texto_pdf(conteudo, 'cabecalho')
+        self.assertNotIn('LAUDO ANEXO', cabecalho)
+        completo, parcial = tc_parser.parsear_tc(serial), tc_parser.parsear_tc(cabecalho)
+        for campo in ('bou', 'processo', 'vara', 'natureza_penal', 'itens_apreendidos'):
+            self.assertEqual(parcial[campo], completo[campo])
+
+        with self.assertRaises(ValueError):
+            tc_parser.extrair_texto_pdf(conteudo, 'rapido')
+
+    def test_backends_dao_o_mesmo_cabecalho(self):
+        conteudo = pdf_de_texto(TC_COMPLETO, anexos=1)
+        referencia = tc_parser.parsear_tc(tc_parser.extrair_texto_pdf(conteudo, backend='pdfplumber'))
+        for nome in tc_parser.BACKENDS_PDF:
+            if tc_parser.backend_disponivel(nome):
+                dados = tc_parser.parsear_tc(tc_parser.extrair_texto_pdf(conteudo, backend=nome))
+                for campo in ('bou', 'processo', 'vara', 'itens_apreendidos'):
+                    self.assertEqual(dados[campo], referencia[campo], f"{nome}: {campo}")
+
+    def test_auto_passa_ao_proximo_backend_quando_o_texto_nao_serve(self):
+        conteudo = pdf_de_texto(TC_COMPLETO)
+        backends = {'ruim': lambda *a: iter(['texto sem cabeçalho']), 'quebrado': mock.Mock(side_effect=OSError),
+                    'pdfplumber': tc_parser.BACKENDS_PDF['pdfplumber']}
+        tentativas = []
+        with mock.patch.object(tc_parser, 'BACKENDS_PDF', backends), \
+                mock.patch.object(tc_parser, '_ESTATISTICAS', {}), \
+                mock.patch.object(tc_parser, 'backend_disponivel', return_value=True):
+            texto = tc_parser.extrair_texto_pdf(conteudo, tentativas=tentativas)
+            estatisticas = tc_parser.estatisticas_pdf()
+
+        self.assertIn('2025/1234567', texto)
+        self.assertEqual([(t['backend'], t['aceito'], t['falhou']) for t in tentativas],
+                         [('ruim', False, False), ('quebrado', False, True), ('pdfplumber', True, False)])
+        self.assertEqual(estatisticas['ruim']['taxa_aceitos'], 0)
+        self.assertEqual(estatisticas['quebrado']['falhas'], 1)
+        self.assertEqual(estatisticas['pdfplumber']['aceitos'], 1)
@@ -0,0 +1,105 @@
+"""
+uploads.py — Recebimento de TCs sem carregar o arquivo inteiro na memória.
+
+O upload é gravado em pedaços num arquivo temporário anônimo (sem nome no
+sistema de arquivos: some quando é fechado, ao fim da requisição ou se o
+processo cair) e o parser o lê por mmap, sem cópia para um objeto bytes.
+O tamanho é conferido enquanto os pedaços chegam, contra TC_UPLOAD_MAX_BYTES.
+"""
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+# Folga para os cabeçalhos do multipart ao comparar o Content-Length com o limite
+_FOLGA_MULTIPART = 64 * 1024
+
+
+def max_bytes():
+    return getattr(settings, 'TC_UPLOAD_MAX_BYTES', 20 * 1024 * 1024)
+
+
+def corpo_grande_demais(request):
+    """ True se o Content-Length já denuncia um envio acima do limite (nada foi lido) """
+    try:
+        tamanho = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    return tamanho > max_bytes() + _FOLGA_MULTIPART
+
+
+class ArquivoAnonimo(UploadedFile):
+    """ Upload num tempfile.TemporaryFile, que não tem nome no disco """
+
+    def __init__(self, name, content_type, charset, content_type_extra=None):
+        super().__init__(tempfile.TemporaryFile(), name, content_type, 0, charset, content_type_extra)
+
+
+class UploadAnonimoHandler(FileUploadHandler):
+    """
+    Grava cada arquivo do upload num ArquivoAnonimo e interrompe o envio
+    (consumindo o resto do corpo) quando um arquivo passa de TC_UPLOAD_MAX_BYTES;
+    nesse caso `excedeu` fica True e o arquivo não aparece em request.FILES.
+    """
+
+    excedeu = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = ArquivoAnonimo(self.file_name, self.content_type, self.charset, self.content_type_extra)
+        self.recebidos = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recebidos += len(raw_data)
+        if self.recebidos > max_bytes():
+            self.excedeu = True
+            self.file.close()
+            raise StopUpload()
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+@contextmanager
+def conteudo_mapeado(arquivo):
+    """
+    Conteúdo do arquivo enviado para o tc_parser: o mmap (somente leitura) do
+    arquivo temporário, ou os bytes quando o upload ficou em memória ou veio vazio.
+    """
+    if not isinstance(arquivo, ArquivoAnonimo) or not arquivo.size:
+        arquivo.seek(0)
+        yield arquivo.read()
+        return
+    arquivo.file.flush()
+    mapa = mmap.mmap(arquivo.file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapa
+    finally:
+        mapa.close()
+
+
+def caminho_do_processo(arquivo):
+    """
+    Caminho pelo qual outro processo do mesmo usuário abre o arquivo
+    temporário anônimo (/proc/<pid>/fd/<n>), para o pool do tc_assincrono ler
+    o upload sem receber uma cópia. None se o upload não está num
+    ArquivoAnonimo, veio vazio ou o sistema não tem /proc.
+    """
+    if not isinstance(arquivo, ArquivoAnonimo) or not arquivo.size:
+        return None
+    caminho = f"/proc/{os.getpid()}/fd/{arquivo.file.fileno()}"
+    if not os.path.exists(caminho):
+        return None
+    arquivo.file.flush()
+    return caminho
@@ -23,6 +23,9 @@ urlpatterns = [
     path('api/dados_autocomplete/', views.api_dados_autocomplete, name='api_dados_autocomplete'),
     path('api/receber_projudi/', views.api_receber_projudi, name='api_receber_projudi'),
     path('api/ler_tc/', views.api_ler_tc, name='api_ler_tc'),
+    path('api/ler_tc/lote/', views.api_ler_tc_lote, name='api_ler_tc_lote'),
+    path('api/ler_tc/estatisticas/', views.api_estatisticas_tc, name='api_estatisticas_tc'),
+    path('api/ler_tc/instrumentacao/', views.api_instrumentacao_tc, name='api_instrumentacao_tc'),
     
     # Armazenamento e Custódia
     path('custodia/', views.custodia_lista, name='custodia_lista'),
@@ -49,10 +52,19 @@ urlpatterns = [
     path('capa-lote/<int:id>/', views.imprimir_capa_lote, name='imprimir_capa_lote'),
     path('certidao-lote/<int:id>/', views.imprimir_certidao_lote, name='imprimir_certidao_lote'),
     path('lotes/certidao-coletiva/', views.relatorio_forum_view, name='certidao_coletiva_lotes'),
+    path('pdf/recibo-entrada/<int:id>/', views.pdf_recibo_entrada, name='pdf_recibo_entrada'),
+    path('pdf/capa-lote/<int:id>/', views.pdf_capa_lote, name='pdf_capa_lote'),
+    path('pdf/certidao/<str:tipo>/', views.pdf_certidao_lotes, name='pdf_certidao_lotes'),
+    path('pdf/relatorio/', views.pdf_relatorio, name='pdf_relatorio'),
+    path('exportar/auditoria/', views.exportar_auditoria_zip, name='exportar_auditoria_zip'),
+    path('api/documentos/tarefas/', views.api_enfileirar_documento, name='api_enfileirar_documento'),
+    path('api/documentos/tarefas/<int:id>/', views.api_status_documento, name='api_status_documento'),
+    path('api/documentos/tarefas/<int:id>/download/', views.baixar_documento_tarefa, name='baixar_documento_tarefa'),
     
     # Relatórios e Auditoria
     path('relatorio/gerencial/', views.relatorio_gerencial, name='relatorio_gerencial'),
     path('relatorio/incineracao/', views.relatorio_incineracao, name='relatorio_incineracao'),
     path('inventario/', views.relatorio_inventario_geral, name='relatorio_inventario'),
+    path('inventario/exportar/<str:formato>/', views.exportar_inventario, name='exportar_inventario'),
     path('oficio/gerar/', views.gerar_oficio_remessa_view, name='gerar_oficio_remessa'),
 ]
@@ -1,6 +1,8 @@
 from datetime import datetime, date
 import json
 import os
+import re
+import tempfile
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.db import transaction
@@ -12,40 +14,18 @@ from django.db.models.functions import ExtractMonth, ExtractYear, Coalesce, Trun
 from django.db.models.fields import DecimalField
 from django.core.paginator import Paginator
 from django.conf import settings
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404, FileResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from .models import (
     DROGAS_CHOICES, GRADUACAO_CHOICES, VARA_CHOICES, CATEGORIA_CHOICES, STATUS_CUSTODIA_CHOICES,
-    Ocorrencia, Material, Noticiado, LoteIncineracao, RegistroHistorico, CaixaIncineracao, DrogaConfig, NaturezaPenal
+    Ocorrencia, Material, Noticiado, LoteIncineracao, RegistroHistorico, CaixaIncineracao, DrogaConfig, NaturezaPenal,
+    TarefaDocumento, HistoricoArquivado, normalizar_processo,
+)
+from . import (
+    custodia, documentos_dados, documentos_services, documentos_cache, documentos_exportacao, documentos_pacote,
+    inventario_exportacao, tarefas_documentos,
 )
-from . import documentos_services
-
-
-def _aplicar_filtros_material(qs, filtros):
-    if filtros.get('categoria'):
-        qs = qs.filter(categoria=filtros['categoria'])
-    if filtros.get('substancia'):
-        qs = qs.filter(substancia=filtros['substancia'])
-    if filtros.get('status'):
-        qs = qs.filter(status=filtros['status'])
-    if filtros.get('vara'):
-        qs = qs.filter(noticiado__ocorrencia__vara=filtros['vara'])
-    if filtros.get('natureza_penal'):
-        qs = qs.filter(noticiado__ocorrencia__natureza_penal__icontains=filtros['natureza_penal'])
-    if filtros.get('unidade_origem'):
-        qs = qs.filter(noticiado__ocorrencia__unidade_origem=filtros['unidade_origem'])
-    if filtros.get('ano'):
-        qs = qs.filter(noticiado__ocorrencia__data_registro_bou__year=filtros['ano'])
-    if filtros.get('semestre'):
-        sem = int(filtros['semestre'])
-        if sem == 1:
-            qs = qs.filter(noticiado__ocorrencia__data_registro_bou__month__range=(1, 6))
-        else:
-            qs = qs.filter(noticiado__ocorrencia__data_registro_bou__month__range=(7, 12))
-    if filtros.get('data_inicio'):
-        qs = qs.filter(data_criacao__date__gte=filtros['data_inicio'])
-    if filtros.get('data_fim'):
-        qs = qs.filter(data_criacao__date__lte=filtros['data_fim'])
-    return qs
 
 
 def _resumir_material(qs):
@@ -128,6 +108,49 @@ def _resumir_material(qs):
         'peso_total_gramas': peso_total,
     }, por_categoria, por_substancia, por_status, por_natureza, por_unidade, por_mes
 
+def _resposta_pdf_direta(gerar, nome_arquivo):
+    """
+    Gera o PDF num buffer temporário (memória até PDF_SPOOL_MAX_BYTES, depois
+    arquivo anônimo) e o entrega sem arquivar nada em MEDIA_ROOT.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=getattr(settings, 'PDF_SPOOL_MAX_BYTES', 5 * 1024 * 1024))
+    try:
+        gerar(spool)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    response = FileResponse(spool, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{nome_arquivo}"'
+    return response
+
+_FIM = object()
+
+
+async def _em_fluxo_async(iterador):
+    """ Puxa cada pedaço do iterador síncrono por sync_to_async, um de cada vez """
+    iterador = iter(iterador)
+    try:
+        while (parte := await sync_to_async(next)(iterador, _FIM)) is not _FIM:
+            yield parte
+    finally:
+        # Cliente que desconectou: o gerador (e o que ele tem aberto) é fechado na thread dele
+        fechar = getattr(iterador, 'close', None)
+        if fechar is not None:
+            await sync_to_async(fechar)()
+
+
+def _resposta_em_fluxo(request, conteudo, **kwargs):
+    """
+    StreamingHttpResponse que envia aos pedaços também sob ASGI. O Django 5.0
+    junta um iterador síncrono inteiro na memória (sync_to_async(list)) antes
+    de enviá-lo por ASGI, e um assíncrono por WSGI: cada servidor recebe o
+    tipo de iterador que ele consome em fluxo.
+    """
+    if isinstance(request, ASGIRequest):
+        conteudo = _em_fluxo_async(conteudo)
+    return StreamingHttpResponse(conteudo, **kwargs)
+
 # --- FUNÇÃO AUXILIAR DE FORMATAÇÃO ---
 def formatar_peso_br(valor_gramas):
     if not valor_gramas:
@@ -155,6 +178,11 @@ def registrar(request):
                 if Ocorrencia.objects.filter(bou=bou).exists():
                     messages.error(request, f"O BOU {bou} já está cadastrado!")
                     return redirect('cadastro_entrada')
+                existente = processo and Ocorrencia.objects.filter(
+                    processo_normalizado=normalizar_processo(processo)).first()
+                if existente:
+                    messages.error(request, f"O processo {processo} já está cadastrado (BOU {existente.bou})!")
+                    return redirect('cadastro_entrada')
                     
                 nat_penal = request.POST.get('natureza_penal', '').strip().upper()
                 if nat_penal:
@@ -240,17 +268,18 @@ def confirmar_conferencia(request, id):
         
         # O peso real agora assume o peso estimado na conferência simples
         material.peso_real = material.peso_estimado
-        material.status = 'ARMAZENADO'
         material.localizacao_no_cofre = request.POST.get('localizacao', 'Cofre Central')
-        material.save()
         
         # O histórico agora é a única prova de QUEM fez a ação
-        RegistroHistorico.objects.create(
-            material=material, 
-            criado_por=request.user, 
-            status_na_epoca='ARMAZENADO',
-            observacao=f"CONFERÊNCIA FÍSICA: Pesagem Real {material.peso_formatado()}. Local: {material.localizacao_no_cofre}"
-        )
+        try:
+            custodia.transicionar(
+                [material], 'ARMAZENADO',
+                "CONFERÊNCIA FÍSICA: Pesagem Real {peso}. Local: {material.localizacao_no_cofre}",
+                usuario=request.user, campos=['peso_real', 'localizacao_no_cofre'],
+                contexto={'peso': material.peso_formatado()})
+        except custodia.TransicaoInvalida as e:
+            messages.error(request, str(e))
+            return redirect('conferencia_lista')
         messages.success(request, f"BOU {material.noticiado.ocorrencia.bou} armazenado com sucesso.")
     return redirect('conferencia_lista')
 
@@ -389,7 +418,7 @@ def relatorio_gerencial(request):
             filtros[key] = val
     
     qs = Material.objects.all().select_related('noticiado__ocorrencia')
-    qs = _aplicar_filtros_material(qs, filtros)
+    qs = documentos_dados.aplicar_filtros_material(qs, filtros)
     
     resumo, por_categoria, por_substancia, por_status, por_natureza, por_unidade, por_mes = _resumir_material(qs)
     
@@ -430,13 +459,11 @@ def gerar_oficio_remessa_view(request):
             return redirect('custodia_lista')
             
         try:
-            path = documentos_services.gerar_oficio_materiais_gerais(materiais, request.user)
-            # Retorna o arquivo gerado
-            full_path = os.path.join(settings.MEDIA_ROOT, path)
-            with open(full_path, 'rb') as f:
-                response = HttpResponse(f.read(), content_type='application/pdf')
-                response['Content-Disposition'] = f'inline; filename="{os.path.basename(path)}"'
-                return response
+            nome = f"oficio_remessa_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            return _resposta_pdf_direta(
+                lambda destino: documentos_services.gerar_oficio_materiais_gerais(materiais, request.user, destino=destino),
+                nome
+            )
         except Exception as e:
             messages.error(request, f"Erro ao gerar Ofício: {e}")
             return redirect('custodia_lista')
@@ -556,15 +583,22 @@ def finalizar_lote_com_eprotocolo(request):
         lote_id = request.POST.get('lote_id')
         eprotocolo = request.POST.get('eprotocolo_comando') or request.POST.get('eprotocolo_geral')
         lote = get_object_or_404(LoteIncineracao, id=lote_id)
-        agora = timezone.now()
+        
+        # Materiais primeiro: uma transição inválida não deixa o lote marcado como incinerado
+        try:
+            custodia.transicionar(
+                lote.materiais.exclude(status='INCINERADO'), 'INCINERADO',
+                "Material incinerado com o Lote {lote}. eProtocolo: {eprotocolo}",
+                usuario=request.user, contexto={'lote': lote.identificador, 'eprotocolo': eprotocolo or '-'})
+        except custodia.TransicaoInvalida as e:
+            messages.error(request, f"Lote {lote.identificador} não incinerado: {e}")
+            return redirect('lotes_incineracao')
+        
         lote.status = 'INCINERADO'
-        lote.data_incineracao = agora
+        lote.data_incineracao = timezone.now()
         lote.eprotocolo_geral = eprotocolo
         lote.save()
         
-        # Atualiza materiais e gera histórico automático pelo signal
-        Material.objects.filter(lote=lote).update(status='INCINERADO')
-        
         messages.success(request, f"Lote {lote.identificador} incinerado com sucesso!")
     return redirect('lotes_incineracao')
 
@@ -589,64 +623,124 @@ def api_verificar_ocorrencia(request):
             return JsonResponse({'existe': True, 'id': oc.id, 'bou': oc.bou})
     return JsonResponse({'existe': False})
 
-from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth.views import redirect_to_login
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_POST
 import json
 import uuid
-from . import tc_parser
+from . import tc_assincrono, tc_lote, tc_parser, uploads
 
-@login_required
+@csrf_exempt
 @require_POST
-def api_ler_tc(request):
+async def api_ler_tc(request):
     """
-    Recebe um PDF ou DOCX do TC, extrai o texto em memória (sem gravar),
-    e devolve JSON estruturado com todos os dados identificados.
+    Recebe um PDF ou DOCX do TC e devolve JSON estruturado com todos os dados
+    identificados. O upload vai para um arquivo temporário anônimo e é lido
+    por mmap (uploads.py): nada fica no disco depois da requisição. O CSRF é
+    conferido depois de trocar os upload handlers.
+
+    Assíncrona: o corpo é lido numa thread e a extração roda no pool do
+    tc_assincrono, então um lote de envios não trava as páginas sob ASGI.
+    (login_required do Django 5.0 não aceita views assíncronas.)
     """
+    if not (await request.auser()).is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if uploads.corpo_grande_demais(request):
+        return _arquivo_grande_demais()
+    handler = uploads.UploadAnonimoHandler(request)
+    request.upload_handlers = [handler]
+    await sync_to_async(lambda: request.FILES, thread_sensitive=False)()
+    return await _api_ler_tc(request, handler)
+
+
+def _arquivo_grande_demais():
+    limite = uploads.max_bytes() // (1024 * 1024)
+    return JsonResponse({'erro': f'Arquivo maior que o permitido ({limite} MB).'}, status=413)
+
+
+@csrf_protect
+async def _api_ler_tc(request, handler):
     arquivo = request.FILES.get('arquivo')
+    if handler.excedeu:
+        return _arquivo_grande_demais()
     if not arquivo:
         return JsonResponse({'erro': 'Nenhum arquivo enviado.'}, status=400)
 
-    nome = arquivo.name.lower()
-    conteudo = arquivo.read()  # Lê tudo em memória — arquivo nunca toca o disco
+    try:
+        with uploads.conteudo_mapeado(arquivo) as conteudo:
+            dados = await tc_assincrono.ler_tc(arquivo.name, conteudo, uploads.caminho_do_processo(arquivo))
+    except tc_assincrono.Ocupado:
+        resposta = JsonResponse({'erro': 'Muitos TCs sendo lidos agora. Tente de novo em instantes.'}, status=503)
+        resposta['Retry-After'] = '5'
+        return resposta
+    except TimeoutError:
+        return JsonResponse({'erro': 'Tempo esgotado ao processar o arquivo.'}, status=504)
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'erro': f'Erro ao processar arquivo: {str(e)}'}, status=500)
+    finally:
+        arquivo.close()
+
+    # Verifica se o BOU/processo já existe
+    dados['duplicata'] = (await tc_lote.abuscar_duplicatas([dados]))[0]
+    return JsonResponse({'sucesso': True, 'dados': dados})
 
+
+@login_required
+@require_POST
+def api_ler_tc_lote(request):
+    """
+    Vários TCs de uma vez (campo 'arquivos', com PDFs, DOCX e/ou ZIPs).
+    Responde em NDJSON: uma linha por arquivo assim que ele é lido e uma
+    linha final com as duplicatas encontradas no cadastro.
+    """
+    enviados = request.FILES.getlist('arquivos')
+    if not enviados:
+        return JsonResponse({'erro': 'Nenhum arquivo enviado.'}, status=400)
     try:
-        if nome.endswith('.pdf'):
-            texto = tc_parser.extrair_texto_pdf(conteudo)
-        elif nome.endswith('.docx'):
-            texto = tc_parser.extrair_texto_docx(conteudo)
-        else:
-            return JsonResponse({'erro': 'Formato não suportado. Envie PDF ou DOCX.'}, status=400)
+        arquivos = tc_lote.arquivos_do_envio(enviados)
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    if not arquivos:
+        return JsonResponse({'erro': 'Nenhum PDF ou DOCX encontrado no envio.'}, status=400)
 
-        if not texto.strip():
-            return JsonResponse({'erro': 'Não foi possível extrair texto do arquivo. Verifique se o PDF não é uma imagem escaneada.'}, status=400)
+    resposta = _resposta_em_fluxo(request, tc_lote.ndjson_em_fluxo(arquivos), content_type='application/x-ndjson')
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'
+    return resposta
 
-        dados = tc_parser.parsear_tc(texto)
 
-        # Verifica se o BOU/processo já existe
-        duplicata = None
-        if dados.get('bou'):
-            oc = Ocorrencia.objects.filter(bou=dados['bou']).first()
-            if oc:
-                duplicata = {'id': oc.id, 'bou': oc.bou}
-        if not duplicata and dados.get('processo'):
-            oc = Ocorrencia.objects.filter(processo=dados['processo']).first()
-            if oc:
-                duplicata = {'id': oc.id, 'bou': oc.bou}
+@login_required
+def api_estatisticas_tc(request):
+    """
+    Contadores dos backends de extração de PDF deste processo do servidor:
+    tentativas, aceitos, falhas, páginas, tempo, ms por página e taxa de aceitação.
+    """
+    return JsonResponse({
+        'disponiveis': [nome for nome in tc_parser.BACKENDS_PDF if tc_parser.backend_disponivel(nome)],
+        'backends': tc_parser.estatisticas_pdf(),
+    })
 
-        dados['duplicata'] = duplicata
-        return JsonResponse({'sucesso': True, 'dados': dados})
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return JsonResponse({'erro': f'Erro ao processar arquivo: {str(e)}'}, status=500)
+@login_required
+def api_instrumentacao_tc(request):
+    """
+    Resumo da instrumentação do tc_parser neste processo do servidor (só staff):
+    por campo, taxa de acerto, alternativa que casou e tempo médio/p95.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'erro': 'Acesso restrito à administração.'}, status=403)
+    return JsonResponse(tc_parser.resumo_instrumentacao())
 
 @csrf_exempt
-def api_receber_projudi(request):
+async def api_receber_projudi(request):
     """
     NÃO grava nada automaticamente.
     Valida duplicidade e retorna a URL do formulário pré-preenchido
-    para o usuário conferir e salvar manualmente.
+    para o usuário conferir e salvar manualmente. Assíncrona, como api_ler_tc.
     """
     if request.method == 'POST':
         try:
@@ -657,7 +751,7 @@ def api_receber_projudi(request):
                 return JsonResponse({'erro': 'Número do processo não informado.'}, status=400)
 
             # Verifica duplicidade
-            ocorrencia = Ocorrencia.objects.filter(processo=processo).first()
+            ocorrencia = await Ocorrencia.objects.filter(processo_normalizado=normalizar_processo(processo)).afirst()
             if ocorrencia:
                 url_edicao = request.build_absolute_uri(f'/gestao/cadastro/adicionar/{ocorrencia.id}/')
                 return JsonResponse({
@@ -775,6 +869,11 @@ def lotes_montagem(request):
     }
     return render(request, 'gestao/lotes_montagem.html', context)
 
+
+# Chave de processo que é um BOU (ocorrência sem processo), como "2025/00001"
+_CHAVE_BOU = re.compile(r'^\d+/\d+$')
+
+
 @login_required
 @transaction.atomic
 def fechar_lote_manual(request):
@@ -797,14 +896,24 @@ def fechar_lote_manual(request):
             lotes_criados = 0
             processos_adicionados = 0
             materiais_adicionados = 0
+            materiais_lotados = []
             
+            # A chave de cada processo é "processo or bou" (lotes_montagem). O processo casa
+            # como foi digitado (as repetidas antigas não têm chave normalizada) e pela chave
+            # normalizada; só as chaves sem formato de BOU são normalizadas: "2025/00001"
+            # normalizado casaria com o processo "2025.00001" de outra ocorrência.
+            bous = [k for k in processo_keys if _CHAVE_BOU.match(k)]
+            processos = [normalizar_processo(k) for k in processo_keys if not _CHAVE_BOU.match(k)]
+            sem_processo = Q(noticiado__ocorrencia__processo__isnull=True) | Q(noticiado__ocorrencia__processo='')
+
             # Buscar todos os materiais dos processos selecionados, ordenados por data
             materiais_selecionados = Material.objects.filter(
                 status='AUTORIZADO',
                 lote__isnull=True
             ).select_related('noticiado__ocorrencia').filter(
                 Q(noticiado__ocorrencia__processo__in=processo_keys) |
-                Q(noticiado__ocorrencia__bou__in=processo_keys)
+                Q(noticiado__ocorrencia__processo_normalizado__in=processos) |
+                (Q(noticiado__ocorrencia__bou__in=bous) & sem_processo)
             ).order_by('noticiado__ocorrencia__data_registro_bou', 'noticiado__ocorrencia__bou')
             
             # Agrupar materiais por processo (manter processos juntos)
@@ -845,19 +954,13 @@ def fechar_lote_manual(request):
                     
                     for mat in materiais_processo:
                         mat.lote = lote_atual
-                        mat.status = 'AGUARDANDO_INCINERACAO'
-                        mat.save(update_fields=['lote', 'status'])
-                        RegistroHistorico.objects.create(
-                            material=mat,
-                            criado_por=request.user,
-                            status_na_epoca='AGUARDANDO_INCINERACAO',
-                            observacao=f"Material adicionado ao Lote {identificador}"
-                        )
+                        materiais_lotados.append(mat)
                         materiais_adicionados += 1
                     processos_adicionados += 1
                     lotes_criados += 1
                     lote_atual = None
                     espacos_restantes = 0
+                    continue
                 
                 # Se não cabe no lote atual, criar novo lote
                 elif qtd_processo > espacos_restantes:
@@ -876,14 +979,7 @@ def fechar_lote_manual(request):
                 # Adicionar processo ao lote atual
                 for mat in materiais_processo:
                     mat.lote = lote_atual
-                    mat.status = 'AGUARDANDO_INCINERACAO'
-                    mat.save(update_fields=['lote', 'status'])
-                    RegistroHistorico.objects.create(
-                        material=mat,
-                        criado_por=request.user,
-                        status_na_epoca='AGUARDANDO_INCINERACAO',
-                        observacao=f"Material adicionado ao Lote {identificador}"
-                    )
+                    materiais_lotados.append(mat)
                     materiais_adicionados += 1
                     espacos_restantes -= 1
                 processos_adicionados += 1
@@ -892,8 +988,16 @@ def fechar_lote_manual(request):
             if lote_atual:
                 lotes_criados += 1
             
+            # Todos os materiais de todos os lotes numa transição só
+            custodia.transicionar(
+                materiais_lotados, 'AGUARDANDO_INCINERACAO',
+                "Material adicionado ao Lote {material.lote.identificador}",
+                usuario=request.user, campos=['lote'])
+            
             messages.success(request, f"{lotes_criados} lote(s) criado(s) com {processos_adicionados} processo(s) e {materiais_adicionados} material(is)!")
         except Exception as e:
+            # Nada do que foi criado antes do erro (lotes vazios, pendências) pode ficar gravado
+            transaction.set_rollback(True)
             messages.error(request, f"Erro ao gerar lote: {e}")
     
     return redirect('lotes_montagem')
@@ -1068,26 +1172,20 @@ def concluir_caixa(request, caixa_id):
                 messages.warning(request, "Esta caixa já foi incinerada!")
                 return redirect('caixas_incineracao')
             
-            lotes = caixa.lotes.all()
-            count = 0
+            lotes = [lote for lote in caixa.lotes.all() if lote.status != 'INCINERADO']
+            
+            # Materiais primeiro, numa transição só: se alguma for inválida, nada é gravado
+            custodia.transicionar(
+                Material.objects.filter(lote__in=lotes).exclude(status='INCINERADO'), 'INCINERADO',
+                "Material incinerado via caixa {caixa}",
+                usuario=request.user, contexto={'caixa': caixa.identificador})
             
+            agora = timezone.now()
             for lote in lotes:
-                if lote.status != 'INCINERADO':
-                    lote.status = 'INCINERADO'
-                    lote.data_incineracao = timezone.now()
-                    lote.save(update_fields=['status', 'data_incineracao'])
-                    
-                    for mat in lote.materiais.all():
-                        mat.status = 'INCINERADO'
-                        mat.save(update_fields=['status'])
-                        
-                        RegistroHistorico.objects.create(
-                            material=mat,
-                            criado_por=request.user,
-                            status_na_epoca='INCINERADO',
-                            observacao=f"Material incinerado via caixa {caixa.identificador}"
-                        )
-                    count += 1
+                lote.status = 'INCINERADO'
+                lote.data_incineracao = agora
+            LoteIncineracao.objects.bulk_update(lotes, ['status', 'data_incineracao'])
+            count = len(lotes)
             
             caixa.status = 'INCINERADO'
             caixa.data_incineracao = timezone.now()
@@ -1095,6 +1193,7 @@ def concluir_caixa(request, caixa_id):
             
             messages.success(request, f"Caixa {caixa.identificador} incinerada com {count} lote(s)!")
         except Exception as e:
+            transaction.set_rollback(True)
             messages.error(request, f"Erro ao concluir caixa: {e}")
     
     return redirect('caixas_incineracao')
@@ -1104,105 +1203,14 @@ def concluir_caixa(request, caixa_id):
 def imprimir_certidao_caixa(request, caixa_id):
     """ Gera certidão de incineração para todos os lotes da caixa """
     caixa = get_object_or_404(CaixaIncineracao, id=caixa_id)
-    lotes = caixa.lotes.all().prefetch_related('materiais__noticiado__ocorrencia')
-    
-    return render(request, 'gestao/certidao_caixa.html', {
-        'caixa': caixa,
-        'lotes': lotes,
-        'data_impressao': timezone.now(),
-    })
+    return render(request, 'gestao/certidao_caixa.html', documentos_dados.contexto_certidao_caixa(caixa))
 
 
 @login_required
 def imprimir_espelho_caixa(request, caixa_id):
     """ Gera espelho (lista detalhada) de todos os lotes da caixa para certidão de incineração """
     caixa = get_object_or_404(CaixaIncineracao, id=caixa_id)
-
-    lotes_list = []
-    all_materiais = []
-
-    for lote in caixa.lotes.all():
-        mats = lista = list(lote.materiais.select_related('noticiado__ocorrencia'))
-        peso_lote = sum(float(m.peso_real or m.peso_estimado or 0) for m in mats)
-
-        lotes_list.append({
-            'lote': lote,
-            'materiais_count': len(mats),
-            'peso': peso_lote,
-        })
-
-        for mat in mats:
-            all_materiais.append({
-                'material': mat,
-                'lote_identificador': lote.identificador,
-                'noticiado_nome': mat.noticiado.nome if mat.noticiado else '',
-                'processo': mat.noticiado.ocorrencia.processo if mat.noticiado and mat.noticiado.ocorrencia else '',
-                'bou': mat.noticiado.ocorrencia.bou if mat.noticiado and mat.noticiado.ocorrencia else '',
-            })
-
-    all_materiais.sort(key=lambda x: (
-        x['noticiado_nome'].upper(),
-        x['processo'] or x['bou'],
-        x['lote_identificador']
-    ))
-
-    por_vara = {}
-    for item in all_materiais:
-        mat = item['material']
-        if mat.noticiado and mat.noticiado.ocorrencia:
-            vn = mat.noticiado.ocorrencia.get_vara_display()
-            por_vara.setdefault(vn, []).append(item)
-
-    processos_unicos = set()
-    for item in all_materiais:
-        proc = item['processo'] or item['bou']
-        if proc:
-            processos_unicos.add(proc)
-
-    total_peso = sum(float(item['material'].peso_real or item['material'].peso_estimado or 0) for item in all_materiais)
-
-    return render(request, 'gestao/espelho_caixa.html', {
-        'caixa': caixa,
-        'lotes_list': lotes_list,
-        'materiais': all_materiais,
-        'por_vara': por_vara,
-        'processos_unicos_count': len(processos_unicos),
-        'total_peso': total_peso,
-        'total_itens': len(all_materiais),
-        'data_impressao': timezone.now(),
-    })
-
-    all_materiais.sort(key=lambda x: (
-        x['noticiado_nome'].upper(),
-        x['processo'] or x['bou'],
-        x['lote_identificador']
-    ))
-
-    por_vara = {}
-    for item in all_materiais:
-        mat = item['material']
-        if mat.noticiado and mat.noticiado.ocorrencia:
-            vn = mat.noticiado.ocorrencia.get_vara_display()
-            por_vara.setdefault(vn, []).append(item)
-
-    processos_unicos = set()
-    for item in all_materiais:
-        proc = item['processo'] or item['bou']
-        if proc:
-            processos_unicos.add(proc)
-
-    total_peso = sum(float(item['material'].peso_real or item['material'].peso_estimado or 0) for item in all_materiais)
-
-    return render(request, 'gestao/espelho_caixa.html', {
-        'caixa': caixa,
-        'lotes': lotes,
-        'materiais': all_materiais,
-        'por_vara': por_vara,
-        'processos_unicos_count': len(processos_unicos),
-        'total_peso': total_peso,
-        'total_itens': len(all_materiais),
-        'data_impressao': timezone.now(),
-    })
+    return render(request, 'gestao/espelho_caixa.html', documentos_dados.contexto_espelho_caixa(caixa))
 
 
 # --- 6. IMPRESSÃO E RELATÓRIOS (AUDITORIA FÍSICA) ---
@@ -1233,6 +1241,179 @@ def imprimir_capa_lote(request, id):
         'data_impressao': timezone.now()
     })
 
+# --- 6B. DOCUMENTOS PDF (CACHE POR CONTEÚDO + ETAG) ---
+
+FILTROS_RELATORIO = ['categoria', 'substancia', 'status', 'vara', 'natureza_penal',
+                     'data_inicio', 'data_fim', 'ano', 'semestre', 'unidade_origem']
+
+
+def _resposta_documento(request, documento, nome_arquivo):
+    return documentos_cache.resposta_pdf(
+        request, documento.tipo, documento.ids, documento.digital, documento.gerar,
+        nome_arquivo, por_dia=documento.por_dia)
+
+
+@login_required
+def pdf_recibo_entrada(request, id):
+    """ Recibo de entrada em PDF; só é regerado se a ocorrência mudou """
+    documento = documentos_exportacao.recibo_entrada(id)
+    if documento is None:
+        raise Http404("Ocorrência não encontrada.")
+    return _resposta_documento(request, documento, f"recibo_entrada_{id}.pdf")
+
+
+@login_required
+def pdf_capa_lote(request, id):
+    """ Capa (termo de destruição) do lote em PDF """
+    documento = documentos_exportacao.capa_lote(id, request.user)
+    if documento is None:
+        raise Http404("Lote não encontrado.")
+    return _resposta_documento(request, documento, f"capa_lote_{id}.pdf")
+
+
+@login_required
+def pdf_certidao_lotes(request, tipo):
+    """ Certidão antecipada ou coletiva (pós-incineração) dos lotes informados em ?lote= """
+    if tipo not in ('antecipada', 'coletiva'):
+        raise Http404("Tipo de certidão inválido.")
+    lote_ids = {int(i) for i in request.GET.getlist('lote') if i.isdigit()}
+    documento = documentos_exportacao.certidao_lotes(tipo, lote_ids, request.user)
+    if documento is None:
+        raise Http404("Nenhum lote encontrado.")
+    return _resposta_documento(request, documento, f"certidao_{tipo}.pdf")
+
+
+@login_required
+def pdf_relatorio(request):
+    """ Relatório filtrado (landscape) em PDF, com os mesmos filtros do relatório gerencial """
+    tipo = request.GET.get('tipo', 'inventario')
+    filtros = {k: request.GET[k] for k in FILTROS_RELATORIO if request.GET.get(k)}
+    qs = documentos_dados.aplicar_filtros_material(
+        Material.objects.select_related('noticiado__ocorrencia'), filtros
+    ).order_by('noticiado__ocorrencia__data_registro_bou', 'id')
+
+    def gerar(destino):
+        documentos_services.gerar_relatorio_filtrado_pdf(qs, filtros, tipo, destino=destino)
+
+    ids = [tipo] + [f"{k}={v}" for k, v in sorted(filtros.items())]
+    return documentos_cache.resposta_pdf(
+        request, 'relatorio', ids, documentos_cache.digital_materiais(qs), gerar,
+        f"relatorio_{tipo}.pdf", por_dia=True)
+
+
+@login_required
+def exportar_auditoria_zip(request):
+    """
+    ZIP com todos os documentos de uma caixa (?caixa=) ou semestre (?ano=&semestre=),
+    enviado em fluxo à medida que cada arquivo fica pronto
+    """
+    caixa = request.GET.get('caixa', '')
+    ano, semestre = request.GET.get('ano', ''), request.GET.get('semestre', '')
+    if caixa.isdigit():
+        lote_ids = documentos_pacote.selecionar_lotes(caixa_id=int(caixa))
+        nome = f"auditoria_caixa_{caixa}.zip"
+    elif ano.isdigit() and semestre in ('1', '2'):
+        lote_ids = documentos_pacote.selecionar_lotes(ano=int(ano), semestre=semestre)
+        nome = f"auditoria_{ano}_{semestre}sem.zip"
+    else:
+        return JsonResponse({'erro': 'Informe a caixa ou o ano e o semestre.'}, status=400)
+    if not lote_ids:
+        raise Http404("Nenhum lote encontrado.")
+
+    arquivos = documentos_exportacao.arquivos_auditoria(lote_ids, request.user)
+    response = _resposta_em_fluxo(request, documentos_exportacao.zip_em_fluxo(arquivos), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
+
+
+# --- 6C. FILA DE DOCUMENTOS EM SEGUNDO PLANO ---
+
+def _tarefa_json(tarefa):
+    dados = {
+        'id': tarefa.id,
+        'tipo': tarefa.tipo,
+        'status': tarefa.status,
+        'progresso': tarefa.progresso,
+        'erro': tarefa.erro,
+        'url_status': reverse('api_status_documento', args=[tarefa.id]),
+    }
+    if tarefa.status == 'CONCLUIDO':
+        dados['url_download'] = reverse('baixar_documento_tarefa', args=[tarefa.id])
+    return dados
+
+
+def _parametros_pacote(dados, lote_ids):
+    """ Pacote de documentos: lotes de uma caixa, de um semestre (ano + semestre) ou os informados """
+    caixa = dados.get('caixa', '')
+    ano, semestre = dados.get('ano', ''), dados.get('semestre', '')
+    if not (caixa.isdigit() or lote_ids or (ano.isdigit() and semestre in ('1', '2'))):
+        return None, 'Informe a caixa, o semestre (ano e semestre) ou os lotes do pacote.'
+
+    lote_ids = documentos_pacote.selecionar_lotes(
+        caixa_id=int(caixa) if caixa.isdigit() else None,
+        ano=int(ano) if ano.isdigit() else None,
+        semestre=semestre if semestre in ('1', '2') else None,
+        lote_ids=lote_ids,
+    )
+    if not lote_ids:
+        return None, 'Nenhum lote encontrado para o pacote.'
+    documentos = [d for d in documentos_pacote.DOCUMENTOS_PACOTE if d in dados.getlist('documento')]
+    return {
+        'lote_ids': lote_ids,
+        'documentos': documentos or list(documentos_pacote.DOCUMENTOS_PACOTE),
+        'formato': 'zip' if dados.get('formato') == 'zip' else 'pdf',
+    }, None
+
+
+@login_required
+@require_POST
+def api_enfileirar_documento(request):
+    """ Enfileira um documento pesado; o worker (processar_documentos) gera em segundo plano """
+    tipo = request.POST.get('tipo', '').upper()
+    lote_ids = sorted({int(i) for i in request.POST.getlist('lote') if i.isdigit()})
+
+    if tipo == 'RELATORIO':
+        parametros = {
+            'tipo': request.POST.get('tipo_relatorio', 'inventario'),
+            'filtros': {k: request.POST[k] for k in FILTROS_RELATORIO if request.POST.get(k)},
+        }
+    elif tipo == 'PACOTE':
+        parametros, erro = _parametros_pacote(request.POST, lote_ids)
+        if erro:
+            return JsonResponse({'erro': erro}, status=400)
+    elif not lote_ids:
+        return JsonResponse({'erro': 'Informe ao menos um lote.'}, status=400)
+    elif tipo == 'CAPA_LOTE':
+        parametros = {'lote_id': lote_ids[0]}
+    else:
+        parametros = {'lote_ids': lote_ids}
+
+    try:
+        tarefa = tarefas_documentos.enfileirar(tipo, parametros, request.user)
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    return JsonResponse(_tarefa_json(tarefa), status=202)
+
+
+@login_required
+def api_status_documento(request, id):
+    tarefa = get_object_or_404(TarefaDocumento, id=id)
+    return JsonResponse(_tarefa_json(tarefa))
+
+
+@login_required
+def baixar_documento_tarefa(request, id):
+    tarefa = get_object_or_404(TarefaDocumento, id=id)
+    if tarefa.status != 'CONCLUIDO' or not tarefa.arquivo:
+        return JsonResponse(_tarefa_json(tarefa), status=409)
+    caminho = os.path.join(settings.MEDIA_ROOT, tarefa.arquivo)
+    if not os.path.exists(caminho):
+        raise Http404("Arquivo da tarefa não encontrado.")
+    content_type = 'application/zip' if caminho.endswith('.zip') else 'application/pdf'
+    return FileResponse(open(caminho, 'rb'), content_type=content_type,
+                        filename=os.path.basename(caminho))
+
+
 @login_required
 def imprimir_certidao_lote(request, id):
     """ Certidão detalhada para o Juízo/Promotoria sobre a destruição """
@@ -1256,10 +1437,8 @@ def imprimir_certidao_lote(request, id):
     }
     return render(request, 'relatorios/certidao_destruicao.html', context)
 
-@login_required
-def relatorio_inventario_geral(request):
-    """ Visão geral de tudo com rastro de quem manipulou e filtros avançados """
-    params = request.GET
+def _filtros_inventario(params):
+    """ Filtros do inventário geral (tela e exportação). Sem ano informado vale o ano atual. """
     filtros = Q()
     ano_atual = datetime.now().year
 
@@ -1298,13 +1477,21 @@ def relatorio_inventario_geral(request):
     if substancia:
         filtros &= Q(substancia=substancia)
 
+    return filtros
+
+
+@login_required
+def relatorio_inventario_geral(request):
+    """ Visão geral de tudo com rastro de quem manipulou e filtros avançados """
+    filtros = _filtros_inventario(request.GET)
+
     # Query Principal
     materiais_qs = Material.objects.filter(filtros).select_related(
         'noticiado__ocorrencia', 
         'noticiado__ocorrencia__criado_por',
         'lote'
     ).prefetch_related(
-        Prefetch('historico', queryset=RegistroHistorico.objects.select_related('criado_por'))
+        Prefetch('historico', queryset=RegistroHistorico.objects.select_related('criado_por').order_by('-data_criacao'))
     ).order_by('-noticiado__ocorrencia__data_registro_bou')
 
     # Cálculos Extras para Resumo
@@ -1342,6 +1529,30 @@ def relatorio_inventario_geral(request):
     
     return render(request, 'relatorios/inventario_geral.html', context)
 
+
+@login_required
+def exportar_inventario(request, formato):
+    """
+    Inventário geral completo (mesmos filtros da tela) em CSV ou XLSX, enviado
+    em fluxo enquanto os materiais são lidos do banco em blocos
+    """
+    if formato not in ('csv', 'xlsx'):
+        raise Http404("Formato inválido.")
+    materiais_qs = Material.objects.filter(_filtros_inventario(request.GET)).order_by(
+        '-noticiado__ocorrencia__data_registro_bou', 'id')
+    linhas = inventario_exportacao.linhas_inventario(materiais_qs)
+
+    if formato == 'csv':
+        response = _resposta_em_fluxo(
+            request, inventario_exportacao.csv_em_fluxo(linhas), content_type='text/csv; charset=utf-8')
+    else:
+        response = _resposta_em_fluxo(
+            request, inventario_exportacao.xlsx_em_fluxo(linhas),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    nome = f"inventario_{timezone.now().strftime('%Y%m%d_%H%M')}.{formato}"
+    response['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
+
 # --- 7. RELATÓRIOS ESPECÍFICOS (VARA CRIMINAL) ---
 
 @login_required
@@ -1422,5 +1633,13 @@ def auditoria_lista(request):
 @login_required
 def detalhe_auditoria(request, material_id):
     material = get_object_or_404(Material, id=material_id)
-    historico = material.historico.all().order_by('-data_criacao')
-    return render(request, 'gestao/detalhe_auditoria.html', {'material': material, 'historico': historico})
\ No newline at end of file
+    # Só a tabela quente; o arquivo dos anos encerrados só com ?arquivo=1
+    ver_arquivo = request.GET.get('arquivo') == '1'
+    if ver_arquivo:
+        historico = RegistroHistorico.objects.entre(material_id=material.id)
+    else:
+        historico = material.historico.select_related('criado_por').order_by('-data_criacao', '-id')
+    return render(request, 'gestao/detalhe_auditoria.html', {
+        'material': material, 'historico': historico, 'ver_arquivo': ver_arquivo,
+        'ha_arquivo': not ver_arquivo and HistoricoArquivado.objects.exists(),
+    })
\ No newline at end of file